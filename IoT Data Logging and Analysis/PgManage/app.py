@@ -2,7 +2,8 @@ import streamlit as st
 import psycopg2
 import os
 from database.connection import DatabaseConnection
-from pages import dashboard, tables, functions, procedures, triggers, events, dcl_operations, query_executor, erd
+from database.ddl_feed import ensure_ddl_listener
+from pages import dashboard, tables, functions, procedures, triggers, events, dcl_operations, query_executor, erd, cache, workload, index_advisor, maintenance, locks
 from utils.helpers import init_session_state
 
 # Configure page
@@ -17,6 +18,16 @@ def main():
     """Main application entry point"""
     init_session_state()
     
+    try:
+        render_app()
+    finally:
+        # Hand the pooled connection back so idle sessions don't hold one
+        if st.session_state.get('db_connection') is not None:
+            st.session_state.db_connection.release()
+
+def render_app():
+    """Render sidebar and page content"""
+    
     # Custom CSS for better styling
     st.markdown("""
     <style>
@@ -126,7 +137,8 @@ def show_connection_status():
         
         if selected_db != st.session_state.get('current_database'):
             st.session_state.current_database = selected_db
-            st.session_state.db_connection.connect_to_database(selected_db)
+            if st.session_state.db_connection.connect_to_database(selected_db):
+                start_change_feed(st.session_state.db_connection)
             st.rerun()
             
     except Exception as e:
@@ -134,11 +146,20 @@ def show_connection_status():
     
     # Disconnect button
     if st.button("🔌 Disconnect", use_container_width=True):
+        st.session_state.db_connection.close()
         st.session_state.connected = False
         st.session_state.db_connection = None
         st.session_state.current_database = None
         st.rerun()
 
+def start_change_feed(db_conn):
+    """Listen for DDL notifications if the change feed triggers are installed"""
+    try:
+        ensure_ddl_listener(db_conn)
+    except Exception:
+        # The feed is optional; the catalog falls back to its TTL
+        pass
+
 def show_navigation_menu():
     """Display navigation menu"""
     menu_items = [
@@ -150,7 +171,12 @@ def show_navigation_menu():
         ("⚡ Triggers", "triggers"),
         ("📅 Events", "events"),
         ("🔐 DCL Operations", "dcl_operations"),
-        ("💻 Query Executor", "query_executor")
+        ("💻 Query Executor", "query_executor"),
+        ("📈 Workload", "workload"),
+        ("🧭 Index Advisor", "index_advisor"),
+        ("🧹 Maintenance", "maintenance"),
+        ("🔒 Locks", "locks"),
+        ("🧠 Result Cache", "cache")
     ]
     
     current_page = st.session_state.get('current_page', 'dashboard')
@@ -184,6 +210,16 @@ def show_main_content():
         query_executor.show()
     elif current_page == 'erd':
         erd.show()
+    elif current_page == 'workload':
+        workload.show()
+    elif current_page == 'index_advisor':
+        index_advisor.show()
+    elif current_page == 'maintenance':
+        maintenance.show()
+    elif current_page == 'locks':
+        locks.show()
+    elif current_page == 'cache':
+        cache.show()
 
 def show_welcome_screen():
     """Display welcome screen when not connected"""
@@ -0,0 +1,61 @@
+"""
+Benchmark the ERD layout and clustering on a synthetic warehouse schema
+
+Tables reference a few of the tables created shortly before them, as fact and
+dimension tables of one subject area tend to, with some tables left unrelated:
+    python benchmarks/erd_layout.py --tables 3000 --schemas 12
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.erd_layout import build_graph, compute_layout, connected_components, get_layout, label_propagation
+
+
+def synthetic_schema(tables, schemas, seed):
+    """Table labels and foreign key (source, target) pairs"""
+    rng = random.Random(seed)
+    labels = [f"schema_{i % schemas}.table_{i}" for i in range(tables)]
+    edges = []
+    for i in range(1, tables):
+        # One table in five is unrelated to the rest
+        if rng.random() < 0.2:
+            continue
+        for _ in range(rng.choice([1, 1, 2, 3])):
+            edges.append((labels[i], labels[rng.randrange(max(0, i - 60), i)]))
+    return labels, edges
+
+
+def time_it(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<28} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=3000)
+    parser.add_argument("--schemas", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    labels, edges = synthetic_schema(args.tables, args.schemas, args.seed)
+    graph = time_it("build graph", lambda: build_graph(labels, edges))
+    components = connected_components(len(graph.nodes), graph.edges)
+    print(f"{len(graph.nodes):,} tables, {len(graph.edges):,} related pairs, "
+          f"{len(components):,} components (largest {len(components[0]):,})")
+
+    time_it("force-directed layout", lambda: compute_layout(graph))
+    clusters = time_it("label propagation", lambda: label_propagation(graph))
+    print(f"{clusters.max() + 1:,} clusters")
+    time_it("get_layout (first call)", lambda: get_layout(graph))
+    time_it("get_layout (cached)", lambda: get_layout(graph))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark dict-row vs columnar DataFrame construction for query results
+
+Offline mode builds both DataFrames from synthetic sensor_data rows:
+    python benchmarks/result_decoding.py --rows 1000000
+
+Live mode selects the same shape from PostgreSQL with both cursor kinds:
+    python benchmarks/result_decoding.py --rows 1000000 --dsn "host=localhost user=postgres"
+"""
+import argparse
+import datetime
+import decimal
+import os
+import sys
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.results import build_dataframe
+
+Column = namedtuple('Column', ['name', 'type_code'])
+
+# reading_id int8, device_id int4, sensor_id int4, value float8,
+# calibrated numeric, reading_time timestamp, unit varchar
+DESCRIPTION = [
+    Column('reading_id', 20),
+    Column('device_id', 23),
+    Column('sensor_id', 23),
+    Column('value', 701),
+    Column('calibrated', 1700),
+    Column('reading_time', 1114),
+    Column('unit', 1043),
+]
+
+LIVE_QUERY = """
+    SELECT g::int8 AS reading_id,
+           (g % 500)::int4 AS device_id,
+           (g % 12)::int4 AS sensor_id,
+           random()::float8 AS value,
+           round((random() * 100)::numeric, 3) AS calibrated,
+           timestamp '2025-01-01' + g * interval '1 second' AS reading_time,
+           'celsius'::varchar AS unit
+    FROM generate_series(1, %s) g
+"""
+
+
+def synthetic_rows(count, numeric):
+    """Rows as psycopg2 would return them for DESCRIPTION"""
+    start = datetime.datetime(2025, 1, 1)
+    second = datetime.timedelta(seconds=1)
+    make_numeric = float if numeric == 'float' else decimal.Decimal
+    return [
+        (i, i % 500, i % 12, i * 0.5, make_numeric('12.345'), start + i * second, 'celsius')
+        for i in range(count)
+    ]
+
+
+def time_it(label, func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<28} {best:8.3f}s  {df.memory_usage(deep=True).sum() / 1e6:8.1f} MB")
+    return best
+
+
+def run_offline(rows, repeat):
+    # The old path decoded numeric to Decimal and built one dict per row
+    # (RealDictCursor does the dict building while fetching)
+    dict_source = synthetic_rows(rows, 'decimal')
+    names = [column.name for column in DESCRIPTION]
+    tuple_rows = synthetic_rows(rows, 'float')
+
+    dict_time = time_it(
+        "dict rows -> DataFrame",
+        lambda: pd.DataFrame([dict(zip(names, row)) for row in dict_source]),
+        repeat
+    )
+    columnar_time = time_it("columnar build_dataframe", lambda: build_dataframe(tuple_rows, DESCRIPTION), repeat)
+    return dict_time, columnar_time
+
+
+def run_live(dsn, rows, repeat):
+    import psycopg2
+    import psycopg2.extras
+    from database.results import prepare_cursor
+
+    conn = psycopg2.connect(dsn)
+
+    def dict_path():
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute(LIVE_QUERY, (rows,))
+        df = pd.DataFrame(cursor.fetchall())
+        cursor.close()
+        return df
+
+    def columnar_path():
+        cursor = conn.cursor()
+        prepare_cursor(cursor)
+        cursor.execute(LIVE_QUERY, (rows,))
+        df = build_dataframe(cursor.fetchall(), cursor.description)
+        cursor.close()
+        return df
+
+    try:
+        dict_time = time_it("RealDictCursor + DataFrame", dict_path, repeat)
+        columnar_time = time_it("tuples + build_dataframe", columnar_path, repeat)
+    finally:
+        conn.close()
+    return dict_time, columnar_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dsn", help="libpq connection string for a live run")
+    args = parser.parse_args()
+
+    print(f"{args.rows:,} rows x {len(DESCRIPTION)} columns, best of {args.repeat}")
+    if args.dsn:
+        dict_time, columnar_time = run_live(args.dsn, args.rows, args.repeat)
+    else:
+        dict_time, columnar_time = run_offline(args.rows, args.repeat)
+    print(f"speedup: {dict_time / columnar_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Batch calls of one procedure with parameter rows from an uploaded CSV or Parquet
+file. Rows are bound as query parameters and committed in batches, each batch on
+its own pooled connection, so a run can be spread over several connections and
+resumed from the batches that did not finish.
+"""
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import psycopg2
+import psycopg2.errors
+from psycopg2 import sql
+
+from database.routines import routine_call
+
+BATCH_WORKER_CHOICES = [1, 2, 4, 8]
+DEFAULT_BATCH_SIZE = 500
+# Connections the page itself needs while a run holds the others
+RESERVED_CONNECTIONS = 2
+# Failed rows kept with their error; later failures are only counted
+MAX_CAPTURED_FAILURES = 10000
+
+BATCH_QUEUED = 'queued'
+BATCH_RUNNING = 'running'
+BATCH_DONE = 'done'
+BATCH_FAILED = 'failed'
+BATCH_CANCELLED = 'cancelled'
+
+# What happens to the rest of a batch when one of its rows fails
+ON_ERROR_SKIP = 'skip row'
+ON_ERROR_ROLLBACK = 'roll back batch'
+
+NULL_COLUMN = None
+
+
+def read_parameter_file(data: bytes, filename: str) -> pd.DataFrame:
+    """Parameter rows from CSV (values kept as text, empty cells are NULL) or Parquet (typed)"""
+    if filename.lower().endswith('.parquet'):
+        try:
+            return pd.read_parquet(io.BytesIO(data))
+        except ImportError as e:
+            raise ValueError(f"Reading Parquet files needs pyarrow or fastparquet: {str(e).splitlines()[0]}")
+    return pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, na_values=[''])
+
+
+def default_mapping(arguments: pd.DataFrame, columns: List[str]) -> List[Optional[str]]:
+    """File column for each argument: by name where one matches, otherwise by position"""
+    by_name = {column.lower(): column for column in columns}
+    mapping = []
+    for position, argument in enumerate(arguments.itertuples()):
+        if argument.parameter_mode == 'OUT':
+            mapping.append(NULL_COLUMN)
+        elif argument.parameter_name and argument.parameter_name.lower() in by_name:
+            mapping.append(by_name[argument.parameter_name.lower()])
+        elif position < len(columns):
+            mapping.append(columns[position])
+        else:
+            mapping.append(NULL_COLUMN)
+    return mapping
+
+
+def bind_rows(rows: pd.DataFrame, mapping: List[Optional[str]]) -> List[tuple]:
+    """One tuple of Python values per row in argument order; missing values and unmapped arguments are None"""
+    columns = []
+    for column in mapping:
+        if column is NULL_COLUMN:
+            columns.append([None] * len(rows))
+            continue
+        values = rows[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = pd.Series(values.dt.to_pydatetime(), index=values.index, dtype=object)
+        columns.append(values.astype(object).where(values.notna(), None).tolist())
+    return list(zip(*columns)) if columns else [()] * len(rows)
+
+
+def chunk_ranges(start: int, end: int, batch_size: int) -> List[Tuple[int, int]]:
+    return [(first, min(first + batch_size, end)) for first in range(start, end, batch_size)]
+
+
+def max_batch_workers(pool) -> int:
+    return max(1, pool.max_size - RESERVED_CONNECTIONS)
+
+
+class CallBatch:
+    """Rows [start, end) of the file, called in one transaction"""
+
+    def __init__(self, number: int, start: int, end: int):
+        self.number = number
+        self.start = start
+        self.end = end
+        self.status = BATCH_QUEUED
+        self.rows_done = 0
+        self.rows_failed = 0
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._conn = None
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class BatchRun:
+    """Calls of one procedure over parameter rows, at most `workers` batches at a time"""
+
+    def __init__(self, pool, routine, arguments: pd.DataFrame, rows: List[tuple], ranges: List[Tuple[int, int]],
+                 workers: int = 1, on_error: str = ON_ERROR_SKIP):
+        self.pool = pool
+        self.routine = routine
+        self.arguments = arguments
+        self.rows = rows
+        self.on_error = on_error
+        self.workers = min(workers, max_batch_workers(pool))
+        self.statement = routine_call(routine, arguments, [sql.Placeholder()] * len(arguments))
+        self.batches = [CallBatch(number, start, end) for number, (start, end) in enumerate(ranges, start=1)]
+        self.failures: List[Dict] = []
+        self.started_at = time.time()
+        self.finished_at = None
+        self._cancel_requested = False
+        self._lock = threading.Lock()
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pgmanage-batch")
+        self._futures = [executor.submit(self._call_batch, batch) for batch in self.batches]
+        # Workers exit once the queue is drained
+        executor.shutdown(wait=False)
+
+    def _record_failure(self, row: int, error: Exception):
+        with self._lock:
+            if len(self.failures) < MAX_CAPTURED_FAILURES:
+                self.failures.append({'row': row, 'error': str(error).strip()})
+
+    def _mark_finished(self):
+        """Stop the clock once no batch is queued or running, whichever thread gets there last"""
+        with self._lock:
+            if self.finished_at is None and self.finished:
+                self.finished_at = time.time()
+
+    def _call_batch(self, batch: CallBatch):
+        if self._cancel_requested:
+            batch.status = BATCH_CANCELLED
+            self._mark_finished()
+            return
+
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    with self._lock:
+                        if self._cancel_requested:
+                            batch.status = BATCH_CANCELLED
+                            return
+                        batch._conn = conn
+                        batch.started_at = time.time()
+                        batch.status = BATCH_RUNNING
+                    statement = self.statement.as_string(conn)
+                    skip = self.on_error == ON_ERROR_SKIP
+
+                    for row in range(batch.start, batch.end):
+                        if self._cancel_requested:
+                            # Nothing of a cancelled batch is kept, so resuming reruns all of it
+                            conn.rollback()
+                            batch.status = BATCH_CANCELLED
+                            batch.rows_done = 0
+                            return
+                        if skip:
+                            cursor.execute("SAVEPOINT pgmanage_batch_row")
+                        try:
+                            cursor.execute(statement, self.rows[row])
+                        except psycopg2.Error as e:
+                            # The row was interrupted by cancel(), it did not fail
+                            if self._cancel_requested and isinstance(e, psycopg2.errors.QueryCanceled):
+                                raise
+                            batch.rows_failed += 1
+                            self._record_failure(row, e)
+                            if not skip:
+                                raise
+                            cursor.execute("ROLLBACK TO SAVEPOINT pgmanage_batch_row")
+                            continue
+                        if skip:
+                            cursor.execute("RELEASE SAVEPOINT pgmanage_batch_row")
+                        batch.rows_done += 1
+
+                    conn.commit()
+                    batch.status = BATCH_DONE
+                finally:
+                    with self._lock:
+                        batch._conn = None
+                    cursor.close()
+        except psycopg2.errors.QueryCanceled as e:
+            batch.status = BATCH_CANCELLED if self._cancel_requested else BATCH_FAILED
+            batch.rows_done = 0
+            batch.error = str(e).strip()
+        except Exception as e:
+            batch.status = BATCH_FAILED
+            batch.rows_done = 0
+            batch.error = str(e).strip()
+        finally:
+            if batch.started_at is not None:
+                batch.finished_at = time.time()
+            self._mark_finished()
+
+    def cancel(self):
+        """Skip queued batches and roll back the running ones"""
+        with self._lock:
+            self._cancel_requested = True
+            connections = [batch._conn for batch in self.batches if batch._conn is not None]
+        for future, batch in zip(self._futures, self.batches):
+            if future.cancel():
+                batch.status = BATCH_CANCELLED
+        # The running batches may all have returned before their queued successors were cancelled
+        self._mark_finished()
+        for conn in connections:
+            try:
+                conn.cancel()
+            except psycopg2.Error:
+                pass
+
+    @property
+    def finished(self) -> bool:
+        return all(batch.status not in (BATCH_QUEUED, BATCH_RUNNING) for batch in self.batches)
+
+    @property
+    def rows_committed(self) -> int:
+        return sum(batch.rows_done for batch in self.batches if batch.status == BATCH_DONE)
+
+    @property
+    def rows_processed(self) -> int:
+        return sum(batch.rows_done + batch.rows_failed for batch in self.batches)
+
+    @property
+    def rows_settled(self) -> int:
+        """Rows that need no more work in this run: called, or in a batch that failed"""
+        return sum(batch.size if batch.status == BATCH_FAILED else batch.rows_done + batch.rows_failed
+                   for batch in self.batches)
+
+    @property
+    def total_rows(self) -> int:
+        return sum(batch.size for batch in self.batches)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        return self.rows_processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def unfinished_ranges(self) -> List[Tuple[int, int]]:
+        """Row ranges of the batches that were not committed, for a resumed run"""
+        return [(batch.start, batch.end) for batch in self.batches if batch.status != BATCH_DONE]
+
+    def first_unfinished_row(self) -> Optional[int]:
+        ranges = self.unfinished_ranges()
+        return ranges[0][0] if ranges else None
+
+    def failed_rows(self, names: List[str]) -> pd.DataFrame:
+        """Captured failures with the values they were called with; `row` is 1-based like the file's data rows"""
+        with self._lock:
+            failures = sorted(self.failures, key=lambda failure: failure['row'])
+        records = []
+        for failure in failures:
+            record = {'row': failure['row'] + 1}
+            record.update(zip(names, self.rows[failure['row']]))
+            record['error'] = failure['error']
+            records.append(record)
+        return pd.DataFrame(records, columns=['row'] + list(names) + ['error'])
+
+    def batch_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([{
+            'batch': batch.number,
+            'rows': f"{batch.start + 1:,}–{batch.end:,}",
+            'status': batch.status,
+            'done': batch.rows_done,
+            'failed': batch.rows_failed,
+            'percent': 100.0 if batch.status == BATCH_FAILED or not batch.size
+            else (batch.rows_done + batch.rows_failed) / batch.size * 100,
+            'elapsed': batch.elapsed,
+            'error': batch.error
+        } for batch in self.batches])
+
+    def summary(self) -> Dict[str, int]:
+        counts = {status: 0 for status in (BATCH_QUEUED, BATCH_RUNNING, BATCH_DONE, BATCH_FAILED, BATCH_CANCELLED)}
+        for batch in self.batches:
+            counts[batch.status] += 1
+        return counts
+
+
+_runs: Dict[tuple, BatchRun] = {}
+_runs_lock = threading.Lock()
+
+
+def start_batch_run(db_conn, routine, arguments: pd.DataFrame, rows: List[tuple], ranges: List[Tuple[int, int]],
+                    workers: int = 1, on_error: str = ON_ERROR_SKIP) -> BatchRun:
+    """Start a run for the connection's database; only one runs per database at a time"""
+    key = db_conn.cache_key
+    with _runs_lock:
+        current = _runs.get(key)
+        if current is not None and not current.finished:
+            raise RuntimeError("A batch run is already in progress for this database")
+        run = BatchRun(db_conn.get_pool(), routine, arguments, rows, ranges, workers, on_error)
+        _runs[key] = run
+        return run
+
+
+def get_batch_run(db_conn) -> Optional[BatchRun]:
+    """The current or last batch run of the connection's database, shared by all sessions"""
+    with _runs_lock:
+        return _runs.get(db_conn.cache_key)
+
+
+def clear_batch_run(db_conn):
+    with _runs_lock:
+        run = _runs.get(db_conn.cache_key)
+        if run is not None and run.finished:
+            del _runs[db_conn.cache_key]
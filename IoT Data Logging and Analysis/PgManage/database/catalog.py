@@ -0,0 +1,217 @@
+"""
+Cached catalog snapshot shared by all PgManage pages and sessions
+"""
+import re
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+from database.queries import CATALOG_QUERIES
+from database.relationships import RelationshipGraph, foreign_key_columns
+
+# Seconds a snapshot is served before it is reloaded
+CATALOG_TTL = 300
+
+# Statements that can't change the catalog; anything else invalidates it
+_NON_DDL_PATTERN = re.compile(r'^\s*(SELECT|WITH|SHOW|EXPLAIN|INSERT|UPDATE|DELETE|VALUES|TABLE|COPY)\b', re.IGNORECASE)
+
+
+@dataclass
+class CatalogSnapshot:
+    """Tables, columns, indexes, constraints, relationships, routines and triggers of one database"""
+    tables: pd.DataFrame
+    columns: pd.DataFrame
+    indexes: pd.DataFrame
+    constraints: pd.DataFrame
+    relationships: pd.DataFrame
+    foreign_keys: pd.DataFrame
+    routines: pd.DataFrame
+    triggers: pd.DataFrame
+    loaded_at: float = field(default_factory=time.time)
+    _graph: Optional[RelationshipGraph] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.loaded_at
+
+    @property
+    def graph(self) -> RelationshipGraph:
+        """Foreign keys and view dependencies as adjacency lists, built on first use"""
+        if self._graph is None:
+            self._graph = RelationshipGraph(self.relationships)
+        return self._graph
+
+    def table_options(self, table_type: Optional[str] = None) -> list:
+        """'schema.table' labels for select boxes"""
+        tables = self.tables
+        if table_type:
+            tables = tables[tables['table_type'] == table_type]
+        return (tables['table_schema'] + '.' + tables['table_name']).tolist()
+
+    def table_columns(self, schema: str, table: str) -> pd.DataFrame:
+        return self._for_table(self.columns, schema, table)
+
+    def table_indexes(self, schema: str, table: str) -> pd.DataFrame:
+        return self._for_table(self.indexes, schema, table)
+
+    def table_constraints(self, schema: str, table: str) -> pd.DataFrame:
+        return self._for_table(self.constraints, schema, table)
+
+    def table_info(self, schema: str, table: str) -> Optional[pd.Series]:
+        tables = self._for_table(self.tables, schema, table)
+        return None if tables.empty else tables.iloc[0]
+
+    def primary_key(self, schema: str, table: str) -> List[str]:
+        """Primary key column names in key order, empty if the table has none"""
+        indexes = self.table_indexes(schema, table)
+        primary = indexes[indexes['is_primary'] == True]
+        if primary.empty:
+            return []
+
+        attnums = [int(attnum) for attnum in primary.iloc[0]['indkey'].split()]
+        columns = self.table_columns(schema, table).set_index('ordinal_position')['column_name']
+        return [columns[attnum] for attnum in attnums]
+
+    @staticmethod
+    def _for_table(df: pd.DataFrame, schema: str, table: str) -> pd.DataFrame:
+        return df[(df['table_schema'] == schema) & (df['table_name'] == table)].reset_index(drop=True)
+
+
+# Snapshot frames a changed object of each pg_event_trigger object_type can affect
+OBJECT_TYPE_FRAMES = {
+    'table': ('tables', 'columns', 'indexes', 'constraints', 'relationships', 'triggers'),
+    'table column': ('tables', 'columns', 'indexes', 'constraints', 'relationships'),
+    'foreign table': ('tables', 'columns', 'constraints', 'relationships'),
+    'view': ('tables', 'columns', 'relationships'),
+    'materialized view': ('tables', 'columns', 'indexes', 'relationships'),
+    'index': ('indexes', 'constraints'),
+    'table constraint': ('constraints', 'relationships', 'indexes'),
+    'function': ('routines', 'triggers'),
+    'procedure': ('routines',),
+    'aggregate': ('routines',),
+    'trigger': ('triggers',),
+    'sequence': (),
+    'event trigger': (),
+    'policy': (),
+    'statistics object': (),
+}
+
+_cache: Dict[tuple, CatalogSnapshot] = {}
+_cache_lock = threading.Lock()
+# One loader per database so concurrent sessions wait for a single load
+_load_locks: Dict[tuple, threading.Lock] = {}
+# Frames known to be out of date, reloaded on the next get_catalog
+_stale_frames: Dict[tuple, Set[str]] = {}
+# Databases whose DDL is reported by a change feed listener
+_feed_keys: Set[tuple] = set()
+
+# With a live change feed the TTL only guards against missed notifications
+CATALOG_FEED_TTL = 3600
+
+
+def _with_column_counts(tables: pd.DataFrame, columns: pd.DataFrame) -> pd.DataFrame:
+    tables = tables.drop(columns=['column_count'], errors='ignore')
+    if tables.empty:
+        return tables
+    column_counts = columns.groupby(['table_schema', 'table_name']).size().rename('column_count')
+    tables = tables.join(column_counts, on=['table_schema', 'table_name'])
+    tables['column_count'] = tables['column_count'].fillna(0).astype('int64')
+    return tables
+
+
+def load_catalog(db_conn) -> CatalogSnapshot:
+    """Load a fresh snapshot with one pg_catalog query per object kind"""
+    frames = {name: db_conn.execute_query(query) for name, query in CATALOG_QUERIES.items()}
+    frames['tables'] = _with_column_counts(frames['tables'], frames['columns'])
+    frames['foreign_keys'] = foreign_key_columns(frames['relationships'])
+    return CatalogSnapshot(**frames)
+
+
+def refresh_catalog(db_conn, snapshot: CatalogSnapshot, frame_names: Iterable[str]) -> CatalogSnapshot:
+    """Copy of a snapshot with only the named frames reloaded"""
+    frames = {name: db_conn.execute_query(CATALOG_QUERIES[name]) for name in frame_names}
+    if 'tables' in frames or 'columns' in frames:
+        frames['tables'] = _with_column_counts(frames.get('tables', snapshot.tables),
+                                               frames.get('columns', snapshot.columns))
+    if 'relationships' in frames:
+        frames['foreign_keys'] = foreign_key_columns(frames['relationships'])
+    # loaded_at is kept so the TTL still forces a periodic full reload
+    return replace(snapshot, **frames)
+
+
+def get_catalog(db_conn, ttl: float = CATALOG_TTL) -> CatalogSnapshot:
+    """Cached snapshot for the connection's database, reloaded after ttl seconds"""
+    key = db_conn.cache_key
+
+    with _cache_lock:
+        if key in _feed_keys:
+            ttl = max(ttl, CATALOG_FEED_TTL)
+        snapshot = _cache.get(key)
+        if snapshot is not None and snapshot.age < ttl and not _stale_frames.get(key):
+            return snapshot
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    with load_lock:
+        # Another session may have finished loading while we waited
+        with _cache_lock:
+            snapshot = _cache.get(key)
+            stale = _stale_frames.pop(key, set())
+        if snapshot is not None and snapshot.age < ttl and not stale:
+            return snapshot
+
+        try:
+            if snapshot is not None and snapshot.age < ttl:
+                snapshot = refresh_catalog(db_conn, snapshot, stale)
+            else:
+                snapshot = load_catalog(db_conn)
+        except Exception:
+            with _cache_lock:
+                _stale_frames.setdefault(key, set()).update(stale)
+            raise
+
+        with _cache_lock:
+            _cache[key] = snapshot
+        return snapshot
+
+
+def invalidate_catalog_key(key: tuple, object_types: Optional[Iterable[str]] = None):
+    """Invalidate a cached snapshot entirely, or only the frames the changed object types affect"""
+    with _cache_lock:
+        if object_types is None:
+            _cache.pop(key, None)
+            _stale_frames.pop(key, None)
+            return
+
+        if key not in _cache:
+            return
+        stale = _stale_frames.setdefault(key, set())
+        for object_type in object_types:
+            # Unknown object types (schemas, types, extensions, ...) reload everything
+            stale.update(OBJECT_TYPE_FRAMES.get(object_type, CATALOG_QUERIES.keys()))
+
+
+def invalidate_catalog(db_conn, object_types: Optional[Iterable[str]] = None):
+    """Drop the cached snapshot for the connection's database"""
+    invalidate_catalog_key(db_conn.cache_key, object_types)
+
+
+def set_change_feed(key: tuple, active: bool):
+    """Record whether a change feed listener is keeping a database's snapshot current"""
+    with _cache_lock:
+        if active:
+            _feed_keys.add(key)
+        else:
+            _feed_keys.discard(key)
+
+
+def has_change_feed(db_conn) -> bool:
+    with _cache_lock:
+        return db_conn.cache_key in _feed_keys
+
+
+def is_ddl(query: str) -> bool:
+    """Whether a statement may change the catalog"""
+    return not _NON_DDL_PATTERN.match(query)
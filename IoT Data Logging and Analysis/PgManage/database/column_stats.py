@@ -0,0 +1,129 @@
+"""
+Zero-scan column profiles built from the planner statistics in pg_stats
+"""
+import datetime
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from database.queries import COLUMN_STATS_QUERIES
+from database.results import fetch_dataframe
+
+# Share of rows modified since ANALYZE before statistics count as aging / stale;
+# autovacuum re-analyzes at 10% by default
+AGING_MODIFIED_RATIO = 0.1
+STALE_MODIFIED_RATIO = 0.2
+
+FRESHNESS_FRESH = 'fresh'
+FRESHNESS_AGING = 'aging'
+FRESHNESS_STALE = 'stale'
+FRESHNESS_MISSING = 'never analyzed'
+
+
+@dataclass
+class StatsProfile:
+    """Column statistics of one table as of its last ANALYZE"""
+    schema: str
+    table: str
+    row_estimate: float
+    columns: pd.DataFrame
+    last_analyzed: Optional[datetime.datetime]
+    modified_since_analyze: Optional[float]
+
+    @property
+    def modified_ratio(self) -> Optional[float]:
+        if self.modified_since_analyze is None:
+            return None
+        return self.modified_since_analyze / max(self.row_estimate, 1.0)
+
+    @property
+    def freshness(self) -> str:
+        if self.last_analyzed is None or self.columns.empty:
+            return FRESHNESS_MISSING
+        ratio = self.modified_ratio or 0.0
+        if ratio >= STALE_MODIFIED_RATIO:
+            return FRESHNESS_STALE
+        if ratio >= AGING_MODIFIED_RATIO:
+            return FRESHNESS_AGING
+        return FRESHNESS_FRESH
+
+    def column(self, column_name: str) -> Optional[pd.Series]:
+        columns = self.columns[self.columns['column_name'] == column_name]
+        return None if columns.empty else columns.iloc[0]
+
+    def top_values(self, column_name: str) -> pd.DataFrame:
+        """Most common values with their share and estimated row count"""
+        stats = self.column(column_name)
+        if stats is None or not isinstance(stats['most_common_vals'], list):
+            return pd.DataFrame(columns=['value', 'frequency', 'estimated_rows'])
+
+        frequencies = np.asarray(stats['most_common_freqs'], dtype='float64')
+        return pd.DataFrame({
+            'value': stats['most_common_vals'],
+            'frequency': frequencies,
+            'estimated_rows': frequencies * self.row_estimate
+        })
+
+    def histogram(self, column_name: str) -> pd.DataFrame:
+        """Equi-depth histogram buckets; numeric bounds also get a row density"""
+        stats = self.column(column_name)
+        if stats is None or not isinstance(stats['histogram_bounds'], list) or len(stats['histogram_bounds']) < 2:
+            return pd.DataFrame(columns=['lower', 'upper', 'frequency', 'estimated_rows'])
+
+        bounds = stats['histogram_bounds']
+        buckets = len(bounds) - 1
+        # Histogram buckets share the rows that are neither NULL nor a most common value
+        common_share = float(np.sum(stats['most_common_freqs'])) if isinstance(stats['most_common_freqs'], list) else 0.0
+        frequency = max(1.0 - float(stats['null_frac']) - common_share, 0.0) / buckets
+
+        histogram = pd.DataFrame({
+            'lower': bounds[:-1],
+            'upper': bounds[1:],
+            'frequency': frequency,
+            'estimated_rows': frequency * self.row_estimate
+        })
+
+        numeric_bounds = pd.to_numeric(pd.Series(bounds), errors='coerce')
+        if numeric_bounds.notna().all():
+            widths = numeric_bounds.diff().iloc[1:].to_numpy()
+            histogram['lower'] = numeric_bounds.iloc[:-1].to_numpy()
+            histogram['upper'] = numeric_bounds.iloc[1:].to_numpy()
+            histogram['density'] = np.where(widths > 0, histogram['estimated_rows'] / np.where(widths > 0, widths, 1), np.nan)
+        return histogram
+
+
+def distinct_estimate(n_distinct: float, row_estimate: float) -> float:
+    """pg_stats n_distinct as a count; negative values are a fraction of the rows"""
+    if pd.isna(n_distinct):
+        return np.nan
+    return -n_distinct * row_estimate if n_distinct < 0 else n_distinct
+
+
+def load_stats_profile(connection, schema: str, table: str) -> StatsProfile:
+    """Read pg_stats and the ANALYZE bookkeeping for one table without scanning it"""
+    columns = fetch_dataframe(connection, COLUMN_STATS_QUERIES['pg_stats'], (schema, table))
+    freshness = fetch_dataframe(connection, COLUMN_STATS_QUERIES['freshness'], (schema, table))
+
+    if freshness.empty:
+        raise Exception(f"Table {schema}.{table} not found")
+    info = freshness.iloc[0]
+
+    # reltuples is -1 on PostgreSQL 14+ until the first VACUUM/ANALYZE
+    row_estimate = float(info['reltuples']) if pd.notna(info['reltuples']) and info['reltuples'] >= 0 else 0.0
+    if pd.notna(info['n_live_tup']) and row_estimate == 0:
+        row_estimate = float(info['n_live_tup'])
+
+    if not columns.empty:
+        columns['distinct_estimate'] = [distinct_estimate(value, row_estimate) for value in columns['n_distinct']]
+
+    last_analyzed = info['last_analyzed']
+    return StatsProfile(
+        schema=schema,
+        table=table,
+        row_estimate=row_estimate,
+        columns=columns,
+        last_analyzed=None if pd.isna(last_analyzed) else pd.Timestamp(last_analyzed).to_pydatetime(),
+        modified_since_analyze=None if pd.isna(info['n_mod_since_analyze']) else float(info['n_mod_since_analyze'])
+    )
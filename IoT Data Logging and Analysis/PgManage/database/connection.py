@@ -3,6 +3,9 @@ import psycopg2.extras
 import streamlit as st
 from typing import List, Dict, Any, Optional
 import pandas as pd
+from database.pool import ConnectionPool, get_pool
+from database.result_cache import cached_query
+from database.results import build_dataframe, prepare_cursor
 
 class DatabaseConnection:
     """Handles PostgreSQL database connections and operations"""
@@ -12,20 +15,39 @@ class DatabaseConnection:
         self.port = port
         self.user = user
         self.password = password
-        self.connection = None
         self.current_database = None
+        self._pool = None
+        self._connection = None
+    
+    @property
+    def connection(self):
+        """Connection borrowed from the shared pool for the current script run"""
+        if self._connection is None and self._pool is not None:
+            self._connection = self._pool.getconn()
+        return self._connection
+    
+    @property
+    def cache_key(self) -> tuple:
+        """Identity of the current database for process-wide caches"""
+        return (self.host, str(self.port), self.user, self.current_database)
+    
+    def get_pool(self, database: Optional[str] = None) -> ConnectionPool:
+        """Get the process-wide pool for a database on this server"""
+        return get_pool(self.host, self.port, self.user, self.password,
+                        database or self.current_database or 'postgres')
+    
+    def release(self):
+        """Return the borrowed connection to the pool"""
+        if self._connection is not None:
+            self._pool.putconn(self._connection)
+            self._connection = None
     
     def test_connection(self) -> bool:
         """Test database connection"""
         try:
-            conn = psycopg2.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database='postgres'  # Connect to default postgres database
-            )
-            conn.close()
+            # Connect to default postgres database
+            with self.get_pool('postgres').connection():
+                pass
             return True
         except Exception as e:
             st.error(f"Connection failed: {str(e)}")
@@ -34,24 +56,16 @@ class DatabaseConnection:
     def get_databases(self) -> List[str]:
         """Get list of available databases"""
         try:
-            conn = psycopg2.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database='postgres'
-            )
-            
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT datname FROM pg_database 
-                WHERE datistemplate = false 
-                ORDER BY datname
-            """)
-            
-            databases = [row[0] for row in cursor.fetchall()]
-            cursor.close()
-            conn.close()
+            with self.get_pool('postgres').connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT datname FROM pg_database 
+                    WHERE datistemplate = false 
+                    ORDER BY datname
+                """)
+                
+                databases = [row[0] for row in cursor.fetchall()]
+                cursor.close()
             
             return databases
         except Exception as e:
@@ -61,34 +75,39 @@ class DatabaseConnection:
     def connect_to_database(self, database: str) -> bool:
         """Connect to specific database"""
         try:
-            if self.connection:
-                self.connection.close()
+            self.release()
             
-            self.connection = psycopg2.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=database
-            )
+            # Borrow eagerly so connection errors surface here
+            pool = self.get_pool(database)
+            self._connection = pool.getconn()
+            self._pool = pool
             self.current_database = database
             return True
         except Exception as e:
             st.error(f"Error connecting to database {database}: {str(e)}")
             return False
     
-    def execute_query(self, query: str, fetch: bool = True) -> Optional[pd.DataFrame]:
-        """Execute SQL query and return results as DataFrame"""
+    def execute_query(self, query: str, fetch: bool = True, numeric: str = 'float',
+                      cache: bool = True) -> Optional[pd.DataFrame]:
+        """Execute SQL query and return results as DataFrame (numeric as 'float' or 'decimal')"""
+        if fetch and cache:
+            # Read-only statements on unchanged tables are served from the shared result cache
+            return cached_query(self, query, lambda: self._execute_query(query, fetch, numeric), variant=(numeric,))
+        return self._execute_query(query, fetch, numeric)
+    
+    def _execute_query(self, query: str, fetch: bool, numeric: str) -> Optional[pd.DataFrame]:
         try:
             if not self.connection:
                 raise Exception("No database connection")
             
-            cursor = self.connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor = self.connection.cursor()
+            prepare_cursor(cursor, numeric)
             cursor.execute(query)
             
             if fetch and cursor.description:
+                # Plain tuples decoded column-wise into typed arrays
                 results = cursor.fetchall()
-                df = pd.DataFrame(results)
+                df = build_dataframe(results, cursor.description, numeric)
                 cursor.close()
                 return df
             else:
@@ -97,8 +116,8 @@ class DatabaseConnection:
                 return None
                 
         except Exception as e:
-            if self.connection:
-                self.connection.rollback()
+            if self._connection:
+                self._connection.rollback()
             raise e
     
     def execute_query_raw(self, query: str) -> List[Dict[str, Any]]:
@@ -120,8 +139,8 @@ class DatabaseConnection:
                 return []
                 
         except Exception as e:
-            if self.connection:
-                self.connection.rollback()
+            if self._connection:
+                self._connection.rollback()
             raise e
     
     def get_table_info(self) -> pd.DataFrame:
@@ -166,7 +185,6 @@ class DatabaseConnection:
         return result.iloc[0, 0] if not result.empty else 0
     
     def close(self):
-        """Close database connection"""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
+        """Release the database connection and detach from the pool"""
+        self.release()
+        self._pool = None
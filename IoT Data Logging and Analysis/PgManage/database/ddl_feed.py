@@ -0,0 +1,179 @@
+"""
+DDL change feed: event triggers publish schema changes with pg_notify and a
+listener thread per database invalidates the affected catalog snapshot frames
+"""
+import collections
+import json
+import select
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+
+from database.catalog import invalidate_catalog_key, set_change_feed
+from database.queries import DDL_FEED_QUERIES
+
+DDL_CHANNEL = 'pgmanage_ddl'
+
+# Seconds between wakeups to check for a stop request
+LISTEN_POLL_SECONDS = 5
+RECONNECT_DELAY_SECONDS = 10
+RECENT_CHANGES = 50
+
+
+def parse_notification(payload: str) -> Dict[str, Any]:
+    """Decode a notification payload; unparseable payloads count as an unknown change"""
+    try:
+        change = json.loads(payload)
+    except ValueError:
+        change = {}
+    if not isinstance(change, dict):
+        change = {}
+    change.setdefault('object_type', None)
+    return change
+
+
+class DDLListener(threading.Thread):
+    """Daemon thread holding a dedicated LISTEN connection for one database"""
+
+    def __init__(self, host: str, port: str, user: str, password: str, database: str, key: tuple):
+        super().__init__(name=f"pgmanage-ddl-{database}", daemon=True)
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.database = database
+        self.key = key
+        self.listening = False
+        self.notification_count = 0
+        self.last_error = None
+        self.recent_changes = collections.deque(maxlen=RECENT_CHANGES)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._listen()
+            except psycopg2.Error as e:
+                self.last_error = str(e)
+                self._stop_event.wait(RECONNECT_DELAY_SECONDS)
+
+    def _listen(self):
+        conn = psycopg2.connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database
+        )
+        try:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute(f"LISTEN {DDL_CHANNEL}")
+            cursor.close()
+
+            # Changes made while nobody was listening were missed
+            invalidate_catalog_key(self.key)
+            set_change_feed(self.key, True)
+            self.listening = True
+            self.last_error = None
+
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([conn], [], [], LISTEN_POLL_SECONDS)
+                if not readable:
+                    continue
+                conn.poll()
+                changes = []
+                while conn.notifies:
+                    changes.append(parse_notification(conn.notifies.pop(0).payload))
+                if changes:
+                    self._apply(changes)
+        finally:
+            self.listening = False
+            set_change_feed(self.key, False)
+            conn.close()
+
+    def _apply(self, changes: List[Dict[str, Any]]):
+        object_types = {change['object_type'] for change in changes}
+        if None in object_types:
+            invalidate_catalog_key(self.key)
+        else:
+            invalidate_catalog_key(self.key, object_types)
+
+        received_at = time.time()
+        for change in changes:
+            self.recent_changes.appendleft(dict(change, received_at=received_at))
+        self.notification_count += len(changes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'database': self.database,
+            'listening': self.listening,
+            'notifications': self.notification_count,
+            'last_error': self.last_error
+        }
+
+
+_listeners: Dict[tuple, DDLListener] = {}
+_listeners_lock = threading.Lock()
+
+
+def start_ddl_listener(db_conn) -> DDLListener:
+    """Start (or return the running) listener for the connection's database"""
+    key = db_conn.cache_key
+    with _listeners_lock:
+        listener = _listeners.get(key)
+        if listener is not None and listener.is_alive() and not listener.stopped:
+            return listener
+
+        listener = DDLListener(db_conn.host, db_conn.port, db_conn.user, db_conn.password,
+                               db_conn.current_database, key)
+        listener.start()
+        _listeners[key] = listener
+        return listener
+
+
+def stop_ddl_listener(db_conn):
+    """Stop the listener for the connection's database, if any"""
+    with _listeners_lock:
+        listener = _listeners.pop(db_conn.cache_key, None)
+    if listener is not None:
+        listener.stop()
+
+
+def get_ddl_listener(db_conn) -> Optional[DDLListener]:
+    with _listeners_lock:
+        return _listeners.get(db_conn.cache_key)
+
+
+def is_ddl_feed_installed(db_conn) -> bool:
+    """Whether both PgManage event triggers exist and are enabled"""
+    status = db_conn.execute_query(DDL_FEED_QUERIES['status'])
+    return bool(status.iloc[0]['installed']) and bool(status.iloc[0]['enabled'])
+
+
+def install_ddl_feed(db_conn) -> DDLListener:
+    """Create the event triggers (superuser only) and start listening"""
+    db_conn.execute_query(DDL_FEED_QUERIES['install'], fetch=False)
+    return start_ddl_listener(db_conn)
+
+
+def uninstall_ddl_feed(db_conn):
+    """Stop listening and drop the event triggers"""
+    stop_ddl_listener(db_conn)
+    db_conn.execute_query(DDL_FEED_QUERIES['uninstall'], fetch=False)
+
+
+def ensure_ddl_listener(db_conn) -> Optional[DDLListener]:
+    """Start a listener if the event triggers are installed in the connection's database"""
+    if is_ddl_feed_installed(db_conn):
+        return start_ddl_listener(db_conn)
+    return None
@@ -0,0 +1,343 @@
+"""
+Graph layout for the ERD: foreign keys form an undirected graph that is laid
+out force-directed per connected component, then packed into rows. Layouts are
+cached by a hash of the graph, so an unchanged schema is laid out once per
+process however many sessions draw it.
+"""
+import hashlib
+import math
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from database.relationships import RelationshipGraph
+
+LAYOUT_CACHE_SIZE = 64
+# Force-directed iterations shrink with the node count; each one is O(n²)
+MIN_ITERATIONS = 40
+MAX_ITERATIONS = 200
+ITERATION_BUDGET = 200000
+# Components this small are drawn as a hub with its neighbours on a circle
+SMALL_COMPONENT = 12
+# Rows of the pairwise repulsion computed at once, bounding memory to BLOCK_SIZE × n
+BLOCK_SIZE = 256
+# Above this many nodes each iteration repels against a random sample instead of every node
+EXACT_REPULSION_LIMIT = 800
+REPULSION_SAMPLE = 200
+COMPONENT_GAP = 2.0
+
+STANDALONE_CLUSTER = -1
+
+
+@dataclass(frozen=True)
+class Graph:
+    """Nodes by label and undirected edges between node indexes, each with its multiplicity"""
+    nodes: Tuple[str, ...]
+    edges: Tuple[Tuple[int, int], ...]
+    weights: Tuple[int, ...]
+
+    @property
+    def key(self) -> str:
+        digest = hashlib.sha1()
+        digest.update('\n'.join(self.nodes).encode('utf-8'))
+        digest.update(repr(self.edges).encode('utf-8'))
+        return digest.hexdigest()
+
+    def degrees(self) -> np.ndarray:
+        degrees = np.zeros(len(self.nodes), dtype=int)
+        for (source, target), weight in zip(self.edges, self.weights):
+            degrees[source] += weight
+            degrees[target] += weight
+        return degrees
+
+
+def build_graph(nodes: Iterable[str], edges: Iterable[Tuple[str, str]]) -> Graph:
+    """Graph over the given nodes; edges to unknown nodes and self references are dropped"""
+    nodes = tuple(sorted(set(nodes)))
+    index = {node: i for i, node in enumerate(nodes)}
+    counts = Counter()
+    for source, target in edges:
+        if source in index and target in index and source != target:
+            pair = tuple(sorted((index[source], index[target])))
+            counts[pair] += 1
+    pairs = sorted(counts)
+    return Graph(nodes, tuple(pairs), tuple(counts[pair] for pair in pairs))
+
+
+def table_label(schema: str, table: str) -> str:
+    return f"{schema}.{table}"
+
+
+def foreign_key_edges(relationships: RelationshipGraph) -> List[Tuple[str, str]]:
+    """One (source, target) table pair per foreign key constraint"""
+    relations = relationships.relations
+    return [(relations[edge.source].label, relations[edge.target].label) for edge in relationships.foreign_keys()]
+
+
+def connected_components(node_count: int, edges: Iterable[Tuple[int, int]]) -> List[List[int]]:
+    """Node indexes of every connected component, largest first"""
+    parent = list(range(node_count))
+
+    def find(node: int) -> int:
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for source, target in edges:
+        root_source, root_target = find(source), find(target)
+        if root_source != root_target:
+            parent[root_source] = root_target
+
+    components = defaultdict(list)
+    for node in range(node_count):
+        components[find(node)].append(node)
+    return sorted(components.values(), key=lambda nodes: (-len(nodes), nodes[0]))
+
+
+def force_layout(node_count: int, edges: List[Tuple[int, int]], seed: int = 0) -> np.ndarray:
+    """Fruchterman-Reingold positions with an ideal edge length of 1"""
+    if node_count == 1:
+        return np.zeros((1, 2))
+
+    rng = np.random.default_rng(seed)
+    side = math.sqrt(node_count)
+    positions = rng.random((node_count, 2)) * side
+    iterations = int(min(MAX_ITERATIONS, max(MIN_ITERATIONS, ITERATION_BUDGET // node_count)))
+    temperature = side / 10
+    cooling = temperature / (iterations + 1)
+
+    sources = np.array([source for source, _ in edges], dtype=int)
+    targets = np.array([target for _, target in edges], dtype=int)
+    sampled = node_count > EXACT_REPULSION_LIMIT
+
+    for _ in range(iterations):
+        displacement = np.zeros_like(positions)
+
+        # Pairs repel with force 1/d, in blocks of rows to bound memory. Large
+        # components estimate the sum from a sample, scaled up to every node.
+        others = positions[rng.choice(node_count, REPULSION_SAMPLE, replace=False)] if sampled else positions
+        scale = node_count / REPULSION_SAMPLE if sampled else 1.0
+        for start in range(0, node_count, BLOCK_SIZE):
+            block = positions[start:start + BLOCK_SIZE]
+            dx = block[:, 0, None] - others[None, :, 0]
+            dy = block[:, 1, None] - others[None, :, 1]
+            distance_squared = np.maximum(dx * dx + dy * dy, 1e-4)
+            displacement[start:start + BLOCK_SIZE, 0] += (dx / distance_squared).sum(axis=1) * scale
+            displacement[start:start + BLOCK_SIZE, 1] += (dy / distance_squared).sum(axis=1) * scale
+
+        # Connected nodes attract with force d²
+        if len(sources):
+            delta = positions[sources] - positions[targets]
+            pull = delta * np.linalg.norm(delta, axis=1)[:, None]
+            np.add.at(displacement, sources, -pull)
+            np.add.at(displacement, targets, pull)
+
+        # Moves are capped by a temperature that cools linearly
+        length = np.maximum(np.linalg.norm(displacement, axis=1), 1e-9)
+        positions += displacement / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature = max(temperature - cooling, 0.01)
+
+    return positions - positions.min(axis=0)
+
+
+def star_layout(node_count: int, hub: int) -> np.ndarray:
+    """The hub at the centre and the other nodes evenly on a unit circle around it"""
+    positions = np.zeros((node_count, 2))
+    others = [node for node in range(node_count) if node != hub]
+    angles = np.linspace(0, 2 * math.pi, len(others), endpoint=False)
+    positions[others] = np.column_stack([np.cos(angles), np.sin(angles)])
+    return positions
+
+
+def grid_layout(node_count: int) -> np.ndarray:
+    """Unconnected nodes in a square grid at unit spacing"""
+    columns = max(1, math.ceil(math.sqrt(node_count)))
+    return np.array([(i % columns, i // columns) for i in range(node_count)], dtype=float)
+
+
+def pack_blocks(blocks: List[np.ndarray], gap: float = COMPONENT_GAP) -> List[np.ndarray]:
+    """Shift each block of positions into rows of roughly square overall shape, largest first"""
+    sizes = [block.max(axis=0) - block.min(axis=0) if len(block) else np.zeros(2) for block in blocks]
+    area = sum((width + gap) * (height + gap) for width, height in sizes)
+    row_width = max(math.sqrt(area), max((width for width, _ in sizes), default=0))
+
+    placed = []
+    x = y = row_height = 0.0
+    for block, (width, height) in zip(blocks, sizes):
+        if x > 0 and x + width > row_width:
+            x, y, row_height = 0.0, y + row_height + gap, 0.0
+        placed.append(block - block.min(axis=0) + np.array([x, y]))
+        x += width + gap
+        row_height = max(row_height, height)
+    return placed
+
+
+def compute_layout(graph: Graph, seed: int = 0) -> np.ndarray:
+    """Positions of every node: components laid out separately, standalone nodes in one grid"""
+    positions = np.zeros((len(graph.nodes), 2))
+    if not graph.nodes:
+        return positions
+
+    components = connected_components(len(graph.nodes), graph.edges)
+    connected = [nodes for nodes in components if len(nodes) > 1]
+    standalone = [nodes[0] for nodes in components if len(nodes) == 1]
+
+    component_of = np.zeros(len(graph.nodes), dtype=int)
+    for component, nodes in enumerate(connected):
+        component_of[nodes] = component
+    component_edges = defaultdict(list)
+    for source, target in graph.edges:
+        component_edges[component_of[source]].append((source, target))
+    degrees = graph.degrees()
+
+    groups, blocks = [], []
+    for component, nodes in enumerate(connected):
+        local = {node: i for i, node in enumerate(nodes)}
+        groups.append(nodes)
+        if len(nodes) <= SMALL_COMPONENT:
+            blocks.append(star_layout(len(nodes), int(np.argmax(degrees[nodes]))))
+        else:
+            local_edges = [(local[source], local[target]) for source, target in component_edges[component]]
+            blocks.append(force_layout(len(nodes), local_edges, seed))
+    if standalone:
+        groups.append(standalone)
+        blocks.append(grid_layout(len(standalone)))
+
+    for nodes, block in zip(groups, pack_blocks(blocks)):
+        positions[nodes] = block
+    return positions
+
+
+@dataclass(frozen=True)
+class Layout:
+    """Positions and community of every node of a graph"""
+    positions: np.ndarray
+    clusters: np.ndarray
+
+
+_layouts: "OrderedDict[str, Layout]" = OrderedDict()
+_layouts_lock = threading.Lock()
+
+
+def get_layout(graph: Graph) -> Layout:
+    """Cached layout and clusters of the graph, keyed by the graph's hash"""
+    key = graph.key
+    with _layouts_lock:
+        layout = _layouts.get(key)
+        if layout is not None:
+            _layouts.move_to_end(key)
+            return layout
+
+    layout = Layout(compute_layout(graph), label_propagation(graph))
+    with _layouts_lock:
+        _layouts[key] = layout
+        while len(_layouts) > LAYOUT_CACHE_SIZE:
+            _layouts.popitem(last=False)
+    return layout
+
+
+def label_propagation(graph: Graph, max_rounds: int = 20) -> np.ndarray:
+    """Community of every node; nodes without edges get STANDALONE_CLUSTER
+
+    Each node repeatedly adopts the label most common among its neighbours.
+    Votes are weighted by edge multiplicity times one plus the neighbours the
+    two nodes share, so a lone foreign key between two groups does not pull
+    them into one community. Ties keep the current label, else go to the
+    smallest, so the result is deterministic.
+    """
+    adjacent: Dict[int, set] = defaultdict(set)
+    for source, target in graph.edges:
+        adjacent[source].add(target)
+        adjacent[target].add(source)
+
+    neighbours: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    for (source, target), weight in zip(graph.edges, graph.weights):
+        weight *= 1 + len(adjacent[source] & adjacent[target])
+        neighbours[source].append((target, weight))
+        neighbours[target].append((source, weight))
+
+    labels = np.arange(len(graph.nodes))
+    for _ in range(max_rounds):
+        changed = False
+        for node in sorted(neighbours, key=lambda node: (-len(neighbours[node]), node)):
+            votes = Counter()
+            for neighbour, weight in neighbours[node]:
+                votes[labels[neighbour]] += weight
+            best = max(votes.values())
+            if votes[labels[node]] == best:
+                continue
+            label = min(label for label, count in votes.items() if count == best)
+            if label != labels[node]:
+                labels[node] = label
+                changed = True
+        if not changed:
+            break
+
+    # Renumber by community size, largest first
+    counts = Counter(labels[node] for node in neighbours)
+    order = {label: i for i, (label, _) in enumerate(sorted(counts.items(), key=lambda item: (-item[1], item[0])))}
+    return np.array([order[labels[node]] if node in neighbours else STANDALONE_CLUSTER for node in range(len(graph.nodes))])
+
+
+def neighbourhood(graph: Graph, seeds: Iterable[str], hops: int) -> List[str]:
+    """Labels of the seed nodes and every node within `hops` edges of them"""
+    index = {node: i for i, node in enumerate(graph.nodes)}
+    adjacent: Dict[int, set] = defaultdict(set)
+    for source, target in graph.edges:
+        adjacent[source].add(target)
+        adjacent[target].add(source)
+
+    reached = {index[seed] for seed in seeds if seed in index}
+    frontier = set(reached)
+    for _ in range(hops):
+        frontier = {neighbour for node in frontier for neighbour in adjacent[node]} - reached
+        reached |= frontier
+    return [graph.nodes[node] for node in sorted(reached)]
+
+
+def summarize_clusters(graph: Graph, clusters: np.ndarray) -> pd.DataFrame:
+    """One row per cluster: its tables, the most connected table and the edges leaving it"""
+    members = pd.DataFrame({'node': graph.nodes, 'cluster': clusters, 'degree': graph.degrees()})
+    members = members.sort_values(['degree', 'node'], ascending=[False, True])
+    summary = members.groupby('cluster').agg(tables=('node', 'size'), hub=('node', 'first')).reset_index()
+
+    outgoing = Counter()
+    for (source, target), weight in zip(graph.edges, graph.weights):
+        if clusters[source] != clusters[target]:
+            outgoing[clusters[source]] += weight
+            outgoing[clusters[target]] += weight
+    summary['external_edges'] = summary['cluster'].map(lambda cluster: outgoing.get(cluster, 0))
+    return summary
+
+
+def collapse_groups(graph: Graph, positions: np.ndarray, groups: List, expanded: Iterable = ()) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Nodes and edges with every group not in `expanded` drawn as one node
+
+    A collapsed group sits at the centroid of its tables, so expanding it puts
+    the tables where the group was. Edges between the same pair of drawn nodes
+    are merged, with their multiplicities summed.
+    """
+    expanded = set(expanded)
+    members = pd.DataFrame({'node': graph.nodes, 'group': groups, 'x': positions[:, 0], 'y': positions[:, 1]})
+    members['expanded'] = members['group'].isin(expanded)
+    members['label'] = members['node'].where(members['expanded'], members['group'].astype(str))
+
+    nodes = members.groupby('label', sort=False).agg(
+        group=('group', 'first'), x=('x', 'mean'), y=('y', 'mean'), tables=('node', 'size'), expanded=('expanded', 'first')
+    ).reset_index()
+    index = {label: i for i, label in enumerate(nodes['label'])}
+    drawn = members['label'].map(index).to_numpy()
+
+    counts = Counter()
+    for (source, target), weight in zip(graph.edges, graph.weights):
+        pair = tuple(sorted((drawn[source], drawn[target])))
+        if pair[0] != pair[1]:
+            counts[pair] += weight
+    edges = pd.DataFrame([(source, target, weight) for (source, target), weight in counts.items()],
+                         columns=['source', 'target', 'weight'])
+    return nodes, edges
@@ -0,0 +1,64 @@
+"""
+COPY-based CSV export of query results
+"""
+import datetime
+import gzip
+import os
+import tempfile
+from typing import Optional, Tuple
+
+# Buffer between psycopg2's per-row writes and the output file
+EXPORT_BUFFER_SIZE = 1024 * 1024
+GZIP_LEVEL = 6
+
+
+def build_copy_statement(query: str, header: bool = True) -> str:
+    """Wrap a SELECT in COPY ... TO STDOUT as CSV"""
+    query = query.strip().rstrip(';').strip()
+    if not query:
+        raise ValueError("Query cannot be empty")
+
+    options = "FORMAT csv, HEADER" if header else "FORMAT csv"
+    return f"COPY ({query}) TO STDOUT WITH ({options})"
+
+
+def copy_query(connection, query: str, fileobj, compress: bool = False, header: bool = True) -> Optional[int]:
+    """Stream a query's rows as CSV into a binary file object, returning the row count if known"""
+    copy_sql = build_copy_statement(query, header)
+    target = gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=GZIP_LEVEL) if compress else fileobj
+
+    cursor = connection.cursor()
+    try:
+        cursor.copy_expert(copy_sql, target)
+        row_count = cursor.rowcount if cursor.rowcount >= 0 else None
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+        if compress:
+            target.close()
+
+    return row_count
+
+
+def export_query_to_file(db_conn, query: str, compress: bool = False,
+                         filename_prefix: str = "query_results") -> Tuple[str, str, Optional[int]]:
+    """Export a query to a temporary .csv/.csv.gz file via COPY; the caller removes the file"""
+    if not db_conn.connection:
+        raise Exception("No database connection")
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    suffix = ".csv.gz" if compress else ".csv"
+    filename = f"{filename_prefix}_{timestamp}{suffix}"
+
+    with tempfile.NamedTemporaryFile(mode='wb', suffix=suffix, delete=False,
+                                     buffering=EXPORT_BUFFER_SIZE) as export_file:
+        try:
+            row_count = copy_query(db_conn.connection, query, export_file, compress)
+        except Exception:
+            export_file.close()
+            os.remove(export_file.name)
+            raise
+
+    return export_file.name, filename, row_count
@@ -0,0 +1,384 @@
+"""
+Micro-benchmarks of one routine: repeated calls from one or more pooled
+connections, timed on the client, with pg_stat_user_functions deltas for the
+time spent inside the routine itself
+"""
+import datetime
+import json
+import random
+import string
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+
+from database.queries import FUNCTION_QUERIES
+from database.results import fetch_dataframe
+from database.routines import routine_call, routine_label
+
+CONCURRENCY_CHOICES = [1, 2, 4, 8, 16]
+# Connections the page itself needs while a benchmark holds the others
+RESERVED_CONNECTIONS = 2
+MAX_BENCHMARK_SECONDS = 300
+# A run stops early once this many calls have failed
+MAX_ERRORS = 20
+# Before PostgreSQL 15 backends publish function statistics at most about once a second
+STATS_FLUSH_SECONDS = 1.2
+# pg_stat_force_next_flush() is available from this server version
+FORCE_FLUSH_VERSION = 150000
+# Workers stop waiting for the others to finish warming up after this long
+BARRIER_TIMEOUT_SECONDS = MAX_BENCHMARK_SECONDS
+PERCENTILES = [50, 95, 99]
+# pg_stat_user_functions has no row for a routine until it is first called
+NO_CALLS = {'calls': 0, 'total_time': 0.0, 'self_time': 0.0}
+
+RANDOM_GENERATORS = {
+    'smallint': lambda rng: str(rng.randint(1, 1000)),
+    'integer': lambda rng: str(rng.randint(1, 100000)),
+    'bigint': lambda rng: str(rng.randint(1, 10 ** 9)),
+    'numeric': lambda rng: f"{rng.uniform(0, 1000):.4f}",
+    'real': lambda rng: f"{rng.uniform(0, 1000):.4f}",
+    'double precision': lambda rng: f"{rng.uniform(0, 1000):.6f}",
+    'boolean': lambda rng: rng.choice(['true', 'false']),
+    'text': lambda rng: ''.join(rng.choices(string.ascii_lowercase, k=8)),
+    'character varying': lambda rng: ''.join(rng.choices(string.ascii_lowercase, k=8)),
+    'uuid': lambda rng: str(uuid.UUID(int=rng.getrandbits(128))),
+    'date': lambda rng: (datetime.date.today() - datetime.timedelta(days=rng.randint(0, 365))).isoformat(),
+    'timestamp without time zone': lambda rng: (
+        datetime.datetime.now() - datetime.timedelta(seconds=rng.uniform(0, 30 * 86400))).isoformat(sep=' '),
+    'timestamp with time zone': lambda rng: (
+        datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=rng.uniform(0, 30 * 86400))).isoformat(sep=' '),
+}
+
+
+def can_randomize(data_type: str) -> bool:
+    return data_type in RANDOM_GENERATORS
+
+
+def max_concurrency(pool) -> int:
+    return max(1, pool.max_size - RESERVED_CONNECTIONS)
+
+
+@dataclass
+class BenchmarkArgument:
+    """A value passed as is, or drawn at random for every call; an empty value is NULL"""
+    data_type: str
+    mode: str = 'IN'
+    value: str = ''
+    randomize: bool = False
+
+    def draw(self, rng: random.Random) -> Optional[str]:
+        if self.randomize:
+            return RANDOM_GENERATORS[self.data_type](rng)
+        return self.value if self.value != '' else None
+
+
+@dataclass
+class BenchmarkConfig:
+    """How long to run, on how many connections, and whether calls are kept"""
+    calls: Optional[int] = 1000
+    seconds: Optional[float] = None
+    concurrency: int = 1
+    warmup: int = 10
+    commit: bool = False
+    seed: int = 0
+
+
+@dataclass
+class BenchmarkResult:
+    """Latencies of every timed call and the routine's statistics before and after"""
+    routine: str
+    statement: str
+    config: Dict
+    started_at: float
+    wall_seconds: float
+    latencies_ms: np.ndarray
+    offsets: np.ndarray
+    workers: np.ndarray
+    errors: int = 0
+    first_error: Optional[str] = None
+    stats_before: Optional[Dict] = None
+    stats_after: Optional[Dict] = None
+    track_functions: Optional[str] = None
+    label: str = ''
+
+    def summary(self) -> Dict:
+        """Latency distribution, throughput and the per-call time the server spent in the routine"""
+        latencies = self.latencies_ms
+        calls = len(latencies)
+        summary = {
+            'label': self.label or datetime.datetime.fromtimestamp(self.started_at).strftime('%H:%M:%S'),
+            'routine': self.routine,
+            'calls': calls,
+            'errors': self.errors,
+            'concurrency': self.config.get('concurrency'),
+            'wall_seconds': self.wall_seconds,
+            'throughput': calls / self.wall_seconds if self.wall_seconds > 0 else None,
+            'mean_ms': float(latencies.mean()) if calls else None,
+            'min_ms': float(latencies.min()) if calls else None,
+            'max_ms': float(latencies.max()) if calls else None,
+            'stddev_ms': float(latencies.std()) if calls else None,
+        }
+        for percentile in PERCENTILES:
+            summary[f"p{percentile}_ms"] = float(np.percentile(latencies, percentile)) if calls else None
+
+        delta = self.stats_delta()
+        summary['server_calls'] = delta['calls'] if delta else None
+        summary['server_total_ms'] = delta['total_time'] if delta else None
+        summary['server_self_ms'] = delta['self_time'] if delta else None
+        summary['server_self_per_call_ms'] = (
+            delta['self_time'] / delta['calls'] if delta and delta['calls'] else None
+        )
+        summary['server_total_per_call_ms'] = (
+            delta['total_time'] / delta['calls'] if delta and delta['calls'] else None
+        )
+        return summary
+
+    def stats_delta(self) -> Optional[Dict]:
+        """pg_stat_user_functions change over the run, or None without function tracking"""
+        if not self.stats_before or not self.stats_after:
+            return None
+        return {key: self.stats_after[key] - self.stats_before.get(key, 0) for key in ('calls', 'total_time', 'self_time')}
+
+    def calls_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({'worker': self.workers, 'offset_seconds': self.offsets, 'latency_ms': self.latencies_ms})
+
+    def to_json(self) -> str:
+        """Everything needed to compare against a later run, latencies included"""
+        return json.dumps({
+            'routine': self.routine,
+            'statement': self.statement,
+            'config': self.config,
+            'started_at': self.started_at,
+            'wall_seconds': self.wall_seconds,
+            'errors': self.errors,
+            'first_error': self.first_error,
+            'stats_before': self.stats_before,
+            'stats_after': self.stats_after,
+            'track_functions': self.track_functions,
+            'label': self.label,
+            'summary': self.summary(),
+            'calls': {
+                'worker': self.workers.tolist(),
+                'offset_seconds': np.round(self.offsets, 6).tolist(),
+                'latency_ms': np.round(self.latencies_ms, 4).tolist()
+            }
+        }, indent=1)
+
+    @classmethod
+    def from_json(cls, text: str) -> 'BenchmarkResult':
+        data = json.loads(text)
+        calls = data.get('calls', {})
+        return cls(
+            routine=data['routine'],
+            statement=data.get('statement', ''),
+            config=data.get('config', {}),
+            started_at=data['started_at'],
+            wall_seconds=data['wall_seconds'],
+            latencies_ms=np.array(calls.get('latency_ms', []), dtype=float),
+            offsets=np.array(calls.get('offset_seconds', []), dtype=float),
+            workers=np.array(calls.get('worker', []), dtype=int),
+            errors=data.get('errors', 0),
+            first_error=data.get('first_error'),
+            stats_before=data.get('stats_before'),
+            stats_after=data.get('stats_after'),
+            track_functions=data.get('track_functions'),
+            label=data.get('label', '')
+        )
+
+
+def compare_results(results: List[BenchmarkResult]) -> pd.DataFrame:
+    """One row per run, with each latency and throughput figure relative to the first run"""
+    summaries = pd.DataFrame([result.summary() for result in results])
+    if summaries.empty:
+        return summaries
+    for column in ['p50_ms', 'p95_ms', 'p99_ms', 'throughput', 'server_self_per_call_ms']:
+        baseline = summaries[column].iloc[0]
+        summaries[f"{column}_change"] = (
+            (summaries[column] / baseline - 1) * 100 if baseline else np.nan
+        )
+    return summaries
+
+
+def function_stats(pool, routine_oid: int) -> Optional[Dict]:
+    """The routine's pg_stat_user_functions counters, read in a fresh transaction so they are current"""
+    with pool.connection() as conn:
+        stats = fetch_dataframe(conn, FUNCTION_QUERIES['function_stats'], (routine_oid,))
+    if stats.empty:
+        return None
+    row = stats.iloc[0]
+    return {'calls': int(row['calls']), 'total_time': float(row['total_time']), 'self_time': float(row['self_time'])}
+
+
+class FunctionBenchmark:
+    """Calls one routine repeatedly on `concurrency` pooled connections until a call count or deadline"""
+
+    def __init__(self, pool, routine, arguments: List[BenchmarkArgument], config: BenchmarkConfig):
+        self.pool = pool
+        self.routine = routine
+        self.arguments = arguments
+        self.config = config
+        self.concurrency = min(config.concurrency, max_concurrency(pool))
+        self.statement = routine_call(
+            routine, pd.DataFrame({'data_type': [argument.data_type for argument in arguments],
+                                   'parameter_mode': [argument.mode for argument in arguments]}),
+            [sql.Placeholder()] * len(arguments)
+        )
+        self._issued = 0
+        self._errors = 0
+        self._first_error = None
+        self._deadline = None
+        self._started = None
+        self._track = False
+        self._server_version = 0
+        self._stats_before = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _claim(self) -> bool:
+        """Reserve the next call; False once the call budget or the deadline is reached"""
+        with self._lock:
+            if self._stop.is_set():
+                return False
+            if self.config.calls is not None and self._issued >= self.config.calls:
+                return False
+            if time.perf_counter() >= self._deadline:
+                return False
+            self._issued += 1
+            return True
+
+    def _fail(self, error: Exception):
+        with self._lock:
+            self._errors += 1
+            if self._first_error is None:
+                self._first_error = str(error).strip()
+            if self._errors >= MAX_ERRORS:
+                self._stop.set()
+
+    def _flush_statistics(self, conn, cursor):
+        """Publish this connection's function statistics now, so they land on the right side of the delta"""
+        if self._track and conn.server_version >= FORCE_FLUSH_VERSION:
+            cursor.execute(FUNCTION_QUERIES['force_stats_flush'])
+            # The flush happens once the backend is idle outside a transaction
+            conn.rollback()
+
+    def _worker(self, worker: int, ready: threading.Barrier) -> List[tuple]:
+        rng = random.Random(self.config.seed * 1000 + worker)
+        timings = []
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    self._call(worker, ready, conn, cursor, rng, timings)
+                finally:
+                    cursor.close()
+        except threading.BrokenBarrierError:
+            with self._lock:
+                if self._first_error is None:
+                    self._first_error = "Not every connection finished warming up, so the run did not start"
+        except psycopg2.Error as e:
+            self._fail(e)
+            ready.abort()
+        except BaseException:
+            # Without this the other workers would wait at the barrier for this one
+            ready.abort()
+            raise
+        return timings
+
+    def _call(self, worker: int, ready: threading.Barrier, conn, cursor, rng: random.Random, timings: List[tuple]):
+        """Warm up, wait for the other workers, then call until the budget or deadline is used up"""
+        statement = self.statement.as_string(conn)
+        for _ in range(self.config.warmup):
+            try:
+                cursor.execute(statement, [argument.draw(rng) for argument in self.arguments])
+                if cursor.description:
+                    cursor.fetchall()
+            finally:
+                conn.rollback()
+        if self.config.warmup:
+            self._flush_statistics(conn, cursor)
+
+        # Every worker starts timing together, after its warm-up
+        ready.wait(timeout=BARRIER_TIMEOUT_SECONDS)
+        while self._claim():
+            values = [argument.draw(rng) for argument in self.arguments]
+            start = time.perf_counter()
+            try:
+                cursor.execute(statement, values)
+                if cursor.description:
+                    cursor.fetchall()
+                latency = time.perf_counter() - start
+                if self.config.commit:
+                    conn.commit()
+                else:
+                    conn.rollback()
+                timings.append((worker, start - self._started, latency * 1000))
+            except psycopg2.Error as e:
+                conn.rollback()
+                self._fail(e)
+        self._flush_statistics(conn, cursor)
+
+    def run(self) -> BenchmarkResult:
+        """Run to completion and collect latencies and statistics deltas"""
+        oid = int(self.routine['routine_oid'])
+        with self.pool.connection() as conn:
+            setting = fetch_dataframe(conn, FUNCTION_QUERIES['track_functions'])
+            statement = self.statement.as_string(conn)
+            self._server_version = conn.server_version
+        track_functions = setting.iloc[0]['track_functions']
+        self._track = track_functions != 'none'
+
+        started_at = time.time()
+        self._started = time.perf_counter()
+        ready = threading.Barrier(self.concurrency, action=self._start_clock)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="pgmanage-bench") as executor:
+            futures = [executor.submit(self._worker, worker, ready) for worker in range(self.concurrency)]
+            timings = [timing for future in futures for timing in future.result()]
+        wall_seconds = time.perf_counter() - self._started
+
+        stats_before, stats_after = self._stats_before, None
+        if stats_before is not None:
+            if self._server_version < FORCE_FLUSH_VERSION:
+                time.sleep(STATS_FLUSH_SECONDS)
+            stats_after = function_stats(self.pool, oid) or NO_CALLS
+
+        timings.sort(key=lambda timing: timing[1])
+        return BenchmarkResult(
+            routine=routine_label(self.routine),
+            statement=statement,
+            config={**asdict(self.config), 'concurrency': self.concurrency,
+                    'arguments': [asdict(argument) for argument in self.arguments]},
+            started_at=started_at,
+            wall_seconds=wall_seconds,
+            latencies_ms=np.array([timing[2] for timing in timings], dtype=float),
+            offsets=np.array([timing[1] for timing in timings], dtype=float),
+            workers=np.array([timing[0] for timing in timings], dtype=int),
+            errors=self._errors,
+            first_error=self._first_error,
+            stats_before=stats_before,
+            stats_after=stats_after,
+            track_functions=track_functions
+        )
+
+    def _start_clock(self):
+        """Runs once when every worker has warmed up; statistics and the deadline count from here"""
+        if self._track:
+            try:
+                # Let the warm-up calls reach the statistics first; newer servers flushed them already
+                if self.config.warmup and self._server_version < FORCE_FLUSH_VERSION:
+                    time.sleep(STATS_FLUSH_SECONDS)
+                self._stats_before = function_stats(self.pool, int(self.routine['routine_oid'])) or NO_CALLS
+            except Exception:
+                # Server-side time is optional; the client-side timings still count
+                self._stats_before = None
+        self._started = time.perf_counter()
+        seconds = min(self.config.seconds or MAX_BENCHMARK_SECONDS, MAX_BENCHMARK_SECONDS)
+        self._deadline = self._started + seconds
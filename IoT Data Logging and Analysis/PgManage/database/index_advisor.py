@@ -0,0 +1,506 @@
+"""
+Index advice from the scan statistics and the captured workload: tables read by
+sequential scans, unused and duplicate indexes, and new indexes for the columns
+the executor history and pg_stat_statements keep filtering and joining on
+"""
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from psycopg2 import sql
+
+from database.queries import INDEX_ADVISOR_QUERIES
+from database.result_cache import normalize_sql
+from database.results import fetch_dataframe
+
+PAGE_BYTES = 8192
+# Smaller tables are read faster sequentially than through an index
+MIN_TABLE_ROWS = 10000
+MAX_INDEX_COLUMNS = 4
+WORKLOAD_STATEMENTS = 500
+
+# B-tree leaf tuples: 8-byte header, data padded to 8 bytes and a 4-byte line pointer,
+# packed to the default fillfactor
+INDEX_TUPLE_HEADER = 8
+INDEX_LINE_POINTER = 4
+INDEX_FILL_FACTOR = 0.9
+DEFAULT_COLUMN_WIDTH = 8
+
+ACTION_CREATE = 'CREATE'
+ACTION_DROP = 'DROP'
+
+_IDENTIFIER = r'(?:"(?:[^"]|"")+"|[A-Za-z_][\w$]*)'
+# Literals, parameters and numbers are single tokens so they are never read as column names
+_TOKEN_PATTERN = re.compile(
+    r"'(?:[^']|'')*'|\$\d+|" + _IDENTIFIER + r"|\d+(?:\.\d+)?|::|<=|>=|<>|!=|[=<>(),.]"
+)
+_COMPARISONS = {'=', '<', '>', '<=', '>='}
+_RANGE_OPERATORS = {'<', '>', '<=', '>='}
+# Words that end a FROM item instead of being its alias
+_FROM_ITEM_END = {
+    'where', 'join', 'inner', 'left', 'right', 'full', 'cross', 'natural', 'on', 'using', 'group', 'order',
+    'having', 'limit', 'offset', 'union', 'intersect', 'except', 'window', 'fetch', 'for', 'tablesample'
+}
+# Bare words that are values rather than columns
+_VALUE_WORDS = {
+    'null', 'true', 'false', 'current_date', 'current_time', 'current_timestamp', 'localtime', 'localtimestamp',
+    'current_user', 'session_user', 'interval', 'date', 'timestamp', 'any', 'all', 'array'
+}
+
+
+@dataclass
+class IndexStatistics:
+    """Scan counters, index definitions and column statistics of one database"""
+    tables: pd.DataFrame
+    indexes: pd.DataFrame
+    column_stats: pd.DataFrame
+    stats_reset: Optional[pd.Timestamp] = None
+
+
+@dataclass
+class TablePredicates:
+    """Columns one query compares to values or joins on, for one table"""
+    schema: str
+    table: str
+    equality: List[str] = field(default_factory=list)
+    ranges: List[str] = field(default_factory=list)
+
+    def add(self, column: str, is_range: bool):
+        target = self.ranges if is_range else self.equality
+        if column not in target:
+            target.append(column)
+
+
+def load_statistics(connection) -> IndexStatistics:
+    indexes = fetch_dataframe(connection, INDEX_ADVISOR_QUERIES['indexes'])
+    # INCLUDE columns follow the key columns and never lead a search
+    indexes['columns'] = [list(columns or [])[:int(keys)] for columns, keys in zip(indexes['columns'], indexes['key_columns'])]
+    stats_reset = fetch_dataframe(connection, INDEX_ADVISOR_QUERIES['stats_since'])
+    return IndexStatistics(
+        tables=fetch_dataframe(connection, INDEX_ADVISOR_QUERIES['tables']),
+        indexes=indexes,
+        column_stats=fetch_dataframe(connection, INDEX_ADVISOR_QUERIES['column_stats']),
+        stats_reset=None if stats_reset.empty or pd.isna(stats_reset.iloc[0]['stats_reset']) else stats_reset.iloc[0]['stats_reset']
+    )
+
+
+def load_workload_statements(connection, limit: int = WORKLOAD_STATEMENTS) -> pd.DataFrame:
+    """Most called pg_stat_statements texts that filter or join"""
+    return fetch_dataframe(connection, INDEX_ADVISOR_QUERIES['statements'], (limit,))
+
+
+def seq_scan_tables(statistics: IndexStatistics, min_rows: int = MIN_TABLE_ROWS) -> pd.DataFrame:
+    """Tables read mostly by sequential scans, by rows those scans had to read"""
+    tables = statistics.tables
+    tables = tables[(tables['n_live_tup'] >= min_rows) & (tables['seq_scan'] > tables['idx_scan'])].copy()
+    tables['seq_scan_share'] = tables['seq_scan'] / (tables['seq_scan'] + tables['idx_scan']) * 100
+    tables['rows_per_seq_scan'] = tables['seq_tup_read'] / tables['seq_scan'].where(tables['seq_scan'] > 0)
+    tables['scan_rows'] = tables['seq_scan'] * tables['n_live_tup']
+    return tables.sort_values('scan_rows', ascending=False).reset_index(drop=True)
+
+
+def _droppable(index: pd.Series) -> bool:
+    return not (index['is_unique'] or index['is_primary'] or index['backs_constraint'])
+
+
+def _plain_btree(index: pd.Series) -> bool:
+    return index['method'] == 'btree' and index['is_valid'] and not index['has_expressions'] and not index['is_partial']
+
+
+def redundant_indexes(statistics: IndexStatistics) -> pd.DataFrame:
+    """Unused, invalid, duplicate and prefix-overlapping indexes that could be dropped"""
+    findings: Dict[int, dict] = {}
+
+    def flag(index: pd.Series, reason: str, kind: str, covered_by: Optional[str] = None):
+        finding = findings.setdefault(int(index['index_oid']), {
+            'index_oid': int(index['index_oid']),
+            'table_schema': index['table_schema'],
+            'table_name': index['table_name'],
+            'index_name': index['index_name'],
+            'kind': kind,
+            'covered_by': covered_by,
+            'idx_scan': index['idx_scan'],
+            'index_bytes': index['index_bytes'],
+            'indexdef': index['indexdef'],
+            'reasons': []
+        })
+        finding['reasons'].append(reason)
+
+    for (schema, table), group in statistics.indexes.groupby(['table_schema', 'table_name']):
+        indexes = [row for _, row in group.iterrows()]
+
+        for index in indexes:
+            if not _droppable(index):
+                continue
+            key = (index['method'], tuple(index['columns']), index['indclass'], index['has_expressions'], index['is_partial'])
+            for other in indexes:
+                if other['index_oid'] == index['index_oid']:
+                    continue
+                other_key = (other['method'], tuple(other['columns']), other['indclass'], other['has_expressions'], other['is_partial'])
+
+                if key == other_key and not index['has_expressions'] and not index['is_partial']:
+                    # Of two identical indexes keep the one backing a constraint, else the more used, else the older
+                    keep_other = (not _droppable(other) or other['idx_scan'] > index['idx_scan'] or
+                                  (other['idx_scan'] == index['idx_scan'] and other['index_oid'] < index['index_oid']))
+                    if keep_other:
+                        flag(index, f"Duplicate of {other['index_name']}", 'duplicate', other['index_name'])
+                elif _plain_btree(index) and _plain_btree(other) and len(index['columns']) < len(other['columns']):
+                    prefix = len(index['columns'])
+                    same_opclasses = index['indclass'].split() == other['indclass'].split()[:prefix]
+                    if other['columns'][:prefix] == index['columns'] and same_opclasses:
+                        flag(index, f"Leading columns of {other['index_name']}", 'overlap', other['index_name'])
+
+        for index in indexes:
+            if not index['is_valid'] and _droppable(index):
+                flag(index, "Invalid, left behind by a failed concurrent build", 'invalid')
+            elif index['idx_scan'] == 0 and _droppable(index):
+                flag(index, "Never scanned since the statistics were reset", 'unused')
+
+    records = []
+    for finding in findings.values():
+        finding['reason'] = '; '.join(dict.fromkeys(finding.pop('reasons')))
+        records.append(finding)
+    columns = ['index_oid', 'table_schema', 'table_name', 'index_name', 'kind', 'covered_by',
+               'idx_scan', 'index_bytes', 'indexdef', 'reason']
+    redundant = pd.DataFrame(records, columns=columns)
+    return redundant.sort_values('index_bytes', ascending=False).reset_index(drop=True)
+
+
+def _unquote(identifier: str) -> str:
+    if identifier.startswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier.lower()
+
+
+def _is_name(token: str) -> bool:
+    return bool(re.match(_IDENTIFIER + r'$', token)) and token.lower() not in _VALUE_WORDS
+
+
+def _from_items(tokens: List[str]) -> Dict[str, Tuple[Optional[str], str]]:
+    """Relation of every FROM/JOIN item by its alias and by its own name"""
+    relations = {}
+    i = 0
+    while i < len(tokens):
+        if tokens[i].lower() not in ('from', 'join'):
+            i += 1
+            continue
+
+        i += 1
+        while i < len(tokens):
+            if tokens[i].lower() in ('lateral', 'only'):
+                i += 1
+                continue
+            if not _is_name(tokens[i]):
+                break
+
+            parts = [_unquote(tokens[i])]
+            i += 1
+            if i + 1 < len(tokens) and tokens[i] == '.':
+                parts.append(_unquote(tokens[i + 1]))
+                i += 2
+            relation = (parts[0], parts[1]) if len(parts) == 2 else (None, parts[0])
+            relations[relation[1]] = relation
+
+            if i < len(tokens) and tokens[i].lower() == 'as':
+                i += 1
+            if i < len(tokens) and _is_name(tokens[i]) and tokens[i].lower() not in _FROM_ITEM_END:
+                relations[_unquote(tokens[i])] = relation
+                i += 1
+
+            if i < len(tokens) and tokens[i] == ',':
+                i += 1
+                continue
+            break
+    return relations
+
+
+def _column_before(tokens: List[str], i: int) -> Optional[Tuple[Optional[str], str]]:
+    """(qualifier, column) ending just before token i, if the operand is a bare column"""
+    if i < 1 or not _is_name(tokens[i - 1]) or (i >= 2 and tokens[i - 2] == '::'):
+        return None
+    if i >= 3 and tokens[i - 2] == '.' and _is_name(tokens[i - 3]):
+        return _unquote(tokens[i - 3]), _unquote(tokens[i - 1])
+    return None, _unquote(tokens[i - 1])
+
+
+def _column_after(tokens: List[str], i: int) -> Optional[Tuple[Optional[str], str]]:
+    """(qualifier, column) starting at token i, if the operand is a bare column"""
+    if i >= len(tokens) or not _is_name(tokens[i]):
+        return None
+    if i + 2 < len(tokens) and tokens[i + 1] == '.' and _is_name(tokens[i + 2]):
+        end, column = i + 3, (_unquote(tokens[i]), _unquote(tokens[i + 2]))
+    else:
+        end, column = i + 1, (None, _unquote(tokens[i]))
+    # A function call or a cast makes the operand an expression an ordinary index cannot search
+    if end < len(tokens) and tokens[end] in ('(', '::'):
+        return None
+    return column
+
+
+class _Resolver:
+    """Maps the (qualifier, column) pairs of one query to catalog tables"""
+
+    def __init__(self, relations: Dict[str, Tuple[Optional[str], str]], table_columns: Dict[Tuple[str, str], set]):
+        self.table_columns = table_columns
+        self.aliases = {}
+        for alias, (schema, table) in relations.items():
+            resolved = self._table(schema, table)
+            if resolved is not None:
+                self.aliases[alias] = resolved
+        self.tables = set(self.aliases.values())
+
+    def _table(self, schema: Optional[str], table: str) -> Optional[Tuple[str, str]]:
+        if schema is not None:
+            return (schema, table) if (schema, table) in self.table_columns else None
+        if ('public', table) in self.table_columns:
+            return 'public', table
+        matches = [key for key in self.table_columns if key[1] == table]
+        return matches[0] if len(matches) == 1 else None
+
+    def resolve(self, qualifier: Optional[str], column: str) -> Optional[Tuple[str, str]]:
+        if qualifier is not None:
+            table = self.aliases.get(qualifier)
+            return table if table is not None and column in self.table_columns[table] else None
+        owners = [table for table in self.tables if column in self.table_columns[table]]
+        return owners[0] if len(owners) == 1 else None
+
+
+def mine_predicates(query: str, table_columns: Dict[Tuple[str, str], set]) -> List[TablePredicates]:
+    """Columns compared to values (equality or range) or joined on, per table the query reads"""
+    tokens = _TOKEN_PATTERN.findall(normalize_sql(query))
+    resolver = _Resolver(_from_items(tokens), table_columns)
+    if not resolver.tables:
+        return []
+
+    predicates: Dict[Tuple[str, str], TablePredicates] = {}
+
+    def record(reference: Tuple[Optional[str], str], is_range: bool):
+        table = resolver.resolve(*reference)
+        if table is not None:
+            predicates.setdefault(table, TablePredicates(*table)).add(reference[1], is_range)
+
+    for i, token in enumerate(tokens):
+        operator = token.lower()
+        if operator in _COMPARISONS:
+            left, right = _column_before(tokens, i), _column_after(tokens, i + 1)
+            if left is not None and right is not None:
+                # A join: each side is searched with values from the other
+                if operator == '=' and resolver.resolve(*left) != resolver.resolve(*right):
+                    record(left, False)
+                    record(right, False)
+            elif left is not None or right is not None:
+                record(left or right, operator in _RANGE_OPERATORS)
+        elif operator in ('in', 'between'):
+            left = _column_before(tokens, i)
+            if left is not None:
+                record(left, operator == 'between')
+        elif operator == 'like':
+            left = _column_before(tokens, i)
+            pattern = tokens[i + 1] if i + 1 < len(tokens) else ''
+            # Only a fixed prefix can be searched as a range
+            if left is not None and (pattern.startswith('$') or (pattern.startswith("'") and pattern[1:2] not in ('%', '_', "'"))):
+                record(left, True)
+
+    return list(predicates.values())
+
+
+def table_columns_map(columns: pd.DataFrame) -> Dict[Tuple[str, str], set]:
+    """Column names of every table by (schema, table), from the catalog columns frame"""
+    return {
+        (schema, table): set(group['column_name'])
+        for (schema, table), group in columns.groupby(['table_schema', 'table_name'])
+    }
+
+
+def _distinct_values(statistics: IndexStatistics) -> Dict[Tuple[str, str, str], float]:
+    rows = statistics.tables.set_index(['table_schema', 'table_name'])['n_live_tup'].to_dict()
+    distinct = {}
+    for _, stat in statistics.column_stats.iterrows():
+        n_distinct = stat['n_distinct']
+        if pd.isna(n_distinct):
+            continue
+        # Negative n_distinct is a fraction of the row count
+        if n_distinct < 0:
+            n_distinct = -n_distinct * rows.get((stat['table_schema'], stat['table_name']), 0)
+        distinct[(stat['table_schema'], stat['table_name'], stat['column_name'])] = n_distinct
+    return distinct
+
+
+def candidate_columns(predicates: TablePredicates, distinct: Dict[Tuple[str, str, str], float]) -> Tuple[str, ...]:
+    """Equality columns, most selective first, then one range column"""
+    # The sort is stable, so columns without statistics keep their order in the query
+    equality = sorted(predicates.equality,
+                      key=lambda column: -distinct.get((predicates.schema, predicates.table, column), 0))
+    columns = equality[:MAX_INDEX_COLUMNS]
+    ranges = [column for column in predicates.ranges if column not in columns]
+    if ranges and len(columns) < MAX_INDEX_COLUMNS:
+        columns.append(ranges[0])
+    return tuple(columns)
+
+
+def mine_workload(statements: Iterable[Tuple[str, float, str]], table_columns: Dict[Tuple[str, str], set],
+                  statistics: IndexStatistics) -> pd.DataFrame:
+    """Candidate index columns per table from (query, calls, source) statements, weighted by calls"""
+    distinct = _distinct_values(statistics)
+    candidates: Dict[Tuple[str, str, Tuple[str, ...]], dict] = {}
+
+    for query, calls, source in statements:
+        for predicates in mine_predicates(query, table_columns):
+            columns = candidate_columns(predicates, distinct)
+            if not columns:
+                continue
+            candidate = candidates.setdefault((predicates.schema, predicates.table, columns), {
+                'table_schema': predicates.schema,
+                'table_name': predicates.table,
+                'columns': columns,
+                'equality_columns': len([column for column in columns if column in predicates.equality]),
+                'calls': 0.0,
+                'statements': 0,
+                'sources': set(),
+                'example_query': query,
+                'example_calls': -1.0
+            })
+            candidate['calls'] += calls
+            candidate['statements'] += 1
+            candidate['sources'].add(source)
+            if calls > candidate['example_calls']:
+                candidate['example_query'], candidate['example_calls'] = query, calls
+
+    records = []
+    for candidate in candidates.values():
+        candidate['sources'] = ', '.join(sorted(candidate.pop('sources')))
+        candidate.pop('example_calls')
+        records.append(candidate)
+    columns = ['table_schema', 'table_name', 'columns', 'equality_columns', 'calls', 'statements', 'sources', 'example_query']
+    return pd.DataFrame(records, columns=columns)
+
+
+def covering_index(columns: Tuple[str, ...], equality_columns: int, indexes: pd.DataFrame) -> Optional[str]:
+    """Name of an existing b-tree whose leading columns already serve the candidate"""
+    equality, rest = set(columns[:equality_columns]), list(columns[equality_columns:])
+    for _, index in indexes.iterrows():
+        if not _plain_btree(index):
+            continue
+        keys = list(index['columns'])
+        # Equality columns may come in any order, as long as they lead the index
+        if len(keys) >= len(columns) and set(keys[:equality_columns]) == equality and keys[equality_columns:len(columns)] == rest:
+            return index['index_name']
+    return None
+
+
+def with_coverage(candidates: pd.DataFrame, statistics: IndexStatistics) -> pd.DataFrame:
+    """Candidates with the existing index that already serves each one, if any"""
+    candidates = candidates.copy()
+    candidates['covered_by'] = [
+        covering_index(candidate['columns'], candidate['equality_columns'], statistics.indexes[
+            (statistics.indexes['table_schema'] == candidate['table_schema']) &
+            (statistics.indexes['table_name'] == candidate['table_name'])
+        ])
+        for _, candidate in candidates.iterrows()
+    ]
+    return candidates
+
+
+def estimate_index_bytes(schema: str, table: str, columns: Tuple[str, ...], rows: float,
+                         statistics: IndexStatistics) -> float:
+    """Leaf size of a b-tree on the columns from their average widths"""
+    widths = statistics.column_stats.set_index(['table_schema', 'table_name', 'column_name'])['avg_width'].to_dict()
+    data = sum(widths.get((schema, table, column), DEFAULT_COLUMN_WIDTH) for column in columns)
+    tuple_bytes = math.ceil((INDEX_TUPLE_HEADER + data) / 8) * 8 + INDEX_LINE_POINTER
+    return rows * tuple_bytes / INDEX_FILL_FACTOR
+
+
+def _relation(schema: str, name: str) -> sql.Composed:
+    return sql.SQL("{}.{}").format(sql.Identifier(schema), sql.Identifier(name))
+
+
+def suggest(statistics: IndexStatistics, candidates: pd.DataFrame, redundant: pd.DataFrame,
+            min_rows: int = MIN_TABLE_ROWS) -> pd.DataFrame:
+    """CREATE and DROP suggestions ranked by 8 kB pages saved: scan pages avoided or index pages reclaimed"""
+    tables = statistics.tables.set_index(['table_schema', 'table_name'])
+    suggestions = []
+
+    for _, candidate in candidates.iterrows():
+        key = (candidate['table_schema'], candidate['table_name'])
+        if key not in tables.index:
+            continue
+        table = tables.loc[key]
+        if table['n_live_tup'] < min_rows:
+            continue
+
+        if pd.notna(candidate['covered_by']):
+            continue
+        indexes = statistics.indexes[(statistics.indexes['table_schema'] == key[0]) &
+                                     (statistics.indexes['table_name'] == key[1])]
+
+        # Only the share of reads that were sequential scans benefits
+        scans = table['seq_scan'] + table['idx_scan']
+        seq_share = table['seq_scan'] / scans if scans else 1.0
+        pages_avoided = candidate['calls'] * table['relpages'] * seq_share
+        index_bytes = estimate_index_bytes(*key, candidate['columns'], table['n_live_tup'], statistics)
+
+        reason = f"{candidate['statements']} statement(s), {candidate['calls']:,.0f} call(s) filter or join on these columns"
+        superseded = [
+            index['index_name'] for _, index in indexes.iterrows()
+            if _plain_btree(index) and _droppable(index) and
+            list(candidate['columns'][:len(index['columns'])]) == list(index['columns'])
+        ]
+        if superseded:
+            reason += f"; makes {', '.join(superseded)} redundant"
+
+        suggestions.append({
+            'action': ACTION_CREATE,
+            'table_schema': key[0],
+            'table_name': key[1],
+            'target': ', '.join(candidate['columns']),
+            'statement': sql.SQL("CREATE INDEX CONCURRENTLY ON {} ({})").format(
+                _relation(*key), sql.SQL(', ').join(sql.Identifier(column) for column in candidate['columns'])
+            ),
+            'reason': reason,
+            'space_bytes': -index_bytes,
+            'pages_saved': pages_avoided,
+            'example_query': candidate['example_query']
+        })
+
+    for _, index in redundant.iterrows():
+        suggestions.append({
+            'action': ACTION_DROP,
+            'table_schema': index['table_schema'],
+            'table_name': index['table_name'],
+            'target': index['index_name'],
+            'statement': sql.SQL("DROP INDEX CONCURRENTLY {}").format(_relation(index['table_schema'], index['index_name'])),
+            'reason': index['reason'],
+            'space_bytes': float(index['index_bytes']),
+            'pages_saved': index['index_bytes'] / PAGE_BYTES,
+            'example_query': None
+        })
+
+    columns = ['action', 'table_schema', 'table_name', 'target', 'statement', 'reason',
+               'space_bytes', 'pages_saved', 'example_query']
+    suggestions = pd.DataFrame(suggestions, columns=columns)
+    return suggestions.sort_values('pages_saved', ascending=False).reset_index(drop=True)
+
+
+def advise(connection, statements: Iterable[Tuple[str, float, str]], columns: pd.DataFrame,
+           min_rows: int = MIN_TABLE_ROWS) -> Tuple[IndexStatistics, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Load the statistics and return them with the mined candidates, redundant indexes and ranked suggestions"""
+    statistics = load_statistics(connection)
+    candidates = with_coverage(mine_workload(statements, table_columns_map(columns), statistics), statistics)
+    redundant = redundant_indexes(statistics)
+    suggestions = suggest(statistics, candidates, redundant, min_rows)
+    suggestions['statement'] = [statement.as_string(connection) + ";" for statement in suggestions['statement']]
+    return statistics, candidates, redundant, suggestions
+
+
+def apply_suggestion(pool, statement: str):
+    """Run a CREATE/DROP INDEX CONCURRENTLY, which cannot run inside a transaction block"""
+    with pool.connection() as conn:
+        # The pool turns autocommit off again when the connection is returned
+        conn.autocommit = True
+        cursor = conn.cursor()
+        try:
+            cursor.execute(statement)
+        finally:
+            cursor.close()
@@ -0,0 +1,245 @@
+"""
+Blocking chains from pg_blocking_pids(), sampled on a background thread so that
+short, intermittent lock waits are still visible after they have cleared
+"""
+import collections
+import datetime
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from database.queries import LOCK_QUERIES
+from database.results import fetch_dataframe
+
+LOCK_SAMPLE_INTERVALS = [1, 2, 5, 10, 30]
+DEFAULT_LOCK_SAMPLE_INTERVAL = 5
+LOCK_SAMPLES = int(os.environ.get('PGMANAGE_LOCK_SAMPLES', '720'))
+# Sampling stops when nobody has opened the locks page for this long
+LOCK_SAMPLER_IDLE_SECONDS = 900
+
+
+@dataclass(frozen=True)
+class LockSample:
+    """Backends waiting on or holding contended locks at one point in time"""
+    taken_at: float
+    backends: pd.DataFrame
+
+
+def load_blocking(connection) -> pd.DataFrame:
+    backends = fetch_dataframe(connection, LOCK_QUERIES['blocking'])
+    backends['blocked_by'] = backends['blocked_by'].map(lambda pids: [int(pid) for pid in (pids or [])])
+    return backends
+
+
+def _seconds(value) -> float:
+    return float(value) if value is not None and pd.notna(value) else 0.0
+
+
+def blocking_tree(backends: pd.DataFrame) -> pd.DataFrame:
+    """Backends in depth-first order under the blockers that are not waiting themselves
+
+    Each row gets its depth, the root blocker's pid and how many backends wait
+    behind it directly or indirectly. A backend blocked by several others is listed
+    under each of them.
+    """
+    columns = list(backends.columns) + ['depth', 'root_pid', 'waiting_behind']
+    if backends.empty:
+        return pd.DataFrame(columns=columns)
+
+    by_pid = {int(row['pid']): row for _, row in backends.iterrows()}
+    children: Dict[int, List[int]] = collections.defaultdict(list)
+    for pid, row in by_pid.items():
+        for blocker in row['blocked_by']:
+            children[blocker].append(pid)
+
+    def behind(pid: int, seen: set) -> set:
+        waiting = set()
+        for child in children.get(pid, []):
+            if child not in seen:
+                waiting |= {child} | behind(child, seen | {child})
+        return waiting
+
+    roots = [pid for pid, row in by_pid.items() if not row['blocked_by'] and children.get(pid)]
+    # A cycle is a deadlock the server has not broken yet; start from its lowest pid
+    listed = set(roots)
+    for pid in roots:
+        listed |= behind(pid, {pid})
+    for pid in sorted(by_pid):
+        if pid not in listed and children.get(pid):
+            roots.append(pid)
+            listed |= {pid} | behind(pid, {pid})
+
+    # Longest chains first
+    roots.sort(key=lambda pid: (-len(behind(pid, {pid})), pid))
+
+    records = []
+
+    def walk(pid: int, depth: int, root: int, path: set):
+        if pid not in by_pid:
+            return
+        record = by_pid[pid].to_dict()
+        record.update(depth=depth, root_pid=root, waiting_behind=len(behind(pid, path)))
+        records.append(record)
+        for child in sorted(children.get(pid, []), key=lambda child: -_seconds(by_pid[child]['wait_seconds'])):
+            if child not in path:
+                walk(child, depth + 1, root, path | {child})
+
+    for root in roots:
+        walk(root, 0, root, {root})
+
+    return pd.DataFrame(records, columns=columns)
+
+
+def summarize_samples(samples: List[LockSample]) -> pd.DataFrame:
+    """Waiting backends, root blockers and the longest wait in every sample"""
+    records = []
+    for sample in samples:
+        backends = sample.backends
+        waiting = backends[backends['blocked_by'].map(len) > 0]
+        blockers = backends[backends['blocked_by'].map(len) == 0]
+        records.append({
+            'taken_at': datetime.datetime.fromtimestamp(sample.taken_at),
+            'waiting': len(waiting),
+            'blockers': len(blockers),
+            'max_wait_seconds': float(waiting['wait_seconds'].max()) if not waiting.empty else 0.0
+        })
+    return pd.DataFrame(records, columns=['taken_at', 'waiting', 'blockers', 'max_wait_seconds'])
+
+
+def contention_history(samples: List[LockSample]) -> pd.DataFrame:
+    """Lock waits seen across the samples, grouped by what was waited on
+
+    A wait that spans several samples is counted once per sample it was seen
+    in, so `samples` approximates how long the contention lasted.
+    """
+    columns = ['wait_relation', 'wait_locktype', 'wait_mode', 'samples', 'backends', 'max_wait_seconds',
+               'first_seen', 'last_seen', 'example_query', 'blocker_query']
+    waits = []
+    for sample in samples:
+        backends = sample.backends
+        queries = dict(zip(backends['pid'], backends['query']))
+        for _, row in backends[backends['blocked_by'].map(len) > 0].iterrows():
+            waits.append({
+                'taken_at': sample.taken_at,
+                'pid': row['pid'],
+                'wait_relation': row['wait_relation'] if pd.notna(row['wait_relation']) else '',
+                'wait_locktype': row['wait_locktype'],
+                'wait_mode': row['wait_mode'],
+                'wait_seconds': row['wait_seconds'],
+                'query': row['query'],
+                'blocker_query': queries.get(row['blocked_by'][0])
+            })
+    if not waits:
+        return pd.DataFrame(columns=columns)
+
+    waits = pd.DataFrame(waits)
+    history = waits.groupby(['wait_relation', 'wait_locktype', 'wait_mode'], dropna=False).agg(
+        samples=('taken_at', 'nunique'),
+        backends=('pid', 'nunique'),
+        max_wait_seconds=('wait_seconds', 'max'),
+        first_seen=('taken_at', 'min'),
+        last_seen=('taken_at', 'max'),
+        example_query=('query', 'last'),
+        blocker_query=('blocker_query', 'last')
+    ).reset_index()
+    history['first_seen'] = history['first_seen'].map(datetime.datetime.fromtimestamp)
+    history['last_seen'] = history['last_seen'].map(datetime.datetime.fromtimestamp)
+    return history.sort_values(['samples', 'max_wait_seconds'], ascending=False).reset_index(drop=True)[columns]
+
+
+def signal_backend(connection, pid: int, backend_start, terminate: bool = False) -> bool:
+    """Cancel the backend's query or terminate it; False if it is gone or the signal was refused"""
+    result = fetch_dataframe(connection, LOCK_QUERIES['terminate' if terminate else 'cancel'], (int(pid), backend_start))
+    return not result.empty and bool(result.iloc[0]['signalled'])
+
+
+class LockSampler(threading.Thread):
+    """Daemon thread sampling the blocking backends of one database at an interval"""
+
+    def __init__(self, pool, database: str, interval: float = DEFAULT_LOCK_SAMPLE_INTERVAL,
+                 capacity: int = LOCK_SAMPLES):
+        super().__init__(name=f"pgmanage-locks-{database}", daemon=True)
+        self.pool = pool
+        self.database = database
+        self.interval = interval
+        self.last_error = None
+        self.last_read = time.time()
+        self._samples = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def set_interval(self, interval: float):
+        if interval != self.interval:
+            self.interval = interval
+            self._wake_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            if time.time() - self.last_read > LOCK_SAMPLER_IDLE_SECONDS:
+                self._stop_event.set()
+                break
+            try:
+                self.sample_now()
+            except Exception as e:
+                self.last_error = str(e)
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+
+    def sample_now(self) -> LockSample:
+        with self.pool.connection() as conn:
+            sample = LockSample(taken_at=time.time(), backends=load_blocking(conn))
+        with self._lock:
+            self._samples.append(sample)
+        self.last_error = None
+        return sample
+
+    def samples(self, since: Optional[float] = None) -> List[LockSample]:
+        self.last_read = time.time()
+        with self._lock:
+            return [sample for sample in self._samples if since is None or sample.taken_at >= since]
+
+    def latest(self) -> Optional[LockSample]:
+        self.last_read = time.time()
+        with self._lock:
+            return self._samples[-1] if self._samples else None
+
+
+_samplers: Dict[tuple, LockSampler] = {}
+_samplers_lock = threading.Lock()
+
+
+def ensure_lock_sampler(db_conn, interval: Optional[float] = None) -> LockSampler:
+    """Start (or return the running) lock sampler for the connection's database"""
+    key = db_conn.cache_key
+    with _samplers_lock:
+        sampler = _samplers.get(key)
+        if sampler is None or not sampler.is_alive() or sampler.stopped:
+            sampler = LockSampler(db_conn.get_pool(), db_conn.current_database,
+                                  interval or DEFAULT_LOCK_SAMPLE_INTERVAL)
+            sampler.start()
+            _samplers[key] = sampler
+        elif interval:
+            sampler.set_interval(interval)
+        sampler.last_read = time.time()
+        return sampler
+
+
+def stop_lock_sampler(db_conn):
+    """Stop the lock sampler for the connection's database, if any"""
+    with _samplers_lock:
+        sampler = _samplers.pop(db_conn.cache_key, None)
+    if sampler is not None:
+        sampler.stop()
@@ -0,0 +1,223 @@
+"""
+Table and index bloat estimates from catalog statistics, and VACUUM runs over
+several tables on a bounded pool of worker threads
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import psycopg2.errors
+from psycopg2 import sql
+
+from database.queries import MAINTENANCE_QUERIES, MONITORING_QUERIES
+from database.results import fetch_dataframe
+
+VACUUM_WORKER_CHOICES = [1, 2, 3, 4]
+DEFAULT_VACUUM_WORKERS = 2
+# Connections the page itself needs while a run holds the others
+RESERVED_CONNECTIONS = 2
+
+TASK_QUEUED = 'queued'
+TASK_RUNNING = 'running'
+TASK_DONE = 'done'
+TASK_CANCELLED = 'cancelled'
+TASK_ERROR = 'error'
+
+
+def _dead_ratio(dead: pd.Series, live: pd.Series) -> pd.Series:
+    total = dead + live
+    return pd.Series(np.where(total > 0, dead / total.where(total > 0, 1) * 100, 0.0), index=dead.index)
+
+
+def estimate_table_bloat(connection) -> pd.DataFrame:
+    """Tables with estimated bloat, dead tuples and last (auto)vacuum/analyze times"""
+    tables = fetch_dataframe(connection, MAINTENANCE_QUERIES['table_bloat'])
+    stats = fetch_dataframe(connection, MONITORING_QUERIES['table_stats']).rename(
+        columns={'schemaname': 'table_schema', 'tablename': 'table_name'}
+    )
+    tables = tables.merge(stats, on=['table_schema', 'table_name'], how='left')
+
+    tables['bloat_bytes'] = (tables['table_bytes'] - tables['expected_bytes']).clip(lower=0)
+    tables['bloat_ratio'] = np.where(tables['table_bytes'] > 0,
+                                     tables['bloat_bytes'] / tables['table_bytes'].where(tables['table_bytes'] > 0, 1) * 100, 0.0)
+    tables[['live_tuples', 'dead_tuples']] = tables[['live_tuples', 'dead_tuples']].fillna(0)
+    tables['dead_ratio'] = _dead_ratio(tables['dead_tuples'], tables['live_tuples'])
+    for column in ('last_vacuum', 'last_autovacuum', 'last_analyze', 'last_autoanalyze'):
+        tables[column] = pd.to_datetime(tables[column], utc=True)
+    tables['last_vacuumed'] = tables[['last_vacuum', 'last_autovacuum']].max(axis=1)
+    tables['last_analyzed'] = tables[['last_analyze', 'last_autoanalyze']].max(axis=1)
+    return tables
+
+
+def estimate_index_bloat(connection) -> pd.DataFrame:
+    """B-tree indexes with estimated bloat; indexes on expressions have no width statistics and are marked"""
+    indexes = fetch_dataframe(connection, MAINTENANCE_QUERIES['index_bloat'])
+    indexes['bloat_bytes'] = (indexes['index_bytes'] - indexes['expected_bytes']).clip(lower=0)
+    indexes.loc[~indexes['has_stats'].astype(bool), 'bloat_bytes'] = np.nan
+    indexes['bloat_ratio'] = indexes['bloat_bytes'] / indexes['index_bytes'].where(indexes['index_bytes'] > 0) * 100
+    return indexes
+
+
+def rank_tables(tables: pd.DataFrame, indexes: pd.DataFrame, by: str = 'reclaimable_bytes') -> pd.DataFrame:
+    """Tables with their index bloat added, ranked by reclaimable space or dead tuple ratio"""
+    index_bloat = indexes.groupby(['table_schema', 'table_name'])['bloat_bytes'].sum().rename('index_bloat_bytes')
+    ranked = tables.merge(index_bloat, left_on=['table_schema', 'table_name'], right_index=True, how='left')
+    ranked['index_bloat_bytes'] = ranked['index_bloat_bytes'].fillna(0)
+    # Estimates for never-analyzed tables are unreliable, so they only count toward the total when known
+    ranked['reclaimable_bytes'] = ranked['bloat_bytes'].where(ranked['has_stats'].astype(bool), 0) + ranked['index_bloat_bytes']
+    secondary = 'dead_ratio' if by == 'reclaimable_bytes' else 'reclaimable_bytes'
+    return ranked.sort_values([by, secondary], ascending=False).reset_index(drop=True)
+
+
+def vacuum_progress(connection) -> pd.DataFrame:
+    """Vacuums running in the current database, ours and autovacuum's, with a completion estimate"""
+    progress = fetch_dataframe(connection, MAINTENANCE_QUERIES['vacuum_progress'])
+    total = progress['heap_blks_total'].where(progress['heap_blks_total'] > 0)
+    # The heap is scanned first, then vacuumed in a second pass over the same blocks
+    done = np.where(progress['phase'] == 'scanning heap', progress['heap_blks_scanned'], progress['heap_blks_vacuumed'])
+    progress['percent'] = (pd.Series(done, index=progress.index) / total * 100).clip(upper=100)
+    return progress
+
+
+def max_vacuum_workers(pool) -> int:
+    return max(1, pool.max_size - RESERVED_CONNECTIONS)
+
+
+class VacuumTask:
+    """VACUUM of one table within a run"""
+
+    def __init__(self, schema: str, table: str):
+        self.schema = schema
+        self.table = table
+        self.status = TASK_QUEUED
+        self.pid = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._conn = None
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class VacuumRun:
+    """VACUUM of several tables, at most `workers` at a time, each on its own pooled connection"""
+
+    def __init__(self, pool, tables: List[Tuple[str, str]], workers: int = DEFAULT_VACUUM_WORKERS, analyze: bool = True):
+        self.pool = pool
+        self.analyze = analyze
+        self.workers = min(workers, max_vacuum_workers(pool))
+        self.tasks = [VacuumTask(schema, table) for schema, table in tables]
+        self.started_at = time.time()
+        self._cancel_requested = False
+        self._lock = threading.Lock()
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pgmanage-vacuum")
+        self._futures = [executor.submit(self._vacuum, task) for task in self.tasks]
+        # Workers exit once the queue is drained
+        executor.shutdown(wait=False)
+
+    def statement(self, task: VacuumTask) -> sql.Composed:
+        options = sql.SQL("(ANALYZE) ") if self.analyze else sql.SQL("")
+        return sql.SQL("VACUUM {}{}.{}").format(options, sql.Identifier(task.schema), sql.Identifier(task.table))
+
+    def _vacuum(self, task: VacuumTask):
+        if self._cancel_requested:
+            task.status = TASK_CANCELLED
+            return
+
+        try:
+            with self.pool.connection() as conn:
+                # VACUUM cannot run inside a transaction block
+                conn.autocommit = True
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("SELECT pg_backend_pid()")
+                    with self._lock:
+                        if self._cancel_requested:
+                            task.status = TASK_CANCELLED
+                            return
+                        task.pid = cursor.fetchone()[0]
+                        task._conn = conn
+                        task.started_at = time.time()
+                        task.status = TASK_RUNNING
+                    cursor.execute(self.statement(task))
+                    task.status = TASK_DONE
+                finally:
+                    with self._lock:
+                        task._conn = None
+                    cursor.close()
+        except psycopg2.errors.QueryCanceled as e:
+            task.status = TASK_CANCELLED if self._cancel_requested else TASK_ERROR
+            task.error = str(e).strip()
+        except Exception as e:
+            task.status = TASK_ERROR
+            task.error = str(e).strip()
+        finally:
+            if task.started_at is not None:
+                task.finished_at = time.time()
+
+    def cancel(self):
+        """Skip queued tables and cancel the running vacuums on the server"""
+        with self._lock:
+            self._cancel_requested = True
+            connections = [task._conn for task in self.tasks if task._conn is not None]
+        for future, task in zip(self._futures, self.tasks):
+            if future.cancel():
+                task.status = TASK_CANCELLED
+        for conn in connections:
+            try:
+                conn.cancel()
+            except psycopg2.Error:
+                pass
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_requested
+
+    @property
+    def finished(self) -> bool:
+        return all(task.status not in (TASK_QUEUED, TASK_RUNNING) for task in self.tasks)
+
+    def summary(self) -> Dict[str, int]:
+        counts = {status: 0 for status in (TASK_QUEUED, TASK_RUNNING, TASK_DONE, TASK_CANCELLED, TASK_ERROR)}
+        for task in self.tasks:
+            counts[task.status] += 1
+        return counts
+
+
+_runs: Dict[tuple, VacuumRun] = {}
+_runs_lock = threading.Lock()
+
+
+def start_vacuum(db_conn, tables: List[Tuple[str, str]], workers: int = DEFAULT_VACUUM_WORKERS,
+                 analyze: bool = True) -> VacuumRun:
+    """Start a run for the connection's database; only one runs per database at a time"""
+    key = db_conn.cache_key
+    with _runs_lock:
+        current = _runs.get(key)
+        if current is not None and not current.finished:
+            raise RuntimeError("A vacuum run is already in progress for this database")
+        run = VacuumRun(db_conn.get_pool(), tables, workers, analyze)
+        _runs[key] = run
+        return run
+
+
+def get_vacuum_run(db_conn) -> Optional[VacuumRun]:
+    """The current or last vacuum run of the connection's database, shared by all sessions"""
+    with _runs_lock:
+        return _runs.get(db_conn.cache_key)
+
+
+def clear_vacuum_run(db_conn):
+    with _runs_lock:
+        run = _runs.get(db_conn.cache_key)
+        if run is not None and run.finished:
+            del _runs[db_conn.cache_key]
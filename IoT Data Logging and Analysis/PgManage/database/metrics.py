@@ -0,0 +1,48 @@
+"""
+Dashboard metric collectors
+"""
+import datetime
+from dataclasses import dataclass
+
+from database.queries import DASHBOARD_QUERIES
+from utils.helpers import format_bytes
+
+
+@dataclass(frozen=True)
+class OverviewSnapshot:
+    """Object counts and size of the current database at one point in time"""
+    table_count: int
+    view_count: int
+    materialized_view_count: int
+    function_count: int
+    procedure_count: int
+    trigger_count: int
+    index_count: int
+    sequence_count: int
+    database_size: int
+    active_connections: int
+    collected_at: datetime.datetime
+
+    @property
+    def database_size_pretty(self) -> str:
+        return format_bytes(self.database_size)
+
+
+def collect_overview(db_conn) -> OverviewSnapshot:
+    """Collect every overview counter with a single catalog query"""
+    result = db_conn.execute_query(DASHBOARD_QUERIES['overview'])
+    row = result.iloc[0]
+
+    return OverviewSnapshot(
+        table_count=int(row['table_count']),
+        view_count=int(row['view_count']),
+        materialized_view_count=int(row['materialized_view_count']),
+        function_count=int(row['function_count']),
+        procedure_count=int(row['procedure_count']),
+        trigger_count=int(row['trigger_count']),
+        index_count=int(row['index_count']),
+        sequence_count=int(row['sequence_count']),
+        database_size=int(row['database_size']),
+        active_connections=int(row['active_connections']),
+        collected_at=datetime.datetime.now()
+    )
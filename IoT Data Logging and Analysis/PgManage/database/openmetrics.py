@@ -0,0 +1,265 @@
+"""
+OpenMetrics rendering of the monitoring queries, collected at most once per interval
+"""
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import pandas as pd
+
+from database.queries import MONITORING_QUERIES
+from database.results import fetch_dataframe
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+METRIC_PREFIX = 'pgmanage'
+
+DEFAULT_COLLECT_INTERVAL = 15.0
+# Tables and indexes beyond these caps are left out; see SeriesCap
+DEFAULT_MAX_TABLES = 500
+DEFAULT_MAX_INDEXES = 1000
+
+TYPE_COUNTER = 'counter'
+TYPE_GAUGE = 'gauge'
+
+
+@dataclass
+class MetricFamily:
+    """One metric name with its samples as (labels, value)"""
+    name: str
+    type: str
+    help: str
+    unit: str = ''
+    samples: List[Tuple[Dict[str, str], float]] = field(default_factory=list)
+
+    def add(self, value, **labels):
+        if value is None or pd.isna(value):
+            return
+        self.samples.append((labels, float(value)))
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(int(value)) if value.is_integer() and abs(value) < 2 ** 53 else repr(value)
+
+
+def render(families: List[MetricFamily]) -> str:
+    """Text exposition of the families, terminated by # EOF"""
+    lines = []
+    for family in families:
+        # OpenMetrics requires the unit as a name suffix
+        name = f"{METRIC_PREFIX}_{family.name}" + (f"_{family.unit}" if family.unit else '')
+        lines.append(f"# TYPE {name} {family.type}")
+        if family.unit:
+            lines.append(f"# UNIT {name} {family.unit}")
+        lines.append(f"# HELP {name} {family.help}")
+
+        sample_name = f"{name}_total" if family.type == TYPE_COUNTER else name
+        for labels, value in family.samples:
+            if labels:
+                label_text = ','.join(f'{key}="{escape_label_value(label)}"' for key, label in labels.items())
+                lines.append(f"{sample_name}{{{label_text}}} {format_value(value)}")
+            else:
+                lines.append(f"{sample_name} {format_value(value)}")
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class SeriesCap:
+    """At most `limit` series, kept the same from one collection to the next
+
+    Series exported last time stay while their object exists and free slots go
+    to the most active of the others. Ranking every collection afresh would
+    swap objects near the cutoff in and out, leaving gaps in their series.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.kept: Set[tuple] = set()
+
+    def select(self, frame: pd.DataFrame, key_columns: List[str], activity: pd.Series) -> pd.DataFrame:
+        keys = list(zip(*(frame[column] for column in key_columns)))
+        ranked = pd.DataFrame({'retained': [key in self.kept for key in keys], 'activity': activity.to_numpy()},
+                              index=frame.index)
+        order = ranked.sort_values(['retained', 'activity'], ascending=False, kind='stable').index[:self.limit]
+        kept = frame.loc[order]
+        self.kept = set(zip(*(kept[column] for column in key_columns)))
+        return kept
+
+
+def _cap(cap: Union[int, SeriesCap]) -> SeriesCap:
+    return cap if isinstance(cap, SeriesCap) else SeriesCap(cap)
+
+
+def _epoch(value) -> Optional[float]:
+    if value is None or pd.isna(value):
+        return None
+    return pd.Timestamp(value).timestamp()
+
+
+def database_families(stats: pd.DataFrame) -> List[MetricFamily]:
+    """Database-wide counters from pg_stat_database"""
+    connections = MetricFamily('database_connections', TYPE_GAUGE, 'Backends connected to the database')
+    transactions = MetricFamily('database_transactions', TYPE_COUNTER, 'Transactions by outcome')
+    blocks = MetricFamily('database_blocks', TYPE_COUNTER, 'Block accesses by source')
+    tuples = MetricFamily('database_tuples', TYPE_COUNTER, 'Rows processed by operation')
+
+    for _, row in stats.iterrows():
+        database = row['datname']
+        connections.add(row['connections'], database=database)
+        transactions.add(row['commits'], database=database, outcome='commit')
+        transactions.add(row['rollbacks'], database=database, outcome='rollback')
+        blocks.add(row['blocks_hit'], database=database, source='cache')
+        blocks.add(row['blocks_read'], database=database, source='disk')
+        for operation in ('returned', 'fetched', 'inserted', 'updated', 'deleted'):
+            tuples.add(row[f"tuples_{operation}"], database=database, operation=operation)
+
+    return [connections, transactions, blocks, tuples]
+
+
+def table_families(table_stats: pd.DataFrame, max_tables: Union[int, SeriesCap]) -> Tuple[List[MetricFamily], int]:
+    """Per-table counters for the tables within the cap; returns the families and the number dropped"""
+    activity = table_stats['inserts'] + table_stats['updates'] + table_stats['deletes']
+    kept = _cap(max_tables).select(table_stats, ['schemaname', 'tablename'], activity)
+
+    modified = MetricFamily('table_tuples_modified', TYPE_COUNTER, 'Rows written to the table by operation')
+    live = MetricFamily('table_live_tuples', TYPE_GAUGE, 'Estimated live rows')
+    dead = MetricFamily('table_dead_tuples', TYPE_GAUGE, 'Estimated dead rows')
+    vacuumed = MetricFamily('table_last_vacuum_timestamp', TYPE_GAUGE,
+                            'Last manual or automatic vacuum', unit='seconds')
+    analyzed = MetricFamily('table_last_analyze_timestamp', TYPE_GAUGE,
+                            'Last manual or automatic analyze', unit='seconds')
+
+    for _, row in kept.sort_values(['schemaname', 'tablename']).iterrows():
+        labels = {'schema': row['schemaname'], 'table': row['tablename']}
+        for column, operation in (('inserts', 'insert'), ('updates', 'update'), ('deletes', 'delete')):
+            modified.add(row[column], **labels, operation=operation)
+        live.add(row['live_tuples'], **labels)
+        dead.add(row['dead_tuples'], **labels)
+
+        last_vacuum = [t for t in (_epoch(row['last_vacuum']), _epoch(row['last_autovacuum'])) if t is not None]
+        last_analyze = [t for t in (_epoch(row['last_analyze']), _epoch(row['last_autoanalyze'])) if t is not None]
+        if last_vacuum:
+            vacuumed.add(max(last_vacuum), **labels)
+        if last_analyze:
+            analyzed.add(max(last_analyze), **labels)
+
+    return [modified, live, dead, vacuumed, analyzed], len(table_stats) - len(kept)
+
+
+def index_families(index_usage: pd.DataFrame, max_indexes: Union[int, SeriesCap]) -> Tuple[List[MetricFamily], int]:
+    """Per-index counters for the indexes within the cap; returns the families and the number dropped"""
+    kept = _cap(max_indexes).select(index_usage, ['schemaname', 'tablename', 'indexname'], index_usage['tuples_read'])
+
+    read = MetricFamily('index_tuples_read', TYPE_COUNTER, 'Index entries returned by scans of the index')
+    fetched = MetricFamily('index_tuples_fetched', TYPE_COUNTER, 'Live table rows fetched by simple index scans')
+
+    for _, row in kept.sort_values(['schemaname', 'tablename', 'indexname']).iterrows():
+        labels = {'schema': row['schemaname'], 'table': row['tablename'], 'index': row['indexname']}
+        read.add(row['tuples_read'], **labels)
+        fetched.add(row['tuples_fetched'], **labels)
+
+    return [read, fetched], len(index_usage) - len(kept)
+
+
+def activity_families(active_queries: pd.DataFrame, now: float) -> List[MetricFamily]:
+    """Active query counts and the oldest running query per user; query text is never exported"""
+    active = MetricFamily('active_queries', TYPE_GAUGE, 'Queries currently running')
+    oldest = MetricFamily('active_query_max_duration', TYPE_GAUGE,
+                          'Run time of the longest running query', unit='seconds')
+
+    if not active_queries.empty:
+        starts = active_queries['query_start'].map(_epoch)
+        for user, group in active_queries.assign(started=starts).groupby('usename', dropna=False):
+            user = '' if pd.isna(user) else user
+            active.add(len(group), user=user)
+            if group['started'].notna().any():
+                oldest.add(max(now - group['started'].min(), 0.0), user=user)
+
+    return [active, oldest]
+
+
+def collect_families(connection, max_tables: Union[int, SeriesCap] = DEFAULT_MAX_TABLES,
+                     max_indexes: Union[int, SeriesCap] = DEFAULT_MAX_INDEXES) -> List[MetricFamily]:
+    """Run every monitoring query once and convert the results to metric families"""
+    families = database_families(fetch_dataframe(connection, MONITORING_QUERIES['database_stats']))
+
+    tables, dropped_tables = table_families(fetch_dataframe(connection, MONITORING_QUERIES['table_stats']), max_tables)
+    indexes, dropped_indexes = index_families(fetch_dataframe(connection, MONITORING_QUERIES['index_usage']), max_indexes)
+    families += tables + indexes
+    families += activity_families(fetch_dataframe(connection, MONITORING_QUERIES['active_queries']), time.time())
+
+    dropped = MetricFamily('exporter_series_dropped', TYPE_GAUGE,
+                           'Tables or indexes left out by the cardinality cap')
+    dropped.add(dropped_tables, kind='table')
+    dropped.add(dropped_indexes, kind='index')
+    families.append(dropped)
+    return families
+
+
+class CachedCollector:
+    """Serves the last collection to every scrape until it is older than the interval"""
+
+    def __init__(self, pool, interval: float = DEFAULT_COLLECT_INTERVAL,
+                 max_tables: int = DEFAULT_MAX_TABLES, max_indexes: int = DEFAULT_MAX_INDEXES):
+        self.pool = pool
+        self.interval = interval
+        self.max_tables = max_tables
+        self.max_indexes = max_indexes
+        self._table_cap = SeriesCap(max_tables)
+        self._index_cap = SeriesCap(max_indexes)
+        self.collections = 0
+        self.errors = 0
+        self.last_error = None
+        self._families: List[MetricFamily] = []
+        self._up = False
+        self._duration = 0.0
+        self._collected_at = 0.0
+        self._lock = threading.Lock()
+
+    def _collect(self):
+        start = time.time()
+        try:
+            with self.pool.connection() as conn:
+                self._families = collect_families(conn, self._table_cap, self._index_cap)
+            self._up = True
+            self.last_error = None
+        except Exception as e:
+            # Stale samples are dropped rather than served as if they were current
+            self._families = []
+            self._up = False
+            self.errors += 1
+            self.last_error = str(e)
+        self.collections += 1
+        self._duration = time.time() - start
+        self._collected_at = time.time()
+
+    def _exporter_families(self) -> List[MetricFamily]:
+        up = MetricFamily('up', TYPE_GAUGE, 'Whether the last collection succeeded')
+        up.add(1 if self._up else 0)
+        duration = MetricFamily('exporter_collect_duration', TYPE_GAUGE,
+                                'Time the last collection took', unit='seconds')
+        duration.add(self._duration)
+        collected = MetricFamily('exporter_last_collect_timestamp', TYPE_GAUGE,
+                                 'When the served samples were collected', unit='seconds')
+        collected.add(self._collected_at)
+        collections = MetricFamily('exporter_collections', TYPE_COUNTER, 'Collections run against the database')
+        collections.add(self.collections)
+        errors = MetricFamily('exporter_collect_errors', TYPE_COUNTER, 'Collections that failed')
+        errors.add(self.errors)
+        return [up, duration, collected, collections, errors]
+
+    def scrape(self) -> str:
+        """OpenMetrics text; concurrent scrapes wait for one collection instead of starting their own"""
+        with self._lock:
+            if time.time() - self._collected_at >= self.interval:
+                self._collect()
+            return render(self._families + self._exporter_families())
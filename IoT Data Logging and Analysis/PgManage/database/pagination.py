@@ -0,0 +1,173 @@
+"""
+Keyset pagination over a table's primary key, falling back to ctid, with next-page prefetch
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import pandas as pd
+from psycopg2 import sql
+
+from database.queries import TABLE_QUERIES
+from database.results import build_dataframe, prepare_cursor
+
+PAGING_PRIMARY_KEY = 'primary key'
+PAGING_CTID = 'ctid'
+# Views, partitioned and foreign tables without a primary key
+PAGING_OFFSET = 'offset'
+
+# Relation kinds whose ctid identifies a row (plain tables and materialized views)
+CTID_RELKINDS = ('r', 'm')
+
+# ctid pages read a window of heap blocks at a time, so the ORDER BY ctid sort only
+# covers that window; windows double while they come back short (sparse or bloated heaps)
+CTID_WINDOW_BLOCKS = 32
+CTID_MAX_WINDOW_BLOCKS = 8192
+
+PREFETCH_WORKERS = 4
+
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='pgmanage-prefetch')
+
+
+@dataclass(frozen=True)
+class PagingPlan:
+    """How to page through one relation"""
+    schema: str
+    table: str
+    mode: str
+    key_columns: Tuple[str, ...] = ()
+    key_types: Tuple[str, ...] = ()
+
+
+@dataclass
+class Page:
+    """One page of rows and the cursor that continues after it"""
+    data: pd.DataFrame
+    # Text form of the last row's key, None on the last page
+    next_key: Optional[tuple]
+
+
+def plan_paging(catalog, schema: str, table: str) -> PagingPlan:
+    """Pick primary key, ctid or OFFSET paging from the catalog snapshot"""
+    primary_key = catalog.primary_key(schema, table)
+    if primary_key:
+        columns = catalog.table_columns(schema, table).set_index('column_name')['full_data_type']
+        return PagingPlan(schema, table, PAGING_PRIMARY_KEY,
+                          tuple(primary_key), tuple(columns[column] for column in primary_key))
+
+    info = catalog.table_info(schema, table)
+    if info is not None and info['relkind'] in CTID_RELKINDS:
+        return PagingPlan(schema, table, PAGING_CTID, ('ctid',), ('tid',))
+
+    return PagingPlan(schema, table, PAGING_OFFSET)
+
+
+def ctid_block(ctid: str) -> int:
+    """Heap block number of a ctid in its text form '(block,offset)'"""
+    return int(ctid.strip('()').split(',')[0])
+
+
+def build_page_query(plan: PagingPlan, limit: int, after: Optional[tuple] = None,
+                     blocks: Optional[Tuple[int, int]] = None) -> Tuple[sql.Composed, list]:
+    """Page query selecting the key as text first, then every column of the relation
+
+    For ctid paging, `blocks` is the [first, last) heap block window to read; a TID
+    Range Scan (PostgreSQL 14+) reads only those blocks and sorts only their rows.
+    """
+    relation = sql.SQL("{}.{}").format(sql.Identifier(plan.schema), sql.Identifier(plan.table))
+
+    # One row past the page tells us whether there is a next page
+    if plan.mode == PAGING_OFFSET:
+        offset = after[0] if after else 0
+        query = sql.SQL("SELECT * FROM {} LIMIT %s OFFSET %s").format(relation)
+        return query, [limit + 1, offset]
+
+    keys = sql.SQL(", ").join(sql.Identifier(column) for column in plan.key_columns)
+    key_text = sql.SQL(", ").join(
+        sql.SQL("{}::text").format(sql.Identifier(column)) for column in plan.key_columns
+    )
+
+    conditions = []
+    params = []
+    if blocks is not None:
+        conditions.append(sql.SQL("ctid >= %s::tid AND ctid < %s::tid"))
+        params.extend([f"({blocks[0]},0)", f"({blocks[1]},0)"])
+    if after is not None:
+        # Row comparison walks the key's btree (or the TID range) from the cursor
+        placeholders = sql.SQL(", ").join(
+            sql.SQL("%s::") + sql.SQL(key_type) for key_type in plan.key_types
+        )
+        conditions.append(sql.SQL("({}) > ({})").format(keys, placeholders))
+        params.extend(after)
+
+    where = sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions) if conditions else sql.SQL("")
+    query = sql.SQL("SELECT {}, * FROM {}{} ORDER BY {} LIMIT %s").format(key_text, relation, where, keys)
+    params.append(limit + 1)
+    return query, params
+
+
+def _fetch_rows(cursor, plan: PagingPlan, limit: int, after: Optional[tuple]):
+    """Up to limit + 1 rows after the cursor, and their description"""
+    if plan.mode != PAGING_CTID:
+        cursor.execute(*build_page_query(plan, limit, after))
+        return cursor.fetchall(), cursor.description
+
+    cursor.execute(TABLE_QUERIES['relation_blocks'], (plan.schema, plan.table))
+    result = cursor.fetchone()
+    total_blocks = int(result[0]) if result else 0
+
+    # The page continues in the block of the cursor's row, then in the windows after it
+    first = ctid_block(after[0]) if after else 0
+    window = CTID_WINDOW_BLOCKS
+    rows, description = [], None
+    while True:
+        last = first + window
+        cursor.execute(*build_page_query(plan, limit - len(rows), after, (first, last)))
+        rows.extend(cursor.fetchall())
+        description = cursor.description
+        if len(rows) > limit or last >= total_blocks:
+            return rows, description
+        first, after = last, None
+        window = min(window * 2, CTID_MAX_WINDOW_BLOCKS)
+
+
+def fetch_page(connection, plan: PagingPlan, limit: int, after: Optional[tuple] = None) -> Page:
+    """Fetch the page that starts after the given cursor"""
+    cursor = connection.cursor()
+    try:
+        prepare_cursor(cursor)
+        rows, description = _fetch_rows(cursor, plan, limit, after)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if plan.mode == PAGING_OFFSET:
+        offset = after[0] if after else 0
+        return Page(build_dataframe(rows, description), (offset + limit,) if has_more else None)
+
+    key_width = len(plan.key_columns)
+    data = build_dataframe([row[key_width:] for row in rows], description[key_width:])
+    return Page(data, tuple(rows[-1][:key_width]) if has_more else None)
+
+
+def _fetch_pooled(pool, plan: PagingPlan, limit: int, after: Optional[tuple]) -> Page:
+    with pool.connection() as conn:
+        return fetch_page(conn, plan, limit, after)
+
+
+def prefetch_page(db_conn, plan: PagingPlan, limit: int, after: Optional[tuple]) -> Future:
+    """Fetch a page in the background on its own pooled connection"""
+    return _prefetch_executor.submit(_fetch_pooled, db_conn.get_pool(), plan, limit, after)
+
+
+def describe_plan(plan: PagingPlan) -> str:
+    if plan.mode == PAGING_PRIMARY_KEY:
+        return f"Paging by primary key ({', '.join(plan.key_columns)})"
+    if plan.mode == PAGING_CTID:
+        return "Paging by physical row location (ctid); the table has no primary key"
+    return "Paging by OFFSET; deep pages get slower because this relation has no primary key or ctid"
@@ -0,0 +1,273 @@
+"""
+EXPLAIN (FORMAT JSON) analysis: flattened plan tree with exclusive time per node,
+findings for likely problems, and comparison of two plans of the same query
+"""
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+# Actual rows off from the estimate by this factor or more are flagged
+MISESTIMATE_FACTOR = 10.0
+# Sequential scans reading at least this many rows are flagged
+SEQ_SCAN_ROWS = 100000
+# Filters discarding this share of the scanned rows suggest an index would help
+SELECTIVE_FILTER_RATIO = 0.9
+
+SEVERITY_HIGH = 'high'
+SEVERITY_MEDIUM = 'medium'
+SEVERITY_INFO = 'info'
+
+FINDING_MISESTIMATE = 'Row misestimate'
+FINDING_SPILL = 'Spill to disk'
+FINDING_SEQ_SCAN = 'Large sequential scan'
+FINDING_NEVER_EXECUTED = 'Never executed'
+
+PARALLEL_NODES = ('Gather', 'Gather Merge')
+
+
+@dataclass
+class PlanAnalysis:
+    """A parsed plan: one row per node in depth-first order"""
+    nodes: pd.DataFrame
+    findings: pd.DataFrame
+    planning_time: Optional[float]
+    execution_time: Optional[float]
+    has_actuals: bool
+    raw: Any
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def measure(self) -> str:
+        """Column that attributes cost to nodes: exclusive time when analyzed, else exclusive cost"""
+        return 'exclusive_time' if self.has_actuals else 'exclusive_cost'
+
+    @property
+    def total_cost(self) -> float:
+        return float(self.nodes['total_cost'].iloc[0]) if not self.nodes.empty else 0.0
+
+    def hotspots(self, limit: int = 5) -> pd.DataFrame:
+        return self.nodes.nlargest(limit, self.measure)
+
+
+def load_plan_json(value) -> list:
+    """The EXPLAIN output cell as a list, whether the driver decoded the json or not"""
+    if isinstance(value, (bytes, str)):
+        value = json.loads(value)
+    if isinstance(value, dict):
+        value = [value]
+    return value
+
+
+def _relation(plan: Dict[str, Any]) -> Optional[str]:
+    if 'Relation Name' not in plan:
+        return None
+    if plan.get('Schema'):
+        return f"{plan['Schema']}.{plan['Relation Name']}"
+    return plan['Relation Name']
+
+
+def _label(plan: Dict[str, Any]) -> str:
+    label = plan['Node Type']
+    if plan.get('Strategy') and plan['Node Type'] == 'Aggregate':
+        label = f"{plan['Strategy'].replace('Plain', '')} Aggregate".strip()
+    if plan.get('Join Type') and plan['Node Type'] in ('Nested Loop', 'Hash Join', 'Merge Join'):
+        label += f" ({plan['Join Type']})"
+    if plan.get('Index Name'):
+        label += f" using {plan['Index Name']}"
+    relation = _relation(plan)
+    if relation:
+        label += f" on {relation}"
+        if plan.get('Alias') and plan['Alias'] != plan['Relation Name']:
+            label += f" {plan['Alias']}"
+    if plan.get('Subplan Name'):
+        label = f"{plan['Subplan Name']}: {label}"
+    return label
+
+
+def _flatten(plan: Dict[str, Any], parent_id: Optional[int], depth: int, divisor: int, rows: List[dict]) -> dict:
+    node_id = len(rows)
+    loops = plan.get('Actual Loops')
+    total_time = plan.get('Actual Total Time')
+
+    # Times of nodes under Gather are per-process averages; loops count every worker
+    inclusive_time = total_time * loops / divisor if total_time is not None and loops is not None else None
+
+    row = {
+        'node_id': node_id,
+        'parent_id': parent_id,
+        'depth': depth,
+        'node_type': plan['Node Type'],
+        'label': _label(plan),
+        'relation': _relation(plan),
+        'index_name': plan.get('Index Name'),
+        'startup_cost': plan.get('Startup Cost'),
+        'total_cost': plan.get('Total Cost'),
+        'plan_rows': plan.get('Plan Rows'),
+        'actual_rows': plan.get('Actual Rows'),
+        'actual_loops': loops,
+        'inclusive_time': inclusive_time,
+        'shared_hit_blocks': plan.get('Shared Hit Blocks'),
+        'shared_read_blocks': plan.get('Shared Read Blocks'),
+        'temp_read_blocks': plan.get('Temp Read Blocks'),
+        'temp_written_blocks': plan.get('Temp Written Blocks'),
+        'rows_removed_by_filter': plan.get('Rows Removed by Filter'),
+        'filter': plan.get('Filter') or plan.get('Index Cond') or plan.get('Hash Cond') or plan.get('Join Filter'),
+        'sort_space_type': plan.get('Sort Space Type'),
+        'sort_space_used': plan.get('Sort Space Used'),
+        'hash_batches': plan.get('Hash Batches'),
+        'hashagg_batches': plan.get('HashAgg Batches'),
+        'disk_usage': plan.get('Disk Usage')
+    }
+    rows.append(row)
+
+    child_divisor = divisor
+    if plan['Node Type'] in PARALLEL_NODES and plan.get('Workers Launched') is not None:
+        # The leader also runs the parallel part unless parallel_leader_participation is off
+        child_divisor = plan['Workers Launched'] + 1
+
+    children = [_flatten(child, node_id, depth + 1, child_divisor, rows) for child in plan.get('Plans', [])]
+
+    child_time = sum(child['inclusive_time'] or 0.0 for child in children)
+    child_cost = sum(child['total_cost'] or 0.0 for child in children)
+    row['exclusive_time'] = max(inclusive_time - child_time, 0.0) if inclusive_time is not None else None
+    row['exclusive_cost'] = max((row['total_cost'] or 0.0) - child_cost, 0.0)
+    return row
+
+
+def _number(value) -> float:
+    """Plan fields missing from a node (None, or NaN once in a DataFrame) count as zero"""
+    return 0.0 if value is None or pd.isna(value) else float(value)
+
+
+def _findings(nodes: pd.DataFrame, has_actuals: bool) -> pd.DataFrame:
+    findings = []
+
+    def add(node, severity, kind, message):
+        findings.append({'node_id': node['node_id'], 'node': node['label'], 'severity': severity,
+                         'finding': kind, 'detail': message})
+
+    for _, node in nodes.iterrows():
+        if has_actuals:
+            if node['actual_loops'] == 0:
+                add(node, SEVERITY_INFO, FINDING_NEVER_EXECUTED, "The executor never ran this node")
+                continue
+
+            estimated = max(_number(node['plan_rows']), 1)
+            actual = max(_number(node['actual_rows']), 1)
+            factor = actual / estimated
+            if factor >= MISESTIMATE_FACTOR or factor <= 1 / MISESTIMATE_FACTOR:
+                direction = 'more' if factor > 1 else 'fewer'
+                ratio = factor if factor > 1 else 1 / factor
+                add(node, SEVERITY_HIGH if ratio >= MISESTIMATE_FACTOR ** 2 else SEVERITY_MEDIUM, FINDING_MISESTIMATE,
+                    f"{node['actual_rows']:,.0f} rows per loop vs {node['plan_rows']:,.0f} estimated "
+                    f"({ratio:,.0f}x {direction}); check statistics with ANALYZE")
+
+        if node['sort_space_type'] == 'Disk':
+            add(node, SEVERITY_HIGH, FINDING_SPILL,
+                f"Sort used {_number(node['sort_space_used']):,.0f} kB on disk; consider raising work_mem")
+        elif _number(node['hash_batches']) > 1:
+            add(node, SEVERITY_HIGH, FINDING_SPILL,
+                f"Hash split into {node['hash_batches']:,.0f} batches; consider raising work_mem")
+        elif _number(node['hashagg_batches']) > 1 or _number(node['disk_usage']) > 0:
+            add(node, SEVERITY_HIGH, FINDING_SPILL,
+                f"Hash aggregate spilled {_number(node['disk_usage']):,.0f} kB to disk; consider raising work_mem")
+        elif _number(node['temp_written_blocks']) > 0:
+            add(node, SEVERITY_MEDIUM, FINDING_SPILL,
+                f"Wrote {node['temp_written_blocks']:,.0f} temporary blocks")
+
+        if node['node_type'] == 'Seq Scan':
+            if has_actuals:
+                loops = _number(node['actual_loops']) or 1
+                removed = _number(node['rows_removed_by_filter']) * loops
+                scanned = _number(node['actual_rows']) * loops + removed
+            else:
+                removed = 0.0
+                scanned = _number(node['plan_rows'])
+            if scanned >= SEQ_SCAN_ROWS:
+                detail = f"Reads {scanned:,.0f} rows of {node['relation']}"
+                selective = removed / scanned >= SELECTIVE_FILTER_RATIO
+                if selective:
+                    detail += f" and its filter discards {removed / scanned:.0%} of them; an index on the filtered columns may help"
+                add(node, SEVERITY_HIGH if selective else SEVERITY_MEDIUM, FINDING_SEQ_SCAN, detail)
+
+    severity_order = {SEVERITY_HIGH: 0, SEVERITY_MEDIUM: 1, SEVERITY_INFO: 2}
+    findings_df = pd.DataFrame(findings, columns=['node_id', 'node', 'severity', 'finding', 'detail'])
+    findings_df['rank'] = findings_df['severity'].map(severity_order)
+    return findings_df.sort_values(['rank', 'node_id']).drop(columns=['rank']).reset_index(drop=True)
+
+
+def analyze_plan(explain_output) -> PlanAnalysis:
+    """Parse the output of EXPLAIN (FORMAT JSON), with or without ANALYZE"""
+    document = load_plan_json(explain_output)[0]
+    rows: List[dict] = []
+    _flatten(document['Plan'], None, 0, 1, rows)
+
+    nodes = pd.DataFrame(rows)
+    has_actuals = nodes['inclusive_time'].notna().any()
+
+    if has_actuals:
+        total = nodes['exclusive_time'].sum()
+        nodes['time_share'] = nodes['exclusive_time'] / total * 100 if total > 0 else 0.0
+    total_cost = nodes['exclusive_cost'].sum()
+    nodes['cost_share'] = nodes['exclusive_cost'] / total_cost * 100 if total_cost > 0 else 0.0
+
+    return PlanAnalysis(
+        nodes=nodes,
+        findings=_findings(nodes, has_actuals),
+        planning_time=document.get('Planning Time'),
+        execution_time=document.get('Execution Time'),
+        has_actuals=bool(has_actuals),
+        raw=document
+    )
+
+
+def plan_summary(analysis: PlanAnalysis) -> Dict[str, Optional[float]]:
+    nodes = analysis.nodes
+    top = nodes.iloc[0]
+    return {
+        'Execution time (ms)': analysis.execution_time,
+        'Planning time (ms)': analysis.planning_time,
+        'Total cost': analysis.total_cost,
+        'Rows returned': top['actual_rows'] if analysis.has_actuals else top['plan_rows'],
+        'Shared blocks hit': top['shared_hit_blocks'],
+        'Shared blocks read': top['shared_read_blocks'],
+        'Temp blocks written': nodes['temp_written_blocks'].fillna(0).sum() if analysis.has_actuals else None,
+        'Plan nodes': float(len(nodes)),
+        'Sequential scans': float((nodes['node_type'] == 'Seq Scan').sum()),
+        'Findings': float(len(analysis.findings))
+    }
+
+
+def diff_plans(before: PlanAnalysis, after: PlanAnalysis) -> Dict[str, Any]:
+    """Summary deltas and per-operation time (or cost) of two plans"""
+    before_summary = plan_summary(before)
+    after_summary = plan_summary(after)
+    summary = pd.DataFrame({
+        'metric': list(before_summary),
+        'before': [before_summary[name] for name in before_summary],
+        'after': [after_summary[name] for name in before_summary]
+    })
+    summary[['before', 'after']] = summary[['before', 'after']].astype('float64')
+    summary['change'] = summary['after'] - summary['before']
+    summary['change_pct'] = (summary['change'] / summary['before'].where(summary['before'] != 0)) * 100
+
+    # Nodes are matched by what they do, so a Seq Scan replaced by an Index Scan shows as one removed and one added
+    measure = 'exclusive_time' if before.has_actuals and after.has_actuals else 'exclusive_cost'
+
+    def operations(analysis):
+        nodes = analysis.nodes.assign(operation=analysis.nodes['label'].str.replace(r'^[^:]*Plan \d+[^:]*: ', '', regex=True))
+        return nodes.groupby('operation').agg(count=('node_id', 'size'), value=(measure, 'sum'))
+
+    operations_df = operations(before).join(operations(after), how='outer', lsuffix='_before', rsuffix='_after')
+    operations_df = operations_df.fillna(0).reset_index()
+    operations_df['change'] = operations_df['value_after'] - operations_df['value_before']
+    operations_df['status'] = [
+        'added' if row['count_before'] == 0 else 'removed' if row['count_after'] == 0 else 'changed'
+        for _, row in operations_df.iterrows()
+    ]
+    operations_df = operations_df.reindex(operations_df['change'].abs().sort_values(ascending=False).index)
+
+    return {'summary': summary, 'operations': operations_df.reset_index(drop=True), 'measure': measure}
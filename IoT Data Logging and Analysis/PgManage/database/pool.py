@@ -0,0 +1,263 @@
+"""
+Process-wide PostgreSQL connection pooling shared by all Streamlit sessions
+"""
+import hmac
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple, Any
+
+import psycopg2
+import psycopg2.extensions
+
+# Pool sizing can be tuned per deployment through the environment
+DEFAULT_MIN_SIZE = int(os.getenv("PGMANAGE_POOL_MIN", "1"))
+DEFAULT_MAX_SIZE = int(os.getenv("PGMANAGE_POOL_MAX", "10"))
+DEFAULT_MAX_IDLE = float(os.getenv("PGMANAGE_POOL_MAX_IDLE", "300"))
+DEFAULT_HEALTH_CHECK_INTERVAL = float(os.getenv("PGMANAGE_POOL_HEALTH_CHECK", "30"))
+DEFAULT_ACQUIRE_TIMEOUT = float(os.getenv("PGMANAGE_POOL_TIMEOUT", "30"))
+
+
+class PoolError(Exception):
+    """Raised when a connection cannot be borrowed from a pool"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of connections to a single PostgreSQL database"""
+
+    def __init__(self, host: str, port: str, user: str, password: str, database: str,
+                 min_size: int = DEFAULT_MIN_SIZE, max_size: int = DEFAULT_MAX_SIZE,
+                 max_idle: float = DEFAULT_MAX_IDLE,
+                 health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+
+        self.host = host
+        self.port = port
+        self.user = user
+        self.database = database
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+
+        self._password = password
+        self._cond = threading.Condition()
+        # Idle connections with the time they were returned, oldest first
+        self._idle: List[Tuple[Any, float]] = []
+        self._in_use = set()
+        # Slots reserved by callers that are currently opening a connection
+        self._opening = 0
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _size(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _connect(self, password: Optional[str] = None):
+        return psycopg2.connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self._password if password is None else password,
+            database=self.database
+        )
+
+    def _evict_idle_locked(self) -> list:
+        """Remove connections idle for longer than max_idle, keeping min_size open"""
+        now = time.monotonic()
+        stale = []
+        while self._idle and self._size() > self.min_size and now - self._idle[0][1] > self.max_idle:
+            stale.append(self._idle.pop(0)[0])
+        return stale
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        """Check that a pooled connection is still usable"""
+        if conn.closed:
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _open_reserved(self):
+        """Open a connection for a slot already reserved in _opening"""
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._opening -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._opening -= 1
+            self._in_use.add(conn)
+        return conn
+
+    def getconn(self, timeout: float = DEFAULT_ACQUIRE_TIMEOUT):
+        """Borrow a connection, waiting up to timeout seconds if the pool is full"""
+        deadline = time.monotonic() + timeout
+        conn = None
+        returned_at = 0.0
+        stale = []
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("Connection pool is closed")
+
+                stale.extend(self._evict_idle_locked())
+
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    self._in_use.add(conn)
+                    break
+
+                if self._size() < self.max_size:
+                    self._opening += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError(
+                        f"Timed out waiting for a connection to {self.database} "
+                        f"(pool size {self.max_size})"
+                    )
+                self._cond.wait(remaining)
+
+        for stale_conn in stale:
+            self._close_quietly(stale_conn)
+
+        if conn is None:
+            return self._open_reserved()
+
+        # Only ping connections that have been sitting idle for a while
+        if conn.closed or (time.monotonic() - returned_at > self.health_check_interval
+                           and not self._is_healthy(conn)):
+            with self._cond:
+                self._in_use.discard(conn)
+                self._opening += 1
+            self._close_quietly(conn)
+            return self._open_reserved()
+
+        return conn
+
+    def putconn(self, conn, close: bool = False):
+        """Return a borrowed connection to the pool"""
+        if not close and not conn.closed:
+            try:
+                # Never hand an open transaction to the next borrower
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                close = True
+
+        with self._cond:
+            self._in_use.discard(conn)
+            discard = close or conn.closed or self._closed
+            if not discard:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+        if discard:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self, timeout: float = DEFAULT_ACQUIRE_TIMEOUT):
+        """Borrow a connection for the duration of a with block"""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def authenticate(self, password: str):
+        """Verify a session's password before it shares this pool's connections"""
+        if hmac.compare_digest((password or '').encode(), (self._password or '').encode()):
+            return
+
+        # Credentials differ from the ones the pool was created with: only
+        # accept them (e.g. after a password rotation) if the server does
+        conn = self._connect(password)
+        self._close_quietly(conn)
+        with self._cond:
+            self._password = password
+
+    def stats(self) -> Dict[str, Any]:
+        """Current pool occupancy"""
+        with self._cond:
+            return {
+                'host': self.host,
+                'port': self.port,
+                'user': self.user,
+                'database': self.database,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'max_size': self.max_size
+            }
+
+    def closeall(self):
+        """Close idle connections and stop handing out new ones"""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._cond.notify_all()
+
+        for conn in idle:
+            self._close_quietly(conn)
+
+
+_pools: Dict[Tuple[str, str, str, str], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host: str, port: str, user: str, password: str, database: str, **kwargs) -> ConnectionPool:
+    """Get the shared pool for (host, port, user, database), creating it if needed"""
+    key = (host, str(port), user, database)
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = ConnectionPool(host, port, user, password, database, **kwargs)
+            _pools[key] = pool
+            return pool
+
+    pool.authenticate(password)
+    return pool
+
+
+def get_pool_stats() -> List[Dict[str, Any]]:
+    """Occupancy of every pool in this process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def close_all_pools():
+    """Close every pool in this process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+
+    for pool in pools:
+        pool.closeall()
@@ -0,0 +1,297 @@
+"""
+Column profiles for a whole table from a single scan, over the full table or a
+TABLESAMPLE SYSTEM sample, computing summary and value-frequency statistics together
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from psycopg2 import sql
+
+from database.results import fetch_dataframe
+
+NUMERIC_TYPES = ['integer', 'bigint', 'smallint', 'numeric', 'decimal', 'real', 'double precision', 'money']
+TEXT_TYPES = ['character varying', 'varchar', 'character', 'char', 'text']
+
+KIND_NUMERIC = 'numeric'
+KIND_TEXT = 'text'
+
+# Tables estimated below this many rows are profiled exactly by default
+PROFILE_EXACT_THRESHOLD = 100000
+DEFAULT_SAMPLE_PERCENT = 1.0
+TOP_VALUES = 10
+# Value frequencies group every scanned row once per column; above this many
+# rows × columns only the summary statistics are computed
+MAX_FREQUENCY_CELLS = 10000000
+
+_upgrade_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='pgmanage-profile')
+
+
+@dataclass
+class TableProfile:
+    """Per-column statistics of one table; sample_percent is None for an exact profile"""
+    schema: str
+    table: str
+    sample_percent: Optional[float]
+    total_count: float
+    columns: pd.DataFrame
+    top_values: pd.DataFrame
+    elapsed: float
+    frequencies_skipped: bool = False
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def exact(self) -> bool:
+        return self.sample_percent is None
+
+    def column(self, column_name: str) -> pd.Series:
+        return self.columns.set_index('column_name').loc[column_name]
+
+    def column_top_values(self, column_name: str) -> pd.DataFrame:
+        values = self.top_values[self.top_values['column_name'] == column_name]
+        return values[['value', 'frequency']].reset_index(drop=True)
+
+
+def profile_columns(columns_df: pd.DataFrame) -> List[Tuple[str, str, str]]:
+    """(column_name, data_type, kind) for the columns the profiler understands"""
+    profiled = []
+    for _, col in columns_df.iterrows():
+        if col['data_type'] in NUMERIC_TYPES:
+            profiled.append((col['column_name'], col['data_type'], KIND_NUMERIC))
+        elif col['data_type'] in TEXT_TYPES:
+            profiled.append((col['column_name'], col['data_type'], KIND_TEXT))
+    return profiled
+
+
+def _source(schema: str, table: str, sample_percent: Optional[float]) -> Tuple[sql.Composed, list]:
+    relation = sql.SQL("{}.{}").format(sql.Identifier(schema), sql.Identifier(table))
+    if sample_percent is None:
+        return relation, []
+    return sql.SQL("{} TABLESAMPLE SYSTEM (%s)").format(relation), [sample_percent]
+
+
+def build_summary_query(columns: List[Tuple[str, str, str]], source: sql.Composable) -> sql.Composed:
+    """COUNT/MIN/MAX/AVG/STDDEV or length stats for every column in one aggregate"""
+    aggregates = [sql.SQL("COUNT(*) as total_count")]
+
+    for i, (column_name, data_type, kind) in enumerate(columns):
+        column = sql.Identifier(column_name)
+        alias = f"c{i}"
+        aggregates.append(sql.SQL("COUNT({}) as {}").format(column, sql.Identifier(f"{alias}_non_null")))
+
+        if kind == KIND_NUMERIC:
+            # money has no STDDEV
+            value = sql.SQL("{}::numeric").format(column) if data_type == 'money' else column
+            for function, name in (('MIN', 'min'), ('MAX', 'max'), ('AVG', 'avg'), ('STDDEV', 'stddev')):
+                aggregates.append(sql.SQL(function + "({}) as {}").format(value, sql.Identifier(f"{alias}_{name}")))
+        else:
+            length = sql.SQL("LENGTH({})").format(column)
+            for function, name in (('AVG', 'avg_length'), ('MIN', 'min_length'), ('MAX', 'max_length')):
+                aggregates.append(sql.SQL(function + "({}) as {}").format(length, sql.Identifier(f"{alias}_{name}")))
+
+    return sql.SQL("SELECT {} FROM {}").format(sql.SQL(", ").join(aggregates), source)
+
+
+def build_frequency_query(columns: List[Tuple[str, str, str]], source: sql.Composable,
+                          condition: sql.Composable = sql.SQL("true")) -> sql.Composed:
+    """Distinct count, singleton count and top values of every column from one GROUPING SETS scan"""
+    identifiers = [sql.Identifier(column_name) for column_name, _, _ in columns]
+
+    # GROUPING(col) is 0 only in the grouping set of that column
+    col_index = sql.SQL("CASE {} END").format(sql.SQL(" ").join(
+        sql.SQL("WHEN GROUPING({}) = 0 THEN {}").format(column, sql.Literal(i))
+        for i, column in enumerate(identifiers)
+    ))
+    value = sql.SQL("CASE {} END").format(sql.SQL(" ").join(
+        sql.SQL("WHEN GROUPING({}) = 0 THEN {}::text").format(column, column)
+        for column in identifiers
+    ))
+    grouping_sets = sql.SQL(", ").join(sql.SQL("({})").format(column) for column in identifiers)
+
+    return sql.SQL("""
+        SELECT col_index, value, frequency, distinct_count, singleton_count
+        FROM (
+            SELECT
+                col_index,
+                value,
+                frequency,
+                COUNT(*) OVER (PARTITION BY col_index) as distinct_count,
+                COUNT(*) FILTER (WHERE frequency = 1) OVER (PARTITION BY col_index) as singleton_count,
+                ROW_NUMBER() OVER (PARTITION BY col_index ORDER BY frequency DESC, value) as value_rank
+            FROM (
+                SELECT {} as col_index, {} as value, COUNT(*) as frequency
+                FROM {}
+                WHERE {}
+                GROUP BY GROUPING SETS ({})
+            ) value_groups
+            WHERE value IS NOT NULL
+        ) ranked
+        WHERE value_rank <= %s
+    """).format(col_index, value, source, condition, grouping_sets)
+
+
+def build_profile_query(columns: List[Tuple[str, str, str]], source: sql.Composable) -> sql.Composed:
+    """Summary and frequency statistics from one read of the source
+
+    The sample CTE is referenced twice, so PostgreSQL materializes it and the
+    table (or TABLESAMPLE) is scanned once. The frequency pass only runs while
+    the scanned rows stay within a cap; the condition references no row, so
+    the planner turns it into a one-time filter. Each result row is the
+    summary joined with one top value.
+    """
+    sample = sql.Identifier('sample')
+    within_cap = sql.SQL("(SELECT total_count FROM summary) <= %s")
+
+    return sql.SQL("""
+        WITH sample AS (
+            SELECT {} FROM {}
+        ),
+        summary AS (
+            {}
+        ),
+        frequencies AS (
+            {}
+        )
+        SELECT * FROM summary LEFT JOIN frequencies ON true
+    """).format(
+        sql.SQL(", ").join(sql.Identifier(column_name) for column_name, _, _ in columns), source,
+        build_summary_query(columns, sample),
+        build_frequency_query(columns, sample, within_cap)
+    )
+
+
+def estimate_distinct(sample_non_null: float, sample_distinct: float, singletons: float,
+                      total_non_null: float) -> float:
+    """Haas-Stokes (Duj1) estimator, the one ANALYZE uses for n_distinct"""
+    if sample_non_null <= 0 or sample_distinct <= 0:
+        return 0.0
+    if total_non_null <= sample_non_null:
+        return float(sample_distinct)
+
+    denominator = sample_non_null - singletons + singletons * sample_non_null / total_non_null
+    estimate = sample_non_null * sample_distinct / denominator
+    return float(min(max(estimate, sample_distinct), total_non_null))
+
+
+def profile_table(connection, schema: str, table: str, columns_df: pd.DataFrame,
+                  sample_percent: Optional[float] = None, top_values: int = TOP_VALUES) -> TableProfile:
+    """Profile every numeric and text column with one scan of the table or of a sample"""
+    start = time.time()
+    columns = profile_columns(columns_df)
+    source, source_params = _source(schema, table, sample_percent)
+
+    if columns:
+        result = fetch_dataframe(connection, build_profile_query(columns, source),
+                                 source_params + [MAX_FREQUENCY_CELLS // len(columns), top_values])
+        summary = result.iloc[0]
+        frequencies = result.dropna(subset=['col_index'])
+    else:
+        summary = fetch_dataframe(connection, build_summary_query(columns, source), source_params).iloc[0]
+        frequencies = pd.DataFrame(columns=['col_index', 'value', 'frequency', 'distinct_count', 'singleton_count'])
+    frequencies_skipped = bool(columns) and summary['total_count'] > MAX_FREQUENCY_CELLS // len(columns)
+
+    # Sampled counts are scaled up to the whole table
+    scale = 100.0 / sample_percent if sample_percent else 1.0
+    total_count = float(summary['total_count']) * scale
+
+    records = []
+    top_frames = []
+    for i, (column_name, data_type, kind) in enumerate(columns):
+        column_values = frequencies[frequencies['col_index'] == i]
+        sample_non_null = float(summary[f"c{i}_non_null"])
+        non_null = sample_non_null * scale
+
+        if frequencies_skipped:
+            distinct = float('nan')
+        elif column_values.empty:
+            distinct = 0.0
+        else:
+            sample_distinct = float(column_values['distinct_count'].iloc[0])
+            singletons = float(column_values['singleton_count'].iloc[0])
+            distinct = sample_distinct if sample_percent is None else estimate_distinct(
+                sample_non_null, sample_distinct, singletons, non_null
+            )
+
+        record = {
+            'column_name': column_name,
+            'data_type': data_type,
+            'kind': kind,
+            'non_null_count': non_null,
+            'null_count': total_count - non_null,
+            'distinct_count': distinct
+        }
+        if kind == KIND_NUMERIC:
+            for name in ('min', 'max', 'avg', 'stddev'):
+                record[f"{name}_value"] = summary[f"c{i}_{name}"]
+        else:
+            for name in ('avg_length', 'min_length', 'max_length'):
+                record[name] = summary[f"c{i}_{name}"]
+        records.append(record)
+
+        top = column_values[['value', 'frequency']].copy()
+        top['frequency'] = top['frequency'] * scale
+        top.insert(0, 'column_name', column_name)
+        top_frames.append(top)
+
+    return TableProfile(
+        schema=schema,
+        table=table,
+        sample_percent=sample_percent,
+        total_count=total_count,
+        columns=pd.DataFrame(records),
+        top_values=pd.concat(top_frames, ignore_index=True) if top_frames else
+        pd.DataFrame(columns=['column_name', 'value', 'frequency']),
+        elapsed=time.time() - start,
+        frequencies_skipped=frequencies_skipped
+    )
+
+
+_profiles: Dict[tuple, TableProfile] = {}
+_upgrades: Dict[tuple, Future] = {}
+_profiles_lock = threading.Lock()
+
+
+def _profile_key(db_conn, schema: str, table: str) -> tuple:
+    return db_conn.cache_key + (schema, table)
+
+
+def get_cached_profile(db_conn, schema: str, table: str) -> Optional[TableProfile]:
+    with _profiles_lock:
+        return _profiles.get(_profile_key(db_conn, schema, table))
+
+
+def run_profile(db_conn, schema: str, table: str, columns_df: pd.DataFrame,
+                sample_percent: Optional[float] = None) -> TableProfile:
+    """Profile on the session's connection and cache the result for every session"""
+    profile = profile_table(db_conn.connection, schema, table, columns_df, sample_percent)
+    with _profiles_lock:
+        _profiles[_profile_key(db_conn, schema, table)] = profile
+    return profile
+
+
+def _run_exact_upgrade(pool, key: tuple, schema: str, table: str, columns_df: pd.DataFrame) -> TableProfile:
+    with pool.connection() as conn:
+        profile = profile_table(conn, schema, table, columns_df)
+    with _profiles_lock:
+        _profiles[key] = profile
+    return profile
+
+
+def start_exact_upgrade(db_conn, schema: str, table: str, columns_df: pd.DataFrame) -> Future:
+    """Replace a sampled profile with an exact one computed on a pooled connection"""
+    key = _profile_key(db_conn, schema, table)
+    with _profiles_lock:
+        running = _upgrades.get(key)
+        if running is not None and not running.done():
+            return running
+        future = _upgrade_executor.submit(_run_exact_upgrade, db_conn.get_pool(), key, schema, table, columns_df)
+        _upgrades[key] = future
+        return future
+
+
+def get_exact_upgrade(db_conn, schema: str, table: str) -> Optional[Future]:
+    with _profiles_lock:
+        return _upgrades.get(_profile_key(db_conn, schema, table))
@@ -46,6 +46,52 @@ DASHBOARD_QUERIES = {
         SELECT COUNT(*) as count
         FROM information_schema.sequences
         WHERE sequence_schema NOT IN ('information_schema', 'pg_catalog')
+    """,
+    
+    # All overview counters in one round trip, straight from pg_catalog
+    'overview': """
+        WITH user_namespaces AS (
+            SELECT oid
+            FROM pg_namespace
+            WHERE nspname NOT IN ('information_schema', 'pg_catalog')
+            AND nspname !~ '^pg_(toast|temp_)'
+        ),
+        relation_counts AS (
+            SELECT
+                COUNT(*) FILTER (WHERE c.relkind IN ('r', 'p', 'f')) as table_count,
+                COUNT(*) FILTER (WHERE c.relkind = 'v') as view_count,
+                COUNT(*) FILTER (WHERE c.relkind = 'm') as materialized_view_count,
+                COUNT(*) FILTER (WHERE c.relkind IN ('i', 'I')) as index_count,
+                COUNT(*) FILTER (WHERE c.relkind = 'S') as sequence_count
+            FROM pg_class c
+            WHERE c.relnamespace IN (SELECT oid FROM user_namespaces)
+        ),
+        routine_counts AS (
+            SELECT
+                COUNT(*) FILTER (WHERE p.prokind = 'f') as function_count,
+                COUNT(*) FILTER (WHERE p.prokind = 'p') as procedure_count
+            FROM pg_proc p
+            WHERE p.pronamespace IN (SELECT oid FROM user_namespaces)
+        )
+        SELECT
+            r.table_count,
+            r.view_count,
+            r.materialized_view_count,
+            r.index_count,
+            r.sequence_count,
+            f.function_count,
+            f.procedure_count,
+            (SELECT COUNT(*)
+             FROM pg_trigger t
+             JOIN pg_class c ON c.oid = t.tgrelid
+             WHERE NOT t.tgisinternal
+             AND c.relnamespace IN (SELECT oid FROM user_namespaces)) as trigger_count,
+            pg_database_size(current_database()) as database_size,
+            (SELECT COUNT(*)
+             FROM pg_stat_activity
+             WHERE datname = current_database()) as active_connections
+        FROM relation_counts r
+        CROSS JOIN routine_counts f
     """
 }
 
@@ -95,34 +141,97 @@ TABLE_QUERIES = {
             constraint_type
         FROM information_schema.table_constraints 
         WHERE table_schema = %s AND table_name = %s
+    """,
+    
+    # Live-tuple counter from the statistics collector, falling back to the
+    # planner's reltuples when stats were reset or never gathered. Partitioned
+    # tables hold no rows themselves, so they get the sum of their leaves.
+    'estimated_row_counts': """
+        WITH estimates AS (
+            SELECT 
+                c.oid,
+                n.nspname as schemaname,
+                c.relname as tablename,
+                c.relkind::text as relkind,
+                CASE
+                    WHEN s.n_live_tup > 0 OR c.reltuples <= 0 THEN COALESCE(s.n_live_tup, 0)
+                    ELSE c.reltuples::bigint
+                END as row_count
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+            WHERE c.relkind IN ('r', 'p', 'm', 'f')
+            AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+            AND n.nspname !~ '^pg_(toast|temp_)'
+        )
+        SELECT 
+            e.schemaname,
+            e.tablename,
+            e.relkind,
+            CASE
+                WHEN e.relkind = 'p' THEN (
+                    SELECT COALESCE(SUM(leaf.row_count), 0)::bigint
+                    FROM pg_partition_tree(e.oid) t
+                    JOIN estimates leaf ON leaf.oid = t.relid
+                    WHERE t.isleaf
+                )
+                ELSE e.row_count
+            END as row_count
+        FROM estimates e
+        ORDER BY e.schemaname, e.tablename
+    """,
+    # Heap blocks of a relation, the range ctid paging walks through
+    'relation_blocks': """
+        SELECT pg_relation_size(c.oid) / current_setting('block_size')::int as blocks
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %s AND c.relname = %s
     """
 }
 
-# Function queries
+# Function queries, by pg_proc OID so overloads stay apart
 FUNCTION_QUERIES = {
-    'all_functions': """
+    # pg_get_functiondef() rejects aggregates, which only have prosrc
+    'routine_source': """
         SELECT 
-            r.routine_schema,
-            r.routine_name,
-            r.routine_type,
-            r.data_type as return_type,
-            r.routine_definition,
-            p.prosrc as source_code
-        FROM information_schema.routines r
-        LEFT JOIN pg_proc p ON r.routine_name = p.proname
-        WHERE r.routine_schema NOT IN ('information_schema', 'pg_catalog')
-        ORDER BY r.routine_schema, r.routine_name
+            p.prosrc as source_code,
+            CASE WHEN p.prokind <> 'a' THEN pg_get_functiondef(p.oid) END as definition
+        FROM pg_proc p
+        WHERE p.oid = %s
     """,
     
-    'function_parameters': """
+    'routine_parameters': """
         SELECT 
-            parameter_name,
-            data_type,
-            parameter_mode,
-            ordinal_position
-        FROM information_schema.parameters 
-        WHERE specific_schema = %s AND specific_name = %s
-        ORDER BY ordinal_position
+            NULLIF(p.proargnames[a.position], '') as parameter_name,
+            format_type(a.type_oid, NULL) as data_type,
+            CASE COALESCE(p.proargmodes[a.position], 'i')
+                WHEN 'i' THEN 'IN' WHEN 'o' THEN 'OUT' WHEN 'b' THEN 'INOUT'
+                WHEN 'v' THEN 'VARIADIC' WHEN 't' THEN 'TABLE'
+            END as parameter_mode,
+            a.position as ordinal_position
+        FROM pg_proc p
+        CROSS JOIN LATERAL unnest(COALESCE(p.proallargtypes, p.proargtypes::oid[]))
+            WITH ORDINALITY as a(type_oid, position)
+        WHERE p.oid = %s
+        ORDER BY a.position
+    """,
+    
+    # Empty until track_functions is 'pl' or 'all' and the routine has been called
+    'function_stats': """
+        SELECT 
+            calls,
+            total_time,
+            self_time
+        FROM pg_stat_user_functions
+        WHERE funcid = %s
+    """,
+    
+    'track_functions': """
+        SELECT current_setting('track_functions') as track_functions
+    """,
+    # PostgreSQL 15+: publish this backend's statistics as soon as it is idle
+    'force_stats_flush': """
+        SELECT pg_stat_force_next_flush()
     """
 }
 
@@ -244,7 +353,7 @@ MONITORING_QUERIES = {
     'table_stats': """
         SELECT 
             schemaname,
-            tablename,
+            relname as tablename,
             n_tup_ins as inserts,
             n_tup_upd as updates,
             n_tup_del as deletes,
@@ -255,17 +364,701 @@ MONITORING_QUERIES = {
             last_analyze,
             last_autoanalyze
         FROM pg_stat_user_tables
-        ORDER BY schemaname, tablename
+        ORDER BY schemaname, relname
     """,
     
     'index_usage': """
         SELECT 
             schemaname,
-            tablename,
-            indexname,
+            relname as tablename,
+            indexrelname as indexname,
             idx_tup_read as tuples_read,
             idx_tup_fetch as tuples_fetched
         FROM pg_stat_user_indexes
-        ORDER BY schemaname, tablename, indexname
+        ORDER BY schemaname, relname, indexrelname
+    """
+}
+
+# Metrics sampler: one row of cumulative counters and gauges per sample
+SAMPLER_QUERIES = {
+    'sample': """
+        SELECT 
+            extract(epoch from clock_timestamp()) as sampled_at,
+            coalesce(extract(epoch from d.stats_reset), 0) as stats_reset,
+            d.xact_commit,
+            d.xact_rollback,
+            d.blks_read,
+            d.blks_hit,
+            d.tup_returned,
+            d.tup_fetched,
+            d.tup_inserted,
+            d.tup_updated,
+            d.tup_deleted,
+            d.deadlocks,
+            d.temp_bytes,
+            t.seq_scan,
+            t.seq_tup_read,
+            t.idx_scan,
+            t.live_tuples,
+            t.dead_tuples,
+            a.backends,
+            a.active,
+            a.idle_in_transaction,
+            a.waiting
+        FROM pg_stat_database d
+        CROSS JOIN (
+            SELECT 
+                COALESCE(SUM(seq_scan), 0) as seq_scan,
+                COALESCE(SUM(seq_tup_read), 0) as seq_tup_read,
+                COALESCE(SUM(idx_scan), 0) as idx_scan,
+                COALESCE(SUM(n_live_tup), 0) as live_tuples,
+                COALESCE(SUM(n_dead_tup), 0) as dead_tuples
+            FROM pg_stat_user_tables
+        ) t
+        CROSS JOIN (
+            SELECT 
+                COUNT(*) as backends,
+                COUNT(*) FILTER (WHERE state = 'active') as active,
+                COUNT(*) FILTER (WHERE state IN ('idle in transaction', 'idle in transaction (aborted)')) as idle_in_transaction,
+                COUNT(*) FILTER (WHERE wait_event_type = 'Lock') as waiting
+            FROM pg_stat_activity
+            WHERE datname = current_database()
+            AND pid <> pg_backend_pid()
+        ) a
+        WHERE d.datname = current_database()
+    """
+}
+
+# Catalog snapshot queries (pg_catalog only, one row set per object kind)
+CATALOG_QUERIES = {
+    'tables': """
+        SELECT 
+            c.oid as table_oid,
+            n.nspname as table_schema,
+            c.relname as table_name,
+            CASE c.relkind
+                WHEN 'v' THEN 'VIEW'
+                WHEN 'm' THEN 'MATERIALIZED VIEW'
+                WHEN 'f' THEN 'FOREIGN TABLE'
+                ELSE 'BASE TABLE'
+            END as table_type,
+            c.relkind::text as relkind,
+            s.total_bytes,
+            pg_size_pretty(s.total_bytes) as size
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        CROSS JOIN LATERAL (SELECT pg_total_relation_size(c.oid) as total_bytes) s
+        WHERE c.relkind IN ('r', 'p', 'v', 'm', 'f')
+        AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+        AND n.nspname !~ '^pg_(toast|temp_)'
+        ORDER BY n.nspname, c.relname
+    """,
+    
+    'columns': """
+        SELECT 
+            n.nspname as table_schema,
+            c.relname as table_name,
+            a.attname as column_name,
+            format_type(a.atttypid, NULL) as data_type,
+            format_type(a.atttypid, a.atttypmod) as full_data_type,
+            CASE WHEN a.atttypid IN (1042, 1043) AND a.atttypmod > 0
+                THEN a.atttypmod - 4
+            END as character_maximum_length,
+            CASE WHEN a.atttypid = 1700 AND a.atttypmod > 0
+                THEN ((a.atttypmod - 4) >> 16) & 65535
+            END as numeric_precision,
+            CASE WHEN a.atttypid = 1700 AND a.atttypmod > 0
+                THEN (a.atttypmod - 4) & 65535
+            END as numeric_scale,
+            CASE WHEN a.attnotnull THEN 'NO' ELSE 'YES' END as is_nullable,
+            pg_get_expr(d.adbin, d.adrelid) as column_default,
+            a.attnum as ordinal_position
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+        WHERE a.attnum > 0
+        AND NOT a.attisdropped
+        AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+        AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+        AND n.nspname !~ '^pg_(toast|temp_)'
+        ORDER BY n.nspname, c.relname, a.attnum
+    """,
+    
+    'indexes': """
+        SELECT 
+            n.nspname as table_schema,
+            c.relname as table_name,
+            ic.relname as indexname,
+            pg_get_indexdef(i.indexrelid) as indexdef,
+            i.indisunique as is_unique,
+            i.indisprimary as is_primary,
+            i.indkey::text as indkey
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indrelid
+        JOIN pg_class ic ON ic.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname NOT IN ('information_schema', 'pg_catalog')
+        AND n.nspname !~ '^pg_(toast|temp_)'
+        ORDER BY n.nspname, c.relname, ic.relname
+    """,
+    
+    'constraints': """
+        SELECT 
+            n.nspname as table_schema,
+            c.relname as table_name,
+            con.conname as constraint_name,
+            CASE con.contype
+                WHEN 'p' THEN 'PRIMARY KEY'
+                WHEN 'f' THEN 'FOREIGN KEY'
+                WHEN 'u' THEN 'UNIQUE'
+                WHEN 'c' THEN 'CHECK'
+                WHEN 'x' THEN 'EXCLUDE'
+                ELSE con.contype::text
+            END as constraint_type,
+            pg_get_constraintdef(con.oid) as definition
+        FROM pg_constraint con
+        JOIN pg_class c ON c.oid = con.conrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname NOT IN ('information_schema', 'pg_catalog')
+        AND n.nspname !~ '^pg_(toast|temp_)'
+        ORDER BY n.nspname, c.relname, con.conname
+    """,
+    
+    # One row per relationship: a foreign key with its columns paired in key
+    # order, or a view (or materialized view) reading a relation. View rules
+    # record a pg_depend row per column used, so those are collapsed first.
+    # Foreign keys on or to partitioned tables are cloned onto every partition
+    # (conparentid points at the original); only the original is an edge.
+    'relationships': """
+        SELECT 
+            'foreign_key' as kind,
+            con.conrelid::bigint as source_oid,
+            sn.nspname as source_schema,
+            sc.relname as source_table,
+            sc.relkind::text as source_relkind,
+            con.confrelid::bigint as target_oid,
+            tn.nspname as target_schema,
+            tc.relname as target_table,
+            tc.relkind::text as target_relkind,
+            con.conname as constraint_name,
+            con.oid::bigint as constraint_oid,
+            ARRAY(
+                SELECT a.attname::text
+                FROM unnest(con.conkey) WITH ORDINALITY as k(attnum, position)
+                JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+                ORDER BY k.position
+            ) as source_columns,
+            ARRAY(
+                SELECT a.attname::text
+                FROM unnest(con.confkey) WITH ORDINALITY as k(attnum, position)
+                JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.attnum
+                ORDER BY k.position
+            ) as target_columns,
+            CASE con.confupdtype
+                WHEN 'a' THEN 'NO ACTION' WHEN 'r' THEN 'RESTRICT' WHEN 'c' THEN 'CASCADE'
+                WHEN 'n' THEN 'SET NULL' WHEN 'd' THEN 'SET DEFAULT'
+            END as update_rule,
+            CASE con.confdeltype
+                WHEN 'a' THEN 'NO ACTION' WHEN 'r' THEN 'RESTRICT' WHEN 'c' THEN 'CASCADE'
+                WHEN 'n' THEN 'SET NULL' WHEN 'd' THEN 'SET DEFAULT'
+            END as delete_rule,
+            NULL::text as definition
+        FROM pg_constraint con
+        JOIN pg_class sc ON sc.oid = con.conrelid
+        JOIN pg_namespace sn ON sn.oid = sc.relnamespace
+        JOIN pg_class tc ON tc.oid = con.confrelid
+        JOIN pg_namespace tn ON tn.oid = tc.relnamespace
+        WHERE con.contype = 'f'
+        AND con.conparentid = 0
+        AND sn.nspname NOT IN ('information_schema', 'pg_catalog')
+        
+        UNION ALL
+        
+        SELECT 
+            'view' as kind,
+            v.oid::bigint,
+            vn.nspname,
+            v.relname,
+            v.relkind::text,
+            t.oid::bigint,
+            tn.nspname,
+            t.relname,
+            t.relkind::text,
+            NULL,
+            NULL,
+            NULL,
+            NULL,
+            NULL,
+            NULL,
+            pg_get_viewdef(v.oid)
+        FROM (
+            SELECT DISTINCT r.ev_class as view_oid, d.refobjid as target_oid
+            FROM pg_depend d
+            JOIN pg_rewrite r ON r.oid = d.objid
+            WHERE d.classid = 'pg_rewrite'::regclass
+            AND d.refclassid = 'pg_class'::regclass
+            AND d.deptype = 'n'
+            AND d.refobjid <> r.ev_class
+        ) dep
+        JOIN pg_class v ON v.oid = dep.view_oid
+        JOIN pg_namespace vn ON vn.oid = v.relnamespace
+        JOIN pg_class t ON t.oid = dep.target_oid
+        JOIN pg_namespace tn ON tn.oid = t.relnamespace
+        WHERE vn.nspname NOT IN ('information_schema', 'pg_catalog')
+        AND vn.nspname !~ '^pg_(toast|temp_)'
+        ORDER BY 1, 3, 4, 10, 7, 8
+    """,
+    
+    # Signatures only; routine bodies are fetched on demand. xmin changes when
+    # CREATE OR REPLACE rewrites the row, so it versions the cached bodies.
+    'routines': """
+        SELECT 
+            p.oid as routine_oid,
+            n.nspname as routine_schema,
+            p.proname as routine_name,
+            CASE p.prokind
+                WHEN 'p' THEN 'PROCEDURE'
+                WHEN 'a' THEN 'AGGREGATE'
+                WHEN 'w' THEN 'WINDOW'
+                ELSE 'FUNCTION'
+            END as routine_type,
+            pg_get_function_identity_arguments(p.oid) as arguments,
+            pg_get_function_result(p.oid) as return_type,
+            l.lanname as language,
+            e.extname as extension,
+            p.xmin::text::bigint as routine_version
+        FROM pg_proc p
+        JOIN pg_namespace n ON n.oid = p.pronamespace
+        JOIN pg_language l ON l.oid = p.prolang
+        LEFT JOIN pg_depend d ON d.classid = 'pg_proc'::regclass AND d.objid = p.oid AND d.deptype = 'e'
+        LEFT JOIN pg_extension e ON e.oid = d.refobjid
+        WHERE n.nspname NOT IN ('information_schema', 'pg_catalog')
+        AND n.nspname !~ '^pg_(toast|temp_)'
+        ORDER BY n.nspname, p.proname, p.oid
+    """,
+    
+    # Same shape as TRIGGER_QUERIES['all_triggers']: one row per trigger event
+    'triggers': """
+        SELECT 
+            n.nspname as trigger_schema,
+            t.tgname as trigger_name,
+            e.event as event_manipulation,
+            c.relname as event_object_table,
+            CASE
+                WHEN t.tgtype & 2 = 2 THEN 'BEFORE'
+                WHEN t.tgtype & 64 = 64 THEN 'INSTEAD OF'
+                ELSE 'AFTER'
+            END as action_timing,
+            pg_get_triggerdef(t.oid) as action_statement,
+            CASE WHEN t.tgtype & 1 = 1 THEN 'ROW' ELSE 'STATEMENT' END as action_orientation,
+            t.tgenabled as enabled,
+            fn.nspname || '.' || p.proname as function_name
+        FROM pg_trigger t
+        JOIN pg_class c ON c.oid = t.tgrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_proc p ON p.oid = t.tgfoid
+        JOIN pg_namespace fn ON fn.oid = p.pronamespace
+        CROSS JOIN LATERAL (
+            VALUES ('INSERT', 4), ('DELETE', 8), ('UPDATE', 16), ('TRUNCATE', 32)
+        ) as e(event, bit)
+        WHERE NOT t.tgisinternal
+        AND t.tgtype & e.bit = e.bit
+        AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+        ORDER BY n.nspname, t.tgname, e.event
+    """
+}
+
+# Event triggers that publish DDL on the 'pgmanage_ddl' channel (database.ddl_feed.DDL_CHANNEL)
+DDL_FEED_QUERIES = {
+    'install': """
+        CREATE OR REPLACE FUNCTION public.pgmanage_notify_ddl()
+        RETURNS event_trigger
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+            cmd record;
+        BEGIN
+            IF TG_EVENT = 'sql_drop' THEN
+                FOR cmd IN SELECT object_type, schema_name, object_identity FROM pg_event_trigger_dropped_objects()
+                LOOP
+                    PERFORM pg_notify('pgmanage_ddl', json_build_object(
+                        'command_tag', TG_TAG,
+                        'object_type', cmd.object_type,
+                        'schema_name', cmd.schema_name,
+                        'object_identity', cmd.object_identity
+                    )::text);
+                END LOOP;
+            ELSE
+                FOR cmd IN SELECT command_tag, object_type, schema_name, object_identity FROM pg_event_trigger_ddl_commands()
+                LOOP
+                    PERFORM pg_notify('pgmanage_ddl', json_build_object(
+                        'command_tag', cmd.command_tag,
+                        'object_type', cmd.object_type,
+                        'schema_name', cmd.schema_name,
+                        'object_identity', cmd.object_identity
+                    )::text);
+                END LOOP;
+            END IF;
+        END;
+        $$;
+        
+        DROP EVENT TRIGGER IF EXISTS pgmanage_ddl_command_end;
+        CREATE EVENT TRIGGER pgmanage_ddl_command_end
+            ON ddl_command_end
+            EXECUTE FUNCTION public.pgmanage_notify_ddl();
+        
+        -- DROP reports nothing from pg_event_trigger_ddl_commands()
+        DROP EVENT TRIGGER IF EXISTS pgmanage_sql_drop;
+        CREATE EVENT TRIGGER pgmanage_sql_drop
+            ON sql_drop
+            EXECUTE FUNCTION public.pgmanage_notify_ddl();
+    """,
+    
+    'uninstall': """
+        DROP EVENT TRIGGER IF EXISTS pgmanage_ddl_command_end;
+        DROP EVENT TRIGGER IF EXISTS pgmanage_sql_drop;
+        DROP FUNCTION IF EXISTS public.pgmanage_notify_ddl();
+    """,
+    
+    'status': """
+        SELECT 
+            COUNT(*) = 2 as installed,
+            COALESCE(bool_and(evtenabled <> 'D'), false) as enabled
+        FROM pg_event_trigger
+        WHERE evtname IN ('pgmanage_ddl_command_end', 'pgmanage_sql_drop')
+    """
+}
+
+# Planner statistics for zero-scan column profiles; parameters are (schema, table)
+COLUMN_STATS_QUERIES = {
+    'pg_stats': """
+        SELECT 
+            s.attname as column_name,
+            s.null_frac,
+            s.n_distinct,
+            s.avg_width,
+            s.correlation,
+            -- Statistics of array columns are nested arrays that don't cast to text[]
+            CASE WHEN left(s.most_common_vals::text, 2) <> '{{'
+                THEN s.most_common_vals::text::text[]
+            END as most_common_vals,
+            s.most_common_freqs,
+            CASE WHEN left(s.histogram_bounds::text, 2) <> '{{'
+                THEN s.histogram_bounds::text::text[]
+            END as histogram_bounds
+        FROM pg_stats s
+        JOIN pg_namespace n ON n.nspname = s.schemaname
+        JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = s.tablename
+        WHERE s.schemaname = %s
+        AND s.tablename = %s
+        -- ANALYZE keeps a partitioned table's statistics only as inherited rows
+        AND s.inherited = (c.relkind = 'p')
+    """,
+    
+    'freshness': """
+        SELECT 
+            CASE
+                WHEN c.relkind = 'p' THEN (
+                    SELECT SUM(GREATEST(leaf.reltuples, 0))
+                    FROM pg_partition_tree(c.oid) t
+                    JOIN pg_class leaf ON leaf.oid = t.relid
+                    WHERE t.isleaf
+                )
+                ELSE c.reltuples
+            END as reltuples,
+            st.n_live_tup,
+            st.n_mod_since_analyze,
+            GREATEST(st.last_analyze, st.last_autoanalyze) as last_analyzed
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_stat_user_tables st ON st.relid = c.oid
+        WHERE n.nspname = %s
+        AND c.relname = %s
+    """
+}
+
+# pg_stat_statements workload; {total_time}/{mean_time}/{stddev_time} are the
+# *_exec_time columns from extension version 1.8 and *_time before that
+WORKLOAD_QUERIES = {
+    'status': """
+        SELECT 
+            EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_stat_statements') as available,
+            (SELECT extversion FROM pg_extension WHERE extname = 'pg_stat_statements') as installed_version,
+            position('pg_stat_statements' in current_setting('shared_preload_libraries')) > 0 as preloaded,
+            current_setting('server_version_num')::int as server_version_num
+    """,
+    
+    'install': "CREATE EXTENSION IF NOT EXISTS pg_stat_statements",
+    
+    'statements': """
+        SELECT 
+            pg_get_userbyid(s.userid) as username,
+            s.queryid::text as queryid,
+            s.calls,
+            s.{total_time} as total_time,
+            s.{mean_time} as mean_time,
+            s.{stddev_time} as stddev_time,
+            s.rows,
+            s.shared_blks_hit,
+            s.shared_blks_read,
+            s.shared_blks_dirtied,
+            s.shared_blks_written,
+            s.temp_blks_read,
+            s.temp_blks_written
+        FROM pg_stat_statements(false) s
+        WHERE s.dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+        AND s.queryid IS NOT NULL
+    """,
+    
+    'texts': """
+        SELECT DISTINCT ON (s.queryid)
+            s.queryid::text as queryid,
+            s.query
+        FROM pg_stat_statements(true) s
+        WHERE s.dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+        AND s.queryid::text = ANY(%s)
+        ORDER BY s.queryid
+    """
+}
+
+INDEX_ADVISOR_QUERIES = {
+    'tables': """
+        SELECT 
+            s.relid as table_oid,
+            s.schemaname as table_schema,
+            s.relname as table_name,
+            s.seq_scan,
+            s.seq_tup_read,
+            coalesce(s.idx_scan, 0) as idx_scan,
+            s.n_live_tup,
+            c.relpages,
+            pg_relation_size(s.relid) as table_bytes
+        FROM pg_stat_user_tables s
+        JOIN pg_class c ON c.oid = s.relid
+    """,
+    
+    'indexes': """
+        SELECT 
+            s.indexrelid as index_oid,
+            s.schemaname as table_schema,
+            s.relname as table_name,
+            s.indexrelname as index_name,
+            s.idx_scan,
+            pg_relation_size(s.indexrelid) as index_bytes,
+            am.amname as method,
+            i.indisunique as is_unique,
+            i.indisprimary as is_primary,
+            i.indisvalid as is_valid,
+            i.indkey::text as indkey,
+            i.indclass::text as indclass,
+            i.indnkeyatts as key_columns,
+            i.indexprs IS NOT NULL as has_expressions,
+            i.indpred IS NOT NULL as is_partial,
+            EXISTS (SELECT 1 FROM pg_constraint con WHERE con.conindid = i.indexrelid) as backs_constraint,
+            ARRAY(
+                SELECT a.attname
+                FROM unnest(i.indkey) WITH ORDINALITY k(attnum, position)
+                JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+                ORDER BY k.position
+            ) as columns,
+            pg_get_indexdef(i.indexrelid) as indexdef
+        FROM pg_stat_user_indexes s
+        JOIN pg_index i ON i.indexrelid = s.indexrelid
+        JOIN pg_class ic ON ic.oid = s.indexrelid
+        JOIN pg_am am ON am.oid = ic.relam
+    """,
+    
+    'column_stats': """
+        SELECT 
+            schemaname as table_schema,
+            tablename as table_name,
+            attname as column_name,
+            avg_width,
+            n_distinct
+        FROM pg_stats
+        WHERE schemaname NOT IN ('information_schema', 'pg_catalog')
+    """,
+    
+    'stats_since': """
+        SELECT stats_reset
+        FROM pg_stat_database
+        WHERE datname = current_database()
+    """,
+    
+    'statements': """
+        SELECT 
+            s.query,
+            sum(s.calls) as calls
+        FROM pg_stat_statements(true) s
+        WHERE s.dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+        AND s.query ~* '\\m(where|join)\\M'
+        GROUP BY s.query
+        ORDER BY calls DESC
+        LIMIT %s
+    """
+}
+
+MAINTENANCE_QUERIES = {
+    # Expected size from the average row width in pg_stats: 23-byte tuple header plus null
+    # bitmap and data, each padded to 8 bytes, a 4-byte line pointer per row, 24-byte page header
+    'table_bloat': """
+        WITH widths AS (
+            SELECT 
+                c.oid as table_oid,
+                n.nspname as table_schema,
+                c.relname as table_name,
+                greatest(c.reltuples, 0) as reltuples,
+                c.relpages,
+                current_setting('block_size')::numeric as block_size,
+                coalesce(substring(array_to_string(c.reloptions, ' ') from 'fillfactor=([0-9]+)')::int, 100) as fillfactor,
+                ceil((23 + CASE WHEN max(coalesce(s.null_frac, 0)) > 0 THEN ceil(count(*) / 8.0) ELSE 0 END) / 8.0) * 8 as header_bytes,
+                ceil(sum((1 - coalesce(s.null_frac, 0)) * coalesce(s.avg_width, 0)) / 8.0) * 8 as data_bytes,
+                count(s.attname) = count(*) as has_stats
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+            LEFT JOIN pg_stats s ON s.schemaname = n.nspname AND s.tablename = c.relname AND s.attname = a.attname
+            WHERE c.relkind IN ('r', 'm')
+            AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+            AND n.nspname !~ '^pg_(toast|temp_)'
+            GROUP BY c.oid, n.nspname, c.relname, c.reltuples, c.relpages, c.reloptions
+        )
+        SELECT 
+            table_oid,
+            table_schema,
+            table_name,
+            reltuples as estimated_rows,
+            relpages * block_size as table_bytes,
+            ceil(reltuples / greatest(floor((block_size - 24) * fillfactor / 100 / (header_bytes + data_bytes + 4)), 1))
+                * block_size as expected_bytes,
+            has_stats
+        FROM widths
+    """,
+    
+    # B-tree leaf tuples: 8-byte header and data padded to 8 bytes, a 4-byte line pointer,
+    # 24-byte page header and 16-byte special space, plus the metapage
+    'index_bloat': """
+        WITH widths AS (
+            SELECT 
+                i.indexrelid as index_oid,
+                n.nspname as table_schema,
+                t.relname as table_name,
+                ic.relname as index_name,
+                greatest(ic.reltuples, 0) as reltuples,
+                ic.relpages,
+                current_setting('block_size')::numeric as block_size,
+                coalesce(substring(array_to_string(ic.reloptions, ' ') from 'fillfactor=([0-9]+)')::int, 90) as fillfactor,
+                ceil(sum(coalesce(s.avg_width, 0)) / 8.0) * 8 as data_bytes,
+                count(s.attname) = count(*) AND i.indexprs IS NULL as has_stats
+            FROM pg_index i
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = ic.relam
+            JOIN pg_class t ON t.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = t.relnamespace
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            LEFT JOIN pg_stats s ON s.schemaname = n.nspname AND s.tablename = t.relname AND s.attname = a.attname
+            WHERE am.amname = 'btree'
+            AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+            AND n.nspname !~ '^pg_(toast|temp_)'
+            GROUP BY i.indexrelid, n.nspname, t.relname, ic.relname, ic.reltuples, ic.relpages, ic.reloptions, i.indexprs
+        )
+        SELECT 
+            index_oid,
+            table_schema,
+            table_name,
+            index_name,
+            relpages * block_size as index_bytes,
+            (ceil(reltuples / greatest(floor((block_size - 40) * fillfactor / 100 / (8 + data_bytes + 4)), 1)) + 1)
+                * block_size as expected_bytes,
+            has_stats
+        FROM widths
+    """,
+    
+    'vacuum_progress': """
+        SELECT 
+            p.pid,
+            n.nspname as table_schema,
+            c.relname as table_name,
+            p.phase,
+            p.heap_blks_total,
+            p.heap_blks_scanned,
+            p.heap_blks_vacuumed,
+            p.index_vacuum_count,
+            a.query_start,
+            a.backend_type
+        FROM pg_stat_progress_vacuum p
+        JOIN pg_stat_activity a ON a.pid = p.pid
+        LEFT JOIN pg_class c ON c.oid = p.relid
+        LEFT JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE p.datname = current_database()
+    """
+}
+
+LOCK_QUERIES = {
+    # Every backend that waits on a lock or holds one somebody waits on
+    'blocking': """
+        WITH blocked AS (
+            SELECT pid, pg_blocking_pids(pid) as blocked_by
+            FROM pg_stat_activity
+            WHERE datname = current_database()
+            AND wait_event_type = 'Lock'
+        ),
+        involved AS (
+            SELECT pid FROM blocked WHERE cardinality(blocked_by) > 0
+            UNION
+            SELECT unnest(blocked_by) FROM blocked
+        )
+        SELECT 
+            a.pid,
+            a.backend_start,
+            a.usename,
+            a.application_name,
+            a.client_addr::text as client_addr,
+            a.backend_type,
+            a.state,
+            a.wait_event_type,
+            a.wait_event,
+            extract(epoch FROM now() - a.xact_start) as xact_seconds,
+            coalesce(b.blocked_by, '{}'::int[]) as blocked_by,
+            w.locktype as wait_locktype,
+            w.mode as wait_mode,
+            w.relation_name as wait_relation,
+            extract(epoch FROM now() - coalesce(w.waitstart, a.state_change)) as wait_seconds,
+            h.held_locks,
+            a.query
+        FROM involved i
+        JOIN pg_stat_activity a ON a.pid = i.pid
+        LEFT JOIN blocked b ON b.pid = a.pid AND cardinality(b.blocked_by) > 0
+        LEFT JOIN LATERAL (
+            -- waitstart only exists from PostgreSQL 14 on
+            SELECT 
+                l.locktype,
+                l.mode,
+                l.relation::regclass::text as relation_name,
+                (to_jsonb(l) ->> 'waitstart')::timestamptz as waitstart
+            FROM pg_locks l
+            WHERE l.pid = a.pid AND NOT l.granted
+            LIMIT 1
+        ) w ON true
+        LEFT JOIN LATERAL (
+            SELECT string_agg(DISTINCT l.relation::regclass::text || ' ' || l.mode, ', ') as held_locks
+            FROM pg_locks l
+            WHERE l.pid = a.pid AND l.granted AND l.relation IS NOT NULL
+            AND l.mode <> 'AccessShareLock'
+        ) h ON true
+    """,
+    
+    # backend_start guards against signalling a new backend that reused the pid
+    'cancel': """
+        SELECT pg_cancel_backend(pid) as signalled
+        FROM pg_stat_activity
+        WHERE pid = %s AND backend_start = %s
+    """,
+    
+    'terminate': """
+        SELECT pg_terminate_backend(pid) as signalled
+        FROM pg_stat_activity
+        WHERE pid = %s AND backend_start = %s
     """
 }
@@ -0,0 +1,236 @@
+"""
+Executor queries run on a worker thread with their own pooled connection, so the
+session stays responsive and the statement can be cancelled on the server
+"""
+import re
+import threading
+import time
+import uuid
+import weakref
+from typing import Optional
+
+import pandas as pd
+import psycopg2
+import psycopg2.errors
+
+from database.results import build_dataframe, prepare_cursor
+
+KIND_PREVIEW = 'preview'
+KIND_FETCH = 'fetch'
+KIND_WRITE = 'write'
+
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_CANCELLED = 'cancelled'
+STATUS_TIMEOUT = 'timeout'
+STATUS_ERROR = 'error'
+
+# Small batches so partial results show up while a preview streams
+PREVIEW_CHUNK_SIZE = 1000
+# Jobs no session has polled for this long are cancelled (e.g. the browser tab was closed)
+ABANDONED_AFTER_SECONDS = 60
+REAPER_INTERVAL_SECONDS = 5
+
+# String literals, quoted identifiers and comments, blanked before looking for keywords
+_NON_CODE_PATTERN = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|\$(\w*)\$.*?\$\1\$", re.DOTALL
+)
+# SELECT ... FOR [NO KEY] UPDATE locks rows without modifying them
+_ROW_LOCK_PATTERN = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+)?UPDATE\b", re.IGNORECASE)
+_MODIFYING_PATTERN = re.compile(r"\b(?:INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+
+def is_data_modifying(query: str) -> bool:
+    """Whether a statement writes anywhere, e.g. a WITH whose CTE deletes rows;
+    DECLARE CURSOR rejects those, so they cannot be previewed through a named cursor"""
+    code = _ROW_LOCK_PATTERN.sub(' ', _NON_CODE_PATTERN.sub(' ', query))
+    return bool(_MODIFYING_PATTERN.search(code))
+
+
+class QueryJob:
+    """One executor statement running in the background"""
+
+    def __init__(self, pool, query: str, kind: str, preview_rows: int = 0,
+                 timeout_seconds: float = 0, chunk_size: int = PREVIEW_CHUNK_SIZE):
+        self.pool = pool
+        self.query = query
+        self.kind = kind
+        self.preview_rows = preview_rows
+        self.timeout_seconds = timeout_seconds
+        self.chunk_size = chunk_size
+
+        self.status = STATUS_RUNNING
+        self.error = None
+        self.rowcount = None
+        self.truncated = False
+        self.abandoned = False
+        self.started_at = time.time()
+        self.finished_at = None
+        self.last_seen = time.time()
+
+        self._chunks = []
+        self._chunks_lock = threading.Lock()
+        self._conn = None
+        self._cancel_requested = False
+        self._thread = threading.Thread(target=self._run, name="pgmanage-query", daemon=True)
+
+    @property
+    def running(self) -> bool:
+        return self.status == STATUS_RUNNING
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def row_count(self) -> int:
+        with self._chunks_lock:
+            return sum(len(chunk) for chunk in self._chunks)
+
+    def result(self) -> Optional[pd.DataFrame]:
+        """Rows fetched so far; complete once the job has finished"""
+        with self._chunks_lock:
+            chunks = list(self._chunks)
+        if not chunks:
+            return None
+        return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+    def start(self) -> 'QueryJob':
+        _track(self)
+        self._thread.start()
+        return self
+
+    def touch(self):
+        """Record that a session is still watching this job"""
+        self.last_seen = time.time()
+
+    def cancel(self):
+        """Ask the server to cancel the running statement"""
+        self._cancel_requested = True
+        conn = self._conn
+        if conn is not None and not conn.closed:
+            try:
+                conn.cancel()
+            except psycopg2.Error:
+                pass
+
+    def _add_chunk(self, chunk: pd.DataFrame):
+        with self._chunks_lock:
+            self._chunks.append(chunk)
+
+    def _run(self):
+        try:
+            conn = self.pool.getconn()
+        except Exception as e:
+            self._finish(STATUS_ERROR, str(e))
+            return
+
+        self._conn = conn
+        try:
+            cursor = conn.cursor()
+            if self.timeout_seconds:
+                # Ends with the transaction, so the pooled connection keeps its default
+                cursor.execute("SET LOCAL statement_timeout = %s", (int(self.timeout_seconds * 1000),))
+            cursor.close()
+
+            if self._cancel_requested:
+                raise psycopg2.errors.QueryCanceled("canceling statement due to user request")
+
+            if self.kind == KIND_PREVIEW:
+                self._run_preview(conn)
+            elif self.kind == KIND_FETCH:
+                self._run_fetch(conn)
+            else:
+                self._run_write(conn)
+            self._finish(STATUS_DONE)
+
+        except psycopg2.errors.QueryCanceled as e:
+            self._finish(STATUS_CANCELLED if self._cancel_requested else STATUS_TIMEOUT, str(e).strip())
+        except Exception as e:
+            self._finish(STATUS_ERROR, str(e).strip())
+        finally:
+            self._conn = None
+            self.pool.putconn(conn)
+
+    def _run_preview(self, conn):
+        # Named cursors keep the result on the server and fetch it in batches
+        cursor = conn.cursor(name=f"pgmanage_job_{uuid.uuid4().hex}")
+        prepare_cursor(cursor)
+        try:
+            cursor.execute(self.query)
+            fetched = 0
+            while not self._cancel_requested:
+                wanted = min(self.chunk_size, self.preview_rows - fetched + 1)
+                rows = cursor.fetchmany(wanted)
+                if fetched + len(rows) > self.preview_rows:
+                    # One row past the preview means there is more to export
+                    rows = rows[:self.preview_rows - fetched]
+                    self.truncated = True
+                if rows or fetched == 0:
+                    self._add_chunk(build_dataframe(rows, cursor.description))
+                fetched += len(rows)
+                if self.truncated or len(rows) < wanted:
+                    break
+            if self._cancel_requested:
+                raise psycopg2.errors.QueryCanceled("canceling statement due to user request")
+        finally:
+            cursor.close()
+
+    def _run_fetch(self, conn):
+        cursor = conn.cursor()
+        prepare_cursor(cursor)
+        try:
+            cursor.execute(self.query)
+            if cursor.description:
+                self._add_chunk(build_dataframe(cursor.fetchall(), cursor.description))
+        finally:
+            cursor.close()
+
+    def _run_write(self, conn):
+        cursor = conn.cursor()
+        prepare_cursor(cursor)
+        try:
+            cursor.execute(self.query)
+            self.rowcount = cursor.rowcount if cursor.rowcount >= 0 else None
+            # RETURNING clauses and data-modifying WITH statements return rows too
+            if cursor.description:
+                self._add_chunk(build_dataframe(cursor.fetchall(), cursor.description))
+            conn.commit()
+        finally:
+            cursor.close()
+
+    def _finish(self, status: str, error: Optional[str] = None):
+        self.error = error
+        self.finished_at = time.time()
+        self.status = status
+
+
+_jobs = weakref.WeakSet()
+_jobs_lock = threading.Lock()
+_reaper = None
+
+
+def _reap_abandoned():
+    while True:
+        time.sleep(REAPER_INTERVAL_SECONDS)
+        now = time.time()
+        with _jobs_lock:
+            jobs = list(_jobs)
+        for job in jobs:
+            if job.running and now - job.last_seen > ABANDONED_AFTER_SECONDS:
+                job.abandoned = True
+                job.cancel()
+
+
+def _track(job: QueryJob):
+    global _reaper
+    with _jobs_lock:
+        _jobs.add(job)
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap_abandoned, name="pgmanage-query-reaper", daemon=True)
+            _reaper.start()
+
+
+def start_query_job(db_conn, query: str, kind: str, preview_rows: int = 0, timeout_seconds: float = 0) -> QueryJob:
+    """Run a statement in the background on a connection from the session's pool"""
+    return QueryJob(db_conn.get_pool(), query, kind, preview_rows, timeout_seconds).start()
@@ -0,0 +1,167 @@
+"""
+Relationship graph of one database: foreign keys from pg_constraint and the
+relations each view reads from pg_depend, held as adjacency lists keyed by
+relation OID so neighbours are found in O(degree)
+"""
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+FOREIGN_KEY = 'foreign_key'
+VIEW = 'view'
+
+FOREIGN_KEY_COLUMNS = [
+    'source_schema', 'source_table', 'source_column', 'target_schema', 'target_table', 'target_column',
+    'constraint_name', 'position', 'update_rule', 'delete_rule'
+]
+
+
+@dataclass(frozen=True)
+class Relation:
+    oid: int
+    schema: str
+    name: str
+    relkind: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.schema}.{self.name}"
+
+
+@dataclass(frozen=True)
+class Relationship:
+    """A foreign key from source to target, or the view `source` reading `target`"""
+    kind: str
+    source: int
+    target: int
+    constraint_name: Optional[str] = None
+    source_columns: Tuple[str, ...] = ()
+    target_columns: Tuple[str, ...] = ()
+    update_rule: Optional[str] = None
+    delete_rule: Optional[str] = None
+
+
+def _columns(value) -> Tuple[str, ...]:
+    return tuple(value) if isinstance(value, (list, tuple)) else ()
+
+
+class RelationshipGraph:
+    """Foreign keys and view dependencies with outgoing and incoming edges per relation"""
+
+    def __init__(self, relationships: pd.DataFrame):
+        self.relations: Dict[int, Relation] = {}
+        self.view_definitions: Dict[int, str] = {}
+        self._outgoing: Dict[int, List[Relationship]] = defaultdict(list)
+        self._incoming: Dict[int, List[Relationship]] = defaultdict(list)
+
+        for row in relationships.itertuples(index=False):
+            source, target = int(row.source_oid), int(row.target_oid)
+            self.relations.setdefault(source, Relation(source, row.source_schema, row.source_table, row.source_relkind))
+            self.relations.setdefault(target, Relation(target, row.target_schema, row.target_table, row.target_relkind))
+
+            if row.kind == VIEW:
+                edge = Relationship(VIEW, source, target)
+                if isinstance(row.definition, str):
+                    self.view_definitions[source] = row.definition
+            else:
+                edge = Relationship(
+                    FOREIGN_KEY, source, target, row.constraint_name,
+                    _columns(row.source_columns), _columns(row.target_columns), row.update_rule, row.delete_rule
+                )
+            self._outgoing[source].append(edge)
+            self._incoming[target].append(edge)
+
+        self._by_name = {(relation.schema, relation.name): oid for oid, relation in self.relations.items()}
+
+    def find(self, schema: str, name: str) -> Optional[int]:
+        return self._by_name.get((schema, name))
+
+    def outgoing(self, oid: int, kind: Optional[str] = None) -> List[Relationship]:
+        return [edge for edge in self._outgoing.get(oid, ()) if kind is None or edge.kind == kind]
+
+    def incoming(self, oid: int, kind: Optional[str] = None) -> List[Relationship]:
+        return [edge for edge in self._incoming.get(oid, ()) if kind is None or edge.kind == kind]
+
+    def references(self, oid: int) -> List[Relationship]:
+        """Foreign keys of this table to its parents"""
+        return self.outgoing(oid, FOREIGN_KEY)
+
+    def referenced_by(self, oid: int) -> List[Relationship]:
+        """Foreign keys of child tables to this one"""
+        return self.incoming(oid, FOREIGN_KEY)
+
+    def dependent_views(self, oid: int) -> List[Relationship]:
+        return self.incoming(oid, VIEW)
+
+    def foreign_keys(self) -> Iterable[Relationship]:
+        for edges in self._outgoing.values():
+            for edge in edges:
+                if edge.kind == FOREIGN_KEY:
+                    yield edge
+
+    def expand_view(self, oid: int) -> Tuple[Set[int], Set[int]]:
+        """Views reached from a view through the views it reads, and the other relations underneath them"""
+        views, relations = set(), set()
+        pending = [oid]
+        while pending:
+            current = pending.pop()
+            if current in views:
+                continue
+            views.add(current)
+            for edge in self.outgoing(current, VIEW):
+                if edge.target in self.relations and self.relations[edge.target].relkind == 'v':
+                    pending.append(edge.target)
+                else:
+                    relations.add(edge.target)
+        return views, relations
+
+    def impact(self, oid: int, max_depth: Optional[int] = None) -> pd.DataFrame:
+        """Relations affected by changing a relation: child tables through foreign keys and
+        views reading it, transitively, each at its shortest distance
+
+        `via` is the relationship that reached it from `parent`; for foreign keys the
+        delete rule tells whether deleting parent rows cascades into the child.
+        """
+        columns = ['depth', 'relation', 'relkind', 'via', 'parent', 'constraint_name', 'columns', 'delete_rule']
+        records = []
+        seen = {oid}
+        queue = deque([(oid, 0)])
+        while queue:
+            current, depth = queue.popleft()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for edge in self._incoming.get(current, ()):
+                if edge.source in seen:
+                    continue
+                seen.add(edge.source)
+                queue.append((edge.source, depth + 1))
+                relation = self.relations[edge.source]
+                records.append({
+                    'depth': depth + 1,
+                    'relation': relation.label,
+                    'relkind': relation.relkind,
+                    'via': 'foreign key' if edge.kind == FOREIGN_KEY else 'view',
+                    'parent': self.relations[current].label,
+                    'constraint_name': edge.constraint_name,
+                    'columns': ', '.join(edge.source_columns) or None,
+                    'delete_rule': edge.delete_rule
+                })
+        return pd.DataFrame(records, columns=columns)
+
+
+def foreign_key_columns(relationships: pd.DataFrame) -> pd.DataFrame:
+    """One row per foreign key column pair, in key order"""
+    foreign_keys = relationships[relationships['kind'] == FOREIGN_KEY]
+    if foreign_keys.empty:
+        return pd.DataFrame(columns=FOREIGN_KEY_COLUMNS)
+
+    foreign_keys = foreign_keys.assign(
+        pairs=[list(zip(_columns(source), _columns(target)))
+               for source, target in zip(foreign_keys['source_columns'], foreign_keys['target_columns'])]
+    ).explode('pairs').dropna(subset=['pairs'])
+    foreign_keys['source_column'] = foreign_keys['pairs'].str[0]
+    foreign_keys['target_column'] = foreign_keys['pairs'].str[1]
+    foreign_keys['position'] = foreign_keys.groupby('constraint_oid').cumcount() + 1
+    return foreign_keys[FOREIGN_KEY_COLUMNS].reset_index(drop=True)
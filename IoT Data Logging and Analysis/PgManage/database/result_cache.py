@@ -0,0 +1,430 @@
+"""
+Cross-session cache of read-only query results, validated by a data-version token
+built from pg_stat_user_tables modification counters of the referenced tables
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from database.catalog import get_catalog
+
+RESULT_CACHE_ENABLED = os.getenv("PGMANAGE_RESULT_CACHE", "1") != "0"
+RESULT_CACHE_BUDGET_BYTES = int(float(os.getenv("PGMANAGE_RESULT_CACHE_MB", "256")) * 1024 * 1024)
+# Upper bound on entry age in case counters don't move (track_counts off, stats lag)
+RESULT_CACHE_MAX_AGE = float(os.getenv("PGMANAGE_RESULT_CACHE_MAX_AGE", "300"))
+# A single result may use at most this share of the budget
+MAX_ENTRY_SHARE = 0.25
+
+# Counters plus filenode, which changes on TRUNCATE and table rewrites. Rows
+# written through a partitioned or inheritance parent are counted on its
+# partitions and children, so every descendant is part of the version; the
+# set of descendants changes on ATTACH/DETACH PARTITION as well.
+DATA_VERSION_QUERY = """
+    WITH RECURSIVE tree(relid) AS (
+        SELECT unnest(%s::oid[])
+        UNION
+        SELECT i.inhrelid
+        FROM pg_inherits i
+        JOIN tree t ON i.inhparent = t.relid
+    )
+    SELECT
+        s.relid::bigint,
+        pg_relation_filenode(s.relid),
+        s.n_tup_ins,
+        s.n_tup_upd,
+        s.n_tup_del
+    FROM pg_stat_user_tables s
+    WHERE s.relid IN (SELECT relid FROM tree)
+    ORDER BY s.relid
+"""
+
+_COMMENT_PATTERN = re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL)
+_READ_ONLY_PATTERN = re.compile(r'^(SELECT|WITH)\b', re.IGNORECASE)
+# Writes inside CTEs, row locks, and functions whose result changes without any table changing
+_UNCACHEABLE_PATTERN = re.compile(
+    r'\b(INSERT|UPDATE|DELETE|MERGE|FOR\s+(NO\s+KEY\s+)?UPDATE|FOR\s+(KEY\s+)?SHARE|'
+    r'random|now|clock_timestamp|statement_timestamp|timeofday|current_timestamp|current_date|'
+    r'current_time|localtime|localtimestamp|nextval|setval|currval|txid_\w+|pg_\w+)\b',
+    re.IGNORECASE
+)
+_CALL_PATTERN = re.compile(r'([A-Za-z_][\w$]*)\s*\(')
+# Names that may precede "(" without calling a user function: SQL keywords, types,
+# and built-in functions whose result depends only on their arguments and the rows read
+_SAFE_CALLS = {
+    'select', 'from', 'join', 'on', 'using', 'where', 'and', 'or', 'not', 'in', 'exists', 'any', 'all', 'some',
+    'as', 'materialized', 'values', 'over', 'filter', 'within', 'group', 'by', 'having', 'when', 'then', 'else',
+    'case', 'distinct', 'union', 'intersect', 'except', 'lateral', 'is', 'like', 'ilike', 'between', 'limit',
+    'offset', 'with', 'recursive', 'row', 'array', 'cast', 'extract', 'coalesce', 'nullif', 'greatest', 'least',
+    'count', 'sum', 'avg', 'min', 'max', 'stddev', 'stddev_pop', 'stddev_samp', 'variance', 'var_pop', 'var_samp',
+    'bool_and', 'bool_or', 'every', 'string_agg', 'array_agg', 'json_agg', 'jsonb_agg', 'percentile_cont',
+    'percentile_disc', 'mode', 'corr', 'covar_pop', 'covar_samp', 'regr_slope', 'regr_intercept',
+    'row_number', 'rank', 'dense_rank', 'percent_rank', 'cume_dist', 'ntile', 'lag', 'lead', 'first_value',
+    'last_value', 'nth_value', 'abs', 'round', 'trunc', 'floor', 'ceil', 'ceiling', 'power', 'sqrt', 'exp', 'ln',
+    'log', 'mod', 'sign', 'width_bucket', 'lower', 'upper', 'length', 'char_length', 'substring', 'substr',
+    'trim', 'btrim', 'ltrim', 'rtrim', 'replace', 'concat', 'concat_ws', 'left', 'right', 'lpad', 'rpad',
+    'position', 'split_part', 'regexp_replace', 'regexp_match', 'to_char', 'to_number', 'date_trunc', 'date_part',
+    'age', 'make_date', 'make_timestamp', 'numeric', 'decimal', 'varchar', 'char', 'character', 'timestamp',
+    'time', 'interval', 'float', 'bit', 'varbit', 'json_build_object', 'jsonb_build_object'
+}
+_IDENTIFIER = r'(?:"(?:[^"]|"")+"|[A-Za-z_][\w$]*)'
+_TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|" + _IDENTIFIER + r"|[(),.]")
+_CTE_PATTERN = re.compile(r'(?:\bWITH(?:\s+RECURSIVE)?|,)\s*(' + _IDENTIFIER + r')\s*(?:\([^)]*\))?\s+AS\s*(?:NOT\s+)?(?:MATERIALIZED\s*)?\(',
+                          re.IGNORECASE)
+# Words that end a FROM item instead of being its alias
+_FROM_ITEM_END = {
+    'where', 'join', 'inner', 'left', 'right', 'full', 'cross', 'natural', 'on', 'using', 'group', 'order',
+    'having', 'limit', 'offset', 'union', 'intersect', 'except', 'window', 'fetch', 'for', 'tablesample'
+}
+
+
+def normalize_sql(query: str) -> str:
+    """Strip comments, collapse whitespace and drop the trailing semicolon"""
+    query = _COMMENT_PATTERN.sub(' ', query)
+    query = ' '.join(query.split())
+    return query.rstrip(';').strip()
+
+
+def _unquote(identifier: str) -> str:
+    if identifier.startswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier.lower()
+
+
+def referenced_relations(query: str) -> Optional[List[Tuple[Optional[str], str]]]:
+    """(schema, name) of every relation in FROM lists and JOINs, or None if one is a function call"""
+    ctes = {_unquote(name) for name in _CTE_PATTERN.findall(query)}
+    # String literals are kept as single tokens so their contents are never read as names
+    tokens = _TOKEN_PATTERN.findall(query)
+    relations = []
+
+    i = 0
+    while i < len(tokens):
+        if tokens[i].lower() not in ('from', 'join'):
+            i += 1
+            continue
+
+        i += 1
+        while i < len(tokens):
+            if tokens[i].lower() in ('lateral', 'only'):
+                i += 1
+                continue
+            # Subqueries are walked by the outer loop
+            if tokens[i] == '(' or tokens[i].startswith("'"):
+                break
+
+            parts = [_unquote(tokens[i])]
+            i += 1
+            if i + 1 < len(tokens) and tokens[i] == '.':
+                parts.append(_unquote(tokens[i + 1]))
+                i += 2
+            if i < len(tokens) and tokens[i] == '(':
+                return None
+
+            if len(parts) == 2:
+                relations.append((parts[0], parts[1]))
+            elif parts[0] not in ctes:
+                relations.append((None, parts[0]))
+
+            # Skip the alias and its column list
+            if i < len(tokens) and tokens[i].lower() == 'as':
+                i += 1
+            if i < len(tokens) and tokens[i] not in ('(', ')', ',', '.') and tokens[i].lower() not in _FROM_ITEM_END:
+                i += 1
+                if i < len(tokens) and tokens[i] == '(':
+                    while i < len(tokens) and tokens[i] != ')':
+                        i += 1
+                    i += 1
+
+            if i < len(tokens) and tokens[i] == ',':
+                i += 1
+                continue
+            break
+
+    return relations
+
+
+@dataclass
+class CacheEntry:
+    """A cached result and its hit/miss bookkeeping"""
+    query: str
+    tables: Tuple[str, ...]
+    version: tuple
+    value: Any
+    size: int
+    rows: int
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+    misses: int = 1
+    last_hit: Optional[float] = None
+
+
+class ResultCache:
+    """Thread-safe LRU of query results under a memory budget"""
+
+    def __init__(self, budget_bytes: int = RESULT_CACHE_BUDGET_BYTES, max_age: float = RESULT_CACHE_MAX_AGE):
+        self.budget_bytes = budget_bytes
+        self.max_age = max_age
+        self._entries: "OrderedDict[tuple, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One loader per key so concurrent sessions wait for a single scan
+        self._inflight: Dict[tuple, threading.Lock] = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+    def _lookup_locked(self, key: tuple, version: tuple) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.version != version or time.time() - entry.created_at > self.max_age:
+            return None
+        entry.hits += 1
+        entry.last_hit = time.time()
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store_locked(self, key: tuple, entry: CacheEntry):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= previous.size
+            # Keep the history of a key whose data changed
+            entry.hits = previous.hits
+            entry.misses += previous.misses
+
+        if entry.size > self.budget_bytes * MAX_ENTRY_SHARE:
+            return
+
+        self._entries[key] = entry
+        self._size += entry.size
+        while self._size > self.budget_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+            self.evictions += 1
+
+    def get_or_load(self, key: tuple, version: tuple, query: str, tables: Tuple[str, ...],
+                    loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._lookup_locked(key, version)
+            if entry is not None:
+                return _copy_value(entry.value)
+            load_lock = self._inflight.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._lookup_locked(key, version)
+            if entry is not None:
+                return _copy_value(entry.value)
+
+            try:
+                value = loader()
+                size, rows = _measure(value)
+                with self._lock:
+                    self.misses += 1
+                    self._store_locked(key, CacheEntry(query, tables, version, value, size, rows))
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+            return _copy_value(value)
+
+    def lookup(self, key: tuple, version: tuple) -> Optional[Any]:
+        """Cached value for a key at a data version, counting the hit"""
+        with self._lock:
+            entry = self._lookup_locked(key, version)
+            return None if entry is None else _copy_value(entry.value)
+
+    def store(self, key: tuple, version: tuple, query: str, tables: Tuple[str, ...], value: Any):
+        """Store a value loaded outside get_or_load, counting the miss"""
+        size, rows = _measure(value)
+        with self._lock:
+            self.misses += 1
+            self._store_locked(key, CacheEntry(query, tables, version, value, size, rows))
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self._size,
+                'budget_bytes': self.budget_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'bypasses': self.bypasses,
+                'evictions': self.evictions
+            }
+
+    def entries(self) -> pd.DataFrame:
+        """Per-entry statistics, most recently used first"""
+        now = time.time()
+        with self._lock:
+            records = [
+                {
+                    'database': key[0][3],
+                    'query': entry.query,
+                    'tables': ', '.join(entry.tables),
+                    'rows': entry.rows,
+                    'size_bytes': entry.size,
+                    'hits': entry.hits,
+                    'misses': entry.misses,
+                    'age_seconds': now - entry.created_at,
+                    'last_hit_seconds': now - entry.last_hit if entry.last_hit else None
+                }
+                for key, entry in reversed(self._entries.items())
+            ]
+        return pd.DataFrame(records, columns=[
+            'database', 'query', 'tables', 'rows', 'size_bytes', 'hits', 'misses', 'age_seconds', 'last_hit_seconds'
+        ])
+
+
+def _measure(value: Any) -> Tuple[int, int]:
+    """Memory footprint and row count of a DataFrame or a tuple holding one"""
+    frames = [item for item in (value if isinstance(value, tuple) else (value,)) if isinstance(item, pd.DataFrame)]
+    size = sum(int(frame.memory_usage(index=True, deep=True).sum()) for frame in frames)
+    rows = sum(len(frame) for frame in frames)
+    return size, rows
+
+
+def _copy_value(value: Any) -> Any:
+    """Callers get their own DataFrames so they can add columns freely"""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(item.copy() if isinstance(item, pd.DataFrame) else item for item in value)
+    return value
+
+
+result_cache = ResultCache()
+
+
+def _deterministic(query: str) -> bool:
+    """Whether a read-only statement's result can only change when the tables it reads change"""
+    if not _READ_ONLY_PATTERN.match(query) or _UNCACHEABLE_PATTERN.search(query):
+        return False
+    # A user function could have side effects or read other tables
+    ctes = {_unquote(name) for name in _CTE_PATTERN.findall(query)}
+    return not any(name.lower() not in _SAFE_CALLS and _unquote(name) not in ctes for name in _CALL_PATTERN.findall(query))
+
+
+def resolve_tables(db_conn, query: str) -> Optional[List[Tuple[int, str]]]:
+    """(oid, 'schema.table') of the user tables a query reads, or None if it can't be cached
+
+    Views are resolved through the relationship graph to the tables underneath
+    them, provided every view on the way is itself deterministic.
+    """
+    if not _deterministic(query):
+        return None
+
+    relations = referenced_relations(query)
+    if not relations:
+        return None
+    # System catalogs and statistics views change without touching user tables
+    if any(schema in ('pg_catalog', 'information_schema') or name.startswith('pg_') for schema, name in relations):
+        return None
+
+    catalog = get_catalog(db_conn)
+    tables = catalog.tables
+    # Only tables have modification counters; foreign tables are not cached
+    tables = tables[tables['relkind'].isin(['r', 'p', 'm', 'v'])]
+    labels = dict(zip(tables['table_oid'].astype(int), tables['table_schema'] + '.' + tables['table_name']))
+    relkinds = dict(zip(tables['table_oid'].astype(int), tables['relkind']))
+
+    resolved = {}
+    for schema, name in relations:
+        if schema is None:
+            matches = tables[tables['table_name'] == name]
+            # Unqualified names must be unambiguous; otherwise search_path decides
+            if len(matches) != 1:
+                return None
+        else:
+            matches = tables[(tables['table_schema'] == schema) & (tables['table_name'] == name)]
+            if matches.empty:
+                return None
+        oid = int(matches.iloc[0]['table_oid'])
+
+        if relkinds[oid] != 'v':
+            resolved[oid] = labels[oid]
+            continue
+
+        views, underlying = catalog.graph.expand_view(oid)
+        definitions = catalog.graph.view_definitions
+        if any(view not in definitions or not _deterministic(normalize_sql(definitions[view])) for view in views):
+            return None
+        for table in underlying:
+            # Reads of system catalogs or foreign tables make the view uncacheable
+            if relkinds.get(table) not in ('r', 'p', 'm'):
+                return None
+            resolved[table] = labels[table]
+
+    return sorted(resolved.items()) or None
+
+
+def data_version(connection, table_oids: List[int]) -> tuple:
+    """Modification counters of the given tables and their partitions, read in one catalog query"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(DATA_VERSION_QUERY, (table_oids,))
+        return tuple(cursor.fetchall())
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+@dataclass(frozen=True)
+class CacheTicket:
+    """Where a result loaded asynchronously belongs in the cache"""
+    key: tuple
+    version: tuple
+    query: str
+    tables: Tuple[str, ...]
+
+
+def _ticket(db_conn, query: str, variant: tuple) -> Optional[CacheTicket]:
+    normalized = normalize_sql(query)
+    tables = resolve_tables(db_conn, normalized) if RESULT_CACHE_ENABLED else None
+    if tables is None:
+        result_cache.record_bypass()
+        return None
+
+    version = data_version(db_conn.connection, [oid for oid, _ in tables])
+    key = (db_conn.cache_key, normalized) + variant
+    return CacheTicket(key, version, normalized, tuple(name for _, name in tables))
+
+
+def cached_query(db_conn, query: str, loader: Callable[[], Any], variant: tuple = ()) -> Any:
+    """Serve a read-only query from the cache while its tables are unchanged, else run loader"""
+    ticket = _ticket(db_conn, query, variant)
+    if ticket is None:
+        return loader()
+    return result_cache.get_or_load(ticket.key, ticket.version, ticket.query, ticket.tables, loader)
+
+
+def lookup_query(db_conn, query: str, variant: tuple = ()) -> Tuple[Optional[Any], Optional[CacheTicket]]:
+    """Cached value (or None) and the ticket to store a fresh result under with store_query"""
+    ticket = _ticket(db_conn, query, variant)
+    if ticket is None:
+        return None, None
+    return result_cache.lookup(ticket.key, ticket.version), ticket
+
+
+def store_query(ticket: CacheTicket, value: Any):
+    result_cache.store(ticket.key, ticket.version, ticket.query, ticket.tables, value)
@@ -0,0 +1,111 @@
+"""
+Columnar DataFrame construction from psycopg2 result tuples
+"""
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+import psycopg2.extensions
+from typing import Sequence
+
+# PostgreSQL type OIDs with a fixed-width NumPy representation
+PG_OID_DTYPES = {
+    16: 'bool',       # bool
+    20: 'int64',      # int8
+    21: 'int16',      # int2
+    23: 'int32',      # int4
+    26: 'int64',      # oid
+    700: 'float32',   # float4
+    701: 'float64',   # float8
+}
+
+# Text-like types that stay as Python strings
+PG_TEXT_OIDS = {18, 19, 25, 1042, 1043}
+
+PG_NUMERIC_OID = 1700
+PG_TIMESTAMP_OID = 1114
+
+# Decode numeric straight to float instead of building Decimal objects
+NUMERIC_AS_FLOAT = psycopg2.extensions.new_type(
+    (PG_NUMERIC_OID,), 'PGMANAGE_NUMERIC_FLOAT',
+    lambda value, cursor: float(value) if value is not None else None
+)
+
+
+def prepare_cursor(cursor, numeric: str = 'float'):
+    """Register result typecasters on a cursor before it executes"""
+    if numeric not in ('float', 'decimal'):
+        raise ValueError(f"numeric must be 'float' or 'decimal', not {numeric!r}")
+
+    if numeric == 'float':
+        psycopg2.extensions.register_type(NUMERIC_AS_FLOAT, cursor)
+
+
+def column_dtype(type_code: int, numeric: str = 'float'):
+    """NumPy dtype for a result column, or None when it has no fixed-width form"""
+    if type_code == PG_NUMERIC_OID:
+        return 'float64' if numeric == 'float' else None
+    if type_code == PG_TIMESTAMP_OID:
+        return 'datetime64[ns]'
+    return PG_OID_DTYPES.get(type_code)
+
+
+def _column_array(values: list, type_code: int, numeric: str):
+    """Build one typed column from the values of a result column"""
+    if type_code == PG_TIMESTAMP_OID:
+        # NULLs become NaT; values outside the datetime64[ns] range stay objects
+        try:
+            return pd.to_datetime(values).to_numpy()
+        except (TypeError, ValueError, OverflowError):
+            return np.array(values, dtype=object)
+
+    # NULLs in integer/bool columns can't be represented natively
+    dtype = column_dtype(type_code, numeric)
+    if dtype is not None and None not in values:
+        try:
+            return np.fromiter(values, dtype=dtype, count=len(values))
+        except (TypeError, ValueError, OverflowError):
+            pass
+
+    if type_code in PG_TEXT_OIDS:
+        return np.array(values, dtype=object)
+
+    # Same inference pandas applies to dict rows
+    return pd.Series(values)
+
+
+def build_dataframe(rows: Sequence[tuple], description, numeric: str = 'float') -> pd.DataFrame:
+    """Build a DataFrame column by column from result tuples and cursor.description"""
+    names = [column.name for column in description]
+
+    if rows:
+        # One list per column; zip(*rows) would allocate a tuple per column
+        # holding every row and is several times slower on large results
+        arrays = [
+            _column_array(list(map(itemgetter(i), rows)), column.type_code, numeric)
+            for i, column in enumerate(description)
+        ]
+    else:
+        arrays = [
+            np.array([], dtype=column_dtype(column.type_code, numeric) or object)
+            for column in description
+        ]
+
+    # Positional keys keep duplicate column names (e.g. SELECT a, a) intact
+    df = pd.DataFrame(dict(enumerate(arrays)), copy=False)
+    df.columns = names
+    return df
+
+
+def fetch_dataframe(connection, query, params=None, numeric: str = 'float') -> pd.DataFrame:
+    """Run a parameterized query on a raw connection and build its DataFrame"""
+    cursor = connection.cursor()
+    try:
+        prepare_cursor(cursor, numeric)
+        cursor.execute(query, params)
+        return build_dataframe(cursor.fetchall(), cursor.description, numeric)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,99 @@
+"""
+Routine index over the catalog snapshot's signature-only routines frame.
+Bodies and parameter lists are fetched per pg_proc OID on first use and cached
+under the row's version, so overloads never mix and replaced routines reload.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+from psycopg2 import sql
+
+from database.queries import FUNCTION_QUERIES
+from database.results import fetch_dataframe
+
+ROUTINE_CACHE_SIZE = 256
+
+# Procedures take OUT arguments as placeholders in CALL; functions don't
+FUNCTION_ARGUMENT_MODES = ['IN', 'INOUT', 'VARIADIC']
+PROCEDURE_ARGUMENT_MODES = FUNCTION_ARGUMENT_MODES + ['OUT']
+
+SEARCH_COLUMNS = ['routine_schema', 'routine_name', 'arguments', 'return_type']
+
+
+def search_routines(routines: pd.DataFrame, term: str = '', routine_type: Optional[str] = None,
+                    include_extensions: bool = True) -> pd.DataFrame:
+    """Routines matching every word of the term in their schema, name, argument or return types"""
+    matches = pd.Series(True, index=routines.index)
+    for word in term.split():
+        found = pd.Series(False, index=routines.index)
+        for column in SEARCH_COLUMNS:
+            found |= routines[column].fillna('').str.contains(word, case=False, regex=False)
+        matches &= found
+    if routine_type:
+        matches &= routines['routine_type'] == routine_type
+    if not include_extensions:
+        matches &= routines['extension'].isna()
+    return routines[matches]
+
+
+def routine_label(routine) -> str:
+    return f"{routine['routine_schema']}.{routine['routine_name']}({routine['arguments']})"
+
+
+_cache: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cached(db_conn, routine, kind: str) -> pd.DataFrame:
+    key = (db_conn.cache_key, kind, int(routine['routine_oid']), int(routine['routine_version']))
+    with _cache_lock:
+        value = _cache.get(key)
+        if value is not None:
+            _cache.move_to_end(key)
+            return value
+
+    value = fetch_dataframe(db_conn.connection, FUNCTION_QUERIES[kind], (int(routine['routine_oid']),))
+    with _cache_lock:
+        _cache[key] = value
+        while len(_cache) > ROUTINE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+
+def get_routine_source(db_conn, routine) -> Optional[str]:
+    """Full CREATE statement of a routine, or its prosrc for aggregates; None if it was dropped"""
+    source = _cached(db_conn, routine, 'routine_source')
+    if source.empty:
+        return None
+    row = source.iloc[0]
+    return row['definition'] if pd.notna(row['definition']) else row['source_code']
+
+
+def get_routine_parameters(db_conn, routine) -> pd.DataFrame:
+    """Parameters of one overload in declaration order, including OUT and TABLE columns"""
+    return _cached(db_conn, routine, 'routine_parameters')
+
+
+def call_arguments(routine, parameters: pd.DataFrame) -> pd.DataFrame:
+    """The parameters a call must pass, in order"""
+    modes = PROCEDURE_ARGUMENT_MODES if routine['routine_type'] == 'PROCEDURE' else FUNCTION_ARGUMENT_MODES
+    return parameters[parameters['parameter_mode'].isin(modes)]
+
+
+def routine_call(routine, arguments: pd.DataFrame, values) -> sql.Composed:
+    """SELECT or CALL with every value cast to its parameter's declared type, so the routine's
+    own overload is the one called; values are composables such as Literal or Placeholder"""
+    casts = []
+    for argument, value in zip(arguments.itertuples(), values):
+        cast = sql.SQL("{}::{}").format(value, sql.SQL(argument.data_type))
+        if argument.parameter_mode == 'VARIADIC':
+            cast = sql.SQL("VARIADIC {}").format(cast)
+        casts.append(cast)
+
+    command = sql.SQL("CALL" if routine['routine_type'] == 'PROCEDURE' else "SELECT * FROM")
+    return sql.SQL("{} {}.{}({})").format(
+        command, sql.Identifier(routine['routine_schema']), sql.Identifier(routine['routine_name']),
+        sql.SQL(', ').join(casts)
+    )
@@ -0,0 +1,134 @@
+"""
+Table row counts from catalog estimates, bounded exact counts, or both
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Tuple
+
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+
+from database.pool import PoolError
+from database.queries import TABLE_QUERIES
+
+ROW_COUNT_MODES = ['Estimate', 'Exact', 'Hybrid']
+
+ROW_COUNT_MODE_HELP = (
+    "Estimate: catalog statistics for all tables in one query. "
+    "Exact: COUNT(*) per table with a timeout; foreign tables keep their estimate. "
+    "Hybrid: exact for small tables, estimates for large ones."
+)
+
+# Tables estimated below this many rows are counted exactly in Hybrid mode
+HYBRID_EXACT_THRESHOLD = 100000
+EXACT_COUNT_WORKERS = 4
+EXACT_COUNT_TIMEOUT_MS = 5000
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATED = 'estimated'
+
+
+ROW_COUNT_COLUMNS = ['schemaname', 'tablename', 'row_count', 'count_type']
+
+
+def _estimates(db_conn) -> pd.DataFrame:
+    """Estimated row counts with each table's relkind"""
+    estimates = db_conn.execute_query(TABLE_QUERIES['estimated_row_counts'])
+    if estimates.empty:
+        return pd.DataFrame(columns=ROW_COUNT_COLUMNS + ['relkind'])
+
+    estimates['count_type'] = COUNT_ESTIMATED
+    return estimates[ROW_COUNT_COLUMNS + ['relkind']]
+
+
+def get_estimated_row_counts(db_conn) -> pd.DataFrame:
+    """Estimated row counts for every table from pg_class and pg_stat_user_tables"""
+    return _estimates(db_conn)[ROW_COUNT_COLUMNS]
+
+
+def _exact_count(pool, schema: str, table: str, timeout_ms: int) -> Optional[int]:
+    """COUNT(*) on a pooled connection; None if it times out or fails"""
+    try:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # SET LOCAL ends with the transaction the pool rolls back
+                cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+                cursor.execute(
+                    sql.SQL("SELECT COUNT(*) FROM {}.{}").format(sql.Identifier(schema), sql.Identifier(table))
+                )
+                return cursor.fetchone()[0]
+            finally:
+                cursor.close()
+    # A busy pool keeps the estimate just like a timed-out count
+    except (psycopg2.Error, PoolError):
+        return None
+
+
+def get_exact_row_counts(db_conn, tables: Iterable[Tuple[str, str]],
+                         max_workers: int = EXACT_COUNT_WORKERS,
+                         timeout_ms: int = EXACT_COUNT_TIMEOUT_MS) -> pd.DataFrame:
+    """Exact row counts run in a bounded thread pool, each on its own pooled connection"""
+    tables = list(tables)
+    pool = db_conn.get_pool()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        counts = list(executor.map(
+            lambda table: _exact_count(pool, table[0], table[1], timeout_ms), tables
+        ))
+
+    return pd.DataFrame({
+        'schemaname': [schema for schema, _ in tables],
+        'tablename': [table for _, table in tables],
+        'row_count': counts,
+        'count_type': COUNT_EXACT
+    })
+
+
+def get_row_counts(db_conn, mode: str = 'Estimate',
+                   tables: Optional[Iterable[Tuple[str, str]]] = None,
+                   hybrid_threshold: int = HYBRID_EXACT_THRESHOLD,
+                   max_workers: int = EXACT_COUNT_WORKERS,
+                   timeout_ms: int = EXACT_COUNT_TIMEOUT_MS) -> pd.DataFrame:
+    """Row counts as (schemaname, tablename, row_count, count_type) for the given tables"""
+    if mode not in ROW_COUNT_MODES:
+        raise ValueError(f"Unknown row count mode: {mode}")
+
+    estimates = _estimates(db_conn)
+    if tables is not None:
+        wanted = pd.DataFrame(list(tables), columns=['schemaname', 'tablename'])
+        estimates = wanted.merge(estimates, on=['schemaname', 'tablename'], how='left')
+
+    if mode == 'Estimate':
+        return estimates[ROW_COUNT_COLUMNS]
+
+    # Counting a foreign table would scan it on the remote server
+    exact_targets = estimates[estimates['relkind'] != 'f']
+    if mode == 'Hybrid':
+        exact_targets = exact_targets[exact_targets['row_count'].notna() & (exact_targets['row_count'] < hybrid_threshold)]
+
+    exact = get_exact_row_counts(
+        db_conn,
+        zip(exact_targets['schemaname'], exact_targets['tablename']),
+        max_workers=max_workers,
+        timeout_ms=timeout_ms
+    )
+    # Timed-out exact counts keep their estimate
+    counts = estimates.merge(exact, on=['schemaname', 'tablename'], how='left', suffixes=('', '_exact'))
+    exact_counts = pd.to_numeric(counts['row_count_exact'])
+    has_exact = exact_counts.notna()
+    counts['row_count'] = counts['row_count'].where(~has_exact, exact_counts)
+    counts.loc[has_exact, 'count_type'] = COUNT_EXACT
+    return counts[ROW_COUNT_COLUMNS]
+
+
+def describe_count_types(count_types: pd.Series) -> str:
+    """Caption telling the user which kind of numbers a row count column holds"""
+    exact = int((count_types == COUNT_EXACT).sum())
+    estimated = int((count_types == COUNT_ESTIMATED).sum())
+    unavailable = int(count_types.isna().sum())
+
+    parts = [f"{exact} exact", f"{estimated} estimated from table statistics"]
+    if unavailable:
+        parts.append(f"{unavailable} unavailable")
+    return "Row counts: " + ", ".join(parts)
@@ -0,0 +1,210 @@
+"""
+Background metrics sampler: one thread per database snapshots the cumulative
+statistics views into fixed-size NumPy ring buffers shared by every session
+"""
+import datetime
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from database.queries import SAMPLER_QUERIES
+from database.results import fetch_dataframe
+
+# Cumulative counters are charted as per-second rates, gauges as sampled
+COUNTER_FIELDS = (
+    'xact_commit', 'xact_rollback', 'blks_read', 'blks_hit',
+    'tup_returned', 'tup_fetched', 'tup_inserted', 'tup_updated', 'tup_deleted',
+    'deadlocks', 'temp_bytes', 'seq_scan', 'seq_tup_read', 'idx_scan'
+)
+GAUGE_FIELDS = (
+    'live_tuples', 'dead_tuples', 'backends', 'active', 'idle_in_transaction', 'waiting'
+)
+SAMPLE_FIELDS = COUNTER_FIELDS + GAUGE_FIELDS + ('stats_reset',)
+
+SAMPLER_INTERVALS = [5, 10, 30, 60]
+DEFAULT_SAMPLER_INTERVAL = float(os.environ.get('PGMANAGE_SAMPLER_INTERVAL', '5'))
+SAMPLER_CAPACITY = int(os.environ.get('PGMANAGE_SAMPLER_CAPACITY', '720'))
+# A sampler nobody has read for this long stops, so idle databases are not polled
+SAMPLER_IDLE_SECONDS = 900
+
+
+class RingBuffer:
+    """Fixed-size buffer of timestamped samples; the oldest sample is overwritten first"""
+
+    def __init__(self, capacity: int, fields: Tuple[str, ...]):
+        self.capacity = capacity
+        self.fields = fields
+        self._timestamps = np.full(capacity, np.nan)
+        self._values = np.full((capacity, len(fields)), np.nan)
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: float, values: np.ndarray):
+        with self._lock:
+            self._timestamps[self._next] = timestamp
+            self._values[self._next] = values
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def window(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of (timestamps, values) in sample order"""
+        with self._lock:
+            start = (self._next - self._count) % self.capacity
+            order = (start + np.arange(self._count)) % self.capacity
+            return self._timestamps[order], self._values[order]
+
+
+def compute_rates(timestamps: np.ndarray, values: np.ndarray, fields: Tuple[str, ...]) -> pd.DataFrame:
+    """Per-second rates of the counters and derived ratios between consecutive samples"""
+    if len(timestamps) < 2:
+        return pd.DataFrame()
+
+    column = {name: i for i, name in enumerate(fields)}
+    elapsed = np.diff(timestamps)
+    deltas = np.diff(values, axis=0)
+
+    # A statistics reset restarts the counters; the interval spanning it has no rate.
+    # stats_reset is NULL (NaN) until the first reset, and NaN to NaN is no change
+    stats_reset = values[:, column['stats_reset']]
+    unchanged = (stats_reset[1:] == stats_reset[:-1]) | (np.isnan(stats_reset[1:]) & np.isnan(stats_reset[:-1]))
+    reset = ~unchanged | (elapsed <= 0)
+    deltas[reset] = np.nan
+    deltas[deltas < 0] = np.nan
+
+    def rate(name):
+        return deltas[:, column[name]] / elapsed
+
+    blocks_hit = deltas[:, column['blks_hit']]
+    blocks_total = blocks_hit + deltas[:, column['blks_read']]
+
+    rates = pd.DataFrame({
+        'tps': rate('xact_commit') + rate('xact_rollback'),
+        'commits_per_sec': rate('xact_commit'),
+        'rollbacks_per_sec': rate('xact_rollback'),
+        'cache_hit_ratio': np.where(blocks_total > 0, blocks_hit / np.where(blocks_total > 0, blocks_total, 1) * 100, np.nan),
+        'blocks_read_per_sec': rate('blks_read'),
+        'tuples_returned_per_sec': rate('tup_returned'),
+        'tuples_fetched_per_sec': rate('tup_fetched'),
+        'tuples_inserted_per_sec': rate('tup_inserted'),
+        'tuples_updated_per_sec': rate('tup_updated'),
+        'tuples_deleted_per_sec': rate('tup_deleted'),
+        'seq_scans_per_sec': rate('seq_scan'),
+        'idx_scans_per_sec': rate('idx_scan'),
+        'deadlocks_per_sec': rate('deadlocks'),
+        'temp_bytes_per_sec': rate('temp_bytes')
+    })
+    for name in GAUGE_FIELDS:
+        rates[name] = values[1:, column[name]]
+
+    local_zone = datetime.datetime.now().astimezone().tzinfo
+    rates.index = pd.to_datetime(timestamps[1:], unit='s', utc=True).tz_convert(local_zone)
+    rates.index.name = 'sampled_at'
+    return rates
+
+
+class MetricsSampler(threading.Thread):
+    """Daemon thread sampling one database on connections borrowed from its pool"""
+
+    def __init__(self, pool, database: str, interval: float = DEFAULT_SAMPLER_INTERVAL,
+                 capacity: int = SAMPLER_CAPACITY):
+        super().__init__(name=f"pgmanage-sampler-{database}", daemon=True)
+        self.pool = pool
+        self.database = database
+        self.interval = interval
+        self.buffer = RingBuffer(capacity, SAMPLE_FIELDS)
+        self.sample_count = 0
+        self.last_error = None
+        self.last_read = time.time()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def set_interval(self, interval: float):
+        """Change the interval for every session reading this sampler, from the next sample on"""
+        if interval != self.interval:
+            self.interval = interval
+            self._wake_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            if time.time() - self.last_read > SAMPLER_IDLE_SECONDS:
+                self._stop_event.set()
+                break
+            try:
+                self.sample()
+            except Exception as e:
+                self.last_error = str(e)
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+
+    def sample(self):
+        """Take one snapshot of the statistics views"""
+        with self.pool.connection() as conn:
+            row = fetch_dataframe(conn, SAMPLER_QUERIES['sample']).iloc[0]
+        values = row[list(SAMPLE_FIELDS)].to_numpy(dtype='float64', na_value=np.nan)
+        self.buffer.append(float(row['sampled_at']), values)
+        self.sample_count += 1
+        self.last_error = None
+
+    def rates(self) -> pd.DataFrame:
+        """Rates and gauges of every buffered interval; reading costs no queries"""
+        self.last_read = time.time()
+        timestamps, values = self.buffer.window()
+        return compute_rates(timestamps, values, SAMPLE_FIELDS)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'database': self.database,
+            'interval': self.interval,
+            'samples': len(self.buffer),
+            'capacity': self.buffer.capacity,
+            'last_error': self.last_error
+        }
+
+
+_samplers: Dict[tuple, MetricsSampler] = {}
+_samplers_lock = threading.Lock()
+
+
+def ensure_sampler(db_conn, interval: Optional[float] = None) -> MetricsSampler:
+    """Start (or return the running) sampler for the connection's database"""
+    key = db_conn.cache_key
+    with _samplers_lock:
+        sampler = _samplers.get(key)
+        if sampler is None or not sampler.is_alive() or sampler.stopped:
+            sampler = MetricsSampler(db_conn.get_pool(), db_conn.current_database,
+                                     interval or DEFAULT_SAMPLER_INTERVAL)
+            sampler.start()
+            _samplers[key] = sampler
+        elif interval:
+            sampler.set_interval(interval)
+        sampler.last_read = time.time()
+        return sampler
+
+
+def get_sampler(db_conn) -> Optional[MetricsSampler]:
+    with _samplers_lock:
+        return _samplers.get(db_conn.cache_key)
+
+
+def stop_sampler(db_conn):
+    """Stop the sampler for the connection's database, if any"""
+    with _samplers_lock:
+        sampler = _samplers.pop(db_conn.cache_key, None)
+    if sampler is not None:
+        sampler.stop()
@@ -0,0 +1,242 @@
+"""
+pg_stat_statements workload: periodic snapshots per database, diffed into
+per-interval deltas so the top queries reflect recent load, not the totals
+since the last reset
+"""
+import collections
+import datetime
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from psycopg2 import sql
+
+from database.queries import WORKLOAD_QUERIES
+from database.results import fetch_dataframe
+
+STATEMENT_KEY = ['username', 'queryid']
+COUNTER_COLUMNS = [
+    'calls', 'total_time', 'sum_squares', 'rows',
+    'shared_blks_hit', 'shared_blks_read', 'shared_blks_dirtied', 'shared_blks_written',
+    'temp_blks_read', 'temp_blks_written'
+]
+
+SNAPSHOT_INTERVALS = [60, 300, 900, 3600]
+DEFAULT_SNAPSHOT_INTERVAL = 300
+WORKLOAD_SNAPSHOTS = int(os.environ.get('PGMANAGE_WORKLOAD_SNAPSHOTS', '96'))
+# Snapshots stop when nobody has opened the workload page for this long
+SNAPSHOTTER_IDLE_SECONDS = 3600
+
+
+@dataclass(frozen=True)
+class WorkloadStatus:
+    """Whether pg_stat_statements can be used in the current database"""
+    available: bool
+    installed_version: Optional[str]
+    preloaded: bool
+    server_version_num: int
+
+    @property
+    def ready(self) -> bool:
+        return self.installed_version is not None and self.preloaded
+
+    @property
+    def exec_time_columns(self) -> bool:
+        # Version 1.8 split total_time into planning and execution time
+        major, minor = (int(part) for part in (self.installed_version or '0.0').split('.')[:2])
+        return (major, minor) >= (1, 8)
+
+    @property
+    def supports_generic_plan(self) -> bool:
+        return self.server_version_num >= 160000
+
+
+@dataclass(frozen=True)
+class WorkloadSnapshot:
+    """Cumulative pg_stat_statements counters at one point in time"""
+    taken_at: float
+    statements: pd.DataFrame
+
+
+def load_status(connection) -> WorkloadStatus:
+    row = fetch_dataframe(connection, WORKLOAD_QUERIES['status']).iloc[0]
+    return WorkloadStatus(
+        available=bool(row['available']),
+        installed_version=None if pd.isna(row['installed_version']) else str(row['installed_version']),
+        preloaded=bool(row['preloaded']),
+        server_version_num=int(row['server_version_num'])
+    )
+
+
+def statements_query(status: WorkloadStatus) -> sql.Composed:
+    prefix = 'exec_' if status.exec_time_columns else ''
+    return sql.SQL(WORKLOAD_QUERIES['statements']).format(
+        total_time=sql.Identifier(f"total_{prefix}time"),
+        mean_time=sql.Identifier(f"mean_{prefix}time"),
+        stddev_time=sql.Identifier(f"stddev_{prefix}time")
+    )
+
+
+def take_snapshot(connection, status: WorkloadStatus) -> WorkloadSnapshot:
+    """Read the counters without query texts; texts are fetched only for displayed queries"""
+    statements = fetch_dataframe(connection, statements_query(status))
+
+    # Sum of squared durations is additive, so interval stddev can be recovered from two snapshots
+    statements['sum_squares'] = statements['calls'] * (statements['stddev_time'] ** 2 + statements['mean_time'] ** 2)
+
+    # Top-level and nested executions of a statement are separate entries from 1.9 on
+    statements = statements.groupby(STATEMENT_KEY, as_index=False)[COUNTER_COLUMNS].sum()
+    return WorkloadSnapshot(taken_at=time.time(), statements=statements)
+
+
+def _with_derived(statements: pd.DataFrame) -> pd.DataFrame:
+    statements = statements[statements['calls'] > 0].copy()
+    calls = statements['calls']
+    statements['mean_time'] = statements['total_time'] / calls
+    variance = statements['sum_squares'] / calls - statements['mean_time'] ** 2
+    statements['stddev_time'] = np.sqrt(variance.clip(lower=0))
+    statements['rows_per_call'] = statements['rows'] / calls
+
+    total_time = statements['total_time'].sum()
+    statements['time_share'] = statements['total_time'] / total_time * 100 if total_time > 0 else 0.0
+
+    accessed = statements['shared_blks_hit'] + statements['shared_blks_read']
+    statements['hit_ratio'] = np.where(accessed > 0, statements['shared_blks_hit'] / accessed.where(accessed > 0, 1) * 100, np.nan)
+    return statements.drop(columns=['sum_squares']).reset_index(drop=True)
+
+
+def cumulative_workload(snapshot: WorkloadSnapshot) -> pd.DataFrame:
+    """Counters since each statement entry was created or last reset"""
+    return _with_derived(snapshot.statements)
+
+
+def diff_snapshots(older: WorkloadSnapshot, newer: WorkloadSnapshot) -> pd.DataFrame:
+    """Per-statement activity between two snapshots"""
+    merged = newer.statements.merge(older.statements, on=STATEMENT_KEY, how='left', suffixes=('', '_before'))
+    before = merged[[f"{column}_before" for column in COUNTER_COLUMNS]].fillna(0).to_numpy(dtype="float64", copy=True)
+
+    # An entry that was reset, or evicted and re-added, restarted its counters
+    restarted = merged['calls'].to_numpy() < before[:, 0]
+    before[restarted] = 0
+
+    deltas = merged[STATEMENT_KEY].copy()
+    deltas[COUNTER_COLUMNS] = merged[COUNTER_COLUMNS].to_numpy() - before
+    return _with_derived(deltas)
+
+
+def statement_series(snapshots: List[WorkloadSnapshot], username: str, queryid: str) -> pd.DataFrame:
+    """Calls/s and mean time of one statement in every interval between consecutive snapshots"""
+    points = []
+    for older, newer in zip(snapshots, snapshots[1:]):
+        deltas = diff_snapshots(older, newer)
+        row = deltas[(deltas['username'] == username) & (deltas['queryid'] == queryid)]
+        elapsed = newer.taken_at - older.taken_at
+        calls = float(row['calls'].iloc[0]) if not row.empty else 0.0
+        points.append({
+            'taken_at': datetime.datetime.fromtimestamp(newer.taken_at),
+            'calls_per_sec': calls / elapsed if elapsed > 0 else np.nan,
+            'mean_time': float(row['mean_time'].iloc[0]) if not row.empty else np.nan,
+            'total_time': float(row['total_time'].iloc[0]) if not row.empty else 0.0
+        })
+    return pd.DataFrame(points)
+
+
+class WorkloadSnapshotter(threading.Thread):
+    """Daemon thread snapshotting pg_stat_statements of one database at an interval"""
+
+    def __init__(self, pool, database: str, status: WorkloadStatus,
+                 interval: float = DEFAULT_SNAPSHOT_INTERVAL, capacity: int = WORKLOAD_SNAPSHOTS):
+        super().__init__(name=f"pgmanage-workload-{database}", daemon=True)
+        self.pool = pool
+        self.database = database
+        self.status = status
+        self.interval = interval
+        self.last_error = None
+        self.last_read = time.time()
+        self._snapshots = collections.deque(maxlen=capacity)
+        self._texts: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def set_interval(self, interval: float):
+        if interval != self.interval:
+            self.interval = interval
+            self._wake_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            if time.time() - self.last_read > SNAPSHOTTER_IDLE_SECONDS:
+                self._stop_event.set()
+                break
+            try:
+                self.snapshot_now()
+            except Exception as e:
+                self.last_error = str(e)
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+
+    def snapshot_now(self) -> WorkloadSnapshot:
+        with self.pool.connection() as conn:
+            snapshot = take_snapshot(conn, self.status)
+        with self._lock:
+            self._snapshots.append(snapshot)
+        self.last_error = None
+        return snapshot
+
+    def snapshots(self) -> List[WorkloadSnapshot]:
+        self.last_read = time.time()
+        with self._lock:
+            return list(self._snapshots)
+
+    def query_texts(self, queryids: List[str]) -> Dict[str, str]:
+        """Normalized query texts, read from the server once per queryid"""
+        with self._lock:
+            missing = [queryid for queryid in queryids if queryid not in self._texts]
+        if missing:
+            with self.pool.connection() as conn:
+                texts = fetch_dataframe(conn, WORKLOAD_QUERIES['texts'], (missing,))
+            with self._lock:
+                self._texts.update(zip(texts['queryid'], texts['query']))
+        with self._lock:
+            return {queryid: self._texts.get(queryid, '') for queryid in queryids}
+
+
+_snapshotters: Dict[tuple, WorkloadSnapshotter] = {}
+_snapshotters_lock = threading.Lock()
+
+
+def ensure_snapshotter(db_conn, status: WorkloadStatus, interval: Optional[float] = None) -> WorkloadSnapshotter:
+    """Start (or return the running) snapshotter for the connection's database"""
+    key = db_conn.cache_key
+    with _snapshotters_lock:
+        snapshotter = _snapshotters.get(key)
+        if snapshotter is None or not snapshotter.is_alive() or snapshotter.stopped:
+            snapshotter = WorkloadSnapshotter(db_conn.get_pool(), db_conn.current_database, status,
+                                              interval or DEFAULT_SNAPSHOT_INTERVAL)
+            snapshotter.start()
+            _snapshotters[key] = snapshotter
+        elif interval:
+            snapshotter.set_interval(interval)
+        snapshotter.last_read = time.time()
+        return snapshotter
+
+
+def stop_snapshotter(db_conn):
+    """Stop the snapshotter for the connection's database, if any"""
+    with _snapshotters_lock:
+        snapshotter = _snapshotters.pop(db_conn.cache_key, None)
+    if snapshotter is not None:
+        snapshotter.stop()
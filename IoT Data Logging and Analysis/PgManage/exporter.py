@@ -0,0 +1,98 @@
+"""
+Standalone Prometheus/OpenMetrics exporter for the PgManage monitoring queries
+
+    python exporter.py --database iot --listen-port 9188
+
+Connection settings default to the PGHOST, PGPORT, PGUSER, PGPASSWORD and
+PGDATABASE environment variables. Every scrape within --interval seconds of the
+last collection is served from cache, so the database sees at most one
+collection per interval however many scrapers there are.
+"""
+import argparse
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from database.openmetrics import (
+    CONTENT_TYPE, DEFAULT_COLLECT_INTERVAL, DEFAULT_MAX_INDEXES, DEFAULT_MAX_TABLES, CachedCollector
+)
+from database.pool import ConnectionPool
+
+DEFAULT_LISTEN_PORT = 9188
+
+LANDING_PAGE = b"""<html>
+<head><title>PgManage Exporter</title></head>
+<body><h1>PgManage Exporter</h1><p><a href="/metrics">Metrics</a></p></body>
+</html>
+"""
+
+
+def make_handler(collector: CachedCollector):
+    """Request handler class bound to one collector"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?', 1)[0]
+            if path == '/metrics':
+                body = collector.scrape().encode('utf-8')
+                content_type = CONTENT_TYPE
+            elif path == '/':
+                body = LANDING_PAGE
+                content_type = 'text/html; charset=utf-8'
+            else:
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood the console
+            pass
+
+    return MetricsHandler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve PgManage monitoring metrics in OpenMetrics format")
+    parser.add_argument('--host', default=os.getenv('PGHOST', 'localhost'))
+    parser.add_argument('--port', default=os.getenv('PGPORT', '5432'))
+    parser.add_argument('--user', default=os.getenv('PGUSER', 'postgres'))
+    parser.add_argument('--database', default=os.getenv('PGDATABASE', 'postgres'))
+    parser.add_argument('--listen-address', default='0.0.0.0')
+    parser.add_argument('--listen-port', type=int, default=DEFAULT_LISTEN_PORT)
+    parser.add_argument('--interval', type=float, default=DEFAULT_COLLECT_INTERVAL,
+                        help="Minimum seconds between collections")
+    parser.add_argument('--max-tables', type=int, default=DEFAULT_MAX_TABLES,
+                        help="Tables exported with per-table labels, most active first")
+    parser.add_argument('--max-indexes', type=int, default=DEFAULT_MAX_INDEXES,
+                        help="Indexes exported with per-index labels, most read first")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Passwords stay out of the process list
+    password = os.getenv('PGPASSWORD', '')
+
+    # Collections are serialized, so one connection is enough
+    pool = ConnectionPool(args.host, args.port, args.user, password, args.database, min_size=0, max_size=1)
+    collector = CachedCollector(pool, args.interval, args.max_tables, args.max_indexes)
+
+    server = ThreadingHTTPServer((args.listen_address, args.listen_port), make_handler(collector))
+    print(f"Serving {args.database} metrics on http://{args.listen_address}:{args.listen_port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.closeall()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import streamlit as st
+from database.result_cache import RESULT_CACHE_ENABLED, result_cache
+from utils.helpers import format_bytes
+
+def show():
+    """Display the result cache page"""
+    st.header("🧠 Result Cache")
+    
+    if not st.session_state.get('connected'):
+        st.error("Please connect to a database first")
+        return
+    
+    if not RESULT_CACHE_ENABLED:
+        st.warning("The result cache is disabled (PGMANAGE_RESULT_CACHE=0)")
+    
+    st.caption(
+        "Read-only query results shared by all sessions. An entry is reused while the modification "
+        "counters of every table it reads are unchanged in pg_stat_user_tables."
+    )
+    
+    show_cache_overview()
+    show_cache_entries()
+
+def show_cache_overview():
+    """Display cache-wide hit, miss and memory metrics"""
+    stats = result_cache.stats()
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Entries", stats['entries'])
+        st.metric("Evictions", stats['evictions'])
+    
+    with col2:
+        st.metric("Memory Used", format_bytes(stats['size_bytes']))
+        st.metric("Budget", format_bytes(stats['budget_bytes']))
+    
+    with col3:
+        st.metric("Hits", f"{stats['hits']:,}")
+        st.metric("Misses", f"{stats['misses']:,}")
+    
+    with col4:
+        st.metric("Hit Ratio", f"{stats['hit_ratio'] * 100:.1f}%")
+        st.metric("Not Cacheable", f"{stats['bypasses']:,}")
+    
+    st.progress(min(stats['size_bytes'] / stats['budget_bytes'], 1.0) if stats['budget_bytes'] else 0.0)
+    
+    col1, col2 = st.columns([3, 1])
+    with col2:
+        if st.button("🗑️ Clear Cache", use_container_width=True):
+            result_cache.clear()
+            st.success("✅ Cache cleared")
+            st.rerun()
+
+def show_cache_entries():
+    """Display per-entry statistics"""
+    st.subheader("📋 Cached Results")
+    
+    entries_df = result_cache.entries()
+    
+    if entries_df.empty:
+        st.info("No cached results yet")
+        return
+    
+    search_term = st.text_input("🔍 Search cached queries", placeholder="Enter table name or SQL text...")
+    if search_term:
+        entries_df = entries_df[
+            entries_df['query'].str.contains(search_term, case=False, na=False, regex=False) |
+            entries_df['tables'].str.contains(search_term, case=False, na=False, regex=False)
+        ]
+    
+    entries_df = entries_df.assign(
+        size=entries_df['size_bytes'].map(format_bytes),
+        hit_ratio=(entries_df['hits'] / (entries_df['hits'] + entries_df['misses']) * 100)
+    )
+    
+    st.dataframe(
+        entries_df[['database', 'query', 'tables', 'rows', 'size', 'hits', 'misses', 'hit_ratio',
+                    'age_seconds', 'last_hit_seconds']],
+        column_config={
+            'database': 'Database',
+            'query': st.column_config.TextColumn('Query', width='large'),
+            'tables': 'Tables',
+            'rows': st.column_config.NumberColumn('Rows', format="%d"),
+            'size': 'Size',
+            'hits': st.column_config.NumberColumn('Hits', format="%d"),
+            'misses': st.column_config.NumberColumn('Misses', format="%d"),
+            'hit_ratio': st.column_config.NumberColumn('Hit %', format="%.1f%%"),
+            'age_seconds': st.column_config.NumberColumn('Age (s)', format="%.0f"),
+            'last_hit_seconds': st.column_config.NumberColumn('Last Hit (s ago)', format="%.0f")
+        },
+        use_container_width=True,
+        hide_index=True
+    )
@@ -3,8 +3,10 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
-from database.queries import DASHBOARD_QUERIES, MONITORING_QUERIES
-import time
+from database.queries import MONITORING_QUERIES
+from database.metrics import collect_overview
+from database.sampler import DEFAULT_SAMPLER_INTERVAL, SAMPLER_INTERVALS, ensure_sampler, get_sampler
+from database.row_counts import ROW_COUNT_MODES, ROW_COUNT_MODE_HELP, get_row_counts, describe_count_types
 
 def show():
     """Display the dashboard page"""
@@ -16,18 +18,26 @@ def show():
     
     db_conn = st.session_state.db_connection
     
-    # Auto-refresh toggle
-    col1, col2 = st.columns([3, 1])
+    # Auto-refresh toggle; the interval starts at the running sampler's, which every session shares
+    sampler = get_sampler(db_conn)
+    current = sampler.interval if sampler is not None and not sampler.stopped else DEFAULT_SAMPLER_INTERVAL
+    col1, col2, col3 = st.columns([2, 1, 1])
     with col2:
-        auto_refresh = st.checkbox("🔄 Auto-refresh (30s)", key="dashboard_auto_refresh")
+        interval = st.selectbox(
+            "Sample every (s)", SAMPLER_INTERVALS, key="dashboard_sample_interval",
+            index=SAMPLER_INTERVALS.index(current) if current in SAMPLER_INTERVALS else 0,
+            help="Shared by everyone viewing this database; the latest choice applies to all sessions"
+        )
+    with col3:
+        auto_refresh = st.checkbox("🔄 Auto-refresh", key="dashboard_auto_refresh")
     
-    if auto_refresh:
-        # Auto-refresh every 30 seconds
-        time.sleep(30)
-        st.rerun()
+    # One sampler per database, shared by every session viewing it
+    ensure_sampler(db_conn, interval)
     
     # Main dashboard content
     show_overview_metrics(db_conn)
+    # Only the live charts rerun; they read the sampler's buffer and cost no queries
+    st.fragment(show_live_metrics, run_every=interval if auto_refresh else None)(db_conn)
     show_database_statistics(db_conn)
     show_table_analytics(db_conn)
     show_performance_metrics(db_conn)
@@ -37,40 +47,93 @@ def show_overview_metrics(db_conn):
     st.subheader("📈 Overview Metrics")
     
     try:
-        # Get counts for different database objects
-        table_count = db_conn.execute_query(DASHBOARD_QUERIES['table_count']).iloc[0, 0]
-        view_count = db_conn.execute_query(DASHBOARD_QUERIES['view_count']).iloc[0, 0]
-        function_count = db_conn.execute_query(DASHBOARD_QUERIES['function_count']).iloc[0, 0]
-        procedure_count = db_conn.execute_query(DASHBOARD_QUERIES['procedure_count']).iloc[0, 0]
-        trigger_count = db_conn.execute_query(DASHBOARD_QUERIES['trigger_count']).iloc[0, 0]
-        index_count = db_conn.execute_query(DASHBOARD_QUERIES['index_count']).iloc[0, 0]
-        
-        # Database size and connections
-        db_size = db_conn.get_database_size()
-        active_connections = db_conn.get_active_connections()
+        # All counters in one catalog round trip
+        overview = collect_overview(db_conn)
         
         # Display metrics in columns
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("🗂️ Tables", table_count)
-            st.metric("👁️ Views", view_count)
+            st.metric("🗂️ Tables", overview.table_count)
+            st.metric("👁️ Views", overview.view_count + overview.materialized_view_count)
         
         with col2:
-            st.metric("⚙️ Functions", function_count)
-            st.metric("🔧 Procedures", procedure_count)
+            st.metric("⚙️ Functions", overview.function_count)
+            st.metric("🔧 Procedures", overview.procedure_count)
         
         with col3:
-            st.metric("⚡ Triggers", trigger_count)
-            st.metric("🗂️ Indexes", index_count)
+            st.metric("⚡ Triggers", overview.trigger_count)
+            st.metric("🗂️ Indexes", overview.index_count)
         
         with col4:
-            st.metric("💾 Database Size", db_size)
-            st.metric("🔗 Active Connections", active_connections)
+            st.metric("💾 Database Size", overview.database_size_pretty)
+            st.metric("🔗 Active Connections", overview.active_connections)
         
     except Exception as e:
         st.error(f"Error loading overview metrics: {str(e)}")
 
+def show_live_metrics(db_conn):
+    """Display rates computed from the background sampler's ring buffer"""
+    st.subheader("📉 Live Activity")
+    
+    sampler = get_sampler(db_conn)
+    if sampler is None:
+        st.info("The metrics sampler is not running")
+        return
+    
+    rates = sampler.rates()
+    stats = sampler.stats()
+    
+    if stats['last_error']:
+        st.warning(f"Last sample failed: {stats['last_error']}")
+    
+    if rates.empty:
+        st.info(f"Collecting samples... rates appear after two samples ({stats['interval']:.0f}s apart)")
+        return
+    
+    latest = rates.iloc[-1]
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("⚡ TPS", f"{latest['tps']:,.1f}" if pd.notna(latest['tps']) else "-")
+    
+    with col2:
+        st.metric("↩️ Rollbacks/s", f"{latest['rollbacks_per_sec']:,.1f}" if pd.notna(latest['rollbacks_per_sec']) else "-")
+    
+    with col3:
+        st.metric("🎯 Cache Hit Ratio", f"{latest['cache_hit_ratio']:.1f}%" if pd.notna(latest['cache_hit_ratio']) else "-")
+    
+    with col4:
+        st.metric("🔗 Active / Total", f"{latest['active']:.0f} / {latest['backends']:.0f}")
+    
+    fig = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=('Transactions/s', 'Cache Hit Ratio (%)', 'Tuples/s', 'Connections')
+    )
+    
+    for column, name in (('commits_per_sec', 'Commits'), ('rollbacks_per_sec', 'Rollbacks')):
+        fig.add_trace(go.Scatter(x=rates.index, y=rates[column], name=name, mode='lines'), row=1, col=1)
+    
+    fig.add_trace(go.Scatter(x=rates.index, y=rates['cache_hit_ratio'], name='Hit ratio', mode='lines'), row=1, col=2)
+    
+    for column, name in (('tuples_returned_per_sec', 'Returned'), ('tuples_fetched_per_sec', 'Fetched'),
+                         ('tuples_inserted_per_sec', 'Inserted'), ('tuples_updated_per_sec', 'Updated'),
+                         ('tuples_deleted_per_sec', 'Deleted')):
+        fig.add_trace(go.Scatter(x=rates.index, y=rates[column], name=name, mode='lines'), row=2, col=1)
+    
+    for column, name in (('active', 'Active'), ('idle_in_transaction', 'Idle in transaction'),
+                         ('waiting', 'Waiting on locks')):
+        fig.add_trace(go.Scatter(x=rates.index, y=rates[column], name=name, mode='lines'), row=2, col=2)
+    
+    fig.update_layout(height=550, hovermode='x unified')
+    st.plotly_chart(fig, use_container_width=True)
+    
+    window = (rates.index[-1] - rates.index[0]).total_seconds()
+    st.caption(
+        f"{stats['samples']} of {stats['capacity']} samples buffered, every {stats['interval']:.0f}s "
+        f"(last {window / 60:.1f} min). The sampler is shared by every session on this database."
+    )
+
 def show_database_statistics(db_conn):
     """Display database statistics and charts"""
     st.subheader("📊 Database Statistics")
@@ -136,20 +199,29 @@ def show_table_analytics(db_conn):
         
         if not tables_df.empty:
             # Add row counts
-            row_counts = []
-            for _, table in tables_df.iterrows():
-                count = db_conn.get_table_row_count(table['schemaname'], table['tablename'])
-                row_counts.append(count)
+            count_mode = st.radio(
+                "Row counts", ROW_COUNT_MODES, horizontal=True,
+                key="dashboard_row_count_mode", help=ROW_COUNT_MODE_HELP
+            )
+            
+            with st.spinner("Loading row counts..."):
+                row_counts = get_row_counts(
+                    db_conn, count_mode, zip(tables_df['schemaname'], tables_df['tablename'])
+                )
+            
+            tables_df = tables_df.merge(row_counts, on=['schemaname', 'tablename'], how='left')
+            tables_df['row_count'] = tables_df['row_count'].fillna(0).astype('int64')
             
-            tables_df['row_count'] = row_counts
+            st.caption(describe_count_types(tables_df['count_type']))
             
             # Display table with row counts
             st.dataframe(
-                tables_df[['schemaname', 'tablename', 'row_count', 'hasindexes', 'hastriggers']],
+                tables_df[['schemaname', 'tablename', 'row_count', 'count_type', 'hasindexes', 'hastriggers']],
                 column_config={
                     'schemaname': 'Schema',
                     'tablename': 'Table Name',
                     'row_count': st.column_config.NumberColumn('Row Count', format="%d"),
+                    'count_type': 'Count Type',
                     'hasindexes': 'Has Indexes',
                     'hastriggers': 'Has Triggers'
                 },
@@ -165,7 +237,7 @@ def show_table_analytics(db_conn):
                         top_tables,
                         x='tablename',
                         y='row_count',
-                        title='Top 10 Tables by Row Count',
+                        title=f'Top 10 Tables by Row Count ({count_mode.lower()})',
                         labels={'row_count': 'Row Count', 'tablename': 'Table Name'}
                     )
                     fig_rows.update_xaxes(tickangle=45)
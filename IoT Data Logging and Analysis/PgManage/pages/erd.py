@@ -3,6 +3,17 @@ import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
+from database.catalog import get_catalog
+from database.erd_layout import (
+    STANDALONE_CLUSTER, build_graph, collapse_groups, foreign_key_edges, get_layout, neighbourhood, summarize_clusters
+)
+
+DETAIL_LEVELS = ["Schemas", "Clusters", "Tables"]
+RELKIND_LABELS = {'r': 'table', 'p': 'partitioned table', 'v': 'view', 'm': 'materialized view', 'f': 'foreign table'}
+# Databases with more tables open on the schema overview instead of every table
+FULL_DETAIL_LIMIT = 300
+# Text labels are drawn only when this few nodes are shown; hover always works
+LABEL_LIMIT = 150
 
 def show():
     """Display the ERD (Entity Relationship Diagram) page"""
@@ -15,7 +26,7 @@ def show():
     db_conn = st.session_state.db_connection
     
     # Main tabs
-    tab1, tab2, tab3 = st.tabs(["📊 Table Relationships", "📋 Schema Overview", "🔍 Relationship Details"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📊 Table Relationships", "📋 Schema Overview", "🔍 Relationship Details", "💥 Impact Analysis"])
     
     with tab1:
         show_erd_diagram(db_conn)
@@ -25,6 +36,9 @@ def show():
     
     with tab3:
         show_relationship_details(db_conn)
+    
+    with tab4:
+        show_impact_analysis(db_conn)
 
 def show_erd_diagram(db_conn):
     """Display interactive ERD diagram"""
@@ -32,59 +46,57 @@ def show_erd_diagram(db_conn):
     
     try:
         # Get all tables and their relationships
-        tables_query = """
-        SELECT 
-            t.table_schema,
-            t.table_name,
-            COUNT(c.column_name) as column_count
-        FROM information_schema.tables t
-        LEFT JOIN information_schema.columns c 
-            ON t.table_schema = c.table_schema 
-            AND t.table_name = c.table_name
-        WHERE t.table_type = 'BASE TABLE'
-            AND t.table_schema NOT IN ('information_schema', 'pg_catalog')
-        GROUP BY t.table_schema, t.table_name
-        ORDER BY t.table_schema, t.table_name
-        """
-        
-        tables_df = db_conn.execute_query(tables_query)
+        catalog = get_catalog(db_conn)
+        tables_df = catalog.tables[catalog.tables['table_type'] == 'BASE TABLE']
         
         if tables_df.empty:
             st.info("No tables found in the current database")
             return
         
         # Get foreign key relationships
-        fk_query = """
-        SELECT 
-            tc.table_schema as source_schema,
-            tc.table_name as source_table,
-            kcu.column_name as source_column,
-            ccu.table_schema as target_schema,
-            ccu.table_name as target_table,
-            ccu.column_name as target_column,
-            tc.constraint_name
-        FROM information_schema.table_constraints tc
-        JOIN information_schema.key_column_usage kcu
-            ON tc.constraint_name = kcu.constraint_name
-            AND tc.table_schema = kcu.table_schema
-        JOIN information_schema.constraint_column_usage ccu
-            ON ccu.constraint_name = tc.constraint_name
-            AND ccu.table_schema = tc.table_schema
-        WHERE tc.constraint_type = 'FOREIGN KEY'
-            AND tc.table_schema NOT IN ('information_schema', 'pg_catalog')
-        """
+        fk_df = catalog.foreign_keys
+        
+        labels = tables_df['table_schema'] + '.' + tables_df['table_name']
+        graph = build_graph(labels, foreign_key_edges(catalog.graph))
+        # Laid out once per schema version and shared by every session
+        layout = get_layout(graph)
+        
+        info = pd.DataFrame({
+            'node': graph.nodes,
+            'schema': [node.split('.', 1)[0] for node in graph.nodes],
+            'cluster': layout.clusters,
+            'degree': graph.degrees()
+        })
+        info['columns'] = info['node'].map(dict(zip(labels, tables_df['column_count']))).fillna(0).astype(int)
         
-        fk_df = db_conn.execute_query(fk_query)
+        detail = show_erd_controls(graph, info)
+        if detail is None:
+            return
+        
+        level, groups, expanded, visible = detail
+        nodes, edges = collapse_groups(graph, layout.positions, groups, expanded)
+        if visible is not None:
+            nodes = nodes[nodes['label'].isin(visible)]
+            edges = edges[edges['source'].isin(nodes.index) & edges['target'].isin(nodes.index)]
+        
+        st.caption(
+            f"{len(graph.nodes):,} tables · {len(graph.edges):,} related pairs · "
+            f"showing {len(nodes):,} nodes and {len(edges):,} links"
+        )
         
         # Create interactive diagram
-        fig = create_erd_visualization(tables_df, fk_df)
+        fig = create_erd_visualization(nodes, edges, info, level)
         st.plotly_chart(fig, use_container_width=True)
         
+        if level == "Clusters":
+            show_cluster_summary(graph, layout.clusters)
+        
         # Show relationships summary
         if not fk_df.empty:
             st.subheader("🔗 Relationship Summary")
             
-            relationship_summary = fk_df.groupby(['source_table', 'target_table']).size().reset_index(name='relationship_count')
+            relationship_summary = fk_df.drop_duplicates(['source_schema', 'source_table', 'constraint_name']).groupby(
+                ['source_table', 'target_table']).size().reset_index(name='relationship_count')
             
             st.dataframe(
                 relationship_summary,
@@ -102,100 +114,137 @@ def show_erd_diagram(db_conn):
     except Exception as e:
         st.error(f"Error creating ERD: {str(e)}")
 
-def create_erd_visualization(tables_df, fk_df):
-    """Create interactive ERD visualization using Plotly"""
-    fig = go.Figure()
-    
-    # Position tables in a grid layout
-    import math
-    num_tables = len(tables_df)
-    cols = math.ceil(math.sqrt(num_tables))
-    rows = math.ceil(num_tables / cols)
+def show_erd_controls(graph, info):
+    """Choose the level of detail; returns (level, group of each table, expanded groups, visible labels or None)"""
+    col1, col2 = st.columns([1, 2])
     
-    table_positions = {}
+    with col1:
+        level = st.radio(
+            "Detail", DETAIL_LEVELS, horizontal=True, key="erd_detail",
+            index=DETAIL_LEVELS.index("Tables" if len(graph.nodes) <= FULL_DETAIL_LIMIT else "Schemas"),
+            help="Schemas and clusters draw one node per group; expand a group to see its tables"
+        )
     
-    for i, (_, table) in enumerate(tables_df.iterrows()):
-        row = i // cols
-        col = i % cols
+    if level == "Tables":
+        schemas = sorted(info['schema'].unique())
         
-        x = col * 200 + 100
-        y = row * 150 + 100
+        with col2:
+            selected = st.multiselect("Schemas", schemas, default=schemas if len(graph.nodes) <= FULL_DETAIL_LIMIT else schemas[:1],
+                                      key="erd_schemas")
         
-        table_name = f"{table['table_schema']}.{table['table_name']}"
-        table_positions[table_name] = (x, y)
+        col1, col2 = st.columns([2, 1])
         
-        # Add table rectangle
-        fig.add_shape(
-            type="rect",
-            x0=x-60, y0=y-30, x1=x+60, y1=y+30,
-            line=dict(color="RoyalBlue", width=2),
-            fillcolor="LightBlue",
-            opacity=0.7
-        )
+        with col1:
+            focus = st.selectbox("Focus on table", ["(none)"] + list(graph.nodes), key="erd_focus",
+                                 help="Show only this table and the tables within a few foreign keys of it")
+        
+        with col2:
+            hops = st.slider("Hops", 1, 4, 1, key="erd_hops", disabled=focus == "(none)")
         
-        # Add table name
-        fig.add_annotation(
-            x=x, y=y,
-            text=f"<b>{table['table_name']}</b><br>{table['column_count']} columns",
-            showarrow=False,
-            font=dict(size=10, color="DarkBlue"),
-            bgcolor="white",
-            bordercolor="blue",
-            borderwidth=1
+        if focus != "(none)":
+            visible = neighbourhood(graph, [focus], hops)
+        else:
+            visible = info.loc[info['schema'].isin(selected), 'node'].tolist()
+        
+        if not visible:
+            st.info("Select at least one schema or a table to focus on")
+            return None
+        return level, info['schema'].tolist(), set(info['schema']), visible
+    
+    groups = info['schema'] if level == "Schemas" else info['cluster'].map(cluster_name)
+    sizes = groups.value_counts()
+    
+    with col2:
+        expanded = st.multiselect(
+            f"Expand {level.lower()}", sizes.index.tolist(), key=f"erd_expand_{level}",
+            format_func=lambda group: f"{group} ({sizes[group]} tables)"
         )
     
-    # Add relationship lines
-    if not fk_df.empty:
-        for _, fk in fk_df.iterrows():
-            source_table = f"{fk['source_schema']}.{fk['source_table']}"
-            target_table = f"{fk['target_schema']}.{fk['target_table']}"
-            
-            if source_table in table_positions and target_table in table_positions:
-                x1, y1 = table_positions[source_table]
-                x2, y2 = table_positions[target_table]
-                
-                fig.add_shape(
-                    type="line",
-                    x0=x1, y0=y1, x1=x2, y1=y2,
-                    line=dict(color="Red", width=2, dash="dash"),
-                    opacity=0.6
-                )
+    return level, groups.tolist(), expanded, None
+
+def cluster_name(cluster):
+    return "Standalone tables" if cluster == STANDALONE_CLUSTER else f"Cluster {cluster + 1}"
+
+def create_erd_visualization(nodes, edges, info, level):
+    """Draw nodes and foreign keys as one WebGL trace each, so thousands of tables stay responsive"""
+    fig = go.Figure()
+    
+    # All links in one trace, separated by gaps
+    x, y = [], []
+    for source, target in zip(edges['source'], edges['target']):
+        x += [nodes.at[source, 'x'], nodes.at[target, 'x'], None]
+        y += [nodes.at[source, 'y'], nodes.at[target, 'y'], None]
+    
+    fig.add_trace(go.Scattergl(
+        x=x, y=y,
+        mode='lines',
+        line=dict(color='rgba(220, 80, 80, 0.45)', width=1),
+        hoverinfo='skip'
+    ))
+    
+    details = nodes.join(info.set_index('node'), on='label')
+    expanded = nodes['expanded'].astype(bool)
+    hover = [
+        f"<b>{row.label}</b><br>{row.columns:.0f} columns · {row.degree:.0f} foreign key links<br>{cluster_name(row.cluster)}"
+        if is_table else f"<b>{row.label}</b><br>{row.tables} tables"
+        for row, is_table in zip(details.itertuples(), expanded)
+    ]
+    text = [label.split('.', 1)[1] if is_table else label for label, is_table in zip(nodes['label'], expanded)]
+    
+    fig.add_trace(go.Scattergl(
+        x=nodes['x'], y=nodes['y'],
+        mode='markers+text' if len(nodes) <= LABEL_LIMIT else 'markers',
+        text=text,
+        textposition='top center',
+        hovertext=hover,
+        hoverinfo='text',
+        marker=dict(
+            size=[8 if is_table else min(60, 10 + 3 * count ** 0.5) for is_table, count in zip(expanded, nodes['tables'])],
+            color=pd.Series(nodes['group'].astype(str)).astype('category').cat.codes,
+            colorscale='Turbo',
+            line=dict(color='white', width=1)
+        )
+    ))
     
     # Update layout
     fig.update_layout(
-        title="Database Entity Relationship Diagram",
+        title=f"Database Entity Relationship Diagram · {level}",
         showlegend=False,
         xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-        height=600,
-        margin=dict(l=50, r=50, t=50, b=50)
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False, scaleanchor='x'),
+        height=700,
+        margin=dict(l=20, r=20, t=50, b=20),
+        dragmode='pan'
     )
     
     return fig
 
+def show_cluster_summary(graph, clusters):
+    """Display the clusters of closely related tables"""
+    summary = summarize_clusters(graph, clusters)
+    summary['cluster'] = summary['cluster'].map(cluster_name)
+    
+    st.subheader("🧩 Clusters")
+    st.caption("Tables grouped by how densely their foreign keys connect them. External links are foreign keys to tables in other clusters.")
+    st.dataframe(
+        summary.sort_values('tables', ascending=False),
+        column_config={
+            'cluster': 'Cluster',
+            'tables': st.column_config.NumberColumn('Tables', format="%d"),
+            'hub': 'Most Connected Table',
+            'external_edges': st.column_config.NumberColumn('External Links', format="%d")
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+
 def show_schema_overview(db_conn):
     """Display schema overview with statistics"""
     st.subheader("📋 Schema Overview")
     
     try:
         # Get schema statistics
-        schema_query = """
-        SELECT 
-            table_schema,
-            COUNT(DISTINCT table_name) as table_count,
-            COUNT(column_name) as total_columns,
-            COUNT(DISTINCT CASE WHEN data_type LIKE '%char%' OR data_type = 'text' THEN column_name END) as text_columns,
-            COUNT(DISTINCT CASE WHEN data_type IN ('integer', 'bigint', 'smallint', 'numeric', 'decimal', 'real', 'double precision') THEN column_name END) as numeric_columns,
-            COUNT(DISTINCT CASE WHEN data_type LIKE '%timestamp%' OR data_type = 'date' THEN column_name END) as date_columns
-        FROM information_schema.tables t
-        JOIN information_schema.columns c USING (table_schema, table_name)
-        WHERE table_type = 'BASE TABLE'
-            AND table_schema NOT IN ('information_schema', 'pg_catalog')
-        GROUP BY table_schema
-        ORDER BY table_count DESC
-        """
-        
-        schema_df = db_conn.execute_query(schema_query)
+        schema_df = summarize_schemas(get_catalog(db_conn))
         
         if not schema_df.empty:
             # Display schema statistics
@@ -228,37 +277,47 @@ def show_schema_overview(db_conn):
     except Exception as e:
         st.error(f"Error loading schema overview: {str(e)}")
 
+def summarize_schemas(catalog):
+    """Per-schema table and column-type counts for base tables"""
+    base_tables = catalog.tables[catalog.tables['table_type'] == 'BASE TABLE']
+    columns = catalog.columns.merge(base_tables[['table_schema', 'table_name']], on=['table_schema', 'table_name'])
+    
+    if columns.empty:
+        return pd.DataFrame()
+    
+    data_type = columns['data_type']
+    columns = columns.assign(
+        is_text=data_type.str.contains('char') | (data_type == 'text'),
+        is_numeric=data_type.isin(['integer', 'bigint', 'smallint', 'numeric', 'real', 'double precision']),
+        is_date=data_type.str.contains('timestamp') | (data_type == 'date')
+    )
+    
+    schema_df = columns.groupby('table_schema').agg(
+        table_count=('table_name', 'nunique'),
+        total_columns=('column_name', 'size'),
+        text_columns=('is_text', 'sum'),
+        numeric_columns=('is_numeric', 'sum'),
+        date_columns=('is_date', 'sum')
+    ).reset_index()
+    
+    return schema_df.sort_values('table_count', ascending=False)
+
 def show_relationship_details(db_conn):
     """Display detailed relationship information"""
     st.subheader("🔍 Relationship Details")
     
     try:
         # Get detailed foreign key information
-        detailed_fk_query = """
-        SELECT 
-            tc.table_schema || '.' || tc.table_name as source_table,
-            kcu.column_name as source_column,
-            ccu.table_schema || '.' || ccu.table_name as target_table,
-            ccu.column_name as target_column,
-            tc.constraint_name,
-            rc.update_rule,
-            rc.delete_rule
-        FROM information_schema.table_constraints tc
-        JOIN information_schema.key_column_usage kcu
-            ON tc.constraint_name = kcu.constraint_name
-            AND tc.table_schema = kcu.table_schema
-        JOIN information_schema.constraint_column_usage ccu
-            ON ccu.constraint_name = tc.constraint_name
-            AND ccu.table_schema = tc.table_schema
-        JOIN information_schema.referential_constraints rc
-            ON tc.constraint_name = rc.constraint_name
-            AND tc.table_schema = rc.constraint_schema
-        WHERE tc.constraint_type = 'FOREIGN KEY'
-            AND tc.table_schema NOT IN ('information_schema', 'pg_catalog')
-        ORDER BY tc.table_schema, tc.table_name, kcu.column_name
-        """
-        
-        detailed_fk_df = db_conn.execute_query(detailed_fk_query)
+        fk_df = get_catalog(db_conn).foreign_keys
+        detailed_fk_df = pd.DataFrame({
+            'source_table': fk_df['source_schema'] + '.' + fk_df['source_table'],
+            'source_column': fk_df['source_column'],
+            'target_table': fk_df['target_schema'] + '.' + fk_df['target_table'],
+            'target_column': fk_df['target_column'],
+            'constraint_name': fk_df['constraint_name'],
+            'update_rule': fk_df['update_rule'],
+            'delete_rule': fk_df['delete_rule']
+        })
         
         if not detailed_fk_df.empty:
             # Search functionality
@@ -330,4 +389,91 @@ def show_relationship_details(db_conn):
                 """)
     
     except Exception as e:
-        st.error(f"Error loading relationship details: {str(e)}")
\ No newline at end of file
+        st.error(f"Error loading relationship details: {str(e)}")
+
+def show_impact_analysis(db_conn):
+    """Display what a change to a table or view reaches through foreign keys and views"""
+    st.subheader("💥 Impact Analysis")
+    
+    try:
+        catalog = get_catalog(db_conn)
+        graph = catalog.graph
+        
+        options = catalog.table_options()
+        if not options:
+            st.info("No tables found in the current database")
+            return
+        
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            selected = st.selectbox("Table or view", options, key="erd_impact_relation")
+        
+        with col2:
+            depth = st.slider("Levels", 1, 10, 3, key="erd_impact_depth")
+        
+        info = catalog.table_info(*selected.split('.', 1))
+        oid = int(info['table_oid'])
+        
+        impact = graph.impact(oid, depth)
+        parents = graph.references(oid)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("References", len(parents))
+        
+        with col2:
+            st.metric("Child Tables", int((impact['via'] == 'foreign key').sum()))
+        
+        with col3:
+            st.metric("Dependent Views", int((impact['via'] == 'view').sum()))
+        
+        with col4:
+            st.metric("Cascading Deletes", int((impact['delete_rule'] == 'CASCADE').sum()))
+        
+        if impact.empty:
+            st.success(f"✅ Nothing references {selected}")
+        else:
+            st.caption(
+                "Tables whose foreign keys point here, and views that read it, followed transitively. "
+                "Dropping it needs CASCADE to remove the views and constraints listed; deleting rows "
+                "cascades only along CASCADE delete rules and fails on RESTRICT or NO ACTION."
+            )
+            st.dataframe(
+                impact.assign(relkind=impact['relkind'].map(RELKIND_LABELS).fillna(impact['relkind'])),
+                column_config={
+                    'depth': st.column_config.NumberColumn('Level', format="%d"),
+                    'relation': 'Affected',
+                    'relkind': 'Kind',
+                    'via': 'Through',
+                    'parent': 'Depends On',
+                    'constraint_name': 'Constraint',
+                    'columns': 'Columns',
+                    'delete_rule': 'On Delete'
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        if parents:
+            st.markdown("**References**")
+            st.dataframe(
+                pd.DataFrame([{
+                    'target': graph.relations[edge.target].label,
+                    'constraint_name': edge.constraint_name,
+                    'columns': ', '.join(f"{source} → {target}" for source, target in zip(edge.source_columns, edge.target_columns)),
+                    'delete_rule': edge.delete_rule
+                } for edge in parents]),
+                column_config={
+                    'target': 'Referenced Table',
+                    'constraint_name': 'Constraint',
+                    'columns': 'Columns',
+                    'delete_rule': 'On Delete'
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+    
+    except Exception as e:
+        st.error(f"Error analyzing impact: {str(e)}")
@@ -1,5 +1,9 @@
+import datetime
 import streamlit as st
 import pandas as pd
+from database.ddl_feed import (
+    get_ddl_listener, install_ddl_feed, is_ddl_feed_installed, start_ddl_listener, uninstall_ddl_feed
+)
 
 def show():
     """Display the events page"""
@@ -19,6 +23,7 @@ def show():
     
     with tab2:
         show_event_triggers(db_conn)
+        show_ddl_change_feed(db_conn)
     
     with tab3:
         show_event_monitoring(db_conn)
@@ -287,6 +292,73 @@ def show_event_triggers(db_conn):
     except Exception as e:
         st.error(f"Error loading event triggers: {str(e)}")
 
+def show_ddl_change_feed(db_conn):
+    """Install the PgManage DDL event triggers and show the listener status"""
+    st.subheader("🔔 Catalog Change Feed")
+    
+    st.caption(
+        "Optional event triggers that send schema changes over LISTEN/NOTIFY, so cached "
+        "table, index and routine metadata is refreshed as soon as any client changes it. "
+        "Installing requires superuser."
+    )
+    
+    try:
+        installed = is_ddl_feed_installed(db_conn)
+        listener = get_ddl_listener(db_conn)
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric("Event Triggers", "Installed" if installed else "Not installed")
+        
+        with col2:
+            st.metric("Listener", "Listening" if listener and listener.listening else "Stopped")
+        
+        with col3:
+            st.metric("Changes Received", listener.notification_count if listener else 0)
+        
+        if listener and listener.last_error:
+            st.warning(f"Listener reconnecting: {listener.last_error}")
+        
+        if installed:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                if st.button("▶️ Start Listener", use_container_width=True, disabled=bool(listener and listener.is_alive())):
+                    start_ddl_listener(db_conn)
+                    st.rerun()
+            
+            with col2:
+                if st.button("🗑️ Uninstall Change Feed", use_container_width=True):
+                    uninstall_ddl_feed(db_conn)
+                    st.success("✅ Change feed removed")
+                    st.rerun()
+        else:
+            if st.button("📥 Install Change Feed", use_container_width=True):
+                install_ddl_feed(db_conn)
+                st.success("✅ Change feed installed")
+                st.rerun()
+        
+        if listener and listener.recent_changes:
+            changes_df = pd.DataFrame(list(listener.recent_changes))
+            changes_df['received_at'] = changes_df['received_at'].map(datetime.datetime.fromtimestamp)
+            
+            st.dataframe(
+                changes_df,
+                column_config={
+                    'received_at': st.column_config.DatetimeColumn('Received'),
+                    'command_tag': 'Command',
+                    'object_type': 'Object Type',
+                    'schema_name': 'Schema',
+                    'object_identity': 'Object'
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+    
+    except Exception as e:
+        st.error(f"Error loading change feed: {str(e)}")
+
 def show_event_monitoring(db_conn):
     """Display event monitoring information"""
     st.subheader("📊 Event Monitoring")
@@ -305,7 +377,7 @@ def show_event_monitoring(db_conn):
         activity_query = """
         SELECT 
             schemaname,
-            tablename,
+            relname as tablename,
             n_tup_ins + n_tup_upd + n_tup_del as total_operations
         FROM pg_stat_user_tables
         WHERE n_tup_ins + n_tup_upd + n_tup_del > 0
@@ -1,6 +1,15 @@
 import streamlit as st
 import pandas as pd
-from database.queries import FUNCTION_QUERIES
+import plotly.express as px
+from psycopg2 import sql
+from database.catalog import get_catalog
+from database.function_bench import (
+    CONCURRENCY_CHOICES, MAX_BENCHMARK_SECONDS, PERCENTILES, BenchmarkArgument, BenchmarkConfig, BenchmarkResult,
+    FunctionBenchmark, can_randomize, compare_results, max_concurrency
+)
+from database.routines import (
+    call_arguments, get_routine_parameters, get_routine_source, routine_call, routine_label, search_routines
+)
 
 def show():
     """Display the functions page"""
@@ -12,172 +21,159 @@ def show():
     
     db_conn = st.session_state.db_connection
     
+    try:
+        # Signatures only, shared with every page through the catalog snapshot
+        routines = get_catalog(db_conn).routines
+    except Exception as e:
+        st.error(f"Error loading functions: {str(e)}")
+        return
+    
     # Main tabs
     tab1, tab2, tab3 = st.tabs(["📊 All Functions", "🔍 Function Details", "▶️ Execute Function"])
     
     with tab1:
-        show_all_functions(db_conn)
+        show_all_functions(routines)
     
     with tab2:
-        show_function_details(db_conn)
+        show_function_details(db_conn, routines)
     
     with tab3:
-        show_function_executor(db_conn)
+        show_function_executor(db_conn, routines)
 
-def show_all_functions(db_conn):
+def select_routine(routines, label, key):
+    """Search box plus a select box of matching routines; returns the chosen routine's row"""
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        search_term = st.text_input("🔍 Search", placeholder="Name, schema or argument type...", key=f"{key}_search")
+    
+    with col2:
+        include_extensions = st.checkbox("Include extension routines", value=False, key=f"{key}_extensions")
+    
+    matches = search_routines(routines, search_term, include_extensions=include_extensions)
+    if matches.empty:
+        st.info("No matching functions or procedures")
+        return None
+    
+    by_oid = matches.set_index('routine_oid', drop=False)
+    selected = st.selectbox(
+        label, by_oid.index.tolist(), key=key,
+        format_func=lambda oid: f"{routine_label(by_oid.loc[oid])} ({by_oid.loc[oid, 'routine_type']})"
+    )
+    return by_oid.loc[selected]
+
+def show_all_functions(routines):
     """Display all functions and procedures"""
     st.subheader("📊 All Functions & Procedures")
     
-    try:
-        # Get all functions and procedures
-        functions_df = db_conn.execute_query(FUNCTION_QUERIES['all_functions'])
-        
-        if not functions_df.empty:
-            # Filter options
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                search_term = st.text_input("🔍 Search functions", placeholder="Enter function name or schema...")
-            
-            with col2:
-                routine_types = functions_df['routine_type'].unique()
-                selected_type = st.selectbox("Filter by type", ['All'] + list(routine_types))
-            
-            # Apply filters
-            filtered_df = functions_df.copy()
-            
-            if search_term:
-                filtered_df = filtered_df[
-                    filtered_df['routine_name'].str.contains(search_term, case=False, na=False) |
-                    filtered_df['routine_schema'].str.contains(search_term, case=False, na=False)
-                ]
-            
-            if selected_type != 'All':
-                filtered_df = filtered_df[filtered_df['routine_type'] == selected_type]
-            
-            # Display functions
-            st.dataframe(
-                filtered_df[['routine_schema', 'routine_name', 'routine_type', 'return_type']],
-                column_config={
-                    'routine_schema': 'Schema',
-                    'routine_name': 'Name',
-                    'routine_type': 'Type',
-                    'return_type': 'Return Type'
-                },
-                use_container_width=True,
-                hide_index=True
-            )
-            
-            # Summary statistics
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.metric("Total Functions", len(filtered_df[filtered_df['routine_type'] == 'FUNCTION']))
-            
-            with col2:
-                st.metric("Total Procedures", len(filtered_df[filtered_df['routine_type'] == 'PROCEDURE']))
-            
-            with col3:
-                schemas = filtered_df['routine_schema'].nunique()
-                st.metric("Schemas", schemas)
-        else:
-            st.info("No functions or procedures found in the current database")
+    if routines.empty:
+        st.info("No functions or procedures found in the current database")
+        return
     
-    except Exception as e:
-        st.error(f"Error loading functions: {str(e)}")
+    # Filter options
+    col1, col2, col3 = st.columns([2, 1, 1])
+    
+    with col1:
+        search_term = st.text_input("🔍 Search functions", placeholder="Name, schema or argument type, e.g. 'sensor integer'...")
+    
+    with col2:
+        routine_types = sorted(routines['routine_type'].unique())
+        selected_type = st.selectbox("Filter by type", ['All'] + routine_types)
+    
+    with col3:
+        include_extensions = st.checkbox("Include extension routines", value=False,
+                                         help="Routines installed by extensions such as PostGIS or pgcrypto")
+    
+    # Apply filters
+    filtered_df = search_routines(routines, search_term, None if selected_type == 'All' else selected_type,
+                                  include_extensions)
+    
+    # Display functions
+    st.dataframe(
+        filtered_df[['routine_schema', 'routine_name', 'arguments', 'routine_type', 'return_type', 'language', 'extension']],
+        column_config={
+            'routine_schema': 'Schema',
+            'routine_name': 'Name',
+            'arguments': st.column_config.TextColumn('Arguments', width='large'),
+            'routine_type': 'Type',
+            'return_type': 'Return Type',
+            'language': 'Language',
+            'extension': 'Extension'
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    # Summary statistics
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Total Functions", len(filtered_df[filtered_df['routine_type'] == 'FUNCTION']))
+    
+    with col2:
+        st.metric("Total Procedures", len(filtered_df[filtered_df['routine_type'] == 'PROCEDURE']))
+    
+    with col3:
+        st.metric("Schemas", filtered_df['routine_schema'].nunique())
+    
+    with col4:
+        st.metric("From Extensions", int(routines['extension'].notna().sum()))
 
-def show_function_details(db_conn):
+def show_function_details(db_conn, routines):
     """Display detailed information about a specific function"""
     st.subheader("🔍 Function Details")
     
+    if routines.empty:
+        st.info("No functions or procedures available")
+        return
+    
     try:
-        # Get list of functions for selection
-        functions_df = db_conn.execute_query(FUNCTION_QUERIES['all_functions'])
+        routine = select_routine(routines, "Select a function or procedure", "details_function_select")
+        if routine is None:
+            return
         
-        if not functions_df.empty:
-            # Function selection
-            function_options = [
-                f"{row['routine_schema']}.{row['routine_name']} ({row['routine_type']})"
-                for _, row in functions_df.iterrows()
-            ]
-            
-            selected_function = st.selectbox("Select a function or procedure", function_options)
-            
-            if selected_function:
-                # Parse selection
-                parts = selected_function.split(' (')
-                schema_and_name = parts[0]
-                routine_type = parts[1].rstrip(')')
-                schema, routine_name = schema_and_name.split('.', 1)
-                
-                # Get function details
-                function_row = functions_df[
-                    (functions_df['routine_schema'] == schema) &
-                    (functions_df['routine_name'] == routine_name) &
-                    (functions_df['routine_type'] == routine_type)
-                ].iloc[0]
-                
-                # Display function information
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.write(f"**Schema:** {function_row['routine_schema']}")
-                    st.write(f"**Name:** {function_row['routine_name']}")
-                    st.write(f"**Type:** {function_row['routine_type']}")
-                
-                with col2:
-                    st.write(f"**Return Type:** {function_row['return_type']}")
-                
-                # Show parameters
-                st.subheader("📋 Parameters")
-                show_function_parameters(db_conn, schema, routine_name)
-                
-                # Show function source code
-                st.subheader("📝 Source Code")
-                if pd.notna(function_row['routine_definition']):
-                    st.code(function_row['routine_definition'], language='sql')
-                elif pd.notna(function_row['source_code']):
-                    st.code(function_row['source_code'], language='sql')
-                else:
-                    st.info("Source code not available")
+        # Display function information
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.write(f"**Schema:** {routine['routine_schema']}")
+            st.write(f"**Name:** {routine['routine_name']}")
+            st.write(f"**Type:** {routine['routine_type']}")
+        
+        with col2:
+            st.write(f"**Return Type:** {routine['return_type']}")
+            st.write(f"**Language:** {routine['language']}")
+            if pd.notna(routine['extension']):
+                st.write(f"**Extension:** {routine['extension']}")
+        
+        # Show parameters
+        st.subheader("📋 Parameters")
+        show_function_parameters(db_conn, routine)
+        
+        # Source is fetched for this routine only, then served from cache
+        st.subheader("📝 Source Code")
+        source = get_routine_source(db_conn, routine)
+        if source:
+            st.code(source, language='sql')
         else:
-            st.info("No functions or procedures available")
+            st.info("Source code not available")
     
     except Exception as e:
         st.error(f"Error loading function details: {str(e)}")
 
-def show_function_parameters(db_conn, schema, routine_name):
+def show_function_parameters(db_conn, routine):
     """Display function parameters"""
     try:
-        # Get function parameters using information_schema
-        params_query = """
-        SELECT 
-            parameter_name,
-            data_type,
-            parameter_mode,
-            ordinal_position
-        FROM information_schema.parameters 
-        WHERE specific_schema = %s AND specific_name = %s
-        ORDER BY ordinal_position
-        """
+        params_df = get_routine_parameters(db_conn, routine)
         
-        cursor = db_conn.connection.cursor()
-        cursor.execute(params_query, (schema, routine_name))
-        parameters = cursor.fetchall()
-        cursor.close()
-        
-        if parameters:
-            params_df = pd.DataFrame(parameters, columns=[
-                'Parameter Name', 'Data Type', 'Mode', 'Position'
-            ])
-            
+        if not params_df.empty:
             st.dataframe(
                 params_df,
                 column_config={
-                    'Parameter Name': 'Name',
-                    'Data Type': 'Type',
-                    'Mode': 'Mode',
-                    'Position': st.column_config.NumberColumn('Pos')
+                    'parameter_name': 'Name',
+                    'data_type': 'Type',
+                    'parameter_mode': 'Mode',
+                    'ordinal_position': st.column_config.NumberColumn('Pos')
                 },
                 use_container_width=True,
                 hide_index=True
@@ -188,95 +184,273 @@ def show_function_parameters(db_conn, schema, routine_name):
     except Exception as e:
         st.error(f"Error loading parameters: {str(e)}")
 
-def show_function_executor(db_conn):
+def show_function_executor(db_conn, routines):
     """Display function execution interface"""
     st.subheader("▶️ Execute Function")
     
+    if routines.empty:
+        st.info("No functions or procedures available for execution")
+        return
+    
     try:
-        # Get list of functions for selection
-        functions_df = db_conn.execute_query(FUNCTION_QUERIES['all_functions'])
+        routine = select_routine(routines, "Select a function to execute", "exec_function_select")
+        if routine is None:
+            return
         
-        if not functions_df.empty:
-            # Function selection
-            function_options = [
-                f"{row['routine_schema']}.{row['routine_name']} ({row['routine_type']})"
-                for _, row in functions_df.iterrows()
-            ]
+        arguments = call_arguments(routine, get_routine_parameters(db_conn, routine))
+        
+        mode = st.radio("Mode", ["Run once", "Benchmark"], horizontal=True, key="exec_function_mode",
+                        help="Benchmark calls the routine repeatedly and reports its latency distribution")
+        
+        if mode == "Benchmark":
+            show_function_benchmark(db_conn, routine, arguments)
+            return
+        
+        # Create input form
+        with st.form("function_execution_form"):
+            st.write(f"**Executing:** {routine_label(routine)}")
             
-            selected_function = st.selectbox("Select a function to execute", function_options, key="exec_function_select")
+            values = []
+            if not arguments.empty:
+                st.write("**Parameters:**")
+                for param in arguments.itertuples():
+                    if param.parameter_mode == 'OUT':
+                        values.append('')
+                        continue
+                    values.append(st.text_input(
+                        f"{param.parameter_name or f'${param.ordinal_position}'} ({param.data_type})",
+                        key=f"param_{routine['routine_oid']}_{param.ordinal_position}",
+                        help="Leave empty for NULL" + ("; an array literal such as {1,2,3}" if param.parameter_mode == 'VARIADIC' else "")
+                    ))
             
-            if selected_function:
-                # Parse selection
-                parts = selected_function.split(' (')
-                schema_and_name = parts[0]
-                routine_type = parts[1].rstrip(')')
-                schema, routine_name = schema_and_name.split('.', 1)
-                
-                # Get function parameters
-                params_query = """
-                SELECT 
-                    parameter_name,
-                    data_type,
-                    parameter_mode,
-                    ordinal_position
-                FROM information_schema.parameters 
-                WHERE specific_schema = %s AND specific_name = %s
-                AND parameter_mode IN ('IN', 'INOUT')
-                ORDER BY ordinal_position
-                """
-                
-                cursor = db_conn.connection.cursor()
-                cursor.execute(params_query, (schema, routine_name))
-                parameters = cursor.fetchall()
-                cursor.close()
-                
-                # Create input form
-                with st.form("function_execution_form"):
-                    st.write(f"**Executing:** {schema}.{routine_name}")
+            execute_button = st.form_submit_button("🚀 Execute Function")
+            
+            if execute_button:
+                try:
+                    literals = [sql.Literal(value) if value != '' else sql.SQL("NULL") for value in values]
+                    execute_query = routine_call(routine, arguments, literals).as_string(db_conn.connection)
                     
-                    param_values = {}
-                    if parameters:
-                        st.write("**Parameters:**")
-                        for param_name, data_type, param_mode, position in parameters:
-                            if param_name:  # Skip unnamed parameters
-                                param_values[param_name] = st.text_input(
-                                    f"{param_name} ({data_type})",
-                                    key=f"param_{param_name}_{position}"
-                                )
+                    st.code(execute_query, language='sql')
                     
-                    execute_button = st.form_submit_button("🚀 Execute Function")
+                    # Execute function
+                    result = db_conn.execute_query(execute_query)
                     
-                    if execute_button:
-                        try:
-                            # Build function call
-                            if param_values:
-                                param_list = [f"'{value}'" if value else 'NULL' for value in param_values.values()]
-                                param_string = ', '.join(param_list)
-                            else:
-                                param_string = ''
-                            
-                            if routine_type == 'FUNCTION':
-                                execute_query = f'SELECT "{schema}"."{routine_name}"({param_string})'
-                            else:  # PROCEDURE
-                                execute_query = f'CALL "{schema}"."{routine_name}"({param_string})'
-                            
-                            st.code(execute_query, language='sql')
-                            
-                            # Execute function
-                            result = db_conn.execute_query(execute_query)
-                            
-                            if result is not None and not result.empty:
-                                st.success("✅ Function executed successfully!")
-                                st.subheader("📊 Result")
-                                st.dataframe(result, use_container_width=True)
-                            else:
-                                st.success("✅ Function executed successfully!")
-                                st.info("Function executed with no return value")
-                        
-                        except Exception as e:
-                            st.error(f"❌ Error executing function: {str(e)}")
-        else:
-            st.info("No functions or procedures available for execution")
+                    if result is not None and not result.empty:
+                        st.success("✅ Function executed successfully!")
+                        st.subheader("📊 Result")
+                        st.dataframe(result, use_container_width=True)
+                    else:
+                        st.success("✅ Function executed successfully!")
+                        st.info("Function executed with no return value")
+                
+                except Exception as e:
+                    st.error(f"❌ Error executing function: {str(e)}")
     
     except Exception as e:
         st.error(f"Error loading function executor: {str(e)}")
+
+def show_function_benchmark(db_conn, routine, arguments):
+    """Call a routine repeatedly, optionally concurrently, and report latencies and server-side time"""
+    pool = db_conn.get_pool()
+    concurrency_choices = [workers for workers in CONCURRENCY_CHOICES if workers <= max_concurrency(pool)]
+    
+    with st.form("function_benchmark_form"):
+        st.write(f"**Benchmarking:** {routine_label(routine)}")
+        
+        bench_arguments = []
+        if not arguments.empty:
+            st.write("**Parameters:**")
+            for param in arguments.itertuples():
+                if param.parameter_mode == 'OUT':
+                    bench_arguments.append(BenchmarkArgument(param.data_type, param.parameter_mode))
+                    continue
+                
+                col1, col2 = st.columns([3, 1])
+                
+                with col1:
+                    value = st.text_input(
+                        f"{param.parameter_name or f'${param.ordinal_position}'} ({param.data_type})",
+                        key=f"bench_param_{routine['routine_oid']}_{param.ordinal_position}",
+                        help="Leave empty for NULL"
+                    )
+                
+                with col2:
+                    randomize = st.checkbox(
+                        "Random", key=f"bench_random_{routine['routine_oid']}_{param.ordinal_position}",
+                        disabled=not can_randomize(param.data_type),
+                        help="Draw a new value for every call" if can_randomize(param.data_type) else f"No generator for {param.data_type}"
+                    )
+                
+                bench_arguments.append(BenchmarkArgument(param.data_type, param.parameter_mode, value, randomize))
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            stop_after = st.radio("Stop after", ["Calls", "Seconds"], horizontal=True, key="bench_stop_after")
+        
+        with col2:
+            amount = st.number_input("Calls / seconds", min_value=1, max_value=1000000, value=1000, key="bench_amount",
+                                     help=f"Runs end after {MAX_BENCHMARK_SECONDS} seconds at most")
+        
+        with col3:
+            concurrency = st.selectbox("Connections", concurrency_choices, key="bench_concurrency")
+        
+        with col4:
+            warmup = st.number_input("Warm-up calls", min_value=0, max_value=1000, value=10, key="bench_warmup",
+                                     help="Untimed calls per connection first, so plan caching doesn't skew the start")
+        
+        commit = st.checkbox("Commit every call", value=False, key="bench_commit",
+                             help="Off: every call is rolled back, so writes made by the routine are not kept")
+        label = st.text_input("Run label", placeholder="e.g. before rewrite", key="bench_label")
+        
+        run_button = st.form_submit_button("⏱️ Run Benchmark")
+    
+    if run_button:
+        config = BenchmarkConfig(
+            calls=int(amount) if stop_after == "Calls" else None,
+            seconds=float(amount) if stop_after == "Seconds" else None,
+            concurrency=concurrency,
+            warmup=int(warmup),
+            commit=commit
+        )
+        try:
+            with st.spinner(f"Calling {routine['routine_name']} on {concurrency} connection(s)..."):
+                result = FunctionBenchmark(pool, routine, bench_arguments, config).run()
+            result.label = label
+            st.session_state.setdefault('function_benchmarks', []).append(result)
+        except Exception as e:
+            st.error(f"❌ Error running benchmark: {str(e)}")
+    
+    results = st.session_state.get('function_benchmarks', [])
+    if results:
+        show_benchmark_result(results[-1])
+    show_benchmark_comparison(results)
+
+def show_benchmark_result(result):
+    """Display one run's latency distribution, throughput and statistics deltas"""
+    summary = result.summary()
+    
+    st.subheader(f"📊 {summary['label']} · {result.routine}")
+    
+    if result.errors:
+        st.warning(f"⚠️ {result.errors} call(s) failed. First error: {result.first_error}")
+    
+    if not summary['calls']:
+        return
+    
+    col1, col2, col3, col4, col5 = st.columns(5)
+    
+    with col1:
+        st.metric("Calls", f"{summary['calls']:,}")
+    
+    with col2:
+        st.metric("Throughput", f"{summary['throughput']:,.0f}/s")
+    
+    with col3:
+        st.metric("p50", f"{summary['p50_ms']:.3f} ms")
+    
+    with col4:
+        st.metric("p95", f"{summary['p95_ms']:.3f} ms")
+    
+    with col5:
+        st.metric("p99", f"{summary['p99_ms']:.3f} ms")
+    
+    delta = result.stats_delta()
+    if delta and delta['calls']:
+        st.caption(
+            f"pg_stat_user_functions: {delta['calls']:,} calls, {delta['total_time'] / delta['calls']:.3f} ms total "
+            f"and {delta['self_time'] / delta['calls']:.3f} ms self per call. Calls from other sessions during the run are included."
+        )
+        if delta['calls'] != summary['calls']:
+            st.warning(
+                f"⚠️ pg_stat_user_functions counted {delta['calls']:,} calls but {summary['calls']:,} were timed here. "
+                "Other sessions calling the routine, recursive or failed calls, or statistics not yet flushed "
+                "(PostgreSQL before 15) skew the server-side figures."
+            )
+    elif result.track_functions == 'none':
+        st.caption("Server-side time is not available: track_functions is off. Set it to 'pl' (PL/pgSQL) or 'all' to record it.")
+    else:
+        st.caption(f"No pg_stat_user_functions row for this routine with track_functions = '{result.track_functions}'; "
+                   "SQL functions are often inlined and C functions need 'all'.")
+    
+    calls = result.calls_frame()
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        fig = px.histogram(calls, x='latency_ms', nbins=60, title='Latency Distribution',
+                           labels={'latency_ms': 'Latency (ms)'})
+        for percentile in PERCENTILES:
+            fig.add_vline(x=summary[f"p{percentile}_ms"], line_dash="dash", annotation_text=f"p{percentile}")
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        fig = px.scatter(calls, x='offset_seconds', y='latency_ms', color=calls['worker'].astype(str),
+                         title='Latency over the Run', labels={'offset_seconds': 'Seconds', 'latency_ms': 'Latency (ms)', 'color': 'Connection'},
+                         render_mode='webgl')
+        st.plotly_chart(fig, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.download_button(
+            label="📥 Download Run (JSON)",
+            data=result.to_json(),
+            file_name=f"benchmark_{result.routine.split('(')[0]}_{int(result.started_at)}.json",
+            mime="application/json",
+            use_container_width=True
+        )
+    
+    with col2:
+        st.download_button(
+            label="📥 Download Latencies (CSV)",
+            data=calls.to_csv(index=False),
+            file_name=f"benchmark_{result.routine.split('(')[0]}_{int(result.started_at)}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+
+def show_benchmark_comparison(results):
+    """Compare runs from this session and saved runs against the first one"""
+    st.subheader("⚖️ Compare Runs")
+    
+    uploaded = st.file_uploader("Add saved runs (JSON)", type=['json'], accept_multiple_files=True, key="bench_uploads")
+    saved = []
+    for upload in uploaded or []:
+        try:
+            saved.append(BenchmarkResult.from_json(upload.getvalue().decode('utf-8')))
+        except Exception as e:
+            st.error(f"Error reading {upload.name}: {str(e)}")
+    
+    runs = saved + list(results)
+    if len(runs) < 2:
+        st.caption("Run the benchmark again after a change, or add a saved run, to compare. The first run is the baseline.")
+        return
+    
+    comparison = compare_results(runs)
+    st.dataframe(
+        comparison[['label', 'routine', 'calls', 'concurrency', 'throughput', 'throughput_change', 'p50_ms', 'p50_ms_change',
+                    'p95_ms', 'p95_ms_change', 'p99_ms', 'p99_ms_change', 'server_self_per_call_ms', 'server_self_per_call_ms_change']],
+        column_config={
+            'label': 'Run',
+            'routine': 'Routine',
+            'calls': st.column_config.NumberColumn('Calls', format="%d"),
+            'concurrency': st.column_config.NumberColumn('Connections', format="%d"),
+            'throughput': st.column_config.NumberColumn('Calls/s', format="%.0f"),
+            'throughput_change': st.column_config.NumberColumn('Δ Calls/s', format="%+.1f%%"),
+            'p50_ms': st.column_config.NumberColumn('p50 (ms)', format="%.3f"),
+            'p50_ms_change': st.column_config.NumberColumn('Δ p50', format="%+.1f%%"),
+            'p95_ms': st.column_config.NumberColumn('p95 (ms)', format="%.3f"),
+            'p95_ms_change': st.column_config.NumberColumn('Δ p95', format="%+.1f%%"),
+            'p99_ms': st.column_config.NumberColumn('p99 (ms)', format="%.3f"),
+            'p99_ms_change': st.column_config.NumberColumn('Δ p99', format="%+.1f%%"),
+            'server_self_per_call_ms': st.column_config.NumberColumn('Self/call (ms)', format="%.3f"),
+            'server_self_per_call_ms_change': st.column_config.NumberColumn('Δ Self/call', format="%+.1f%%")
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    if results and st.button("🧽 Clear Session Runs", key="bench_clear"):
+        st.session_state.function_benchmarks = []
+        st.rerun()
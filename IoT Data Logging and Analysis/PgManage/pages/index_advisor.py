@@ -0,0 +1,271 @@
+import re
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from database.catalog import get_catalog, invalidate_catalog
+from database.index_advisor import (
+    ACTION_CREATE, ACTION_DROP, MIN_TABLE_ROWS, advise, apply_suggestion, load_workload_statements,
+    seq_scan_tables
+)
+from database.workload import load_status
+from utils.helpers import format_bytes, truncate_string
+
+SOURCE_HISTORY = "history"
+SOURCE_STATEMENTS = "pg_stat_statements"
+
+def show():
+    """Display the index advisor page"""
+    st.header("🧭 Index Advisor")
+    
+    if not st.session_state.get('connected'):
+        st.error("Please connect to a database first")
+        return
+    
+    db_conn = st.session_state.db_connection
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    
+    with col1:
+        st.caption(
+            "Suggestions combine the scan counters PostgreSQL keeps per table and index with the columns "
+            "your queries filter and join on."
+        )
+    
+    with col2:
+        min_rows = st.number_input("Min table rows", min_value=0, value=MIN_TABLE_ROWS, step=10000, key="advisor_min_rows")
+    
+    with col3:
+        st.write("")
+        if st.button("🔄 Refresh", use_container_width=True):
+            st.rerun()
+    
+    statements = collect_statements(db_conn)
+    
+    try:
+        with st.spinner("Analyzing indexes..."):
+            statistics, candidates, redundant, suggestions = advise(
+                db_conn.connection, statements, get_catalog(db_conn).columns, int(min_rows)
+            )
+    except Exception as e:
+        st.error(f"Error analyzing indexes: {str(e)}")
+        return
+    
+    if statistics.stats_reset is not None:
+        st.caption(f"Scan counters collected since {pd.Timestamp(statistics.stats_reset):%Y-%m-%d %H:%M}")
+    
+    tab1, tab2, tab3, tab4 = st.tabs(["💡 Suggestions", "🐢 Sequential Scans", "🗑️ Unused & Duplicate Indexes", "⛏️ Mined Predicates"])
+    
+    with tab1:
+        show_suggestions(db_conn, suggestions)
+    
+    with tab2:
+        show_seq_scans(statistics, int(min_rows))
+    
+    with tab3:
+        show_redundant_indexes(redundant)
+    
+    with tab4:
+        show_mined_predicates(candidates, statements)
+
+def collect_statements(db_conn):
+    """(query, calls, source) from the executor history and, when enabled, pg_stat_statements"""
+    statements = [
+        (entry['full_query'], 1.0, SOURCE_HISTORY)
+        for entry in st.session_state.get('query_history', [])
+        if entry.get('status') == 'SUCCESS'
+    ]
+    
+    try:
+        if load_status(db_conn.connection).ready:
+            workload = load_workload_statements(db_conn.connection)
+            statements += [(query, float(calls), SOURCE_STATEMENTS) for query, calls in zip(workload['query'], workload['calls'])]
+        else:
+            st.info("💡 Enable pg_stat_statements (see the Workload page) to mine the whole workload, not just this session's history.")
+    except Exception as e:
+        st.warning(f"Could not read pg_stat_statements: {str(e)}")
+    
+    return statements
+
+def show_suggestions(db_conn, suggestions):
+    """Display ranked CREATE/DROP suggestions"""
+    if suggestions.empty:
+        st.success("✅ No index changes to suggest")
+        return
+    
+    creates = suggestions[suggestions['action'] == ACTION_CREATE]
+    drops = suggestions[suggestions['action'] == ACTION_DROP]
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Indexes to Create", len(creates))
+    
+    with col2:
+        st.metric("Indexes to Drop", len(drops))
+    
+    with col3:
+        st.metric("Space Reclaimable", format_bytes(drops['space_bytes'].sum()))
+    
+    st.caption(
+        "Ranked by 8 kB pages saved: for CREATE, table pages no longer read by sequential scans "
+        "(calls × table pages × share of scans that were sequential); for DROP, index pages reclaimed. "
+        "Both are estimates."
+    )
+    
+    display = suggestions.assign(
+        table=suggestions['table_schema'] + '.' + suggestions['table_name'],
+        space=suggestions['space_bytes'].map(lambda size: f"+{format_bytes(size)}" if size >= 0 else f"-{format_bytes(-size)}")
+    )
+    
+    st.dataframe(
+        display[['action', 'table', 'target', 'pages_saved', 'space', 'reason']],
+        column_config={
+            'action': 'Action',
+            'table': 'Table',
+            'target': st.column_config.TextColumn('Index / Columns', width='medium'),
+            'pages_saved': st.column_config.NumberColumn('Pages Saved', format="%.0f"),
+            'space': 'Space',
+            'reason': st.column_config.TextColumn('Reason', width='large')
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    selected = st.selectbox(
+        "Suggestion",
+        list(range(len(suggestions))),
+        format_func=lambda i: f"{i + 1}. {suggestions.loc[i, 'action']} {suggestions.loc[i, 'table_name']} ({suggestions.loc[i, 'target']})",
+        key="advisor_suggestion"
+    )
+    suggestion = suggestions.loc[selected]
+    
+    st.code(suggestion['statement'], language='sql')
+    
+    if suggestion['action'] == ACTION_CREATE:
+        st.caption(f"Estimated index size: {format_bytes(-suggestion['space_bytes'])}. Example statement:")
+        st.code(suggestion['example_query'], language='sql')
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # CONCURRENTLY keeps the table writable but cannot run in the executor's transaction
+        if st.button(f"▶️ Apply {suggestion['action']}", type="primary", use_container_width=True):
+            try:
+                with st.spinner("Running..."):
+                    apply_suggestion(db_conn.get_pool(), suggestion['statement'])
+                invalidate_catalog(db_conn, ['index'])
+                st.success("✅ Index change applied")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error applying suggestion: {str(e)}")
+    
+    with col2:
+        if suggestion['action'] == ACTION_CREATE and st.button("📊 EXPLAIN Example in Query Executor", use_container_width=True):
+            st.session_state.executor_prefill = {'query': suggestion['example_query']}
+            st.session_state.executor_pending_explain = True
+            st.session_state.current_page = 'query_executor'
+            st.rerun()
+
+def show_seq_scans(statistics, min_rows):
+    """Display tables read mostly by sequential scans"""
+    tables = seq_scan_tables(statistics, min_rows)
+    
+    if tables.empty:
+        st.success(f"✅ No table with at least {min_rows:,} rows is read mostly by sequential scans")
+        return
+    
+    tables['table'] = tables['table_schema'] + '.' + tables['table_name']
+    tables['size'] = tables['table_bytes'].map(format_bytes)
+    
+    st.dataframe(
+        tables[['table', 'seq_scan', 'idx_scan', 'seq_scan_share', 'n_live_tup', 'rows_per_seq_scan', 'scan_rows', 'size']],
+        column_config={
+            'table': 'Table',
+            'seq_scan': st.column_config.NumberColumn('Seq Scans', format="%d"),
+            'idx_scan': st.column_config.NumberColumn('Index Scans', format="%d"),
+            'seq_scan_share': st.column_config.ProgressColumn('Seq %', format="%.1f%%", min_value=0, max_value=100),
+            'n_live_tup': st.column_config.NumberColumn('Live Rows', format="%d"),
+            'rows_per_seq_scan': st.column_config.NumberColumn('Rows/Seq Scan', format="%.0f"),
+            'scan_rows': st.column_config.NumberColumn('Seq Scans × Rows', format="%.0f"),
+            'size': 'Size'
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    fig = px.bar(
+        tables.head(15),
+        x='scan_rows',
+        y='table',
+        orientation='h',
+        title='Sequential Scans × Live Rows',
+        labels={'scan_rows': 'Seq scans × rows', 'table': 'Table'}
+    )
+    fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+    st.plotly_chart(fig, use_container_width=True)
+
+def show_redundant_indexes(redundant):
+    """Display unused, invalid, duplicate and overlapping indexes"""
+    if redundant.empty:
+        st.success("✅ Every index is used and none duplicates another")
+        return
+    
+    st.caption(
+        "Unique and constraint-backed indexes are never listed. Usage counters are per server: check replicas "
+        "before dropping an index that only looks unused here."
+    )
+    
+    redundant = redundant.assign(
+        table=redundant['table_schema'] + '.' + redundant['table_name'],
+        size=redundant['index_bytes'].map(format_bytes)
+    )
+    
+    st.dataframe(
+        redundant[['index_name', 'table', 'kind', 'covered_by', 'idx_scan', 'size', 'reason', 'indexdef']],
+        column_config={
+            'index_name': 'Index',
+            'table': 'Table',
+            'kind': 'Finding',
+            'covered_by': 'Served By',
+            'idx_scan': st.column_config.NumberColumn('Scans', format="%d"),
+            'size': 'Size',
+            'reason': st.column_config.TextColumn('Reason', width='medium'),
+            'indexdef': st.column_config.TextColumn('Definition', width='large')
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+
+def show_mined_predicates(candidates, statements):
+    """Display the index columns mined from the captured statements"""
+    sources = pd.Series([source for _, _, source in statements]).value_counts()
+    st.caption(
+        f"{sources.get(SOURCE_HISTORY, 0)} executor history statement(s) and "
+        f"{sources.get(SOURCE_STATEMENTS, 0)} pg_stat_statements entries analyzed. Equality and join columns "
+        "come first, most selective first, followed by one range column."
+    )
+    
+    if candidates.empty:
+        st.info("No filter or join columns found. Run some queries in the Query Executor or enable pg_stat_statements.")
+        return
+    
+    candidates = candidates.assign(
+        table=candidates['table_schema'] + '.' + candidates['table_name'],
+        index_columns=candidates['columns'].map(', '.join),
+        example=candidates['example_query'].map(lambda query: truncate_string(re.sub(r'\s+', ' ', query), 100))
+    ).sort_values('calls', ascending=False)
+    
+    st.dataframe(
+        candidates[['table', 'index_columns', 'calls', 'statements', 'sources', 'covered_by', 'example']],
+        column_config={
+            'table': 'Table',
+            'index_columns': 'Columns',
+            'calls': st.column_config.NumberColumn('Calls', format="%d"),
+            'statements': st.column_config.NumberColumn('Statements', format="%d"),
+            'sources': 'Source',
+            'covered_by': 'Existing Index',
+            'example': st.column_config.TextColumn('Example', width='large')
+        },
+        use_container_width=True,
+        hide_index=True
+    )
@@ -0,0 +1,212 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from database.locks import (
+    DEFAULT_LOCK_SAMPLE_INTERVAL, LOCK_SAMPLE_INTERVALS, blocking_tree, contention_history, ensure_lock_sampler,
+    signal_backend, summarize_samples
+)
+from utils.helpers import format_duration, truncate_string
+
+HISTORY_WINDOWS = {
+    "Last 15 minutes": 900,
+    "Last hour": 3600,
+    "All samples": None
+}
+
+def show():
+    """Display the lock monitor page"""
+    st.header("🔒 Lock Monitor")
+    
+    if not st.session_state.get('connected'):
+        st.error("Please connect to a database first")
+        return
+    
+    db_conn = st.session_state.db_connection
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    
+    with col1:
+        st.caption("Sessions waiting on locks, grouped under the session that blocks them. Sampled in the background for every session on this database.")
+    
+    with col2:
+        interval = st.selectbox(
+            "Sample every (s)", LOCK_SAMPLE_INTERVALS, key="locks_sample_interval",
+            index=LOCK_SAMPLE_INTERVALS.index(DEFAULT_LOCK_SAMPLE_INTERVAL)
+        )
+    
+    with col3:
+        auto_refresh = st.checkbox("🔄 Auto-refresh", value=True, key="locks_auto_refresh")
+    
+    sampler = ensure_lock_sampler(db_conn, interval)
+    
+    if sampler.last_error:
+        st.warning(f"Last lock sample failed: {sampler.last_error}")
+    
+    # The tree reruns with each sample; it reads the sampler and costs no queries
+    st.fragment(show_blocking_tree, run_every=interval if auto_refresh else None)(db_conn, sampler)
+    show_contention_history(sampler)
+
+def show_blocking_tree(db_conn, sampler):
+    """Display the current blocking chains with wait times and lock modes"""
+    st.subheader("🌳 Blocking Chains")
+    
+    sample = sampler.latest()
+    if sample is None:
+        st.info("Taking the first sample...")
+        return
+    
+    tree = blocking_tree(sample.backends)
+    
+    col1, col2, col3 = st.columns(3)
+    
+    waiting = tree[tree['depth'] > 0].drop_duplicates('pid')
+    
+    with col1:
+        st.metric("Waiting Sessions", len(waiting))
+    
+    with col2:
+        st.metric("Root Blockers", tree.loc[tree['depth'] == 0, 'pid'].nunique())
+    
+    with col3:
+        longest = waiting['wait_seconds'].max()
+        st.metric("Longest Wait", format_duration(longest) if pd.notna(longest) else "-")
+    
+    if tree.empty:
+        st.success("✅ No session is waiting on a lock")
+        return
+    
+    tree = tree.assign(
+        session=[("    " * depth) + ("└─ " if depth else "🔴 ") + str(pid) for depth, pid in zip(tree['depth'], tree['pid'])],
+        lock=[describe_lock(row) for _, row in tree.iterrows()],
+        wait=tree['wait_seconds'].where(tree['depth'] > 0),
+        query_preview=tree['query'].map(lambda query: truncate_string(' '.join((query or '').split()), 80))
+    )
+    
+    st.dataframe(
+        tree[['session', 'usename', 'application_name', 'state', 'lock', 'wait', 'xact_seconds', 'waiting_behind', 'query_preview']],
+        column_config={
+            'session': st.column_config.TextColumn('PID', width='small'),
+            'usename': 'User',
+            'application_name': 'Application',
+            'state': 'State',
+            'lock': st.column_config.TextColumn('Lock', width='medium'),
+            'wait': st.column_config.NumberColumn('Waiting (s)', format="%.1f"),
+            'xact_seconds': st.column_config.NumberColumn('Transaction (s)', format="%.1f"),
+            'waiting_behind': st.column_config.NumberColumn('Blocks', format="%d"),
+            'query_preview': st.column_config.TextColumn('Query', width='large')
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    show_blocker_actions(db_conn, tree[tree['depth'] == 0].drop_duplicates('pid'))
+
+def describe_lock(backend):
+    """What a backend waits for, or the locks it holds if it is not waiting"""
+    if pd.notna(backend['wait_mode']):
+        target = backend['wait_relation'] if pd.notna(backend['wait_relation']) else backend['wait_locktype']
+        return f"waits for {backend['wait_mode']} on {target}"
+    if pd.notna(backend['held_locks']):
+        return f"holds {backend['held_locks']}"
+    return "holds row or transaction locks"
+
+def show_blocker_actions(db_conn, blockers):
+    """Cancel or terminate a root blocker after confirmation"""
+    st.subheader("🛑 Resolve a Blocker")
+    
+    selected = st.selectbox(
+        "Blocking session",
+        blockers['pid'].tolist(),
+        format_func=lambda pid: f"{pid} · {blockers.loc[blockers['pid'] == pid, 'usename'].iloc[0]} · blocks {blockers.loc[blockers['pid'] == pid, 'waiting_behind'].iloc[0]}",
+        key="locks_blocker"
+    )
+    blocker = blockers[blockers['pid'] == selected].iloc[0]
+    
+    st.code(blocker['query'] or '', language='sql')
+    st.caption(
+        f"State: {blocker['state']} · transaction open for {format_duration(blocker['xact_seconds']) if pd.notna(blocker['xact_seconds']) else '-'}"
+        + (f" · holds {blocker['held_locks']}" if pd.notna(blocker['held_locks']) else "")
+    )
+    if blocker['state'] == 'idle in transaction':
+        st.info("This session is idle inside an open transaction. Cancelling has no effect; only terminating releases its locks.")
+    
+    confirmed = st.checkbox(f"I confirm signalling session {selected}", key=f"locks_confirm_{selected}")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if st.button("⛔ Cancel Query", disabled=not confirmed, use_container_width=True,
+                     help="pg_cancel_backend: the current statement fails, the session stays connected"):
+            send_signal(db_conn, blocker, terminate=False)
+    
+    with col2:
+        if st.button("💀 Terminate Session", type="primary", disabled=not confirmed, use_container_width=True,
+                     help="pg_terminate_backend: the session is disconnected and its transaction rolled back"):
+            send_signal(db_conn, blocker, terminate=True)
+
+def send_signal(db_conn, blocker, terminate):
+    """Cancel or terminate a backend and report the outcome"""
+    action = "terminate" if terminate else "cancel"
+    try:
+        if signal_backend(db_conn.connection, blocker['pid'], blocker['backend_start'], terminate):
+            st.success(f"✅ Sent {action} to session {blocker['pid']}")
+        else:
+            st.warning(f"Session {blocker['pid']} has already ended or the {action} request was refused")
+    except Exception as e:
+        st.error(f"Error sending {action}: {str(e)}")
+
+def show_contention_history(sampler):
+    """Display lock waits over time so short, intermittent contention is visible"""
+    st.subheader("🕒 Contention History")
+    
+    window_label = st.radio("Window", list(HISTORY_WINDOWS), horizontal=True, key="locks_history_window")
+    samples = sampler.samples()
+    window = HISTORY_WINDOWS[window_label]
+    if window is not None and samples:
+        samples = [sample for sample in samples if sample.taken_at >= samples[-1].taken_at - window]
+    
+    if len(samples) < 2:
+        st.info("History appears after a few samples")
+        return
+    
+    summary = summarize_samples(samples)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        fig = px.area(summary, x='taken_at', y='waiting', title='Sessions Waiting on Locks',
+                      labels={'taken_at': 'Time', 'waiting': 'Sessions'})
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        fig = px.line(summary, x='taken_at', y='max_wait_seconds', title='Longest Lock Wait',
+                      labels={'taken_at': 'Time', 'max_wait_seconds': 'Seconds'})
+        st.plotly_chart(fig, use_container_width=True)
+    
+    history = contention_history(samples)
+    if history.empty:
+        st.success(f"✅ No lock waits in the {len(samples)} samples kept")
+        return
+    
+    st.caption("Lock waits by what was waited on. A relation shows up for table-level and tuple locks; waits for another transaction's row changes, such as foreign key checks, show as transactionid.")
+    
+    st.dataframe(
+        history.assign(
+            example_query=history['example_query'].map(lambda query: truncate_string(' '.join((query or '').split()), 80)),
+            blocker_query=history['blocker_query'].map(lambda query: truncate_string(' '.join((query or '').split()), 80))
+        ),
+        column_config={
+            'wait_relation': 'Relation',
+            'wait_locktype': 'Lock Type',
+            'wait_mode': 'Mode',
+            'samples': st.column_config.NumberColumn('Samples', format="%d"),
+            'backends': st.column_config.NumberColumn('Sessions', format="%d"),
+            'max_wait_seconds': st.column_config.NumberColumn('Max Wait (s)', format="%.1f"),
+            'first_seen': st.column_config.DatetimeColumn('First Seen'),
+            'last_seen': st.column_config.DatetimeColumn('Last Seen'),
+            'example_query': st.column_config.TextColumn('Waiting Query', width='large'),
+            'blocker_query': st.column_config.TextColumn('Blocking Query', width='large')
+        },
+        use_container_width=True,
+        hide_index=True
+    )
@@ -0,0 +1,283 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from database.maintenance import (
+    DEFAULT_VACUUM_WORKERS, TASK_RUNNING, VACUUM_WORKER_CHOICES, clear_vacuum_run, estimate_index_bloat,
+    estimate_table_bloat, get_vacuum_run, max_vacuum_workers, rank_tables, start_vacuum, vacuum_progress
+)
+from utils.helpers import format_bytes, format_duration
+
+RANK_OPTIONS = {
+    "Reclaimable space": 'reclaimable_bytes',
+    "Dead tuple ratio": 'dead_ratio'
+}
+PROGRESS_REFRESH_SECONDS = 2
+
+def show():
+    """Display the maintenance page"""
+    st.header("🧹 Maintenance")
+    
+    if not st.session_state.get('connected'):
+        st.error("Please connect to a database first")
+        return
+    
+    db_conn = st.session_state.db_connection
+    
+    try:
+        with st.spinner("Estimating bloat..."):
+            tables = estimate_table_bloat(db_conn.connection)
+            indexes = estimate_index_bloat(db_conn.connection)
+    except Exception as e:
+        st.error(f"Error estimating bloat: {str(e)}")
+        return
+    
+    col1, col2 = st.columns([3, 1])
+    
+    with col2:
+        rank_label = st.selectbox("Rank by", list(RANK_OPTIONS), key="maintenance_rank")
+    
+    ranked = rank_tables(tables, indexes, RANK_OPTIONS[rank_label])
+    
+    with col1:
+        st.caption(
+            "Bloat is estimated from the average row widths in pg_stats, so run ANALYZE first for accurate numbers. "
+            "VACUUM makes the space reusable by new rows; only VACUUM FULL or a rebuild returns it to the operating system."
+        )
+    
+    show_bloat_summary(ranked, indexes)
+    
+    tab1, tab2, tab3 = st.tabs(["🗂️ Tables", "🔍 Indexes", "🧹 Vacuum"])
+    
+    with tab1:
+        show_table_bloat(ranked)
+    
+    with tab2:
+        show_index_bloat(indexes)
+    
+    with tab3:
+        running = show_vacuum(db_conn, ranked)
+        # Only the progress view reruns while our vacuums are running
+        st.fragment(show_vacuum_progress, run_every=PROGRESS_REFRESH_SECONDS if running else None)(db_conn)
+
+def show_bloat_summary(ranked, indexes):
+    """Display database-wide bloat totals"""
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Table Bloat", format_bytes(ranked['bloat_bytes'].where(ranked['has_stats'].astype(bool), 0).sum()))
+    
+    with col2:
+        st.metric("Index Bloat", format_bytes(indexes['bloat_bytes'].sum()))
+    
+    with col3:
+        st.metric("Dead Tuples", f"{ranked['dead_tuples'].sum():,.0f}")
+    
+    with col4:
+        st.metric("Tables > 20% Dead", int((ranked['dead_ratio'] > 20).sum()))
+
+def show_table_bloat(ranked):
+    """Display tables ranked by reclaimable space or dead tuple ratio"""
+    if ranked.empty:
+        st.info("No tables found")
+        return
+    
+    unanalyzed = int((~ranked['has_stats'].astype(bool)).sum())
+    if unanalyzed:
+        st.warning(f"⚠️ {unanalyzed} table(s) have columns without statistics; their bloat is not estimated until they are analyzed.")
+    
+    display = ranked.assign(
+        table=ranked['table_schema'] + '.' + ranked['table_name'],
+        size=ranked['table_bytes'].map(format_bytes),
+        bloat=ranked['bloat_bytes'].map(format_bytes),
+        index_bloat=ranked['index_bloat_bytes'].map(format_bytes),
+        reclaimable=ranked['reclaimable_bytes'].map(format_bytes)
+    )
+    
+    st.dataframe(
+        display[['table', 'size', 'bloat', 'bloat_ratio', 'index_bloat', 'reclaimable', 'live_tuples', 'dead_tuples',
+                 'dead_ratio', 'last_vacuumed', 'last_analyzed']],
+        column_config={
+            'table': 'Table',
+            'size': 'Size',
+            'bloat': 'Table Bloat',
+            'bloat_ratio': st.column_config.ProgressColumn('Bloat %', format="%.1f%%", min_value=0, max_value=100),
+            'index_bloat': 'Index Bloat',
+            'reclaimable': 'Reclaimable',
+            'live_tuples': st.column_config.NumberColumn('Live Rows', format="%d"),
+            'dead_tuples': st.column_config.NumberColumn('Dead Rows', format="%d"),
+            'dead_ratio': st.column_config.ProgressColumn('Dead %', format="%.1f%%", min_value=0, max_value=100),
+            'last_vacuumed': st.column_config.DatetimeColumn('Last Vacuum'),
+            'last_analyzed': st.column_config.DatetimeColumn('Last Analyze')
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    chart_data = display.head(15)
+    if chart_data['reclaimable_bytes'].sum() > 0:
+        fig = px.bar(
+            chart_data.melt(id_vars='table', value_vars=['bloat_bytes', 'index_bloat_bytes'], var_name='kind', value_name='bytes')
+            .replace({'kind': {'bloat_bytes': 'Table', 'index_bloat_bytes': 'Indexes'}}),
+            x='bytes',
+            y='table',
+            color='kind',
+            orientation='h',
+            title='Estimated Bloat by Table',
+            labels={'bytes': 'Bytes', 'table': 'Table', 'kind': 'Bloat in'}
+        )
+        fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+        st.plotly_chart(fig, use_container_width=True)
+
+def show_index_bloat(indexes):
+    """Display b-tree indexes by estimated bloat"""
+    if indexes.empty:
+        st.info("No b-tree indexes found")
+        return
+    
+    indexes = indexes.sort_values('bloat_bytes', ascending=False, na_position='last')
+    display = indexes.assign(
+        table=indexes['table_schema'] + '.' + indexes['table_name'],
+        size=indexes['index_bytes'].map(format_bytes),
+        bloat=indexes['bloat_bytes'].map(lambda size: format_bytes(size) if pd.notna(size) else "unknown")
+    )
+    
+    st.dataframe(
+        display[['index_name', 'table', 'size', 'bloat', 'bloat_ratio']],
+        column_config={
+            'index_name': 'Index',
+            'table': 'Table',
+            'size': 'Size',
+            'bloat': 'Bloat',
+            'bloat_ratio': st.column_config.ProgressColumn('Bloat %', format="%.1f%%", min_value=0, max_value=100)
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    st.caption("VACUUM frees index entries for reuse but does not shrink an index; heavily bloated indexes need REINDEX CONCURRENTLY.")
+
+def show_vacuum(db_conn, ranked):
+    """Choose tables and start a VACUUM run; returns whether a run is in progress"""
+    run = get_vacuum_run(db_conn)
+    running = run is not None and not run.finished
+    
+    tables = dict(zip(ranked['table_schema'] + '.' + ranked['table_name'], zip(ranked['table_schema'], ranked['table_name'])))
+    options = list(tables)
+    default = [
+        option for option, reclaimable, dead_ratio in zip(options, ranked['reclaimable_bytes'], ranked['dead_ratio'])
+        if reclaimable > 0 or dead_ratio > 20
+    ][:5]
+    
+    selected = st.multiselect("Tables to vacuum", options, default=default, key="maintenance_vacuum_tables",
+                              disabled=running)
+    
+    col1, col2, col3 = st.columns([1, 1, 2])
+    
+    worker_limit = max_vacuum_workers(db_conn.get_pool())
+    worker_choices = [workers for workers in VACUUM_WORKER_CHOICES if workers <= worker_limit]
+    
+    with col1:
+        workers = st.selectbox(
+            "Parallel workers", worker_choices, key="maintenance_vacuum_workers",
+            index=worker_choices.index(min(DEFAULT_VACUUM_WORKERS, worker_choices[-1]))
+        )
+    
+    with col2:
+        analyze = st.checkbox("ANALYZE", value=True, key="maintenance_vacuum_analyze",
+                              help="Refresh planner statistics while vacuuming")
+    
+    with col3:
+        st.caption(
+            "Each worker vacuums one table on its own connection. More workers finish sooner "
+            "but compete with your workload for I/O."
+        )
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if st.button("🧹 Start Vacuum", type="primary", disabled=running or not selected, use_container_width=True):
+            try:
+                start_vacuum(db_conn, [tables[option] for option in selected], workers, analyze)
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error starting vacuum: {str(e)}")
+    
+    with col2:
+        if running and st.button("⛔ Cancel Vacuum", use_container_width=True):
+            run.cancel()
+            st.rerun()
+        elif run is not None and not running and st.button("🧽 Clear Results", use_container_width=True):
+            clear_vacuum_run(db_conn)
+            st.rerun()
+    
+    return running
+
+def show_vacuum_progress(db_conn):
+    """Display the run's tables with live progress from pg_stat_progress_vacuum"""
+    run = get_vacuum_run(db_conn)
+    
+    try:
+        progress = vacuum_progress(db_conn.connection)
+    except Exception as e:
+        st.error(f"Error reading vacuum progress: {str(e)}")
+        return
+    
+    if run is not None:
+        st.subheader("📋 Vacuum Run")
+        
+        summary = run.summary()
+        st.caption(
+            f"{len(run.tasks)} table(s) on {run.workers} worker(s) · " +
+            " · ".join(f"{count} {status}" for status, count in summary.items() if count)
+        )
+        
+        by_pid = progress.set_index('pid') if not progress.empty else progress
+        rows = []
+        for task in run.tasks:
+            phase, percent = None, None
+            if task.status == TASK_RUNNING and task.pid in by_pid.index:
+                phase, percent = by_pid.loc[task.pid, 'phase'], by_pid.loc[task.pid, 'percent']
+            rows.append({
+                'table': f"{task.schema}.{task.table}",
+                'status': task.status,
+                'phase': phase,
+                'percent': percent,
+                'elapsed': format_duration(task.elapsed) if task.elapsed is not None else None,
+                'error': task.error
+            })
+        
+        st.dataframe(
+            pd.DataFrame(rows),
+            column_config={
+                'table': 'Table',
+                'status': 'Status',
+                'phase': 'Phase',
+                'percent': st.column_config.ProgressColumn('Heap Progress', format="%.0f%%", min_value=0, max_value=100),
+                'elapsed': 'Elapsed',
+                'error': st.column_config.TextColumn('Error', width='large')
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    # Vacuums started elsewhere, mostly autovacuum
+    ours = {task.pid for task in run.tasks} if run is not None else set()
+    others = progress[~progress['pid'].isin(ours)]
+    if not others.empty:
+        st.subheader("🤖 Other Running Vacuums")
+        others = others.assign(table=others['table_schema'] + '.' + others['table_name'])
+        st.dataframe(
+            others[['pid', 'table', 'backend_type', 'phase', 'percent', 'index_vacuum_count', 'query_start']],
+            column_config={
+                'pid': 'PID',
+                'table': 'Table',
+                'backend_type': 'Started By',
+                'phase': 'Phase',
+                'percent': st.column_config.ProgressColumn('Heap Progress', format="%.0f%%", min_value=0, max_value=100),
+                'index_vacuum_count': st.column_config.NumberColumn('Index Passes', format="%d"),
+                'query_start': st.column_config.DatetimeColumn('Started')
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+    elif run is None:
+        st.info("No vacuums are running in this database")
@@ -1,5 +1,16 @@
 import streamlit as st
 import pandas as pd
+from psycopg2 import sql
+from database.batch_calls import (
+    BATCH_WORKER_CHOICES, DEFAULT_BATCH_SIZE, MAX_CAPTURED_FAILURES, NULL_COLUMN, ON_ERROR_ROLLBACK, ON_ERROR_SKIP,
+    bind_rows, chunk_ranges, clear_batch_run, default_mapping, get_batch_run, max_batch_workers, read_parameter_file,
+    start_batch_run
+)
+from database.catalog import get_catalog
+from database.routines import call_arguments, get_routine_parameters, routine_call, routine_label
+from utils.helpers import format_duration
+
+PROGRESS_REFRESH_SECONDS = 2
 
 def show():
     """Display the procedures page"""
@@ -230,97 +241,244 @@ def show_procedure_executor(db_conn):
     st.subheader("▶️ Execute Stored Procedure")
     
     try:
-        # Get list of procedures for selection
-        procedures_query = """
-        SELECT 
-            routine_schema,
-            routine_name
-        FROM information_schema.routines 
-        WHERE routine_type = 'PROCEDURE'
-        AND routine_schema NOT IN ('information_schema', 'pg_catalog')
-        ORDER BY routine_schema, routine_name
-        """
+        routines = get_catalog(db_conn).routines
+        procedures = routines[routines['routine_type'] == 'PROCEDURE']
         
-        procedures_df = db_conn.execute_query(procedures_query)
+        if procedures.empty:
+            st.info("No stored procedures available for execution")
+            return
         
-        if not procedures_df.empty:
-            # Procedure selection
-            procedure_options = [f"{row['routine_schema']}.{row['routine_name']}" for _, row in procedures_df.iterrows()]
+        # Procedure selection
+        by_oid = procedures.set_index('routine_oid', drop=False)
+        selected = st.selectbox("Select a procedure to execute", by_oid.index.tolist(), key="exec_procedure_select",
+                                format_func=lambda oid: routine_label(by_oid.loc[oid]))
+        routine = by_oid.loc[selected]
+        
+        arguments = call_arguments(routine, get_routine_parameters(db_conn, routine))
+        
+        mode = st.radio("Mode", ["Single call", "Batch from file"], horizontal=True, key="exec_procedure_mode",
+                        help="Batch calls the procedure once per row of a CSV or Parquet file")
+        
+        if mode == "Batch from file":
+            running = show_batch_setup(db_conn, routine, arguments)
+            # Only the progress view reruns while the batch run is in progress
+            st.fragment(show_batch_progress, run_every=PROGRESS_REFRESH_SECONDS if running else None)(db_conn)
+            return
+        
+        # Create input form
+        with st.form("procedure_execution_form"):
+            st.write(f"**Executing:** {routine_label(routine)}")
             
-            selected_procedure = st.selectbox("Select a procedure to execute", procedure_options, key="exec_procedure_select")
+            values = []
+            if not arguments.empty:
+                st.write("**Input Parameters:**")
+                for param in arguments.itertuples():
+                    if param.parameter_mode == 'OUT':
+                        values.append('')
+                        continue
+                    values.append(st.text_input(
+                        f"{param.parameter_name or f'${param.ordinal_position}'} ({param.data_type}) - {param.parameter_mode}",
+                        key=f"proc_param_{routine['routine_oid']}_{param.ordinal_position}",
+                        help="Leave empty for NULL"
+                    ))
             
-            if selected_procedure:
-                schema, procedure_name = selected_procedure.split('.', 1)
-                
-                # Get procedure parameters
-                params_query = """
-                SELECT 
-                    parameter_name,
-                    data_type,
-                    parameter_mode,
-                    ordinal_position
-                FROM information_schema.parameters 
-                WHERE specific_schema = %s AND specific_name = %s
-                AND parameter_mode IN ('IN', 'INOUT')
-                ORDER BY ordinal_position
-                """
-                
-                cursor = db_conn.connection.cursor()
-                cursor.execute(params_query, (schema, procedure_name))
-                parameters = cursor.fetchall()
-                cursor.close()
-                
-                # Create input form
-                with st.form("procedure_execution_form"):
-                    st.write(f"**Executing:** {schema}.{procedure_name}")
+            execute_button = st.form_submit_button("🚀 Execute Procedure")
+            
+            if execute_button:
+                try:
+                    literals = [sql.Literal(value) if value != '' else sql.SQL("NULL") for value in values]
+                    execute_query = routine_call(routine, arguments, literals).as_string(db_conn.connection)
                     
-                    param_values = {}
-                    if parameters:
-                        st.write("**Input Parameters:**")
-                        for param_name, data_type, param_mode, position in parameters:
-                            if param_name:  # Skip unnamed parameters
-                                param_values[param_name] = st.text_input(
-                                    f"{param_name} ({data_type}) - {param_mode}",
-                                    key=f"proc_param_{param_name}_{position}"
-                                )
+                    st.code(execute_query, language='sql')
                     
-                    execute_button = st.form_submit_button("🚀 Execute Procedure")
+                    # Execute procedure; INOUT and OUT parameters come back as one row
+                    result = db_conn.execute_query(execute_query, cache=False)
                     
-                    if execute_button:
-                        try:
-                            # Build procedure call
-                            if param_values:
-                                param_list = [f"'{value}'" if value else 'NULL' for value in param_values.values()]
-                                param_string = ', '.join(param_list)
-                            else:
-                                param_string = ''
-                            
-                            execute_query = f'CALL "{schema}"."{procedure_name}"({param_string})'
-                            
-                            st.code(execute_query, language='sql')
-                            
-                            # Execute procedure
-                            result = db_conn.execute_query(execute_query, fetch=False)
-                            
-                            st.success("✅ Procedure executed successfully!")
-                            
-                            # Check for any result sets (some procedures might return data)
-                            try:
-                                cursor = db_conn.connection.cursor()
-                                if cursor.description:
-                                    result_data = cursor.fetchall()
-                                    if result_data:
-                                        result_df = pd.DataFrame(result_data)
-                                        st.subheader("📊 Result")
-                                        st.dataframe(result_df, use_container_width=True)
-                                cursor.close()
-                            except:
-                                pass  # No result set to display
-                        
-                        except Exception as e:
-                            st.error(f"❌ Error executing procedure: {str(e)}")
-        else:
-            st.info("No stored procedures available for execution")
+                    st.success("✅ Procedure executed successfully!")
+                    
+                    if result is not None and not result.empty:
+                        st.subheader("📊 Result")
+                        st.dataframe(result, use_container_width=True)
+                
+                except Exception as e:
+                    st.error(f"❌ Error executing procedure: {str(e)}")
     
     except Exception as e:
         st.error(f"Error loading procedure executor: {str(e)}")
+
+def argument_names(arguments):
+    """Display name of each call argument, `$n` for unnamed ones"""
+    return [param.parameter_name or f"${param.ordinal_position}" for param in arguments.itertuples()]
+
+def show_batch_setup(db_conn, routine, arguments):
+    """Upload parameter rows, map them to arguments and start a batch run; returns whether a run is in progress"""
+    run = get_batch_run(db_conn)
+    running = run is not None and not run.finished
+    
+    upload = st.file_uploader("Parameter rows", type=["csv", "parquet"], key="batch_parameter_file", disabled=running,
+                              help="One call per row. CSV values are passed as text and cast to each parameter's type; empty cells are NULL.")
+    
+    if upload is None:
+        if run is not None:
+            show_batch_controls(db_conn, run, running)
+        return running
+    
+    try:
+        frame = read_parameter_file(upload.getvalue(), upload.name)
+    except Exception as e:
+        st.error(f"Error reading {upload.name}: {str(e)}")
+        return running
+    
+    st.caption(f"{len(frame):,} row(s), {len(frame.columns)} column(s) in {upload.name}")
+    st.dataframe(frame.head(5), use_container_width=True, hide_index=True)
+    
+    # Map file columns onto the procedure's arguments
+    names = argument_names(arguments)
+    columns = list(frame.columns)
+    mapping = default_mapping(arguments, columns)
+    options = [NULL_COLUMN] + columns
+    
+    if not arguments.empty:
+        st.write("**Column Mapping:**")
+        mapping_columns = st.columns(min(len(names), 4))
+        for position, (param, name) in enumerate(zip(arguments.itertuples(), names)):
+            with mapping_columns[position % len(mapping_columns)]:
+                mapping[position] = st.selectbox(
+                    f"{name} ({param.data_type})", options, index=options.index(mapping[position]),
+                    key=f"batch_map_{routine['routine_oid']}_{upload.name}_{param.ordinal_position}",
+                    format_func=lambda column: "(NULL)" if column is NULL_COLUMN else column,
+                    disabled=param.parameter_mode == 'OUT'
+                )
+    
+    worker_limit = max_batch_workers(db_conn.get_pool())
+    worker_choices = [workers for workers in BATCH_WORKER_CHOICES if workers <= worker_limit]
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        batch_size = st.number_input("Rows per transaction", min_value=1, max_value=100000, value=DEFAULT_BATCH_SIZE,
+                                     key="batch_size")
+    
+    with col2:
+        workers = st.selectbox("Connections", worker_choices, key="batch_workers",
+                               help="Batches run concurrently on this many pooled connections, so rows may commit out of order")
+    
+    with col3:
+        start_row = st.number_input("Start at row", min_value=1, max_value=max(len(frame), 1), value=1, key="batch_start_row",
+                                    help="Skip the rows before this one, e.g. to resume an earlier run")
+    
+    with col4:
+        on_error = st.selectbox("On a failed row", [ON_ERROR_SKIP, ON_ERROR_ROLLBACK], key="batch_on_error",
+                                help="Skip row: the row is recorded and the rest of its batch still commits. "
+                                     "Roll back batch: the whole batch is discarded.")
+    
+    if st.button("🚀 Start Batch", type="primary", disabled=running or frame.empty, use_container_width=True):
+        try:
+            rows = bind_rows(frame, mapping)
+            ranges = chunk_ranges(int(start_row) - 1, len(rows), int(batch_size))
+            start_batch_run(db_conn, routine, arguments, rows, ranges, workers, on_error)
+            st.rerun()
+        except Exception as e:
+            st.error(f"Error starting batch: {str(e)}")
+    
+    if run is not None:
+        show_batch_controls(db_conn, run, running)
+    
+    return running
+
+def show_batch_controls(db_conn, run, running):
+    """Cancel the running batch, resume the last run's unfinished batches or clear its results"""
+    if running:
+        if st.button("⛔ Cancel Batch", use_container_width=True):
+            run.cancel()
+            st.rerun()
+        return
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # The last run's rows and settings, so resuming doesn't depend on the file still being uploaded
+        resume_ranges = run.unfinished_ranges()
+        if st.button(f"⏯️ Resume {len(resume_ranges)} Unfinished Batch(es)", disabled=not resume_ranges,
+                     use_container_width=True, help="Rerun only the batches of the last run that did not commit"):
+            try:
+                start_batch_run(db_conn, run.routine, run.arguments, run.rows, resume_ranges, run.workers, run.on_error)
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error resuming batch: {str(e)}")
+    
+    with col2:
+        if st.button("🧽 Clear Results", use_container_width=True):
+            clear_batch_run(db_conn)
+            st.rerun()
+
+def show_batch_progress(db_conn):
+    """Display the batch run's progress, throughput and failed rows"""
+    run = get_batch_run(db_conn)
+    if run is None:
+        return
+    
+    st.subheader(f"📋 Batch Run: {routine_label(run.routine)}")
+    
+    st.progress(min(run.rows_settled / run.total_rows, 1.0) if run.total_rows else 1.0,
+                text=f"{run.rows_settled:,} of {run.total_rows:,} rows")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Rows Committed", f"{run.rows_committed:,}")
+    
+    with col2:
+        st.metric("Rows Failed", f"{sum(batch.rows_failed for batch in run.batches):,}")
+    
+    with col3:
+        st.metric("Throughput", f"{run.throughput:,.0f} rows/s")
+    
+    with col4:
+        st.metric("Elapsed", format_duration(run.elapsed))
+    
+    summary = run.summary()
+    st.caption(
+        f"{len(run.batches)} batch(es) on {run.workers} connection(s) · " +
+        " · ".join(f"{count} {status}" for status, count in summary.items() if count)
+    )
+    
+    if run.finished:
+        first_row = run.first_unfinished_row()
+        if first_row is not None:
+            st.warning(
+                f"Batches from row {first_row + 1:,} did not commit. Resume the unfinished batches, "
+                f"or start again at row {first_row + 1:,} when the run used one connection."
+            )
+    
+    batches = run.batch_frame()
+    batches['elapsed'] = batches['elapsed'].map(lambda seconds: format_duration(seconds) if pd.notna(seconds) else None)
+    st.dataframe(
+        batches,
+        column_config={
+            'batch': 'Batch',
+            'rows': 'Rows',
+            'status': 'Status',
+            'done': st.column_config.NumberColumn('Done', format="%d"),
+            'failed': st.column_config.NumberColumn('Failed', format="%d"),
+            'percent': st.column_config.ProgressColumn('Progress', format="%.0f%%", min_value=0, max_value=100),
+            'elapsed': 'Elapsed',
+            'error': st.column_config.TextColumn('Error', width='large')
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    failed = run.failed_rows(argument_names(run.arguments))
+    if not failed.empty:
+        st.subheader("❌ Failed Rows")
+        if len(failed) >= MAX_CAPTURED_FAILURES:
+            st.caption(f"Showing the first {MAX_CAPTURED_FAILURES:,} failures")
+        st.dataframe(failed, use_container_width=True, hide_index=True)
+        st.download_button(
+            "📥 Download Failed Rows (CSV)",
+            failed.to_csv(index=False),
+            file_name=f"{run.routine['routine_name']}_failed_rows.csv",
+            mime="text/csv",
+            key="batch_failed_download"
+        )
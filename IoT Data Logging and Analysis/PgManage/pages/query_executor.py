@@ -1,6 +1,24 @@
+import os
+import re
 import streamlit as st
 import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
 import time
+from database.catalog import invalidate_catalog, is_ddl
+from database.plans import SEVERITY_HIGH, SEVERITY_MEDIUM, analyze_plan, diff_plans
+from database.query_jobs import (
+    KIND_FETCH, KIND_PREVIEW, KIND_WRITE, STATUS_CANCELLED, STATUS_DONE, STATUS_TIMEOUT, is_data_modifying,
+    start_query_job
+)
+from database.result_cache import lookup_query, store_query
+from utils.helpers import export_query_to_csv, format_bytes, format_sql_for_display
+
+# Rows kept for on-screen display when the result limit is disabled
+MAX_PREVIEW_ROWS = 10000
+# Seconds between reruns while a background query runs
+JOB_POLL_SECONDS = 0.5
+DEFAULT_STATEMENT_TIMEOUT = 300
 
 def show():
     """Display the query executor page"""
@@ -27,6 +45,12 @@ def show():
     
     with tab3:
         show_quick_reference()
+    
+    # Rerun while a background query runs so elapsed time and partial rows stay current
+    job_state = st.session_state.get('executor_job')
+    if job_state and job_state['job'].running:
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
 
 def show_query_editor(db_conn):
     """Display the main query editor interface"""
@@ -60,6 +84,14 @@ def show_query_editor(db_conn):
     
     default_query = sample_queries.get(query_type, "")
     
+    # Queries handed over by other pages stay in the editor until the query type changes
+    prefill = st.session_state.get('executor_prefill')
+    if prefill:
+        if prefill.setdefault('query_type', query_type) == query_type:
+            default_query = prefill['query']
+        else:
+            del st.session_state.executor_prefill
+    
     # Query text area
     query = st.text_area(
         "SQL Query",
@@ -69,7 +101,7 @@ def show_query_editor(db_conn):
     )
     
     # Query options
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         auto_commit = st.checkbox("Auto-commit", value=True, help="Automatically commit transactions")
@@ -80,6 +112,12 @@ def show_query_editor(db_conn):
     with col3:
         limit_results = st.number_input("Limit results", min_value=0, max_value=10000, value=1000)
     
+    with col4:
+        statement_timeout = st.number_input(
+            "Statement timeout (s)", min_value=0, max_value=86400, value=DEFAULT_STATEMENT_TIMEOUT,
+            key="executor_statement_timeout", help="The server cancels queries running longer than this; 0 = no limit"
+        )
+    
     # Execute button
     col1, col2, col3 = st.columns([1, 1, 2])
     
@@ -91,78 +129,77 @@ def show_query_editor(db_conn):
     
     # Execute query
     if execute_button and query.strip():
-        execute_query(db_conn, query, auto_commit, show_execution_time, limit_results)
+        execute_query(db_conn, query, auto_commit, show_execution_time, limit_results, statement_timeout)
+    
+    if st.session_state.get('executor_job'):
+        show_query_job(db_conn, st.session_state.executor_job)
     
     # Explain query
     if explain_button and query.strip():
         explain_query(db_conn, query)
+    elif st.session_state.pop('executor_pending_explain', False) and query.strip():
+        # Requested from another page: plan only, the statement is not run
+        explain_query(db_conn, query, analyze=False)
+    
+    if st.session_state.get('executor_plan'):
+        show_plan_analysis(st.session_state.executor_plan)
+    
+    # Export the last SELECT; kept in session state so it survives reruns
+    if st.session_state.get('export_query'):
+        show_export_controls(db_conn, st.session_state.export_query)
 
-def execute_query(db_conn, query, auto_commit, show_execution_time, limit_results):
-    """Execute the SQL query and display results"""
+def execute_query(db_conn, query, auto_commit, show_execution_time, limit_results, statement_timeout=0):
+    """Start the SQL query on a background worker, or show a cached preview"""
+    # A new query replaces (and stops) the previous one
+    previous = st.session_state.get('executor_job')
+    if previous and previous['job'] is not None and previous['job'].running:
+        previous['job'].cancel()
+    st.session_state.executor_job = None
+    
     try:
         start_time = time.time()
         
         # Add LIMIT if it's a SELECT query and limit is specified
-        processed_query = query.strip()
+        statement = query.strip().rstrip(";").strip()
+        processed_query = statement
         if limit_results > 0 and processed_query.upper().startswith('SELECT') and 'LIMIT' not in processed_query.upper():
             processed_query += f" LIMIT {limit_results}"
         
-        # Execute query
-        if processed_query.upper().startswith(('SELECT', 'WITH', 'SHOW', 'EXPLAIN')):
-            # Read-only queries
-            result = db_conn.execute_query(processed_query)
+        job_state = {
+            'query': query,
+            'processed_query': processed_query,
+            'show_execution_time': show_execution_time,
+            'ticket': None,
+            'job': None,
+            'recorded': False
+        }
+        
+        # Execute query; a WITH that writes runs as a write, since DECLARE CURSOR rejects it
+        if processed_query.upper().startswith('SELECT') or (
+                processed_query.upper().startswith('WITH') and not is_data_modifying(processed_query)):
+            # Stream through a server-side cursor and stop after the preview;
+            # the full result is exported with COPY below
+            preview_rows = limit_results or MAX_PREVIEW_ROWS
+            cached, ticket = lookup_query(db_conn, processed_query, variant=('preview', preview_rows))
+            # The export covers the whole result, not just the previewed rows
+            st.session_state.export_query = statement
             
-            end_time = time.time()
-            execution_time = end_time - start_time
+            if cached is not None:
+                result, truncated = cached
+                st.caption("⚡ Served from the result cache; the tables have not changed since it was stored")
+                show_query_result(result, truncated, True, show_execution_time, time.time() - start_time)
+                add_to_history(query, time.time() - start_time if show_execution_time else None, "SUCCESS")
+                return
             
-            if result is not None and not result.empty:
-                st.success("✅ Query executed successfully!")
-                
-                if show_execution_time:
-                    st.caption(f"⏱️ Execution time: {execution_time:.3f} seconds")
-                
-                # Display results
-                st.subheader("📊 Query Results")
-                
-                # Show result summary
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.metric("Rows returned", len(result))
-                with col2:
-                    st.metric("Columns", len(result.columns))
-                
-                # Display data
-                st.dataframe(result, use_container_width=True, hide_index=True)
-                
-                # Option to download results
-                if len(result) > 0:
-                    csv = result.to_csv(index=False)
-                    st.download_button(
-                        label="📥 Download CSV",
-                        data=csv,
-                        file_name=f"query_results_{int(time.time())}.csv",
-                        mime="text/csv"
-                    )
-            else:
-                st.success("✅ Query executed successfully!")
-                st.info("No results returned")
-                
-                if show_execution_time:
-                    st.caption(f"⏱️ Execution time: {execution_time:.3f} seconds")
+            job_state['ticket'] = ticket
+            job_state['job'] = start_query_job(db_conn, processed_query, KIND_PREVIEW, preview_rows, statement_timeout)
+        elif processed_query.upper().startswith(('SHOW', 'EXPLAIN')):
+            job_state['job'] = start_query_job(db_conn, processed_query, KIND_FETCH, timeout_seconds=statement_timeout)
         else:
             # Write queries (INSERT, UPDATE, DELETE, etc.)
-            db_conn.execute_query(processed_query, fetch=False)
-            
-            end_time = time.time()
-            execution_time = end_time - start_time
-            
-            st.success("✅ Query executed successfully!")
-            
-            if show_execution_time:
-                st.caption(f"⏱️ Execution time: {execution_time:.3f} seconds")
+            job_state['job'] = start_query_job(db_conn, processed_query, KIND_WRITE, timeout_seconds=statement_timeout)
         
-        # Add to query history
-        add_to_history(query, execution_time if show_execution_time else None, "SUCCESS")
+        st.session_state.executor_job = job_state
         
     except Exception as e:
         end_time = time.time()
@@ -176,30 +213,333 @@ def execute_query(db_conn, query, auto_commit, show_execution_time, limit_result
         # Add to query history
         add_to_history(query, execution_time if show_execution_time else None, "ERROR", str(e))
 
-def explain_query(db_conn, query):
-    """Execute EXPLAIN on the query"""
-    try:
-        # Only explain SELECT queries
-        if not query.strip().upper().startswith(('SELECT', 'WITH')):
-            st.warning("EXPLAIN is only supported for SELECT queries")
-            return
+def show_query_job(db_conn, job_state):
+    """Show a running query with a Cancel button, or the outcome of a finished one"""
+    job = job_state['job']
+    show_execution_time = job_state['show_execution_time']
+    job.touch()
+    
+    if job.running:
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            progress = f" · {job.row_count:,} rows fetched" if job.kind == KIND_PREVIEW and job.row_count else ""
+            st.info(f"⏳ Query running for {job.elapsed:.1f}s{progress}")
         
-        explain_query = f"EXPLAIN (ANALYZE, BUFFERS, VERBOSE) {query}"
-        result = db_conn.execute_query(explain_query)
+        with col2:
+            if st.button("⛔ Cancel Query", use_container_width=True):
+                job.cancel()
+                st.rerun()
+        return
+    
+    result = job.result()
+    
+    if job.status == STATUS_DONE:
+        if not job_state['recorded']:
+            if job.kind == KIND_PREVIEW and job_state['ticket'] is not None:
+                store_query(job_state['ticket'], (result, job.truncated))
+            # Schema changes make the shared catalog snapshot stale
+            if job.kind == KIND_WRITE and is_ddl(job_state['processed_query']):
+                invalidate_catalog(db_conn)
+        
+        if job.kind == KIND_WRITE:
+            st.success("✅ Query executed successfully!")
+            if result is not None and not result.empty:
+                # Rows from RETURNING or the SELECT of a data-modifying WITH
+                st.dataframe(result, use_container_width=True, hide_index=True)
+            elif job.rowcount is not None:
+                st.caption(f"{job.rowcount:,} rows affected")
+            if show_execution_time:
+                st.caption(f"⏱️ Execution time: {job.elapsed:.3f} seconds")
+        else:
+            show_query_result(result, job.truncated, job.kind == KIND_PREVIEW, show_execution_time, job.elapsed)
+        status, error = "SUCCESS", None
+    else:
+        if job.status == STATUS_CANCELLED:
+            reason = "no session was watching it" if job.abandoned else "you cancelled it"
+            st.warning(f"⛔ Query cancelled after {job.elapsed:.1f}s because {reason}")
+            status = "CANCELLED"
+        elif job.status == STATUS_TIMEOUT:
+            st.error(f"⏱️ Query stopped by statement_timeout after {job.elapsed:.1f}s")
+            status = "TIMEOUT"
+        else:
+            st.error(f"❌ Query execution failed: {job.error}")
+            status = "ERROR"
+        error = job.error
         
+        # Rows streamed before the query stopped
         if result is not None and not result.empty:
-            st.success("✅ Query explanation generated!")
-            st.subheader("📊 Query Execution Plan")
+            st.caption(f"Partial results: the first {len(result):,} rows fetched before the query stopped")
+            st.dataframe(result, use_container_width=True, hide_index=True)
+        
+        if show_execution_time:
+            st.caption(f"⏱️ Execution time: {job.elapsed:.3f} seconds")
+    
+    if not job_state['recorded']:
+        add_to_history(job_state['query'], job.elapsed if show_execution_time else None, status, error)
+        job_state['recorded'] = True
+
+def show_query_result(result, truncated, streamed, show_execution_time, execution_time):
+    """Display a finished query's rows"""
+    if result is not None and not result.empty:
+        st.success("✅ Query executed successfully!")
+        
+        if show_execution_time:
+            st.caption(f"⏱️ Execution time: {execution_time:.3f} seconds")
+        
+        # Display results
+        st.subheader("📊 Query Results")
+        
+        # Show result summary
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Rows returned", f"{len(result):,}+" if truncated else len(result))
+        with col2:
+            st.metric("Columns", len(result.columns))
+        
+        if truncated:
+            st.caption(f"Showing the first {len(result):,} rows; use Export Results for the full result")
+        
+        # Display data
+        st.dataframe(result, use_container_width=True, hide_index=True)
+        
+        # Option to download results
+        if not streamed and len(result) > 0:
+            csv = result.to_csv(index=False)
+            st.download_button(
+                label="📥 Download CSV",
+                data=csv,
+                file_name=f"query_results_{int(time.time())}.csv",
+                mime="text/csv"
+            )
+    else:
+        st.success("✅ Query executed successfully!")
+        st.info("No results returned")
+        
+        if show_execution_time:
+            st.caption(f"⏱️ Execution time: {execution_time:.3f} seconds")
+
+def show_export_controls(db_conn, query):
+    """Export the last executed SELECT with COPY, without building a DataFrame"""
+    st.subheader("📦 Export Results")
+    st.code(format_sql_for_display(query, max_lines=5), language='sql')
+    
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        compress = st.checkbox("Gzip compress", key="export_gzip")
+    
+    with col2:
+        export_button = st.button("📦 Prepare CSV Export", use_container_width=True)
+    
+    if export_button:
+        start_time = time.time()
+        with st.spinner("Exporting with COPY..."):
+            export_path, filename, row_count = export_query_to_csv(db_conn, query, "query_results", compress)
+        
+        if export_path:
+            try:
+                size = os.path.getsize(export_path)
+                rows_text = f"{row_count:,} rows, " if row_count is not None else ""
+                st.caption(f"⏱️ Exported {rows_text}{format_bytes(size)} in {time.time() - start_time:.3f} seconds")
+                
+                with open(export_path, 'rb') as export_file:
+                    st.download_button(
+                        label="📥 Download CSV",
+                        data=export_file,
+                        file_name=filename,
+                        mime="application/gzip" if compress else "text/csv"
+                    )
+            finally:
+                os.remove(export_path)
+
+def explain_query(db_conn, query, analyze=True):
+    """Execute EXPLAIN on the query and keep the analyzed plan in session state"""
+    try:
+        if analyze:
+            # Only explain SELECT queries
+            if not query.strip().upper().startswith(('SELECT', 'WITH')):
+                st.warning("EXPLAIN is only supported for SELECT queries")
+                return
             
-            # Display explanation
-            for _, row in result.iterrows():
-                st.text(row.iloc[0])
+            explain_query = f"EXPLAIN (ANALYZE, BUFFERS, VERBOSE, FORMAT JSON) {query}"
+        elif re.search(r'\$\d+', query):
+            # Normalized statements (e.g. from pg_stat_statements) have placeholders instead of values
+            explain_query = f"EXPLAIN (GENERIC_PLAN, VERBOSE, FORMAT JSON) {query}"
+        else:
+            explain_query = f"EXPLAIN (VERBOSE, FORMAT JSON) {query}"
+        # Timings must come from this run, never from the result cache
+        result = db_conn.execute_query(explain_query, cache=False)
+        
+        if result is not None and not result.empty:
+            st.session_state.executor_plan = {
+                'query': query,
+                'analysis': analyze_plan(result.iloc[0, 0]),
+                'explained_at': time.strftime("%H:%M:%S")
+            }
+            st.success("✅ Query explanation generated!")
         else:
             st.info("No explanation available")
     
     except Exception as e:
         st.error(f"❌ Error explaining query: {str(e)}")
 
+def show_plan_analysis(plan_state):
+    """Display the last explained plan with its hotspots and findings"""
+    analysis = plan_state['analysis']
+    nodes = analysis.nodes
+    
+    st.subheader("📊 Query Execution Plan")
+    st.caption(
+        f"Explained at {plan_state['explained_at']} · "
+        + ("actual times from EXPLAIN ANALYZE" if analysis.has_actuals else "estimated costs only; the query was not run")
+    )
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Execution Time", f"{analysis.execution_time:,.2f} ms" if analysis.execution_time is not None else "-")
+    
+    with col2:
+        st.metric("Planning Time", f"{analysis.planning_time:,.2f} ms" if analysis.planning_time is not None else "-")
+    
+    with col3:
+        st.metric("Total Cost", f"{analysis.total_cost:,.2f}")
+    
+    with col4:
+        st.metric("Findings", len(analysis.findings))
+    
+    # Where the time (or cost) goes
+    hotspot = analysis.hotspots(1).iloc[0]
+    share_column = 'time_share' if analysis.has_actuals else 'cost_share'
+    st.info(f"🔥 Hotspot: **{hotspot['label']}** accounts for {hotspot[share_column]:.1f}% of the "
+            + ("execution time" if analysis.has_actuals else "estimated cost"))
+    
+    if not analysis.findings.empty:
+        st.write("**🚩 Findings**")
+        severity_icons = {SEVERITY_HIGH: "🔴", SEVERITY_MEDIUM: "🟠"}
+        findings = analysis.findings.assign(
+            severity=analysis.findings['severity'].map(lambda severity: f"{severity_icons.get(severity, 'ℹ️')} {severity}")
+        )
+        st.dataframe(
+            findings[['severity', 'finding', 'node', 'detail']],
+            column_config={
+                'severity': 'Severity',
+                'finding': 'Finding',
+                'node': 'Node',
+                'detail': st.column_config.TextColumn('Detail', width='large')
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    tab1, tab2, tab3 = st.tabs(["🌳 Plan Tree", "🔥 Flame Chart", "📄 Raw JSON"])
+    
+    with tab1:
+        # Non-breaking spaces keep the indentation in the grid
+        tree = nodes.assign(node=nodes['depth'].map(lambda depth: "\u00a0\u00a0\u00a0" * depth + "→ ") + nodes['label'])
+        
+        if analysis.has_actuals:
+            columns = ['node', 'actual_rows', 'plan_rows', 'actual_loops', 'inclusive_time', 'exclusive_time',
+                       'time_share', 'shared_hit_blocks', 'shared_read_blocks', 'filter']
+        else:
+            columns = ['node', 'plan_rows', 'total_cost', 'exclusive_cost', 'cost_share', 'filter']
+        
+        st.dataframe(
+            tree[columns],
+            column_config={
+                'node': st.column_config.TextColumn('Node', width='large'),
+                'actual_rows': st.column_config.NumberColumn('Rows', format="%d"),
+                'plan_rows': st.column_config.NumberColumn('Est. Rows', format="%d"),
+                'actual_loops': st.column_config.NumberColumn('Loops', format="%d"),
+                'inclusive_time': st.column_config.NumberColumn('Total (ms)', format="%.3f"),
+                'exclusive_time': st.column_config.NumberColumn('Self (ms)', format="%.3f"),
+                'time_share': st.column_config.ProgressColumn('Self %', format="%.1f%%", min_value=0, max_value=100),
+                'total_cost': st.column_config.NumberColumn('Total Cost', format="%.2f"),
+                'exclusive_cost': st.column_config.NumberColumn('Self Cost', format="%.2f"),
+                'cost_share': st.column_config.ProgressColumn('Self %', format="%.1f%%", min_value=0, max_value=100),
+                'shared_hit_blocks': st.column_config.NumberColumn('Shared Hit', format="%d"),
+                'shared_read_blocks': st.column_config.NumberColumn('Shared Read', format="%d"),
+                'filter': 'Condition'
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    with tab2:
+        # Each node's own time stacked under its parent: widths are inclusive time
+        fig = go.Figure(go.Icicle(
+            ids=nodes['node_id'].astype(str),
+            labels=nodes['label'],
+            parents=nodes['parent_id'].map(lambda parent: '' if pd.isna(parent) else str(int(parent))),
+            values=nodes[analysis.measure],
+            branchvalues='remainder',
+            tiling=dict(orientation='v'),
+            hovertemplate="%{label}<br>Self: %{value:.3f}<extra></extra>"
+        ))
+        fig.update_layout(height=500, margin=dict(t=10, l=10, r=10, b=10))
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with tab3:
+        st.json(analysis.raw, expanded=False)
+    
+    # Plan comparison against a saved baseline
+    baseline = st.session_state.get('executor_plan_baseline')
+    
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        if st.button("📌 Use as Baseline", use_container_width=True, disabled=baseline is plan_state):
+            st.session_state.executor_plan_baseline = plan_state
+            st.rerun()
+    
+    with col2:
+        if baseline is not None and st.button("🗑️ Clear Baseline", use_container_width=True):
+            del st.session_state.executor_plan_baseline
+            st.rerun()
+    
+    if baseline is not None and baseline is not plan_state:
+        show_plan_comparison(baseline, plan_state)
+
+def show_plan_comparison(baseline, plan_state):
+    """Compare the current plan with the baseline plan"""
+    st.subheader("⚖️ Plan Comparison")
+    st.caption(f"Baseline explained at {baseline['explained_at']}, current at {plan_state['explained_at']}")
+    
+    if baseline['query'].strip() != plan_state['query'].strip():
+        st.warning("The baseline was explained for a different query text")
+    
+    diff = diff_plans(baseline['analysis'], plan_state['analysis'])
+    
+    st.dataframe(
+        diff['summary'],
+        column_config={
+            'metric': 'Metric',
+            'before': st.column_config.NumberColumn('Baseline', format="%.2f"),
+            'after': st.column_config.NumberColumn('Current', format="%.2f"),
+            'change': st.column_config.NumberColumn('Change', format="%+.2f"),
+            'change_pct': st.column_config.NumberColumn('Change %', format="%+.1f%%")
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    measure_label = 'Self time (ms)' if diff['measure'] == 'exclusive_time' else 'Self cost'
+    operations = diff['operations']
+    
+    if not operations.empty:
+        fig = px.bar(
+            operations.head(15),
+            x='change',
+            y='operation',
+            color='status',
+            orientation='h',
+            title=f'Change in {measure_label} by Operation',
+            labels={'change': f'{measure_label} change', 'operation': 'Operation', 'status': 'Status'}
+        )
+        fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+        st.plotly_chart(fig, use_container_width=True)
+
 def add_to_history(query, execution_time, status, error_message=None):
     """Add query to history"""
     history_entry = {
@@ -228,7 +568,7 @@ def show_query_history():
     col1, col2 = st.columns(2)
     
     with col1:
-        status_filter = st.selectbox("Filter by status", ["All", "SUCCESS", "ERROR"])
+        status_filter = st.selectbox("Filter by status", ["All", "SUCCESS", "ERROR", "CANCELLED", "TIMEOUT"])
     
     with col2:
         if st.button("🗑️ Clear History"):
@@ -348,4 +688,3 @@ def show_quick_reference():
         SELECT * FROM table_name WHERE data @> '{"key": "value"}';
         ```
         """)
-        
\ No newline at end of file
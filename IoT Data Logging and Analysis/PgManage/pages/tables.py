@@ -1,6 +1,20 @@
+import datetime
 import streamlit as st
 import pandas as pd
-from database.queries import TABLE_QUERIES
+import plotly.express as px
+import plotly.graph_objects as go
+from database.catalog import get_catalog, invalidate_catalog
+from database.column_stats import (
+    FRESHNESS_AGING, FRESHNESS_FRESH, FRESHNESS_MISSING, FRESHNESS_STALE, load_stats_profile
+)
+from database.pagination import describe_plan, fetch_page, plan_paging, prefetch_page
+from database.profiler import (
+    DEFAULT_SAMPLE_PERCENT, KIND_NUMERIC, PROFILE_EXACT_THRESHOLD, get_cached_profile, get_exact_upgrade,
+    profile_columns, run_profile, start_exact_upgrade
+)
+from database.row_counts import (
+    ROW_COUNT_MODES, ROW_COUNT_MODE_HELP, COUNT_EXACT, get_row_counts, describe_count_types
+)
 
 def show():
     """Display the tables page"""
@@ -12,6 +26,11 @@ def show():
     
     db_conn = st.session_state.db_connection
     
+    col1, col2 = st.columns([3, 1])
+    with col2:
+        if st.button("🔄 Reload Catalog", use_container_width=True):
+            invalidate_catalog(db_conn)
+    
     # Main tabs
     tab1, tab2, tab3, tab4 = st.tabs(["📊 All Tables", "🔍 Table Details", "📈 Table Data", "📋 Column Statistics"])
     
@@ -33,20 +52,22 @@ def show_all_tables(db_conn):
     
     try:
         # Get all tables
-        tables_df = db_conn.execute_query(TABLE_QUERIES['all_tables'])
+        tables_df = get_catalog(db_conn).tables.copy()
         
         if not tables_df.empty:
             # Add row counts
+            count_mode = st.radio(
+                "Row counts", ROW_COUNT_MODES, horizontal=True,
+                key="tables_row_count_mode", help=ROW_COUNT_MODE_HELP
+            )
+            
             with st.spinner("Loading table information..."):
-                row_counts = []
-                for _, table in tables_df.iterrows():
-                    try:
-                        count = db_conn.get_table_row_count(table['table_schema'], table['table_name'])
-                        row_counts.append(count)
-                    except:
-                        row_counts.append(0)
+                row_counts = get_row_counts(
+                    db_conn, count_mode, zip(tables_df['table_schema'], tables_df['table_name'])
+                )
                 
-                tables_df['row_count'] = row_counts
+                tables_df['row_count'] = row_counts['row_count'].fillna(0).astype('int64').to_numpy()
+                tables_df['count_type'] = row_counts['count_type'].to_numpy()
             
             # Search functionality
             search_term = st.text_input("🔍 Search tables", placeholder="Enter table name or schema...")
@@ -59,15 +80,18 @@ def show_all_tables(db_conn):
             else:
                 filtered_df = tables_df
             
+            st.caption(describe_count_types(filtered_df['count_type']))
+            
             # Display tables
             st.dataframe(
-                filtered_df,
+                filtered_df[['table_schema', 'table_name', 'table_type', 'column_count', 'row_count', 'count_type', 'size']],
                 column_config={
                     'table_schema': 'Schema',
                     'table_name': 'Table Name',
                     'table_type': 'Type',
                     'column_count': st.column_config.NumberColumn('Columns', format="%d"),
                     'row_count': st.column_config.NumberColumn('Rows', format="%d"),
+                    'count_type': 'Count Type',
                     'size': 'Size'
                 },
                 use_container_width=True,
@@ -82,7 +106,8 @@ def show_all_tables(db_conn):
             
             with col2:
                 total_rows = filtered_df['row_count'].sum()
-                st.metric("Total Rows", f"{total_rows:,}")
+                exact_total = (filtered_df['count_type'] == COUNT_EXACT).all()
+                st.metric("Total Rows" if exact_total else "Total Rows (est.)", f"{total_rows:,}")
             
             with col3:
                 avg_columns = filtered_df['column_count'].mean()
@@ -103,11 +128,11 @@ def show_table_details(db_conn):
     
     try:
         # Get list of tables for selection
-        tables_df = db_conn.execute_query(TABLE_QUERIES['all_tables'])
+        catalog = get_catalog(db_conn)
         
-        if not tables_df.empty:
+        if not catalog.tables.empty:
             # Table selection
-            table_options = [f"{row['table_schema']}.{row['table_name']}" for _, row in tables_df.iterrows()]
+            table_options = catalog.table_options()
             
             selected_table = st.selectbox("Select a table", table_options)
             
@@ -141,15 +166,14 @@ def show_table_columns(db_conn, schema, table_name):
     st.write(f"**Columns for {schema}.{table_name}**")
     
     try:
-        cursor = db_conn.connection.cursor()
-        cursor.execute(TABLE_QUERIES['table_columns'], (schema, table_name))
-        columns = cursor.fetchall()
-        cursor.close()
+        columns = get_catalog(db_conn).table_columns(schema, table_name)
         
-        if columns:
-            columns_df = pd.DataFrame(columns, columns=[
-                'Column Name', 'Data Type', 'Max Length', 'Nullable', 'Default', 'Position'
-            ])
+        if not columns.empty:
+            columns_df = columns[[
+                'column_name', 'full_data_type', 'character_maximum_length',
+                'is_nullable', 'column_default', 'ordinal_position'
+            ]]
+            columns_df.columns = ['Column Name', 'Data Type', 'Max Length', 'Nullable', 'Default', 'Position']
             
             st.dataframe(
                 columns_df,
@@ -175,13 +199,10 @@ def show_table_indexes(db_conn, schema, table_name):
     st.write(f"**Indexes for {schema}.{table_name}**")
     
     try:
-        cursor = db_conn.connection.cursor()
-        cursor.execute(TABLE_QUERIES['table_indexes'], (schema, table_name))
-        indexes = cursor.fetchall()
-        cursor.close()
+        indexes = get_catalog(db_conn).table_indexes(schema, table_name)
         
-        if indexes:
-            for idx_name, idx_def in indexes:
+        if not indexes.empty:
+            for idx_name, idx_def in zip(indexes['indexname'], indexes['indexdef']):
                 with st.expander(f"📋 {idx_name}"):
                     st.code(idx_def, language='sql')
         else:
@@ -195,13 +216,11 @@ def show_table_constraints(db_conn, schema, table_name):
     st.write(f"**Constraints for {schema}.{table_name}**")
     
     try:
-        cursor = db_conn.connection.cursor()
-        cursor.execute(TABLE_QUERIES['table_constraints'], (schema, table_name))
-        constraints = cursor.fetchall()
-        cursor.close()
+        constraints = get_catalog(db_conn).table_constraints(schema, table_name)
         
-        if constraints:
-            constraints_df = pd.DataFrame(constraints, columns=['Constraint Name', 'Type'])
+        if not constraints.empty:
+            constraints_df = constraints[['constraint_name', 'constraint_type']]
+            constraints_df.columns = ['Constraint Name', 'Type']
             
             st.dataframe(
                 constraints_df,
@@ -299,46 +318,68 @@ def show_table_data(db_conn):
     
     try:
         # Get list of tables for selection
-        tables_df = db_conn.execute_query(TABLE_QUERIES['all_tables'])
+        catalog = get_catalog(db_conn)
         
-        if not tables_df.empty:
+        if not catalog.tables.empty:
             # Table selection
-            table_options = [f"{row['table_schema']}.{row['table_name']}" for _, row in tables_df.iterrows()]
+            table_options = catalog.table_options()
             
             selected_table = st.selectbox("Select a table to view data", table_options, key="data_table_select")
             
             if selected_table:
                 schema, table_name = selected_table.split('.', 1)
                 
-                # Pagination controls
-                col1, col2, col3 = st.columns([2, 1, 1])
+                limit = st.number_input("Rows per page", min_value=10, max_value=1000, value=100, step=10)
                 
-                with col1:
-                    limit = st.number_input("Rows per page", min_value=10, max_value=1000, value=100, step=10)
-                
-                with col2:
-                    offset = st.number_input("Offset", min_value=0, value=0, step=limit)
-                
-                with col3:
-                    if st.button("🔄 Refresh Data"):
-                        st.rerun()
-                
-                # Query and display data
                 try:
-                    data_query = f'SELECT * FROM "{schema}"."{table_name}" LIMIT {limit} OFFSET {offset}'
-                    data_df = db_conn.execute_query(data_query)
+                    plan = plan_paging(catalog, schema, table_name)
+                    pager = get_pager_state(plan, int(limit))
+                    page = load_current_page(db_conn, pager, plan)
+                    
+                    # Warm the next page while the user reads this one
+                    if page.next_key is not None and pager['prefetch'] is None:
+                        pager['prefetch'] = (page.next_key, prefetch_page(db_conn, plan, pager['limit'], page.next_key))
                     
-                    if not data_df.empty:
-                        st.dataframe(data_df, use_container_width=True, hide_index=True)
+                    if not page.data.empty:
+                        st.dataframe(page.data, use_container_width=True, hide_index=True)
                         
                         # Show pagination info
-                        total_rows = db_conn.get_table_row_count(schema, table_name)
-                        current_start = offset + 1
-                        current_end = min(offset + limit, total_rows)
+                        page_number = len(pager['cursors'])
+                        current_start = (page_number - 1) * pager['limit'] + 1
+                        current_end = current_start + len(page.data) - 1
+                        if pager['estimate'] is None:
+                            pager['estimate'] = get_row_counts(db_conn, 'Estimate', tables=[(schema, table_name)])['row_count'].iloc[0]
+                        estimate = pager['estimate']
+                        total = f" of ~{int(estimate):,} rows (estimated)" if pd.notna(estimate) else ""
                         
-                        st.caption(f"Showing rows {current_start:,} to {current_end:,} of {total_rows:,} total rows")
+                        st.caption(f"Page {page_number:,}: rows {current_start:,} to {current_end:,}{total}. {describe_plan(plan)}")
                     else:
                         st.info("No data found in this table")
+                    
+                    # Pagination controls
+                    col1, col2, col3, col4 = st.columns(4)
+                    
+                    with col1:
+                        if st.button("⏮️ First", use_container_width=True, disabled=len(pager['cursors']) == 1):
+                            pager['cursors'] = [None]
+                            st.rerun()
+                    
+                    with col2:
+                        if st.button("⬅️ Previous", use_container_width=True, disabled=len(pager['cursors']) == 1):
+                            pager['cursors'].pop()
+                            st.rerun()
+                    
+                    with col3:
+                        if st.button("Next ➡️", use_container_width=True, disabled=page.next_key is None):
+                            pager['cursors'].append(page.next_key)
+                            st.rerun()
+                    
+                    with col4:
+                        if st.button("🔄 Refresh Data", use_container_width=True):
+                            pager['page'] = None
+                            pager['prefetch'] = None
+                            pager['estimate'] = None
+                            st.rerun()
                 
                 except Exception as e:
                     st.error(f"Error loading table data: {str(e)}")
@@ -348,17 +389,296 @@ def show_table_data(db_conn):
     except Exception as e:
         st.error(f"Error loading tables: {str(e)}")
 
+def get_pager_state(plan, limit):
+    """Per-session paging cursors, reset when the table, its key or the page size changes"""
+    pager = st.session_state.get('table_data_pager')
+    if pager is None or pager['plan'] != plan or pager['limit'] != limit:
+        pager = {
+            'plan': plan,
+            'limit': limit,
+            # Cursor each visited page starts after; None is the first page
+            'cursors': [None],
+            'page': None,
+            'prefetch': None,
+            'estimate': None
+        }
+        st.session_state.table_data_pager = pager
+    return pager
+
+def load_current_page(db_conn, pager, plan):
+    """Page for the top cursor, from the rerun cache, the prefetch, or the database"""
+    cursor = pager['cursors'][-1]
+    
+    if pager['page'] is not None and pager['page'][0] == cursor:
+        return pager['page'][1]
+    
+    prefetch = pager['prefetch']
+    pager['prefetch'] = None
+    page = None
+    if prefetch is not None and prefetch[0] == cursor:
+        try:
+            page = prefetch[1].result()
+        except Exception:
+            # A failed prefetch (e.g. no free pooled connection) is retried on the session's own connection
+            page = None
+    if page is None:
+        page = fetch_page(db_conn.connection, plan, pager['limit'], cursor)
+    
+    pager['page'] = (cursor, page)
+    return page
+
+def show_profile_controls(db_conn, schema, table_name, columns_df):
+    """Sampled/exact profile controls; returns the cached profile for the table, if any"""
+    st.write("**Column Profile:**")
+    
+    estimate = get_row_counts(db_conn, 'Estimate', tables=[(schema, table_name)])['row_count'].iloc[0]
+    large_table = pd.notna(estimate) and estimate >= PROFILE_EXACT_THRESHOLD
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    
+    with col1:
+        scan = st.radio("Scan", ["Sample", "Full table"], index=0 if large_table else 1, key="profile_scan")
+    
+    with col2:
+        sample_percent = st.slider(
+            "Sample size (% of pages)", min_value=0.1, max_value=100.0, value=DEFAULT_SAMPLE_PERCENT, step=0.1,
+            disabled=scan != "Sample", key="profile_sample_percent",
+            help="TABLESAMPLE SYSTEM reads this share of the table's pages; distinct counts are estimated"
+        )
+    
+    with col3:
+        run_profile_clicked = st.button("📊 Profile Columns", use_container_width=True)
+    
+    if run_profile_clicked:
+        with st.spinner("Profiling columns..."):
+            run_profile(db_conn, schema, table_name, columns_df, sample_percent if scan == "Sample" else None)
+    
+    profile = get_cached_profile(db_conn, schema, table_name)
+    if profile is None:
+        st.info("Profile the table to see per-column statistics")
+        return None
+    
+    upgrade = get_exact_upgrade(db_conn, schema, table_name)
+    profiled_at = datetime.datetime.fromtimestamp(profile.created_at).strftime('%H:%M:%S')
+    
+    if profile.exact:
+        st.caption(f"Exact profile from a full scan at {profiled_at} ({profile.elapsed:.2f}s)")
+    else:
+        st.caption(
+            f"Sampled profile from {profile.sample_percent:g}% of pages at {profiled_at} ({profile.elapsed:.2f}s); "
+            "counts are scaled up and distinct counts are estimated"
+        )
+        
+        if upgrade is not None and not upgrade.done():
+            st.info("⏳ Exact profile running in the background...")
+            if st.button("🔄 Check Progress"):
+                st.rerun()
+        else:
+            if upgrade is not None and upgrade.exception() is not None:
+                st.error(f"Exact profile failed: {str(upgrade.exception())}")
+            if st.button("⬆️ Upgrade to Exact Profile"):
+                start_exact_upgrade(db_conn, schema, table_name, columns_df)
+                st.rerun()
+    
+    if profile.frequencies_skipped:
+        st.caption("Too many rows × columns for a value-frequency pass: unique counts and most common values "
+                   "were skipped; profile a sample to get them")
+    
+    return profile
+
+def show_column_profile(profile, numeric_columns, text_columns):
+    """Display numeric and text column statistics from a profile"""
+    approximate = "" if profile.exact else "~"
+    
+    # Show numeric statistics
+    if numeric_columns:
+        st.write("**Numeric Column Statistics:**")
+        
+        for col_name in numeric_columns:
+            with st.expander(f"📊 {col_name} Statistics"):
+                stats = profile.column(col_name)
+                
+                col1, col2, col3, col4 = st.columns(4)
+                
+                with col1:
+                    st.metric("Total Count", f"{approximate}{profile.total_count:,.0f}")
+                    st.metric("Non-null Count", f"{approximate}{stats['non_null_count']:,.0f}")
+                
+                with col2:
+                    st.metric("Null Count", f"{approximate}{stats['null_count']:,.0f}")
+                    if pd.notna(stats['distinct_count']):
+                        st.metric("Unique Values", f"{approximate}{stats['distinct_count']:,.0f}")
+                
+                with col3:
+                    if pd.notna(stats['min_value']):
+                        st.metric("Minimum", f"{float(stats['min_value']):.2f}")
+                    if pd.notna(stats['max_value']):
+                        st.metric("Maximum", f"{float(stats['max_value']):.2f}")
+                
+                with col4:
+                    if pd.notna(stats['avg_value']):
+                        st.metric("Average", f"{float(stats['avg_value']):.2f}")
+                    if pd.notna(stats['stddev_value']):
+                        st.metric("Std Deviation", f"{float(stats['stddev_value']):.2f}")
+                
+                show_profile_percentages(profile, stats)
+    
+    # Show text column statistics
+    if text_columns:
+        st.write("**Text Column Statistics:**")
+        
+        for col_name in text_columns:
+            with st.expander(f"📝 {col_name} Statistics"):
+                text_stats = profile.column(col_name)
+                
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    st.metric("Total Count", f"{approximate}{profile.total_count:,.0f}")
+                    st.metric("Non-null Count", f"{approximate}{text_stats['non_null_count']:,.0f}")
+                
+                with col2:
+                    st.metric("Null Count", f"{approximate}{text_stats['null_count']:,.0f}")
+                    if pd.notna(text_stats['distinct_count']):
+                        st.metric("Unique Values", f"{approximate}{text_stats['distinct_count']:,.0f}")
+                
+                with col3:
+                    if pd.notna(text_stats['avg_length']):
+                        st.metric("Avg Length", f"{float(text_stats['avg_length']):.1f}")
+                    if pd.notna(text_stats['min_length']) and pd.notna(text_stats['max_length']):
+                        st.metric("Length Range", f"{int(text_stats['min_length'])}-{int(text_stats['max_length'])}")
+                
+                show_profile_percentages(profile, text_stats)
+                
+                # Show most common values
+                common_values_result = profile.column_top_values(col_name)
+                
+                if not common_values_result.empty:
+                    st.write("**Most Common Values:**")
+                    st.dataframe(
+                        common_values_result,
+                        column_config={
+                            'value': 'Value',
+                            'frequency': st.column_config.NumberColumn('Frequency', format="%d")
+                        },
+                        use_container_width=True,
+                        hide_index=True
+                    )
+
+def show_stats_profile(db_conn, schema, table_name, columns_df):
+    """Display column profiles from pg_stats with a freshness indicator"""
+    stats_profile = load_stats_profile(db_conn.connection, schema, table_name)
+    
+    show_stats_freshness(stats_profile)
+    
+    if stats_profile.columns.empty:
+        st.info(f"No statistics collected yet. Run ANALYZE {schema}.{table_name} to build them.")
+        return
+    
+    # Overview of every column
+    overview_df = columns_df[['column_name', 'data_type']].merge(
+        stats_profile.columns[['column_name', 'null_frac', 'distinct_estimate', 'avg_width', 'correlation']],
+        on='column_name', how='left'
+    )
+    overview_df['null_frac'] = overview_df['null_frac'] * 100
+    
+    st.dataframe(
+        overview_df,
+        column_config={
+            'column_name': 'Column Name',
+            'data_type': 'Data Type',
+            'null_frac': st.column_config.NumberColumn('Null %', format="%.1f%%"),
+            'distinct_estimate': st.column_config.NumberColumn('Distinct (est.)', format="%d"),
+            'avg_width': st.column_config.NumberColumn('Avg Width (bytes)', format="%d"),
+            'correlation': st.column_config.NumberColumn('Correlation', format="%.3f")
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    for col_name in stats_profile.columns['column_name']:
+        top_values = stats_profile.top_values(col_name)
+        histogram = stats_profile.histogram(col_name)
+        
+        if top_values.empty and histogram.empty:
+            continue
+        
+        with st.expander(f"📊 {col_name} Distribution"):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                if not histogram.empty:
+                    if 'density' in histogram.columns:
+                        fig = go.Figure(go.Bar(
+                            x=(histogram['lower'] + histogram['upper']) / 2,
+                            y=histogram['density'],
+                            width=histogram['upper'] - histogram['lower'],
+                            customdata=histogram[['lower', 'upper', 'estimated_rows']],
+                            hovertemplate="%{customdata[0]} – %{customdata[1]}<br>~%{customdata[2]:,.0f} rows<extra></extra>"
+                        ))
+                        fig.update_layout(title="Histogram (rows per unit)", xaxis_title=col_name, yaxis_title="Density")
+                    else:
+                        labels = histogram['lower'].astype(str) + ' – ' + histogram['upper'].astype(str)
+                        fig = px.bar(x=labels, y=histogram['estimated_rows'], title="Histogram buckets (equal row counts)",
+                                     labels={'x': col_name, 'y': 'Estimated Rows'})
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.info("No histogram; the column's values are all in the most common list")
+            
+            with col2:
+                if not top_values.empty:
+                    fig = px.bar(top_values.head(20), x='value', y='estimated_rows', title="Most Common Values",
+                                 labels={'value': col_name, 'estimated_rows': 'Estimated Rows'})
+                    fig.update_xaxes(type='category')
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.info("No value is common enough to be listed")
+
+def show_stats_freshness(stats_profile):
+    """Freshness of pg_stats: last ANALYZE and rows modified since"""
+    freshness = stats_profile.freshness
+    ratio = stats_profile.modified_ratio
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        icons = {FRESHNESS_FRESH: "🟢", FRESHNESS_AGING: "🟡", FRESHNESS_STALE: "🔴", FRESHNESS_MISSING: "⚪"}
+        st.metric("Statistics", f"{icons[freshness]} {freshness.title()}")
+    
+    with col2:
+        if stats_profile.last_analyzed is not None:
+            st.metric("Last ANALYZE", stats_profile.last_analyzed.strftime('%Y-%m-%d %H:%M'))
+        else:
+            st.metric("Last ANALYZE", "Never")
+    
+    with col3:
+        if ratio is not None:
+            st.metric("Modified Since", f"{stats_profile.modified_since_analyze:,.0f} rows", f"{ratio * 100:.1f}% of table",
+                      delta_color="inverse")
+    
+    if freshness in (FRESHNESS_STALE, FRESHNESS_MISSING):
+        st.warning(f"Run ANALYZE {stats_profile.schema}.{stats_profile.table} or use a live scan for current numbers")
+
+def show_profile_percentages(profile, stats):
+    """Null percentage and uniqueness lines under a column's metrics"""
+    null_percentage = (stats['null_count'] / profile.total_count) * 100 if profile.total_count > 0 else 0
+    unique_percentage = (stats['distinct_count'] / stats['non_null_count']) * 100 if stats['non_null_count'] > 0 else 0
+    
+    st.write(f"**Null Percentage:** {null_percentage:.1f}%")
+    if pd.notna(unique_percentage):
+        st.write(f"**Uniqueness:** {unique_percentage:.1f}%")
+
 def show_column_statistics(db_conn):
     """Display detailed column statistics for selected table"""
     st.subheader("📋 Column Statistics")
     
     try:
         # Get list of tables for selection
-        tables_df = db_conn.execute_query(TABLE_QUERIES['all_tables'])
+        catalog = get_catalog(db_conn)
         
-        if not tables_df.empty:
+        if not catalog.tables.empty:
             # Table selection
-            table_options = [f"{row['table_schema']}.{row['table_name']}" for _, row in tables_df.iterrows()]
+            table_options = catalog.table_options()
             
             selected_table = st.selectbox("Select a table to analyze", table_options, key="stats_table_select")
             
@@ -366,22 +686,10 @@ def show_column_statistics(db_conn):
                 schema, table_name = selected_table.split('.', 1)
                 
                 # Get column information
-                columns_query = f"""
-                SELECT 
-                    column_name,
-                    data_type,
-                    is_nullable,
-                    column_default,
-                    character_maximum_length,
-                    numeric_precision,
-                    numeric_scale
-                FROM information_schema.columns
-                WHERE table_schema = '{schema}' 
-                    AND table_name = '{table_name}'
-                ORDER BY ordinal_position
-                """
-                
-                columns_df = db_conn.execute_query(columns_query)
+                columns_df = catalog.table_columns(schema, table_name)[[
+                    'column_name', 'data_type', 'is_nullable', 'column_default',
+                    'character_maximum_length', 'numeric_precision', 'numeric_scale'
+                ]]
                 
                 if not columns_df.empty:
                     # Show basic column information
@@ -401,140 +709,29 @@ def show_column_statistics(db_conn):
                         hide_index=True
                     )
                     
-                    # Analyze numeric columns
                     numeric_columns = []
                     text_columns = []
+                    for column_name, _, kind in profile_columns(columns_df):
+                        if kind == KIND_NUMERIC:
+                            numeric_columns.append(column_name)
+                        else:
+                            text_columns.append(column_name)
                     
-                    for _, col in columns_df.iterrows():
-                        if col['data_type'] in ['integer', 'bigint', 'smallint', 'numeric', 'decimal', 'real', 'double precision', 'money']:
-                            numeric_columns.append(col['column_name'])
-                        elif col['data_type'] in ['character varying', 'varchar', 'character', 'char', 'text']:
-                            text_columns.append(col['column_name'])
-                    
-                    # Show numeric statistics
-                    if numeric_columns:
-                        st.write("**Numeric Column Statistics:**")
-                        
-                        for col_name in numeric_columns:
-                            with st.expander(f"📊 {col_name} Statistics"):
-                                try:
-                                    stats_query = f"""
-                                    SELECT 
-                                        COUNT(*) as total_count,
-                                        COUNT("{col_name}") as non_null_count,
-                                        COUNT(*) - COUNT("{col_name}") as null_count,
-                                        MIN("{col_name}") as min_value,
-                                        MAX("{col_name}") as max_value,
-                                        AVG("{col_name}") as avg_value,
-                                        STDDEV("{col_name}") as std_deviation,
-                                        COUNT(DISTINCT "{col_name}") as unique_count
-                                    FROM "{schema}"."{table_name}"
-                                    """
-                                    
-                                    stats_result = db_conn.execute_query(stats_query)
-                                    
-                                    if not stats_result.empty:
-                                        stats = stats_result.iloc[0]
-                                        
-                                        col1, col2, col3, col4 = st.columns(4)
-                                        
-                                        with col1:
-                                            st.metric("Total Count", f"{stats['total_count']:,}")
-                                            st.metric("Non-null Count", f"{stats['non_null_count']:,}")
-                                        
-                                        with col2:
-                                            st.metric("Null Count", f"{stats['null_count']:,}")
-                                            st.metric("Unique Values", f"{stats['unique_count']:,}")
-                                        
-                                        with col3:
-                                            if stats['min_value'] is not None:
-                                                st.metric("Minimum", f"{float(stats['min_value']):.2f}")
-                                            if stats['max_value'] is not None:
-                                                st.metric("Maximum", f"{float(stats['max_value']):.2f}")
-                                        
-                                        with col4:
-                                            if stats['avg_value'] is not None:
-                                                st.metric("Average", f"{float(stats['avg_value']):.2f}")
-                                            if stats['std_deviation'] is not None:
-                                                st.metric("Std Deviation", f"{float(stats['std_deviation']):.2f}")
-                                        
-                                        # Calculate percentages
-                                        null_percentage = (stats['null_count'] / stats['total_count']) * 100 if stats['total_count'] > 0 else 0
-                                        unique_percentage = (stats['unique_count'] / stats['non_null_count']) * 100 if stats['non_null_count'] > 0 else 0
-                                        
-                                        st.write(f"**Null Percentage:** {null_percentage:.1f}%")
-                                        st.write(f"**Uniqueness:** {unique_percentage:.1f}%")
-                                
-                                except Exception as e:
-                                    st.error(f"Error calculating statistics for {col_name}: {str(e)}")
+                    profile_source = st.radio(
+                        "Profile source",
+                        ["Statistics (pg_stats)", "Live scan"],
+                        horizontal=True,
+                        key="profile_source",
+                        help="pg_stats reads the planner statistics from the last ANALYZE without touching the table"
+                    )
                     
-                    # Show text column statistics
-                    if text_columns:
-                        st.write("**Text Column Statistics:**")
+                    if profile_source == "Live scan":
+                        profile = show_profile_controls(db_conn, schema, table_name, columns_df)
                         
-                        for col_name in text_columns:
-                            with st.expander(f"📝 {col_name} Statistics"):
-                                try:
-                                    text_stats_query = f"""
-                                    SELECT 
-                                        COUNT(*) as total_count,
-                                        COUNT("{col_name}") as non_null_count,
-                                        COUNT(*) - COUNT("{col_name}") as null_count,
-                                        COUNT(DISTINCT "{col_name}") as unique_count,
-                                        AVG(LENGTH("{col_name}")) as avg_length,
-                                        MIN(LENGTH("{col_name}")) as min_length,
-                                        MAX(LENGTH("{col_name}")) as max_length
-                                    FROM "{schema}"."{table_name}"
-                                    WHERE "{col_name}" IS NOT NULL
-                                    """
-                                    
-                                    text_stats_result = db_conn.execute_query(text_stats_query)
-                                    
-                                    if not text_stats_result.empty:
-                                        text_stats = text_stats_result.iloc[0]
-                                        
-                                        col1, col2, col3 = st.columns(3)
-                                        
-                                        with col1:
-                                            st.metric("Total Count", f"{text_stats['total_count']:,}")
-                                            st.metric("Non-null Count", f"{text_stats['non_null_count']:,}")
-                                        
-                                        with col2:
-                                            st.metric("Null Count", f"{text_stats['null_count']:,}")
-                                            st.metric("Unique Values", f"{text_stats['unique_count']:,}")
-                                        
-                                        with col3:
-                                            if text_stats['avg_length'] is not None:
-                                                st.metric("Avg Length", f"{float(text_stats['avg_length']):.1f}")
-                                            if text_stats['min_length'] is not None and text_stats['max_length'] is not None:
-                                                st.metric("Length Range", f"{int(text_stats['min_length'])}-{int(text_stats['max_length'])}")
-                                        
-                                        # Show most common values
-                                        common_values_query = f"""
-                                        SELECT "{col_name}" as value, COUNT(*) as frequency
-                                        FROM "{schema}"."{table_name}"
-                                        WHERE "{col_name}" IS NOT NULL
-                                        GROUP BY "{col_name}"
-                                        ORDER BY COUNT(*) DESC
-                                        LIMIT 10
-                                        """
-                                        
-                                        common_values_result = db_conn.execute_query(common_values_query)
-                                        
-                                        if not common_values_result.empty:
-                                            st.write("**Most Common Values:**")
-                                            st.dataframe(
-                                                common_values_result,
-                                                column_config={
-                                                    'value': 'Value',
-                                                    'frequency': st.column_config.NumberColumn('Frequency', format="%d")
-                                                },
-                                                use_container_width=True,
-                                                hide_index=True
-                                            )
-                                
-                                except Exception as e:
-                                    st.error(f"Error calculating text statistics for {col_name}: {str(e)}")
+                        if profile is not None:
+                            show_column_profile(profile, numeric_columns, text_columns)
+                    else:
+                        show_stats_profile(db_conn, schema, table_name, columns_df)
                     
                     # Summary section
                     st.write("**Column Summary:**")
@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from database.catalog import get_catalog
 from database.queries import TRIGGER_QUERIES
 
 def show():
@@ -30,7 +31,7 @@ def show_table_triggers(db_conn):
     
     try:
         # Get all table triggers
-        triggers_df = db_conn.execute_query(TRIGGER_QUERIES['all_triggers'])
+        triggers_df = get_catalog(db_conn).triggers
         
         if not triggers_df.empty:
             # Search functionality
@@ -175,7 +176,7 @@ def show_trigger_details(db_conn):
     
     try:
         # Get list of triggers for selection
-        triggers_df = db_conn.execute_query(TRIGGER_QUERIES['all_triggers'])
+        triggers_df = get_catalog(db_conn).triggers
         
         if not triggers_df.empty:
             # Trigger selection
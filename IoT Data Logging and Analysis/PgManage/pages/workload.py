@@ -0,0 +1,302 @@
+import datetime
+import re
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from database.queries import WORKLOAD_QUERIES
+from database.workload import (
+    DEFAULT_SNAPSHOT_INTERVAL, SNAPSHOT_INTERVALS, cumulative_workload, diff_snapshots, ensure_snapshotter,
+    load_status, statement_series
+)
+from utils.helpers import format_duration, truncate_string
+
+WINDOW_LAST = "Last interval"
+WINDOW_BETWEEN = "Between snapshots"
+WINDOW_RESET = "Since reset"
+
+SORT_COLUMNS = {
+    "Total time": 'total_time',
+    "Mean time": 'mean_time',
+    "Time stddev": 'stddev_time',
+    "Calls": 'calls',
+    "Rows": 'rows',
+    "Shared blocks read": 'shared_blks_read',
+    "Temp blocks written": 'temp_blks_written'
+}
+
+def show():
+    """Display the workload page"""
+    st.header("📈 Query Workload")
+    
+    if not st.session_state.get('connected'):
+        st.error("Please connect to a database first")
+        return
+    
+    db_conn = st.session_state.db_connection
+    
+    try:
+        status = load_status(db_conn.connection)
+    except Exception as e:
+        st.error(f"Error checking pg_stat_statements: {str(e)}")
+        return
+    
+    if not status.ready:
+        show_setup(db_conn, status)
+        return
+    
+    # Snapshot settings
+    col1, col2, col3 = st.columns([2, 1, 1])
+    
+    with col2:
+        interval = st.selectbox(
+            "Snapshot every", SNAPSHOT_INTERVALS, index=SNAPSHOT_INTERVALS.index(DEFAULT_SNAPSHOT_INTERVAL),
+            format_func=format_duration, key="workload_snapshot_interval"
+        )
+    
+    snapshotter = ensure_snapshotter(db_conn, status, interval)
+    
+    with col3:
+        st.write("")
+        if st.button("📸 Take Snapshot", use_container_width=True):
+            try:
+                snapshotter.snapshot_now()
+            except Exception as e:
+                st.error(f"Error taking snapshot: {str(e)}")
+    
+    snapshots = snapshotter.snapshots()
+    
+    with col1:
+        st.caption(
+            f"pg_stat_statements {status.installed_version} · {len(snapshots)} snapshots kept. "
+            "Snapshots are shared by every session on this database."
+        )
+    
+    if snapshotter.last_error:
+        st.warning(f"Last snapshot failed: {snapshotter.last_error}")
+    
+    if not snapshots:
+        st.info("Taking the first snapshot...")
+        return
+    
+    workload, window_label = select_window(snapshots)
+    
+    if workload is None:
+        return
+    
+    if workload.empty:
+        st.info(f"No statements ran {window_label}")
+        return
+    
+    texts = snapshotter.query_texts(workload['queryid'].tolist())
+    workload['query'] = workload['queryid'].map(texts)
+    
+    show_workload_summary(workload, window_label)
+    top = show_top_statements(workload)
+    show_statement_details(snapshots, top, status)
+
+def show_setup(db_conn, status):
+    """Explain how to enable pg_stat_statements"""
+    st.warning("⚠️ pg_stat_statements is not enabled in this database.")
+    
+    if not status.available:
+        st.info("The pg_stat_statements extension is not available on this server. It ships with PostgreSQL's contrib package.")
+        return
+    
+    if not status.preloaded:
+        st.info(
+            "pg_stat_statements must be loaded at server start. Add it to `shared_preload_libraries` "
+            "in postgresql.conf and restart PostgreSQL:"
+        )
+        st.code("shared_preload_libraries = 'pg_stat_statements'", language='ini')
+    
+    if status.installed_version is None:
+        st.info("The extension also has to be created in this database:")
+        st.code(WORKLOAD_QUERIES['install'] + ";", language='sql')
+        
+        if status.preloaded and st.button("➕ Create Extension", type="primary"):
+            try:
+                db_conn.execute_query(WORKLOAD_QUERIES['install'], fetch=False)
+                st.success("✅ pg_stat_statements created")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error creating extension: {str(e)}")
+
+def format_snapshot(snapshot):
+    """Label a snapshot by its local time"""
+    return datetime.datetime.fromtimestamp(snapshot.taken_at).strftime("%Y-%m-%d %H:%M:%S")
+
+def select_window(snapshots):
+    """Choose the interval to analyze; returns (workload, description)"""
+    window = st.radio("Window", [WINDOW_LAST, WINDOW_BETWEEN, WINDOW_RESET], horizontal=True, key="workload_window")
+    
+    if window == WINDOW_RESET:
+        return cumulative_workload(snapshots[-1]), "since the statistics were last reset"
+    
+    if len(snapshots) < 2:
+        st.info("Deltas need two snapshots. Take another snapshot or wait for the next one.")
+        return None, None
+    
+    if window == WINDOW_LAST:
+        older, newer = snapshots[-2], snapshots[-1]
+    else:
+        start, end = st.select_slider(
+            "Snapshots",
+            options=list(range(len(snapshots))),
+            value=(0, len(snapshots) - 1),
+            format_func=lambda i: format_snapshot(snapshots[i]),
+            key="workload_snapshot_range"
+        )
+        if start == end:
+            st.info("Choose two different snapshots")
+            return None, None
+        older, newer = snapshots[start], snapshots[end]
+    
+    label = f"between {format_snapshot(older)} and {format_snapshot(newer)} ({format_duration(newer.taken_at - older.taken_at)})"
+    return diff_snapshots(older, newer), label
+
+def show_workload_summary(workload, window_label):
+    """Display totals for the selected window"""
+    st.subheader("📊 Workload Summary")
+    st.caption(f"Activity {window_label}")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Statements", f"{len(workload):,}")
+    
+    with col2:
+        st.metric("Calls", f"{workload['calls'].sum():,.0f}")
+    
+    with col3:
+        st.metric("Execution Time", format_duration(workload['total_time'].sum() / 1000))
+    
+    with col4:
+        accessed = workload['shared_blks_hit'].sum() + workload['shared_blks_read'].sum()
+        st.metric("Shared Hit Ratio", f"{workload['shared_blks_hit'].sum() / accessed * 100:.1f}%" if accessed else "-")
+
+def show_top_statements(workload):
+    """Display the top statements by the chosen measure; returns the rows shown"""
+    st.subheader("🏆 Top Statements")
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    
+    with col1:
+        search_term = st.text_input("🔍 Search statements", placeholder="Enter SQL text or user...", key="workload_search")
+    
+    with col2:
+        sort_label = st.selectbox("Sort by", list(SORT_COLUMNS), key="workload_sort")
+    
+    with col3:
+        top_n = st.number_input("Show", min_value=5, max_value=500, value=25, step=5, key="workload_top_n")
+    
+    if search_term:
+        workload = workload[
+            workload['query'].str.contains(search_term, case=False, na=False, regex=False) |
+            workload['username'].str.contains(search_term, case=False, na=False, regex=False)
+        ]
+    
+    sort_column = SORT_COLUMNS[sort_label]
+    top = workload.nlargest(int(top_n), sort_column).reset_index(drop=True)
+    
+    if top.empty:
+        st.info("No statements match the search")
+        return top
+    
+    top['query_preview'] = top['query'].map(lambda query: truncate_string(re.sub(r'\s+', ' ', query or ''), 100))
+    
+    st.dataframe(
+        top[['query_preview', 'username', 'calls', 'total_time', 'time_share', 'mean_time', 'stddev_time',
+             'rows', 'shared_blks_hit', 'shared_blks_read', 'hit_ratio', 'temp_blks_read', 'temp_blks_written']],
+        column_config={
+            'query_preview': st.column_config.TextColumn('Query', width='large'),
+            'username': 'User',
+            'calls': st.column_config.NumberColumn('Calls', format="%d"),
+            'total_time': st.column_config.NumberColumn('Total (ms)', format="%.1f"),
+            'time_share': st.column_config.ProgressColumn('Time %', format="%.1f%%", min_value=0, max_value=100),
+            'mean_time': st.column_config.NumberColumn('Mean (ms)', format="%.2f"),
+            'stddev_time': st.column_config.NumberColumn('Stddev (ms)', format="%.2f"),
+            'rows': st.column_config.NumberColumn('Rows', format="%d"),
+            'shared_blks_hit': st.column_config.NumberColumn('Shared Hit', format="%d"),
+            'shared_blks_read': st.column_config.NumberColumn('Shared Read', format="%d"),
+            'hit_ratio': st.column_config.NumberColumn('Hit %', format="%.1f%%"),
+            'temp_blks_read': st.column_config.NumberColumn('Temp Read', format="%d"),
+            'temp_blks_written': st.column_config.NumberColumn('Temp Written', format="%d")
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    chart_data = top.head(15).assign(label=lambda df: df['query_preview'].map(lambda q: truncate_string(q, 40)))
+    fig = px.bar(
+        chart_data,
+        x=sort_column,
+        y='label',
+        orientation='h',
+        title=f'Top Statements by {sort_label}',
+        labels={sort_column: sort_label, 'label': 'Query'}
+    )
+    fig.update_layout(yaxis={'categoryorder': 'total ascending'}, height=450)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    return top
+
+def show_statement_details(snapshots, top, status):
+    """Drill down into one normalized statement"""
+    if top.empty:
+        return
+    
+    st.subheader("🔎 Statement Details")
+    
+    selected = st.selectbox(
+        "Statement",
+        list(range(len(top))),
+        format_func=lambda i: f"{i + 1}. {truncate_string(top.loc[i, 'query_preview'], 90)}",
+        key="workload_statement"
+    )
+    statement = top.loc[selected]
+    
+    st.code(statement['query'] or '', language='sql')
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Calls", f"{statement['calls']:,.0f}")
+        st.metric("Rows/Call", f"{statement['rows_per_call']:,.1f}")
+    
+    with col2:
+        st.metric("Mean Time", f"{statement['mean_time']:,.2f} ms")
+        st.metric("Stddev", f"{statement['stddev_time']:,.2f} ms")
+    
+    with col3:
+        st.metric("Total Time", format_duration(statement['total_time'] / 1000))
+        st.metric("Share of Time", f"{statement['time_share']:.1f}%")
+    
+    with col4:
+        st.metric("Shared Hit Ratio", f"{statement['hit_ratio']:.1f}%" if pd.notna(statement['hit_ratio']) else "-")
+        st.metric("Temp Blocks", f"{statement['temp_blks_read'] + statement['temp_blks_written']:,.0f}")
+    
+    # Calls and latency of this statement across the kept snapshots
+    series = statement_series(snapshots, statement['username'], statement['queryid'])
+    if len(series) > 1:
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            fig = px.line(series, x='taken_at', y='calls_per_sec', title='Calls per Second',
+                          labels={'taken_at': 'Time', 'calls_per_sec': 'Calls/s'})
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            fig = px.line(series, x='taken_at', y='mean_time', title='Mean Time per Interval',
+                          labels={'taken_at': 'Time', 'mean_time': 'Mean (ms)'})
+            st.plotly_chart(fig, use_container_width=True)
+    
+    # Normalized statements have $n placeholders, which only a generic plan can explain
+    has_parameters = bool(re.search(r'\$\d+', statement['query'] or ''))
+    if has_parameters and not status.supports_generic_plan:
+        st.caption("EXPLAIN of statements with $n placeholders needs PostgreSQL 16 or later; replace them with values in the executor.")
+    
+    if st.button("📊 EXPLAIN in Query Executor", disabled=not statement['query']):
+        st.session_state.executor_prefill = {'query': statement['query']}
+        st.session_state.executor_pending_explain = True
+        st.session_state.current_page = 'query_executor'
+        st.rerun()
@@ -67,6 +67,13 @@ if errorlevel 1 (
     exit /b 1
 )
 
+pip install pyarrow
+if errorlevel 1 (
+    echo ERROR: Failed to install pyarrow
+    pause
+    exit /b 1
+)
+
 echo.
 echo ==========================================
 echo ✓ All packages installed successfully!
@@ -90,7 +90,7 @@ echo
 echo "Installing required Python packages..."
 echo "=========================================="
 
-packages=("streamlit" "psycopg2-binary" "pandas" "plotly" "sqlalchemy")
+packages=("streamlit" "psycopg2-binary" "pandas" "plotly" "sqlalchemy" "pyarrow")
 
 for package in "${packages[@]}"; do
     echo "Installing $package..."
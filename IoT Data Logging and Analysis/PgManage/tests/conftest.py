@@ -0,0 +1,13 @@
+import types
+
+import psycopg2.extensions
+import pytest
+from psycopg2 import sql
+
+
+@pytest.fixture
+def quote_ident(monkeypatch):
+    """Compose identifiers and literals without a server connection"""
+    monkeypatch.setattr(sql, 'ext', types.SimpleNamespace(quote_ident=lambda name, conn: f'"{name}"'))
+    monkeypatch.setattr(sql.Literal, 'as_string',
+                        lambda self, context: psycopg2.extensions.adapt(self.wrapped).getquoted().decode())
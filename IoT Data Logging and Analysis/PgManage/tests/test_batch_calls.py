@@ -0,0 +1,202 @@
+import contextlib
+import datetime
+import io
+import threading
+import time
+
+import pandas as pd
+import psycopg2
+import psycopg2.errors
+import pytest
+
+from database.batch_calls import (
+    BATCH_CANCELLED, BATCH_DONE, BATCH_FAILED, NULL_COLUMN, ON_ERROR_ROLLBACK, ON_ERROR_SKIP, BatchRun, bind_rows,
+    chunk_ranges, default_mapping, read_parameter_file
+)
+
+ROUTINE = pd.Series({'routine_schema': 'public', 'routine_name': 'load_reading', 'routine_type': 'PROCEDURE'})
+ARGUMENTS = pd.DataFrame({
+    'parameter_name': ['device_id', 'reading', 'status'],
+    'data_type': ['integer', 'numeric', 'text'],
+    'parameter_mode': ['IN', 'IN', 'OUT'],
+    'ordinal_position': [1, 2, 3]
+})
+
+
+def test_csv_values_stay_text_and_empty_cells_are_null():
+    frame = read_parameter_file(b"device_id,reading\n007,1.50\n8,\n", 'rows.csv')
+    assert bind_rows(frame, ['device_id', 'reading', NULL_COLUMN]) == [('007', '1.50', None), ('8', None, None)]
+
+
+def test_parquet_values_keep_python_types():
+    pytest.importorskip('pyarrow')
+    buffer = io.BytesIO()
+    pd.DataFrame({
+        'device_id': [1, 2],
+        'reading': [1.5, None],
+        'taken_at': pd.to_datetime(['2024-01-01 10:00', None])
+    }).to_parquet(buffer)
+    frame = read_parameter_file(buffer.getvalue(), 'rows.PARQUET')
+    rows = bind_rows(frame, ['device_id', 'reading', 'taken_at'])
+    assert rows == [(1, 1.5, datetime.datetime(2024, 1, 1, 10, 0)), (2, None, None)]
+    assert type(rows[0][0]) is int
+    assert type(rows[0][2]) is datetime.datetime
+
+
+def test_mapping_by_name_then_position():
+    assert default_mapping(ARGUMENTS, ['Reading', 'Device_ID']) == ['Device_ID', 'Reading', NULL_COLUMN]
+    assert default_mapping(ARGUMENTS, ['a', 'b', 'c']) == ['a', 'b', NULL_COLUMN]
+    assert default_mapping(ARGUMENTS, ['a']) == ['a', NULL_COLUMN, NULL_COLUMN]
+
+
+def test_chunk_ranges():
+    assert chunk_ranges(0, 10, 4) == [(0, 4), (4, 8), (8, 10)]
+    assert chunk_ranges(5, 10, 10) == [(5, 10)]
+    assert chunk_ranges(10, 10, 4) == []
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, statement, params=None):
+        if self.conn.pool.gate is not None:
+            self.conn.pool.gate.wait()
+        if params is None:
+            return
+        if params[0] == 'bad':
+            raise psycopg2.DataError('invalid input syntax for type integer: "bad"')
+        if params[0] == 'slow':
+            # Blocks like a long-running call until the server cancels it
+            self.conn.cancelled.wait(10)
+            raise psycopg2.errors.QueryCanceled('canceling statement due to user request')
+        self.conn.pending.append(params[0])
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+        self.pending = []
+        self.cancelled = threading.Event()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        with self.pool.lock:
+            self.pool.committed.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class FakePool:
+    max_size = 6
+
+    def __init__(self, gate=None):
+        self.lock = threading.Lock()
+        self.committed = []
+        self.gate = gate
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = FakeConnection(self)
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+
+
+def wait_for(run, seconds=10):
+    deadline = time.time() + seconds
+    while not run.finished:
+        assert time.time() < deadline, "batch run did not finish"
+        time.sleep(0.01)
+
+
+def rows_with_failures(count, bad):
+    return [('bad' if row in bad else str(row), '1.0', None) for row in range(count)]
+
+
+def test_skipped_rows_are_captured_and_the_rest_commits(quote_ident):
+    pool = FakePool()
+    run = BatchRun(pool, ROUTINE, ARGUMENTS, rows_with_failures(25, {3, 17}), chunk_ranges(0, 25, 10), workers=2)
+    wait_for(run)
+
+    assert run.statement.as_string(None) == 'CALL "public"."load_reading"(%s::integer, %s::numeric, %s::text)'
+    assert run.summary()[BATCH_DONE] == 3
+    assert run.rows_committed == 23
+    assert sorted(pool.committed, key=int) == [str(row) for row in range(25) if row not in (3, 17)]
+    failed = run.failed_rows(['device_id', 'reading', 'status'])
+    assert failed['row'].tolist() == [4, 18]
+    assert failed['error'].str.contains('invalid input syntax').all()
+    assert run.unfinished_ranges() == []
+
+
+def test_rollback_mode_discards_the_failed_batch_and_resumes_it(quote_ident):
+    pool = FakePool()
+    rows = rows_with_failures(25, {13})
+    run = BatchRun(pool, ROUTINE, ARGUMENTS, rows, chunk_ranges(0, 25, 10), on_error=ON_ERROR_ROLLBACK)
+    wait_for(run)
+
+    assert [batch.status for batch in run.batches] == [BATCH_DONE, BATCH_FAILED, BATCH_DONE]
+    assert run.rows_committed == 15
+    assert run.rows_settled == run.total_rows
+    assert run.unfinished_ranges() == [(10, 20)]
+    assert run.first_unfinished_row() == 10
+
+    # The resumed run only calls the rows of the batch that did not commit
+    rows[13] = ('13', '1.0', None)
+    resumed = BatchRun(pool, ROUTINE, ARGUMENTS, rows, run.unfinished_ranges(), on_error=ON_ERROR_SKIP)
+    wait_for(resumed)
+    assert sorted(pool.committed, key=int) == [str(row) for row in range(25)]
+
+
+def test_cancel_stops_the_clock(quote_ident):
+    gate = threading.Event()
+    run = BatchRun(FakePool(gate), ROUTINE, ARGUMENTS, rows_with_failures(100, set()), chunk_ranges(0, 100, 10))
+    time.sleep(0.05)
+    run.cancel()
+    gate.set()
+    wait_for(run)
+
+    assert run.summary()[BATCH_CANCELLED] == 10
+    assert run.rows_committed == 0
+    assert run.finished_at is not None
+    elapsed = run.elapsed
+    time.sleep(0.05)
+    assert run.elapsed == elapsed
+
+
+def test_cancel_after_the_running_batches_returned_stops_the_clock(quote_ident):
+    run = BatchRun(FakePool(), ROUTINE, ARGUMENTS, rows_with_failures(10, set()), chunk_ranges(0, 10, 5))
+    wait_for(run)
+    # Simulate the race: the clock was not stopped by the last batch
+    run.finished_at = None
+    run.cancel()
+    assert run.finished_at is not None
+
+
+def test_cancel_during_a_call_is_not_a_failed_row(quote_ident):
+    rows = rows_with_failures(10, set())
+    rows[2] = ('slow', '1.0', None)
+    run = BatchRun(FakePool(), ROUTINE, ARGUMENTS, rows, chunk_ranges(0, 10, 10))
+    deadline = time.time() + 10
+    while run.batches[0].rows_done < 2:
+        assert time.time() < deadline, "batch did not reach the slow row"
+        time.sleep(0.01)
+    time.sleep(0.05)
+    run.cancel()
+    wait_for(run)
+
+    assert run.batches[0].status == BATCH_CANCELLED
+    assert run.batches[0].rows_failed == 0
+    assert run.failures == []
+    assert run.unfinished_ranges() == [(0, 10)]
@@ -0,0 +1,95 @@
+import numpy as np
+
+from database.erd_layout import (
+    STANDALONE_CLUSTER, build_graph, collapse_groups, compute_layout, connected_components, get_layout,
+    label_propagation, neighbourhood
+)
+
+
+def clique(prefix, size):
+    names = [f"{prefix}{i}" for i in range(size)]
+    return names, [(a, b) for i, a in enumerate(names) for b in names[i + 1:]]
+
+
+def two_cliques():
+    left, left_edges = clique('a', 4)
+    right, right_edges = clique('b', 3)
+    # One bridge between the cliques and one table without foreign keys
+    return build_graph(left + right + ['lonely'], left_edges + right_edges + [('a0', 'b0')])
+
+
+def test_build_graph_merges_duplicates_and_drops_self_and_unknown_edges():
+    graph = build_graph(['b', 'a', 'c'], [('a', 'b'), ('b', 'a'), ('a', 'a'), ('a', 'missing')])
+    assert graph.nodes == ('a', 'b', 'c')
+    assert graph.edges == ((0, 1),)
+    assert graph.weights == (2,)
+    assert graph.degrees().tolist() == [2, 2, 0]
+
+
+def test_connected_components_largest_first():
+    assert connected_components(6, [(4, 5), (0, 1), (1, 2)]) == [[0, 1, 2], [4, 5], [3]]
+
+
+def test_label_propagation_finds_each_clique():
+    graph = two_cliques()
+    clusters = label_propagation(graph)
+    by_node = dict(zip(graph.nodes, clusters))
+
+    assert {by_node[f"a{i}"] for i in range(4)} == {0}
+    assert {by_node[f"b{i}"] for i in range(3)} == {1}
+    assert by_node['lonely'] == STANDALONE_CLUSTER
+
+
+def test_label_propagation_is_deterministic():
+    graph = two_cliques()
+    assert label_propagation(graph).tolist() == label_propagation(graph).tolist()
+
+
+def test_label_propagation_without_edges():
+    graph = build_graph(['a', 'b'], [])
+    assert label_propagation(graph).tolist() == [STANDALONE_CLUSTER, STANDALONE_CLUSTER]
+
+
+def test_layout_places_every_node_apart():
+    names = [f"t{i}" for i in range(30)]
+    # A chain large enough for the force-directed layout, plus a small star and two standalone tables
+    edges = list(zip(names[:19], names[1:20])) + [('t20', f"t{i}") for i in range(21, 25)]
+    graph = build_graph(names, edges)
+
+    positions = compute_layout(graph)
+    assert positions.shape == (30, 2)
+    assert np.isfinite(positions).all()
+    assert len({tuple(np.round(position, 6)) for position in positions}) == 30
+
+
+def test_layout_is_cached_by_graph():
+    layout = get_layout(two_cliques())
+    assert get_layout(two_cliques()) is layout
+    assert layout.positions.shape == (8, 2)
+    assert layout.clusters.tolist() == label_propagation(two_cliques()).tolist()
+
+
+def test_neighbourhood_hops():
+    graph = build_graph(['a', 'b', 'c', 'd'], [('a', 'b'), ('b', 'c'), ('c', 'd')])
+    assert neighbourhood(graph, ['a'], 0) == ['a']
+    assert neighbourhood(graph, ['a'], 2) == ['a', 'b', 'c']
+    assert neighbourhood(graph, ['missing'], 3) == []
+
+
+def test_collapsed_groups_merge_their_edges():
+    graph = two_cliques()
+    positions = compute_layout(graph)
+    groups = [name[0] for name in graph.nodes]
+
+    nodes, edges = collapse_groups(graph, positions, groups)
+    assert sorted(nodes['label']) == ['a', 'b', 'l']
+    assert edges['weight'].tolist() == [1]
+
+    collapsed_a = nodes.set_index('label').loc['a']
+    members = [i for i, name in enumerate(graph.nodes) if name.startswith('a')]
+    assert collapsed_a['tables'] == 4
+    assert collapsed_a[['x', 'y']].tolist() == positions[members].mean(axis=0).tolist()
+
+    nodes, edges = collapse_groups(graph, positions, groups, expanded=['b'])
+    assert set(nodes['label']) == {'a', 'b0', 'b1', 'b2', 'l'}
+    assert edges['weight'].sum() == 4
@@ -0,0 +1,64 @@
+import gzip
+import io
+
+import pytest
+
+from database.export import build_copy_statement, copy_query
+
+
+class FakeCopyCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+
+    def copy_expert(self, statement, target):
+        self.connection.statements.append(statement)
+        if self.connection.error:
+            raise self.connection.error
+        target.write(b"id,value\n1,a\n2,b\n")
+        self.rowcount = 2
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, error=None):
+        self.error = error
+        self.statements = []
+        self.rolled_back = False
+
+    def cursor(self):
+        return FakeCopyCursor(self)
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def test_copy_statement_wraps_the_whole_query():
+    assert build_copy_statement("SELECT * FROM readings;  ") == "COPY (SELECT * FROM readings) TO STDOUT WITH (FORMAT csv, HEADER)"
+    assert build_copy_statement("SELECT 1", header=False) == "COPY (SELECT 1) TO STDOUT WITH (FORMAT csv)"
+
+
+def test_empty_query_is_rejected():
+    with pytest.raises(ValueError):
+        build_copy_statement(" ; ")
+
+
+def test_copy_streams_csv_and_returns_the_row_count():
+    output = io.BytesIO()
+    assert copy_query(FakeConnection(), "SELECT * FROM readings", output) == 2
+    assert output.getvalue() == b"id,value\n1,a\n2,b\n"
+
+
+def test_compressed_copy_is_gzip():
+    output = io.BytesIO()
+    copy_query(FakeConnection(), "SELECT * FROM readings", output, compress=True)
+    assert gzip.decompress(output.getvalue()) == b"id,value\n1,a\n2,b\n"
+
+
+def test_failed_copy_rolls_back():
+    connection = FakeConnection(error=RuntimeError("relation does not exist"))
+    with pytest.raises(RuntimeError):
+        copy_query(connection, "SELECT * FROM missing", io.BytesIO())
+    assert connection.rolled_back
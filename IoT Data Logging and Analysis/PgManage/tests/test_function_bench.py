@@ -0,0 +1,194 @@
+import contextlib
+import threading
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import pytest
+
+from database import function_bench
+from database.function_bench import (
+    NO_CALLS, BenchmarkArgument, BenchmarkConfig, BenchmarkResult, FunctionBenchmark, compare_results
+)
+from database.pool import PoolError
+
+ROUTINE = pd.Series({
+    'routine_oid': 5, 'routine_schema': 'public', 'routine_name': 'ingest', 'routine_type': 'FUNCTION',
+    'arguments': 'device integer'
+})
+
+
+class FakeServer:
+    """Counts calls like pg_stat_user_functions, publishing them only when a backend flushes"""
+
+    def __init__(self, server_version=160000):
+        self.server_version = server_version
+        self.published = 0
+        self.statements = []
+        self.lock = threading.Lock()
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+
+    def execute(self, statement, params=None):
+        server = self.conn.server
+        with server.lock:
+            server.statements.append(statement)
+        if 'pg_stat_force_next_flush' in statement:
+            self.conn.flush_requested = True
+            self.description = [('pg_stat_force_next_flush',)]
+            return
+        if params and params[0] == 'fail':
+            raise psycopg2.DataError('invalid input syntax for type integer: "fail"')
+        self.conn.pending += 1
+        self.description = [('ingest',)]
+
+    def fetchall(self):
+        return [(None,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.server_version = server.server_version
+        self.pending = 0
+        self.flush_requested = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def _end_transaction(self):
+        if self.flush_requested:
+            with self.server.lock:
+                self.server.published += self.pending
+            self.pending = 0
+            self.flush_requested = False
+
+    commit = rollback = _end_transaction
+
+
+class FakePool:
+    max_size = 6
+
+    def __init__(self, server, fail_on=None):
+        self.server = server
+        self.fail_on = fail_on
+        self.acquired = 0
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def connection(self):
+        with self.lock:
+            self.acquired += 1
+            acquired = self.acquired
+        if acquired == self.fail_on:
+            raise PoolError("Timed out waiting for a connection")
+        yield FakeConnection(self.server)
+
+
+@pytest.fixture
+def server(monkeypatch, quote_ident):
+    server = FakeServer()
+
+    def fetch(conn, query, params=None):
+        if 'track_functions' in query:
+            return pd.DataFrame({'track_functions': ['pl']})
+        return pd.DataFrame({'calls': [server.published], 'total_time': [0.0], 'self_time': [0.0]})
+
+    monkeypatch.setattr(function_bench, 'fetch_dataframe', fetch)
+    return server
+
+
+def run_with_timeout(benchmark, seconds=10):
+    """Run a benchmark on a thread so a hang fails the test instead of blocking it"""
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = benchmark.run()
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "benchmark did not finish"
+    return outcome
+
+
+def test_calls_and_server_delta_match(server):
+    config = BenchmarkConfig(calls=200, concurrency=4, warmup=3)
+    result = FunctionBenchmark(FakePool(server), ROUTINE, [BenchmarkArgument('integer', value='1')], config).run()
+
+    summary = result.summary()
+    assert summary['calls'] == 200
+    assert summary['concurrency'] == 4
+    # Warm-up calls were flushed before the baseline, timed calls before the final reading
+    assert summary['server_calls'] == 200
+    assert result.statement == 'SELECT * FROM "public"."ingest"(%s::integer)'
+
+
+def test_statistics_are_not_forced_before_postgresql_15(server, monkeypatch):
+    monkeypatch.setattr(function_bench, 'STATS_FLUSH_SECONDS', 0)
+    server.server_version = 140000
+    config = BenchmarkConfig(calls=10, warmup=1)
+    FunctionBenchmark(FakePool(server), ROUTINE, [BenchmarkArgument('integer', value='1')], config).run()
+    assert not any('pg_stat_force_next_flush' in statement for statement in server.statements)
+
+
+def test_concurrency_leaves_connections_for_the_page(server):
+    config = BenchmarkConfig(calls=10, concurrency=16, warmup=0)
+    benchmark = FunctionBenchmark(FakePool(server), ROUTINE, [BenchmarkArgument('integer', value='1')], config)
+    assert benchmark.concurrency == FakePool.max_size - function_bench.RESERVED_CONNECTIONS
+
+
+def test_failed_connection_does_not_hang_the_other_workers(server):
+    # The first connection reads track_functions; the second is a worker's
+    pool = FakePool(server, fail_on=2)
+    config = BenchmarkConfig(calls=10, concurrency=3, warmup=0)
+    outcome = run_with_timeout(FunctionBenchmark(pool, ROUTINE, [BenchmarkArgument('integer', value='1')], config))
+    assert isinstance(outcome.get('error'), PoolError)
+
+
+def test_failing_warmup_stops_the_run(server):
+    config = BenchmarkConfig(calls=10, concurrency=2, warmup=2)
+    outcome = run_with_timeout(FunctionBenchmark(FakePool(server), ROUTINE, [BenchmarkArgument('integer', value='fail')], config))
+    result = outcome['result']
+    assert len(result.latencies_ms) == 0
+    assert 'invalid input syntax' in result.first_error
+
+
+def test_failing_calls_stop_after_max_errors(server):
+    config = BenchmarkConfig(calls=1000, warmup=0)
+    result = FunctionBenchmark(FakePool(server), ROUTINE, [BenchmarkArgument('integer', value='fail')], config).run()
+    assert result.errors == function_bench.MAX_ERRORS
+    assert result.summary()['calls'] == 0
+
+
+def make_result(latencies, label='', stats_after=None):
+    return BenchmarkResult(
+        routine='public.ingest(device integer)', statement='SELECT 1', config={'concurrency': 1},
+        started_at=0.0, wall_seconds=1.0, latencies_ms=np.array(latencies, dtype=float),
+        offsets=np.arange(len(latencies), dtype=float), workers=np.zeros(len(latencies), dtype=int),
+        stats_before=dict(NO_CALLS) if stats_after else None, stats_after=stats_after, label=label
+    )
+
+
+def test_result_round_trips_through_json():
+    result = make_result([1.0, 2.0, 3.0], 'before', {'calls': 3, 'total_time': 6.0, 'self_time': 3.0})
+    loaded = BenchmarkResult.from_json(result.to_json())
+    assert loaded.summary() == result.summary()
+    assert loaded.summary()['server_self_per_call_ms'] == 1.0
+
+
+def test_compare_results_is_relative_to_the_first_run():
+    comparison = compare_results([make_result([2.0] * 10, 'before'), make_result([1.0] * 20, 'after')])
+    assert comparison['label'].tolist() == ['before', 'after']
+    assert comparison['p50_ms_change'].tolist() == [0.0, -50.0]
+    assert comparison['throughput_change'].tolist() == [0.0, 100.0]
@@ -0,0 +1,70 @@
+import pandas as pd
+
+from database.locks import LockSample, blocking_tree, contention_history, summarize_samples
+
+
+def backends(*rows):
+    """(pid, blocked_by, wait_seconds) rows with the other columns of the blocking query"""
+    return pd.DataFrame([{
+        'pid': pid,
+        'blocked_by': blocked_by,
+        'wait_seconds': wait_seconds,
+        'wait_relation': 'public.devices' if blocked_by else None,
+        'wait_locktype': 'relation' if blocked_by else None,
+        'wait_mode': 'AccessExclusiveLock' if blocked_by else None,
+        'query': f"query {pid}"
+    } for pid, blocked_by, wait_seconds in rows])
+
+
+def tree_rows(tree):
+    return list(zip(tree['pid'], tree['depth'], tree['root_pid'], tree['waiting_behind']))
+
+
+def test_chain_is_listed_depth_first_under_its_root():
+    tree = blocking_tree(backends((10, [], None), (20, [10], 5.0), (30, [20], 2.0)))
+    assert tree_rows(tree) == [(10, 0, 10, 2), (20, 1, 10, 1), (30, 2, 10, 0)]
+
+
+def test_longest_waiter_first_and_biggest_tree_first():
+    tree = blocking_tree(backends(
+        (1, [], None), (2, [1], 1.0),
+        (5, [], None), (6, [5], 1.0), (7, [5], 9.0)
+    ))
+    assert tree['pid'].tolist() == [5, 7, 6, 1, 2]
+
+
+def test_backend_with_two_blockers_is_listed_under_each():
+    tree = blocking_tree(backends((1, [], None), (2, [], None), (3, [1, 2], 4.0)))
+    assert tree_rows(tree) == [(1, 0, 1, 1), (3, 1, 1, 0), (2, 0, 2, 1), (3, 1, 2, 0)]
+
+
+def test_deadlock_cycle_starts_at_its_lowest_pid():
+    tree = blocking_tree(backends((8, [9], 1.0), (9, [8], 1.0)))
+    assert tree_rows(tree) == [(8, 0, 8, 1), (9, 1, 8, 0)]
+
+
+def test_no_contention_gives_an_empty_tree():
+    tree = blocking_tree(backends())
+    assert tree.empty
+    assert {'depth', 'root_pid', 'waiting_behind'} <= set(tree.columns)
+
+
+def test_samples_are_summarized_and_waits_grouped():
+    samples = [
+        LockSample(1000.0, backends((10, [], None), (20, [10], 3.0))),
+        LockSample(1005.0, backends((10, [], None), (20, [10], 8.0), (30, [10], 1.0))),
+    ]
+    summary = summarize_samples(samples)
+    assert summary['waiting'].tolist() == [1, 2]
+    assert summary['blockers'].tolist() == [1, 1]
+    assert summary['max_wait_seconds'].tolist() == [3.0, 8.0]
+
+    history = contention_history(samples)
+    assert len(history) == 1
+    row = history.iloc[0]
+    assert (row['wait_relation'], row['samples'], row['backends'], row['max_wait_seconds']) == ('public.devices', 2, 2, 8.0)
+    assert row['blocker_query'] == 'query 10'
+
+
+def test_no_waits_give_an_empty_history():
+    assert contention_history([LockSample(1000.0, backends((10, [], None)))]).empty
@@ -0,0 +1,98 @@
+import math
+
+import pandas as pd
+
+from database.openmetrics import (
+    TYPE_COUNTER, TYPE_GAUGE, MetricFamily, SeriesCap, activity_families, escape_label_value, format_value, render,
+    table_families
+)
+
+
+def test_counter_with_labels():
+    family = MetricFamily('database_transactions', TYPE_COUNTER, 'Transactions by outcome')
+    family.add(12, database='iot', outcome='commit')
+    family.add(None, database='iot', outcome='rollback')
+    assert render([family]) == (
+        "# TYPE pgmanage_database_transactions counter\n"
+        "# HELP pgmanage_database_transactions Transactions by outcome\n"
+        'pgmanage_database_transactions_total{database="iot",outcome="commit"} 12\n'
+        "# EOF\n"
+    )
+
+
+def test_gauge_with_unit_is_suffixed():
+    family = MetricFamily('active_query_max_duration', TYPE_GAUGE, 'Longest query', unit='seconds')
+    family.add(1.5)
+    assert render([family]).splitlines() == [
+        "# TYPE pgmanage_active_query_max_duration_seconds gauge",
+        "# UNIT pgmanage_active_query_max_duration_seconds seconds",
+        "# HELP pgmanage_active_query_max_duration_seconds Longest query",
+        "pgmanage_active_query_max_duration_seconds 1.5",
+        "# EOF",
+    ]
+
+
+def test_empty_exposition_still_ends_with_eof():
+    assert render([]) == "# EOF\n"
+
+
+def test_values_and_labels_are_escaped():
+    assert format_value(3.0) == '3'
+    assert format_value(0.25) == '0.25'
+    assert format_value(math.nan) == 'NaN'
+    assert format_value(-math.inf) == '-Inf'
+    assert escape_label_value('a "quoted"\\path\nnext') == 'a \\"quoted\\"\\\\path\\nnext'
+
+
+def test_table_cap_keeps_the_most_active_tables():
+    stats = pd.DataFrame({
+        'schemaname': ['public'] * 3,
+        'tablename': ['quiet', 'busy', 'medium'],
+        'inserts': [0, 100, 10], 'updates': [0, 0, 5], 'deletes': [0, 0, 0],
+        'live_tuples': [1, 2, 3], 'dead_tuples': [0, 0, 0],
+        'last_vacuum': [None, pd.Timestamp('2024-01-01', tz='UTC'), None],
+        'last_autovacuum': [None, pd.Timestamp('2024-01-02', tz='UTC'), None],
+        'last_analyze': [None] * 3, 'last_autoanalyze': [None] * 3
+    })
+    families, dropped = table_families(stats, 2)
+    assert dropped == 1
+    live = next(family for family in families if family.name == 'table_live_tuples')
+    assert [labels['table'] for labels, _ in live.samples] == ['busy', 'medium']
+    vacuumed = next(family for family in families if family.name == 'table_last_vacuum_timestamp')
+    assert vacuumed.samples == [({'schema': 'public', 'table': 'busy'}, pd.Timestamp('2024-01-02', tz='UTC').timestamp())]
+
+
+def test_activity_per_user_never_exports_query_text():
+    now = pd.Timestamp('2024-01-01 12:00:10', tz='UTC').timestamp()
+    active = pd.DataFrame({
+        'usename': ['app', 'app', None],
+        'query_start': pd.to_datetime(['2024-01-01 12:00:00', '2024-01-01 12:00:08', '2024-01-01 12:00:09'], utc=True),
+        'query': ['SELECT secret', 'SELECT 1', 'VACUUM']
+    })
+    counts, oldest = activity_families(active, now)
+    assert sorted(counts.samples, key=lambda sample: sample[0]['user']) == [({'user': ''}, 1.0), ({'user': 'app'}, 2.0)]
+    assert dict((labels['user'], value) for labels, value in oldest.samples)['app'] == 10.0
+    assert 'secret' not in render([counts, oldest])
+
+
+def test_table_cap_keeps_its_tables_between_collections():
+    def stats(inserts):
+        return pd.DataFrame({
+            'schemaname': ['public'] * 3, 'tablename': ['a', 'b', 'c'],
+            'inserts': inserts, 'updates': [0] * 3, 'deletes': [0] * 3, 'live_tuples': [1] * 3,
+            'dead_tuples': [0] * 3, 'last_vacuum': [None] * 3, 'last_autovacuum': [None] * 3,
+            'last_analyze': [None] * 3, 'last_autoanalyze': [None] * 3
+        })
+
+    def exported(families):
+        live = next(family for family in families if family.name == 'table_live_tuples')
+        return [labels['table'] for labels, _ in live.samples]
+
+    cap = SeriesCap(2)
+    assert exported(table_families(stats([30, 20, 10]), cap)[0]) == ['a', 'b']
+    # c overtakes b, but b keeps its slot
+    assert exported(table_families(stats([30, 20, 25]), cap)[0]) == ['a', 'b']
+    # A dropped table frees its slot for the most active of the others
+    families, dropped = table_families(stats([30, 20, 25]).iloc[[0, 2]], cap)
+    assert exported(families) == ['a', 'c']
+    assert dropped == 0
@@ -0,0 +1,152 @@
+from collections import namedtuple
+
+import pytest
+
+from database import pagination
+from database.pagination import (
+    CTID_WINDOW_BLOCKS, PAGING_CTID, PAGING_OFFSET, PAGING_PRIMARY_KEY, PagingPlan, build_page_query, ctid_block,
+    fetch_page
+)
+from database.queries import TABLE_QUERIES
+
+Column = namedtuple('Column', ['name', 'type_code'])
+TEXT = 25
+
+KEYED = PagingPlan('public', 'readings', PAGING_PRIMARY_KEY, ('device_id', 'ts'), ('integer', 'timestamp'))
+HEAP = PagingPlan('public', 'raw_log', PAGING_CTID, ('ctid',), ('tid',))
+
+
+def test_primary_key_page_starts_after_the_cursor(quote_ident):
+    query, params = build_page_query(KEYED, 50, ('7', '2024-01-01 00:00:00'))
+    assert query.as_string(None) == (
+        'SELECT "device_id"::text, "ts"::text, * FROM "public"."readings" '
+        'WHERE ("device_id", "ts") > (%s::integer, %s::timestamp) ORDER BY "device_id", "ts" LIMIT %s'
+    )
+    assert params == ['7', '2024-01-01 00:00:00', 51]
+
+
+def test_first_page_has_no_condition(quote_ident):
+    query, params = build_page_query(KEYED, 50)
+    assert 'WHERE' not in query.as_string(None)
+    assert params == [51]
+
+
+def test_offset_page(quote_ident):
+    query, params = build_page_query(PagingPlan('public', 'v', PAGING_OFFSET), 20, (40,))
+    assert query.as_string(None) == 'SELECT * FROM "public"."v" LIMIT %s OFFSET %s'
+    assert params == [21, 40]
+
+
+def test_ctid_page_reads_one_block_window(quote_ident):
+    query, params = build_page_query(HEAP, 10, ('(3,7)',), (3, 35))
+    assert query.as_string(None) == (
+        'SELECT "ctid"::text, * FROM "public"."raw_log" '
+        'WHERE ctid >= %s::tid AND ctid < %s::tid AND ("ctid") > (%s::tid) ORDER BY "ctid" LIMIT %s'
+    )
+    assert params == ['(3,0)', '(35,0)', '(3,7)', 11]
+
+
+def test_ctid_block():
+    assert ctid_block('(1234,56)') == 1234
+
+
+class FakeHeapCursor:
+    """Answers relation_blocks and ctid window queries from a dict of block -> row count"""
+
+    def __init__(self, heap, blocks):
+        self.heap = heap
+        self.blocks = blocks
+        self.windows = []
+        self.description = None
+        self._rows = []
+
+    def execute(self, query, params):
+        if query == TABLE_QUERIES['relation_blocks']:
+            self._rows = [(self.blocks,)]
+            return
+        first, last = ctid_block(params[0]), ctid_block(params[1])
+        after = params[2] if len(params) == 4 else None
+        self.windows.append((first, last))
+        rows = [
+            (block, offset) for block in range(first, min(last, self.blocks))
+            for offset in range(1, self.heap.get(block, 0) + 1)
+        ]
+        if after is not None:
+            rows = [row for row in rows if row > (ctid_block(after), int(after.strip('()').split(',')[1]))]
+        self._rows = [(f"({block},{offset})", f"row {block}.{offset}") for block, offset in rows][:params[-1]]
+        self.description = [Column('ctid', TEXT), Column('payload', TEXT)]
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def heap_connection(monkeypatch, quote_ident):
+    monkeypatch.setattr(pagination, 'prepare_cursor', lambda cursor: None)
+    # Execute the composed query as text so the fake can compare it
+    monkeypatch.setattr(pagination, 'build_page_query', lambda *args: (None, build_page_query(*args)[1]))
+
+    def connect(heap, blocks):
+        return FakeConnection(FakeHeapCursor(heap, blocks))
+    return connect
+
+
+def page_through(connection, limit):
+    pages, after = [], None
+    while True:
+        page = fetch_page(connection, HEAP, limit, after)
+        pages.append(page.data['payload'].tolist())
+        if page.next_key is None:
+            return pages
+        after = page.next_key
+
+
+def test_ctid_pages_cover_every_row_once(heap_connection):
+    heap = {block: 5 for block in range(100)}
+    pages = page_through(heap_connection(heap, 100), 7)
+    rows = [row for page in pages for row in page]
+    assert len(rows) == 500
+    assert rows == [f"row {block}.{offset}" for block in range(100) for offset in range(1, 6)]
+    assert all(len(page) == 7 for page in pages[:-1])
+
+
+def test_ctid_page_reads_only_the_windows_it_needs(heap_connection):
+    connection = heap_connection({block: 100 for block in range(10000)}, 10000)
+    page = fetch_page(connection, HEAP, 50, ('(5000,20)',))
+    assert connection.cursor().windows == [(5000, 5000 + CTID_WINDOW_BLOCKS)]
+    assert page.data['payload'].iloc[0] == 'row 5000.21'
+
+
+def test_sparse_heap_grows_the_window(heap_connection):
+    # Rows only at the start and the end, the rest deleted and vacuumed
+    connection = heap_connection({0: 1, 20000: 1}, 20001)
+    page = fetch_page(connection, HEAP, 10)
+    assert page.data['payload'].tolist() == ['row 0.1', 'row 20000.1']
+    assert page.next_key is None
+    windows = connection.cursor().windows
+    sizes = [last - first for first, last in windows]
+    assert sizes[:3] == [CTID_WINDOW_BLOCKS, CTID_WINDOW_BLOCKS * 2, CTID_WINDOW_BLOCKS * 4]
+    assert max(sizes) == pagination.CTID_MAX_WINDOW_BLOCKS
+
+
+def test_empty_heap_has_one_empty_page(heap_connection):
+    page = fetch_page(heap_connection({}, 0), HEAP, 10)
+    assert page.data.empty
+    assert page.next_key is None
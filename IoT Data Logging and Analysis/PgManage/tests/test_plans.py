@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from database.plans import (
+    FINDING_MISESTIMATE, FINDING_NEVER_EXECUTED, FINDING_SEQ_SCAN, FINDING_SPILL, SEVERITY_HIGH, analyze_plan,
+    diff_plans, plan_summary
+)
+
+
+def seq_scan_plan(removed=900000):
+    """EXPLAIN ANALYZE of a sort over a filtered sequential scan, under a Gather with two workers"""
+    return [{
+        'Plan': {
+            'Node Type': 'Sort', 'Startup Cost': 900.0, 'Total Cost': 1000.0, 'Plan Rows': 100, 'Plan Width': 8,
+            'Actual Total Time': 80.0, 'Actual Rows': 30000, 'Actual Loops': 1,
+            'Sort Space Type': 'Disk', 'Sort Space Used': 2048,
+            'Plans': [{
+                'Node Type': 'Gather', 'Startup Cost': 0.0, 'Total Cost': 800.0, 'Plan Rows': 100,
+                'Actual Total Time': 50.0, 'Actual Rows': 30000, 'Actual Loops': 1, 'Workers Launched': 2,
+                'Plans': [{
+                    'Node Type': 'Seq Scan', 'Relation Name': 'readings', 'Schema': 'public', 'Alias': 'r',
+                    'Startup Cost': 0.0, 'Total Cost': 700.0, 'Plan Rows': 33, 'Actual Total Time': 45.0,
+                    'Actual Rows': 10000, 'Actual Loops': 3, 'Rows Removed by Filter': removed // 3,
+                    'Filter': '(value > 10)'
+                }]
+            }]
+        },
+        'Planning Time': 0.5,
+        'Execution Time': 81.0
+    }]
+
+
+def index_scan_plan():
+    return [{
+        'Plan': {
+            'Node Type': 'Index Scan', 'Index Name': 'readings_value_idx', 'Relation Name': 'readings',
+            'Schema': 'public', 'Alias': 'r', 'Startup Cost': 0.4, 'Total Cost': 120.0, 'Plan Rows': 30000,
+            'Actual Total Time': 12.0, 'Actual Rows': 30000, 'Actual Loops': 1
+        },
+        'Planning Time': 0.4,
+        'Execution Time': 12.5
+    }]
+
+
+def test_nodes_are_flattened_depth_first_with_labels():
+    analysis = analyze_plan(json.dumps(seq_scan_plan()))
+    nodes = analysis.nodes
+
+    assert analysis.has_actuals
+    assert nodes['label'].tolist() == ['Sort', 'Gather', 'Seq Scan on public.readings r']
+    assert nodes['parent_id'].tolist()[1:] == [0, 1]
+    assert nodes['depth'].tolist() == [0, 1, 2]
+    assert analysis.execution_time == 81.0
+
+
+def test_exclusive_time_divides_parallel_loops():
+    nodes = analyze_plan(seq_scan_plan()).nodes.set_index('node_type')
+
+    # Three processes each averaged 45 ms: the leader plus two workers
+    assert nodes.loc['Seq Scan', 'inclusive_time'] == pytest.approx(45.0)
+    assert nodes.loc['Gather', 'exclusive_time'] == pytest.approx(5.0)
+    assert nodes.loc['Sort', 'exclusive_time'] == pytest.approx(30.0)
+    assert nodes['time_share'].sum() == pytest.approx(100.0)
+
+
+def test_findings():
+    findings = analyze_plan(seq_scan_plan()).findings
+    kinds = findings.groupby('node')['finding'].apply(set)
+
+    assert set(findings['severity']) == {SEVERITY_HIGH}
+    # 30,000 rows against an estimate of 100 is off by 300x
+    assert kinds['Sort'] == {FINDING_SPILL, FINDING_MISESTIMATE}
+    assert kinds['Gather'] == {FINDING_MISESTIMATE}
+    scan = findings[findings['finding'] == FINDING_SEQ_SCAN].iloc[0]
+    assert scan['node'] == 'Seq Scan on public.readings r'
+    assert '930,000 rows' in scan['detail']
+    assert 'index' in scan['detail']
+
+
+def test_small_scans_and_accurate_estimates_are_not_flagged():
+    assert analyze_plan(index_scan_plan()).findings.empty
+
+    plan = seq_scan_plan(removed=0)
+    scan = plan[0]['Plan']['Plans'][0]['Plans'][0]
+    scan['Actual Rows'] = 100
+    findings = analyze_plan(plan).findings
+    assert FINDING_SEQ_SCAN not in findings['finding'].tolist()
+
+
+def test_never_executed_nodes():
+    plan = index_scan_plan()
+    plan[0]['Plan']['Actual Loops'] = 0
+    findings = analyze_plan(plan).findings
+    assert findings['finding'].tolist() == [FINDING_NEVER_EXECUTED]
+
+
+def test_plan_without_actuals_uses_cost():
+    plan = seq_scan_plan()
+    for node in (plan[0]['Plan'], plan[0]['Plan']['Plans'][0], plan[0]['Plan']['Plans'][0]['Plans'][0]):
+        for key in ('Actual Total Time', 'Actual Rows', 'Actual Loops'):
+            del node[key]
+    analysis = analyze_plan(plan)
+
+    assert not analysis.has_actuals
+    assert analysis.measure == 'exclusive_cost'
+    assert analysis.nodes['exclusive_cost'].tolist() == [200.0, 100.0, 700.0]
+    assert plan_summary(analysis)['Rows returned'] == 100
+
+
+def test_diff_matches_operations_and_summarizes():
+    diff = diff_plans(analyze_plan(seq_scan_plan()), analyze_plan(index_scan_plan()))
+    assert diff['measure'] == 'exclusive_time'
+
+    summary = diff['summary'].set_index('metric')
+    assert summary.loc['Execution time (ms)', 'change'] == pytest.approx(-68.5)
+    assert summary.loc['Sequential scans', 'change_pct'] == pytest.approx(-100.0)
+
+    operations = diff['operations'].set_index('operation')
+    assert operations.loc['Seq Scan on public.readings r', 'status'] == 'removed'
+    assert operations.loc['Index Scan using readings_value_idx on public.readings r', 'status'] == 'added'
+    assert operations.loc['Sort', 'change'] == pytest.approx(-30.0)
+    assert diff['operations']['change'].abs().is_monotonic_decreasing
@@ -0,0 +1,109 @@
+import pandas as pd
+import pytest
+
+from database.profiler import (
+    KIND_NUMERIC, KIND_TEXT, MAX_FREQUENCY_CELLS, _source, build_profile_query, estimate_distinct, profile_columns,
+    profile_table
+)
+
+
+def test_full_scan_counts_are_exact():
+    assert estimate_distinct(1000, 250, 40, 1000) == 250.0
+
+
+def test_no_singletons_means_every_value_was_seen():
+    # Every distinct value appeared at least twice in the sample
+    assert estimate_distinct(1000, 50, 0, 1000000) == 50.0
+
+
+def test_all_singletons_scale_towards_the_table():
+    # A unique column: every sampled value appears once
+    assert estimate_distinct(1000, 1000, 1000, 1000000) == 1000000.0
+
+
+def test_haas_stokes_estimate():
+    n, d, f1, total = 3000, 1200, 600, 300000
+    expected = n * d / (n - f1 + f1 * n / total)
+    assert estimate_distinct(n, d, f1, total) == pytest.approx(expected)
+    assert d < expected < total
+
+
+def test_empty_sample_has_no_distinct_values():
+    assert estimate_distinct(0, 0, 0, 1000) == 0.0
+
+
+def test_profiled_columns_by_type():
+    columns = pd.DataFrame({
+        'column_name': ['id', 'name', 'payload', 'reading'],
+        'data_type': ['integer', 'character varying', 'jsonb', 'double precision']
+    })
+    assert profile_columns(columns) == [
+        ('id', 'integer', KIND_NUMERIC), ('name', 'character varying', KIND_TEXT),
+        ('reading', 'double precision', KIND_NUMERIC)
+    ]
+
+
+def test_sampled_source(quote_ident):
+    source, params = _source('public', 'readings', 2.5)
+    assert source.as_string(None) == '"public"."readings" TABLESAMPLE SYSTEM (%s)'
+    assert params == [2.5]
+    assert _source('public', 'readings', None)[1] == []
+
+
+COLUMNS = [('id', 'integer', KIND_NUMERIC), ('name', 'text', KIND_TEXT)]
+
+
+def test_profile_reads_the_source_once(quote_ident):
+    source, _ = _source('public', 'readings', 2.5)
+    query = build_profile_query(COLUMNS, source).as_string(None)
+
+    assert query.count('"public"."readings"') == 1
+    assert query.count('FROM "sample"') == 2
+    # Source percent, the frequency cap, then the number of top values
+    assert query.count('%s') == 3
+    assert query.index('TABLESAMPLE') < query.index('FROM summary) <= %s') < query.index('value_rank <= %s')
+
+
+def summary_row(total_count, **values):
+    row = {'total_count': total_count, 'c0_non_null': total_count, 'c0_min': 1, 'c0_max': total_count,
+           'c0_avg': total_count / 2, 'c0_stddev': 1.0, 'c1_non_null': total_count - 1, 'c1_avg_length': 4.0,
+           'c1_min_length': 3, 'c1_max_length': 5}
+    row.update(values)
+    return row
+
+
+def test_profile_from_one_result(monkeypatch):
+    rows = [
+        summary_row(100, col_index=0, value='1', frequency=1, distinct_count=100, singleton_count=100),
+        summary_row(100, col_index=1, value='abc', frequency=60, distinct_count=2, singleton_count=0),
+        summary_row(100, col_index=1, value='abcd', frequency=39, distinct_count=2, singleton_count=0),
+    ]
+    queries = []
+    monkeypatch.setattr('database.profiler.fetch_dataframe',
+                        lambda connection, query, params: queries.append(params) or pd.DataFrame(rows))
+    columns_df = pd.DataFrame({'column_name': ['id', 'name'], 'data_type': ['integer', 'text']})
+
+    profile = profile_table(None, 'public', 'readings', columns_df, sample_percent=10.0, top_values=5)
+
+    assert queries == [[10.0, MAX_FREQUENCY_CELLS // 2, 5]]
+    assert not profile.frequencies_skipped
+    assert profile.total_count == 1000.0
+    assert profile.column('name')['null_count'] == 10.0
+    assert profile.column('name')['distinct_count'] == 2.0
+    assert profile.column_top_values('name')['frequency'].tolist() == [600.0, 390.0]
+    # Every sampled id was seen once, so the estimate scales towards the table
+    assert profile.column('id')['distinct_count'] == 1000.0
+
+
+def test_frequencies_are_skipped_above_the_cap(monkeypatch):
+    total = MAX_FREQUENCY_CELLS // 2 + 1
+    row = summary_row(total, col_index=None, value=None, frequency=None, distinct_count=None, singleton_count=None)
+    monkeypatch.setattr('database.profiler.fetch_dataframe', lambda connection, query, params: pd.DataFrame([row]))
+    columns_df = pd.DataFrame({'column_name': ['id', 'name'], 'data_type': ['integer', 'text']})
+
+    profile = profile_table(None, 'public', 'readings', columns_df)
+
+    assert profile.frequencies_skipped
+    assert profile.column('id')['non_null_count'] == total
+    assert pd.isna(profile.column('id')['distinct_count'])
+    assert profile.top_values.empty
@@ -0,0 +1,29 @@
+import pytest
+
+from database.query_jobs import is_data_modifying
+
+
+@pytest.mark.parametrize('query', [
+    "WITH moved AS (DELETE FROM readings WHERE ts < now() - interval '1 year' RETURNING *) SELECT count(*) FROM moved",
+    "WITH x AS (INSERT INTO archive SELECT * FROM readings RETURNING id) SELECT * FROM x",
+    "with x as (update devices set active = false returning id) select * from x",
+    "WITH src AS (SELECT 1 AS id) MERGE INTO devices d USING src ON d.id = src.id WHEN MATCHED THEN DELETE",
+    "INSERT INTO devices VALUES (1) RETURNING *",
+])
+def test_writes_are_detected(query):
+    assert is_data_modifying(query)
+
+
+@pytest.mark.parametrize('query', [
+    "WITH recent AS (SELECT * FROM readings WHERE ts > now() - interval '1 day') SELECT * FROM recent",
+    "WITH x AS (SELECT 'DELETE FROM readings' AS text) SELECT * FROM x",
+    'WITH x AS (SELECT "update" FROM audit) SELECT * FROM x',
+    "WITH x AS (SELECT 1) -- then DELETE everything\nSELECT * FROM x",
+    "WITH x AS (SELECT 1 /* INSERT later */) SELECT * FROM x",
+    "WITH x AS (SELECT $body$UPDATE t SET a = 1$body$ AS sql) SELECT * FROM x",
+    "WITH x AS (SELECT * FROM devices FOR UPDATE) SELECT * FROM x",
+    "WITH x AS (SELECT * FROM devices FOR NO KEY UPDATE) SELECT * FROM x",
+    "WITH x AS (SELECT updated_at, deleted FROM devices) SELECT * FROM x",
+])
+def test_reads_are_not_writes(query):
+    assert not is_data_modifying(query)
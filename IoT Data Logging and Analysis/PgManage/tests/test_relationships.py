@@ -0,0 +1,45 @@
+import pandas as pd
+
+from database.relationships import FOREIGN_KEY, VIEW, RelationshipGraph, foreign_key_columns
+
+
+def relationship(kind, source, target, constraint_name=None, constraint_oid=None, source_columns=None,
+                 target_columns=None, definition=None):
+    return {
+        'kind': kind, 'source_oid': source, 'source_schema': 'public', 'source_table': f"t{source}",
+        'source_relkind': 'v' if kind == VIEW else 'r', 'target_oid': target, 'target_schema': 'public',
+        'target_table': f"t{target}", 'target_relkind': 'r', 'constraint_name': constraint_name,
+        'constraint_oid': constraint_oid, 'source_columns': source_columns, 'target_columns': target_columns,
+        'update_rule': 'NO ACTION' if kind == FOREIGN_KEY else None,
+        'delete_rule': 'CASCADE' if kind == FOREIGN_KEY else None, 'definition': definition
+    }
+
+
+RELATIONSHIPS = pd.DataFrame([
+    relationship(FOREIGN_KEY, 1, 2, 'readings_device_fkey', 101, ['site_id', 'device_id'], ['site_id', 'id']),
+    # Constraint names are only unique per table, so a second key may share one
+    relationship(FOREIGN_KEY, 1, 3, 'readings_device_fkey', 102, ['sensor_id', 'site_id'], ['id', 'site_id']),
+    relationship(VIEW, 4, 1, definition='SELECT * FROM t1')
+])
+
+
+def test_foreign_key_columns_are_paired_and_numbered_per_constraint():
+    columns = foreign_key_columns(RELATIONSHIPS)
+
+    assert list(zip(columns['source_column'], columns['target_column'], columns['position'])) == [
+        ('site_id', 'site_id', 1), ('device_id', 'id', 2), ('sensor_id', 'id', 1), ('site_id', 'site_id', 2)
+    ]
+    assert columns['target_table'].tolist() == ['t2', 't2', 't3', 't3']
+
+
+def test_foreign_key_columns_without_foreign_keys():
+    assert foreign_key_columns(RELATIONSHIPS[RELATIONSHIPS['kind'] == VIEW]).empty
+
+
+def test_graph_edges_and_view_definitions():
+    graph = RelationshipGraph(RELATIONSHIPS)
+
+    assert [edge.target for edge in graph.foreign_keys()] == [2, 3]
+    assert graph.impact(2)['relation'].tolist()[-2:] == ['public.t1', 'public.t4']
+    assert graph.find('public', 't1') == 1
+    assert graph.view_definitions == {4: 'SELECT * FROM t1'}
@@ -0,0 +1,73 @@
+import contextlib
+
+import pandas as pd
+from psycopg2 import sql
+
+from database.pool import PoolError
+from database.row_counts import COUNT_ESTIMATED, COUNT_EXACT, get_row_counts
+
+ESTIMATES = pd.DataFrame({
+    'schemaname': ['public', 'public', 'public', 'public'],
+    'tablename': ['devices', 'readings', 'remote_readings', 'sites'],
+    'relkind': ['r', 'p', 'f', 'r'],
+    'row_count': [40, 5000000, 200, 3]
+})
+
+
+class FakeCursor:
+    def __init__(self, counts):
+        self.counts = counts
+        self.table = None
+
+    def execute(self, statement, params=None):
+        if not isinstance(statement, str):
+            self.table = [part for part in statement.seq if isinstance(part, sql.Identifier)][-1].string
+
+    def fetchone(self):
+        return (self.counts[self.table],)
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, counts, busy=False):
+        self.counts = counts
+        self.busy = busy
+        self.counted = []
+
+    @contextlib.contextmanager
+    def connection(self):
+        if self.busy:
+            raise PoolError("Timed out waiting for a connection")
+        cursor = FakeCursor(self.counts)
+        yield type('Connection', (), {'cursor': lambda _: cursor})()
+        self.counted.append(cursor.table)
+
+
+class FakeDatabase:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def execute_query(self, query):
+        return ESTIMATES.copy()
+
+    def get_pool(self):
+        return self.pool
+
+
+def test_hybrid_counts_small_tables_and_skips_foreign_ones():
+    pool = FakePool({'devices': 41, 'sites': 3})
+    counts = get_row_counts(FakeDatabase(pool), 'Hybrid')
+
+    assert sorted(pool.counted) == ['devices', 'sites']
+    assert counts.columns.tolist() == ['schemaname', 'tablename', 'row_count', 'count_type']
+    assert counts['row_count'].tolist() == [41, 5000000, 200, 3]
+    assert counts['count_type'].tolist() == [COUNT_EXACT, COUNT_ESTIMATED, COUNT_ESTIMATED, COUNT_EXACT]
+
+
+def test_busy_pool_keeps_the_estimates():
+    counts = get_row_counts(FakeDatabase(FakePool({}, busy=True)), 'Exact')
+
+    assert counts['row_count'].tolist() == ESTIMATES['row_count'].tolist()
+    assert (counts['count_type'] == COUNT_ESTIMATED).all()
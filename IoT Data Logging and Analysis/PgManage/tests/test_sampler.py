@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from database.sampler import GAUGE_FIELDS, SAMPLE_FIELDS, RingBuffer, compute_rates
+
+
+def samples(commits, stats_reset, timestamps=None):
+    """Sample rows where only xact_commit and stats_reset vary"""
+    values = np.zeros((len(commits), len(SAMPLE_FIELDS)))
+    values[:, SAMPLE_FIELDS.index('xact_commit')] = commits
+    values[:, SAMPLE_FIELDS.index('stats_reset')] = stats_reset
+    if timestamps is None:
+        timestamps = np.arange(len(commits), dtype=float) * 5
+    return np.asarray(timestamps, dtype=float), values
+
+
+def test_rates_are_per_second():
+    timestamps, values = samples([100, 150, 250], [0, 0, 0])
+    rates = compute_rates(timestamps, values, SAMPLE_FIELDS)
+    assert rates['commits_per_sec'].tolist() == [10.0, 20.0]
+    assert rates['tps'].tolist() == [10.0, 20.0]
+
+
+def test_never_reset_statistics_still_have_rates():
+    # pg_stat_database.stats_reset is NULL until the first reset
+    timestamps, values = samples([100, 150, 250], [np.nan, np.nan, np.nan])
+    rates = compute_rates(timestamps, values, SAMPLE_FIELDS)
+    assert rates['commits_per_sec'].tolist() == [10.0, 20.0]
+
+
+@pytest.mark.parametrize('stats_reset', [[1000, 1000, 2000], [np.nan, np.nan, 2000]])
+def test_interval_spanning_a_reset_has_no_rate(stats_reset):
+    timestamps, values = samples([100, 150, 5], stats_reset)
+    rates = compute_rates(timestamps, values, SAMPLE_FIELDS)
+    assert rates['commits_per_sec'].iloc[0] == 10.0
+    assert np.isnan(rates['commits_per_sec'].iloc[1])
+
+
+def test_decreasing_counter_has_no_rate():
+    timestamps, values = samples([100, 50], [0, 0])
+    assert np.isnan(compute_rates(timestamps, values, SAMPLE_FIELDS)['commits_per_sec'].iloc[0])
+
+
+def test_cache_hit_ratio_without_block_accesses_is_nan():
+    timestamps, values = samples([0, 0, 0], [0, 0, 0])
+    values[:, SAMPLE_FIELDS.index('blks_hit')] = [0, 90, 90]
+    values[:, SAMPLE_FIELDS.index('blks_read')] = [0, 10, 10]
+    ratio = compute_rates(timestamps, values, SAMPLE_FIELDS)['cache_hit_ratio']
+    assert ratio.iloc[0] == pytest.approx(90.0)
+    assert np.isnan(ratio.iloc[1])
+
+
+def test_gauges_are_the_later_sample():
+    timestamps, values = samples([0, 0], [0, 0])
+    values[:, SAMPLE_FIELDS.index('backends')] = [3, 7]
+    rates = compute_rates(timestamps, values, SAMPLE_FIELDS)
+    assert set(GAUGE_FIELDS) <= set(rates.columns)
+    assert rates['backends'].tolist() == [7.0]
+
+
+def test_fewer_than_two_samples_give_no_rates():
+    timestamps, values = samples([1], [0])
+    assert compute_rates(timestamps, values, SAMPLE_FIELDS).empty
+
+
+def test_ring_buffer_keeps_the_newest_samples_in_order():
+    buffer = RingBuffer(3, ('a',))
+    for i in range(5):
+        buffer.append(float(i), np.array([i * 10.0]))
+    timestamps, values = buffer.window()
+    assert len(buffer) == 3
+    assert timestamps.tolist() == [2.0, 3.0, 4.0]
+    assert values[:, 0].tolist() == [20.0, 30.0, 40.0]
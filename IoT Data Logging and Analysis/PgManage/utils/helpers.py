@@ -184,6 +184,17 @@ def export_data_to_csv(dataframe, filename_prefix="data"):
         st.error(f"Error exporting data: {str(e)}")
         return None, None
 
+def export_query_to_csv(db_conn, query, filename_prefix="data", compress=False):
+    """Export query results with COPY into a temporary CSV file, without a DataFrame"""
+    try:
+        from database.export import export_query_to_file
+        
+        # Returns (path, filename, row_count); the caller removes the file
+        return export_query_to_file(db_conn, query, compress, filename_prefix)
+    except Exception as e:
+        st.error(f"Error exporting data: {str(e)}")
+        return None, None, None
+
 def display_error_with_details(error, context="Operation"):
     """Display detailed error information"""
     st.error(f"❌ {context} failed")